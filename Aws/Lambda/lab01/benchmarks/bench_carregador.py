@@ -0,0 +1,96 @@
+"""executemany x LOAD DATA LOCAL INFILE + merge, gravando tbv9088_regr_prod_plar
+
+Uso (precisa de um MySQL acessível, com local_infile=ON no servidor):
+    DB_HOST=localhost DB_USER=root DB_PASSWORD=... DB_SCHEMA=lab \\
+        python benchmarks/bench_carregador.py --linhas 200000 --lote 10000
+
+As linhas vêm de gerador_dados.py projetadas pelo mapeamento do s3tords. Cada
+carregador grava em uma cópia vazia da tabela (bench_tbv9088_regr_prod_plar) duas
+vezes: a primeira mede inserção, a segunda mede atualização das mesmas chaves.
+"""
+import argparse
+import os
+import sys
+import time
+
+LAB_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, LAB_DIR)
+sys.path.insert(0, os.path.join(LAB_DIR, 's3tords'))
+
+from gerador_dados import generate_test_data
+
+TABELA = 'tbv9088_regr_prod_plar'
+TABELA_BENCH = f"bench_{TABELA}"
+
+# Mesma estrutura de testdbemp.sql, sem o nome da CHECK (único por schema)
+DDL = f"""
+CREATE TABLE IF NOT EXISTS {TABELA_BENCH} (
+   cod_regr_prod_plar bigint NOT NULL,
+   nom_regr_prod_plar varchar(50) NOT NULL,
+   des_regr_prod_plar varchar(255) NOT NULL,
+   ind_rgto_ativ char(1) NOT NULL DEFAULT 'S',
+   dat_hor_inio_vige__regr_prod datetime NOT NULL,
+   dat_hor_usua_atui_rgto datetime NOT NULL,
+   num_funl_cola_cogl_atud varchar(9) NOT NULL,
+   PRIMARY KEY (cod_regr_prod_plar),
+   CHECK (ind_rgto_ativ in ('S', 'N'))
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+"""
+
+
+def gerar_linhas(quantidade):
+    from chalicelib.core.config import TABLE_MAPPINGS
+    from chalicelib.services.processor import DataProcessor
+
+    mapeamento = [t for t in TABLE_MAPPINGS if t['name'] == TABELA]
+    dados = DataProcessor(mapeamento).process_csv('\n'.join(generate_test_data(quantidade)))
+    # gerador_dados repete os códigos a cada 900 linhas; a chave é renumerada para que
+    # cada linha seja uma inserção na primeira passada e uma atualização na segunda
+    linhas = [(i,) + linha[1:] for i, linha in enumerate(dados[TABELA], 1)]
+    return [c['name'] for c in mapeamento[0]['columns']], linhas
+
+
+def medir(servico, colunas, linhas, lote):
+    inicio = time.perf_counter()
+    servico.bulk_upsert(TABELA_BENCH, colunas, linhas, lote)
+    return time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--linhas', type=int, default=200000)
+    parser.add_argument('--lote', type=int, default=10000)
+    args = parser.parse_args()
+
+    from chalicelib.core.config import DBConfig
+    from chalicelib.services.database import DatabaseService
+    from chalicelib.services.pool import reset_pools
+
+    colunas, linhas = gerar_linhas(args.linhas)
+    print(f"{TABELA}: {len(linhas):,} linhas únicas, lotes de {args.lote:,}")
+
+    for carregador in ('executemany', 'load_data'):
+        reset_pools()
+        config = DBConfig()
+        config.loader = carregador
+        servico = DatabaseService(config)
+
+        conexao = servico._get_connection()
+        with conexao.cursor() as cursor:
+            cursor.execute(DDL)
+            cursor.execute(f"TRUNCATE TABLE {TABELA_BENCH}")
+        conexao.commit()
+        servico.pool.release(conexao)
+
+        insercao = medir(servico, colunas, linhas, args.lote)
+        atualizacao = medir(servico, colunas, linhas, args.lote)
+        if servico.loader != carregador:
+            print(f"AVISO: {carregador} indisponível no servidor, medido com {servico.loader}")
+        print(f"{carregador:<12} inserção {len(linhas) / insercao:12,.0f} linhas/s   "
+              f"atualização {len(linhas) / atualizacao:12,.0f} linhas/s")
+
+    reset_pools()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""Latência de invocação cold x warm com S3 simulado pelo moto
+
+Uso:
+    python benchmarks/bench_cold_warm.py --projeto s3tords --invocacoes 20
+    python benchmarks/bench_cold_warm.py --projeto lambdaS3-RDS --latencia-conexao 30
+
+"Cold" descarta os recursos em cache (runtime, clientes boto3, pool de conexões)
+antes de cada invocação, como acontecia quando tudo era criado por chamada;
+"warm" reaproveita o que a primeira invocação criou. O banco é substituído por
+uma conexão falsa com latência de handshake configurável.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from unittest.mock import patch
+
+LAB_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, LAB_DIR)
+
+BUCKET = 'bench-cold-warm'
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ['S3_BUCKET'] = BUCKET
+
+from gerador_dados import generate_test_data
+
+
+class ConexaoFalsa:
+    """Conexão compatível com pymysql/mysql.connector que só simula o custo do handshake"""
+
+    latencia = 0.0
+
+    def __init__(self, *args, **kwargs):
+        time.sleep(self.latencia)
+
+    def cursor(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def executemany(self, query, dados):
+        pass
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def ping(self, reconnect=False):
+        pass
+
+    def close(self):
+        pass
+
+    def is_connected(self):
+        return True
+
+
+def carregar_projeto(projeto):
+    """Retorna (invocar(chave), reiniciar()) do projeto"""
+    sys.path.insert(0, os.path.join(LAB_DIR, projeto))
+    evento = lambda chave: {'Records': [{'s3': {'bucket': {'name': BUCKET}, 'object': {'key': chave}}}]}
+
+    if projeto == 's3tords':
+        from chalicelib.core import runtime
+        from chalicelib.lambda_function import lambda_handler
+        from chalicelib.services.pool import reset_pools
+
+        def reiniciar():
+            runtime.reset_runtime()
+            reset_pools()
+        return lambda chave: lambda_handler(evento(chave), None), reiniciar
+
+    if projeto == 'lambdaS3-RDS':
+        from chalicelib import lambda_function
+        from chalicelib.core.recursos import reiniciar_recursos
+        from chalicelib.services.pool_conexoes import reiniciar_pools
+
+        def reiniciar():
+            lambda_function._handler = None
+            reiniciar_recursos()
+            reiniciar_pools()
+        return lambda chave: lambda_function.lambda_handler(evento(chave), None), reiniciar
+
+    if projeto == 's3-to-rds-v2':
+        import app
+
+        def reiniciar():
+            app.reset_clients()
+            app.reset_pool()
+        return lambda chave: app.handle_s3_file(chave, app.CONFIG), reiniciar
+
+    raise SystemExit(f"Projeto desconhecido: {projeto}")
+
+
+def medir(invocar, s3, conteudo, invocacoes, antes=None):
+    tempos = []
+    for i in range(invocacoes):
+        chave = f"entrada/arquivo_{i}.csv"
+        s3.put_object(Bucket=BUCKET, Key=chave, Body=conteudo)
+        if antes:
+            antes()
+        inicio = time.perf_counter()
+        invocar(chave)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return tempos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--projeto', default='s3tords', choices=['s3tords', 'lambdaS3-RDS', 's3-to-rds-v2'])
+    parser.add_argument('--invocacoes', type=int, default=20)
+    parser.add_argument('--linhas', type=int, default=100)
+    parser.add_argument('--latencia-conexao', type=float, default=20.0, help='Handshake simulado do MySQL (ms)')
+    args = parser.parse_args()
+
+    import boto3
+    from moto import mock_aws
+
+    ConexaoFalsa.latencia = args.latencia_conexao / 1000
+    conteudo = '\n'.join(generate_test_data(args.linhas)).encode('utf-8')
+
+    with mock_aws(), patch('pymysql.connect', ConexaoFalsa), patch('mysql.connector.connect', ConexaoFalsa):
+        s3 = boto3.client('s3')
+        s3.create_bucket(Bucket=BUCKET)
+        invocar, reiniciar = carregar_projeto(args.projeto)
+
+        cold = medir(invocar, s3, conteudo, args.invocacoes, antes=reiniciar)
+        reiniciar()
+        warm = medir(invocar, s3, conteudo, args.invocacoes + 1)[1:]
+
+    print(f"Projeto: {args.projeto} - {args.invocacoes} invocações, {args.linhas} linhas por arquivo")
+    for nome, tempos in (('cold', cold), ('warm', warm)):
+        print(f"{nome:<5} mediana {statistics.median(tempos):8.1f} ms   p95 {sorted(tempos)[int(len(tempos) * 0.95) - 1]:8.1f} ms")
+    print(f"Ganho (mediana): {statistics.median(cold) / statistics.median(warm):.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""Benchmark do caminho colunar (Arrow) contra o caminho linha a linha
+
+Uso:
+    python benchmarks/bench_colunar.py --projeto s3tords --linhas 1000000
+    python benchmarks/bench_colunar.py --projeto lambdaS3-RDS --arquivo dados_10M.csv --lote 100000
+
+Os dois caminhos consomem o mesmo conteúdo em lotes (iter_batches / iterar_lotes);
+os resultados são comparados ignorando as colunas de data atual.
+"""
+import argparse
+import os
+import sys
+import time
+
+LAB_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, LAB_DIR)
+
+from gerador_dados import generate_test_data
+
+
+def carregar_projeto(projeto):
+    """Retorna (processador linha a linha, processador colunar, colunas de data atual por tabela)"""
+    sys.path.insert(0, os.path.join(LAB_DIR, projeto))
+    if projeto == 's3tords':
+        from chalicelib.core.config import TABLE_MAPPINGS
+        from chalicelib.services.processor import DataProcessor
+        mascara = {
+            t['name']: {i for i, c in enumerate(t['columns']) if c['source']['type'] == 'function'}
+            for t in TABLE_MAPPINGS
+        }
+        return (DataProcessor(TABLE_MAPPINGS).iter_batches,
+                DataProcessor(TABLE_MAPPINGS, columnar=True).iter_batches, mascara)
+    if projeto == 'lambdaS3-RDS':
+        from chalicelib.core.config import carregar_mapeamento
+        from chalicelib.services.processador import ProcessadorArquivo
+        mapeamento = carregar_mapeamento()
+        mascara = {
+            t['tabela']: {i for i, c in enumerate(t['colunas']) if c['origem']['tipo'] == 'funcao'}
+            for t in mapeamento
+        }
+        return (ProcessadorArquivo(mapeamento).iterar_lotes,
+                ProcessadorArquivo(mapeamento, colunar=True).iterar_lotes, mascara)
+    raise SystemExit(f"Projeto desconhecido: {projeto}")
+
+
+def medir(nome, iterar, conteudo, lote, linhas):
+    inicio = time.perf_counter()
+    resultado = {}
+    for tabela, registros in iterar(conteudo, lote):
+        resultado.setdefault(tabela, []).extend(registros)
+    duracao = time.perf_counter() - inicio
+    print(f"{nome:<14} {duracao:8.3f}s  {linhas / duracao:12,.0f} linhas/s")
+    return resultado, duracao
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--projeto', default='s3tords', choices=['s3tords', 'lambdaS3-RDS'])
+    parser.add_argument('--linhas', type=int, default=1000000)
+    parser.add_argument('--arquivo', help='Arquivo gerado por gerador_dados.py (opcional)')
+    parser.add_argument('--lote', type=int, default=50000)
+    args = parser.parse_args()
+
+    if args.arquivo:
+        with open(args.arquivo) as f:
+            conteudo = f.read()
+    else:
+        conteudo = '\n'.join(generate_test_data(args.linhas))
+    linhas = conteudo.count('\n') + 1
+
+    por_linha, colunar, mascara = carregar_projeto(args.projeto)
+    print(f"Projeto: {args.projeto} - {linhas:,} linhas, lotes de {args.lote:,}")
+    esperado, t_linha = medir('linha a linha', por_linha, conteudo, args.lote, linhas)
+    obtido, t_colunar = medir('colunar', colunar, conteudo, args.lote, linhas)
+    print(f"Ganho: {t_linha / t_colunar:.2f}x")
+
+    for tabela, registros in esperado.items():
+        ignorar = mascara[tabela]
+        for a, b in zip(registros, obtido[tabela]):
+            if [v for i, v in enumerate(a) if i not in ignorar] != [v for i, v in enumerate(b) if i not in ignorar]:
+                raise SystemExit(f"ERRO: resultados diferentes em {tabela}: {a} != {b}")
+        if len(registros) != len(obtido[tabela]):
+            raise SystemExit(f"ERRO: quantidade de linhas diferente em {tabela}")
+    print("Resultados idênticos (exceto colunas de data atual)")
+
+
+if __name__ == '__main__':
+    main()
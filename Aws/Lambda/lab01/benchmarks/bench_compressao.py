@@ -0,0 +1,96 @@
+"""Latência de ponta a ponta com entrada sem compressão, gzip e zstd
+
+Uso:
+    python benchmarks/bench_compressao.py --linhas 200000 --mbps-conexao 40
+    python benchmarks/bench_compressao.py --projeto lambdaS3-RDS --compressao-arquivamento gzip
+    python benchmarks/bench_compressao.py --projeto s3-to-rds-v2 --mbps-conexao 0
+
+Cada invocação passa pelo handler completo (leitura, descompressão em streaming,
+processamento, banco e arquivamento), com o container já quente. O S3 é simulado pelo
+moto e o banco pela conexão falsa de bench_cold_warm. --mbps-conexao limita a vazão de
+cada resposta do S3, que é onde a compressão ganha: menos bytes trafegados em troca de
+CPU para descomprimir. zstd só é medido com o pacote zstandard instalado.
+"""
+import argparse
+import gzip
+import os
+import statistics
+import sys
+import time
+from contextlib import ExitStack
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_cold_warm import BUCKET, ConexaoFalsa, carregar_projeto, generate_test_data
+from bench_download_faixas import limitar_conexoes
+
+
+def codecs_disponiveis(conteudo, nivel_zstd):
+    """(nome, extensão, corpo) para cada formato medido"""
+    formatos = [('sem compressão', '.csv', conteudo), ('gzip', '.csv.gz', gzip.compress(conteudo, 6))]
+    try:
+        import zstandard
+        formatos.append(('zstd', '.csv.zst', zstandard.ZstdCompressor(level=nivel_zstd).compress(conteudo)))
+    except ImportError:
+        print("zstandard não instalado - zstd não será medido")
+    return formatos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--projeto', default='s3tords', choices=['s3tords', 'lambdaS3-RDS', 's3-to-rds-v2'])
+    parser.add_argument('--linhas', type=int, default=100000)
+    parser.add_argument('--invocacoes', type=int, default=5)
+    parser.add_argument('--mbps-conexao', type=float, default=40.0, help='Vazão simulada por conexão S3 (MB/s, 0 = sem limite)')
+    parser.add_argument('--nivel-zstd', type=int, default=3)
+    parser.add_argument('--compressao-arquivamento', default='none', choices=['none', 'gzip', 'zstd'])
+    parser.add_argument('--streaming', action='store_true', help='Leitura em streaming (S3_STREAM_READ=true)')
+    args = parser.parse_args()
+
+    # Lidos na importação da configuração de cada projeto
+    os.environ['ARCHIVE_COMPRESSION'] = args.compressao_arquivamento
+    os.environ['S3_STREAM_READ'] = 'true' if args.streaming else 'false'
+
+    import boto3
+    from moto import mock_aws
+
+    conteudo = ('\n'.join(generate_test_data(args.linhas)) + '\n').encode('utf-8')
+    formatos = codecs_disponiveis(conteudo, args.nivel_zstd)
+
+    with ExitStack() as pilha:
+        pilha.enter_context(mock_aws())
+        pilha.enter_context(patch('pymysql.connect', ConexaoFalsa))
+        pilha.enter_context(patch('mysql.connector.connect', ConexaoFalsa))
+        s3 = boto3.client('s3')
+        s3.create_bucket(Bucket=BUCKET)
+        invocar, _ = carregar_projeto(args.projeto)
+        if args.mbps_conexao > 0:
+            pilha.enter_context(limitar_conexoes(args.mbps_conexao))
+
+        # Aquecimento: cria clientes, pool e plano de projeção antes das medições
+        s3.put_object(Bucket=BUCKET, Key='entrada/aquecimento.csv', Body=conteudo[:10000])
+        invocar('entrada/aquecimento.csv')
+
+        print(f"Projeto: {args.projeto} - {args.linhas:,} linhas ({len(conteudo) / 1024 / 1024:,.1f} MB), "
+              f"{args.mbps_conexao:g} MB/s por conexão, arquivamento: {args.compressao_arquivamento}")
+        print(f"{'formato':<15} {'MB no S3':>9} {'mediana ms':>11} {'mín ms':>9} {'máx ms':>9}")
+        for nome, extensao, corpo in formatos:
+            tempos = []
+            for i in range(args.invocacoes):
+                chave = f"entrada/arquivo_{i}{extensao}"
+                s3.put_object(Bucket=BUCKET, Key=chave, Body=corpo)
+                inicio = time.perf_counter()
+                resultado = invocar(chave)
+                tempos.append((time.perf_counter() - inicio) * 1000)
+                corpo_resposta = resultado.get('body', resultado)
+                if 'status' in corpo_resposta and corpo_resposta['status'] != 'success':
+                    raise SystemExit(f"Falha em {chave}: {corpo_resposta}")
+                if corpo_resposta.get('failed_files') or corpo_resposta.get('erros'):
+                    raise SystemExit(f"Falha em {chave}: {corpo_resposta}")
+            print(f"{nome:<15} {len(corpo) / 1024 / 1024:9.2f} {statistics.median(tempos):11.1f} "
+                  f"{min(tempos):9.1f} {max(tempos):9.1f}")
+
+
+if __name__ == '__main__':
+    main()
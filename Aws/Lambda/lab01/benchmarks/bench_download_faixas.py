@@ -0,0 +1,140 @@
+"""Download em um único stream x faixas paralelas (Range GET) de um CSV sintético grande
+
+Uso:
+    python benchmarks/bench_download_faixas.py --mb 256 --mbps-conexao 40
+    python benchmarks/bench_download_faixas.py --projeto lambdaS3-RDS --faixa-mb 16 --simultaneas 8
+    python benchmarks/bench_download_faixas.py --mb 4096 --endpoint-url http://localhost:9000
+
+Sem --endpoint-url o S3 é simulado pelo moto no próprio processo. O moto copia o objeto
+inteiro a cada GET, então arquivos de vários GB devem usar um S3 local de verdade
+(MinIO, moto_server) via --endpoint-url. --mbps-conexao limita a vazão de cada resposta
+(como o teto de uma conexão TCP); 0 desliga o limite.
+
+Cada modo lê o arquivo inteiro pelo iterador de linhas do projeto e confere o SHA-256 e
+a quantidade de linhas com o arquivo gerado.
+"""
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+import time
+from contextlib import ExitStack
+from unittest.mock import patch
+
+LAB_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, LAB_DIR)
+
+BUCKET = 'bench-download-faixas'
+CHAVE = 'entrada/grande.csv'
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+
+from gerador_dados import generate_test_data
+
+
+def gerar_arquivo(megabytes):
+    """Arquivo temporário com ~megabytes MB de linhas do gerador; retorna (caminho, sha256, linhas)"""
+    bloco = ('\n'.join(generate_test_data(10000)) + '\n').encode('utf-8')
+    linhas_bloco = bloco.count(b'\n')
+    total = megabytes * 1024 * 1024
+    sha = hashlib.sha256()
+    linhas = 0
+    with tempfile.NamedTemporaryFile('wb', suffix='.csv', delete=False) as saida:
+        escrito = 0
+        while escrito < total:
+            saida.write(bloco)
+            sha.update(bloco)
+            escrito += len(bloco)
+            linhas += linhas_bloco
+    return saida.name, sha.hexdigest(), linhas
+
+
+def limitar_conexoes(mbps):
+    """Limita cada StreamingBody a mbps MB/s, simulando o teto de uma conexão"""
+    from botocore.response import StreamingBody
+
+    ler = StreamingBody.read
+    bytes_por_segundo = mbps * 1024 * 1024
+
+    def read(self, amt=None):
+        inicio = time.perf_counter()
+        dados = ler(self, amt)
+        atraso = len(dados) / bytes_por_segundo - (time.perf_counter() - inicio)
+        if atraso > 0:
+            time.sleep(atraso)
+        return dados
+
+    return patch.object(StreamingBody, 'read', read)
+
+
+def criar_leitor(projeto, cliente, tamanho_faixa, simultaneas):
+    """Retorna ler_linhas(bucket, chave) do armazenamento do projeto"""
+    sys.path.insert(0, os.path.join(LAB_DIR, projeto))
+    if projeto == 's3tords':
+        from chalicelib.core.config import S3Config
+        from chalicelib.services.storage import StorageService
+        config = S3Config()
+        config.range_size = tamanho_faixa
+        config.range_concurrency = simultaneas
+        return StorageService(config, client=cliente).stream_file
+    from chalicelib.core.config import ConfigGerenciador
+    from chalicelib.services.armazenamento import GerenciadorS3
+    config = ConfigGerenciador()
+    config.tamanho_faixa = tamanho_faixa
+    config.faixas_simultaneas = simultaneas
+    return GerenciadorS3(config, cliente=cliente).ler_linhas
+
+
+def medir(ler_linhas):
+    sha = hashlib.sha256()
+    linhas = 0
+    inicio = time.perf_counter()
+    for linha in ler_linhas(BUCKET, CHAVE):
+        sha.update(linha.encode('utf-8'))
+        linhas += 1
+    return time.perf_counter() - inicio, sha.hexdigest(), linhas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--projeto', default='s3tords', choices=['s3tords', 'lambdaS3-RDS'])
+    parser.add_argument('--mb', type=int, default=256, help='Tamanho do arquivo sintético (MB)')
+    parser.add_argument('--faixa-mb', type=int, default=8, help='Tamanho de cada faixa (MB)')
+    parser.add_argument('--simultaneas', type=int, default=8, help='GETs de faixa simultâneos')
+    parser.add_argument('--mbps-conexao', type=float, default=40.0, help='Vazão simulada por conexão (MB/s, 0 = sem limite)')
+    parser.add_argument('--endpoint-url', help='S3 local (MinIO, moto_server) em vez do moto em processo')
+    args = parser.parse_args()
+
+    import boto3
+    from botocore.config import Config
+
+    caminho, sha_esperado, linhas_esperadas = gerar_arquivo(args.mb)
+    tamanho = os.path.getsize(caminho)
+    print(f"Arquivo: {tamanho / 1024 / 1024:,.0f} MB, {linhas_esperadas:,} linhas "
+          f"({args.projeto}, faixas de {args.faixa_mb} MB x {args.simultaneas})")
+
+    try:
+        with ExitStack() as pilha:
+            if not args.endpoint_url:
+                from moto import mock_aws
+                pilha.enter_context(mock_aws())
+            cliente = boto3.client('s3', endpoint_url=args.endpoint_url,
+                                   config=Config(max_pool_connections=max(10, args.simultaneas)))
+            cliente.create_bucket(Bucket=BUCKET)
+            cliente.upload_file(caminho, BUCKET, CHAVE)
+            if args.mbps_conexao > 0:
+                pilha.enter_context(limitar_conexoes(args.mbps_conexao))
+
+            modos = (('stream único', 0), ('faixas', args.faixa_mb * 1024 * 1024))
+            for nome, tamanho_faixa in modos:
+                segundos, sha, linhas = medir(criar_leitor(args.projeto, cliente, tamanho_faixa, args.simultaneas))
+                conferido = 'ok' if (sha, linhas) == (sha_esperado, linhas_esperadas) else 'DIVERGENTE'
+                print(f"{nome:<13} {segundos:8.2f} s   {tamanho / 1024 / 1024 / segundos:10,.1f} MB/s   conteúdo {conferido}")
+    finally:
+        os.unlink(caminho)
+
+
+if __name__ == '__main__':
+    main()
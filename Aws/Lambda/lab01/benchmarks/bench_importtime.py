@@ -0,0 +1,104 @@
+"""Custo de cold start por módulo, medido com python -X importtime
+
+Uso:
+    python benchmarks/bench_importtime.py --projeto s3tords
+    python benchmarks/bench_importtime.py --projeto s3-to-rds-v2 --modulo app --top 20
+    python benchmarks/bench_importtime.py --projeto lambdaS3-RDS --primeiro-uso
+
+Cada medição roda em um interpretador novo (sem cache de módulos), repetida
+--repeticoes vezes; vale o menor tempo por módulo. --primeiro-uso também importa
+o que o handler carrega sob demanda na primeira invocação (boto3, pymysql, ...).
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+LAB_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULOS = {
+    's3tords': 'chalicelib.lambda_function',
+    'lambdaS3-RDS': 'chalicelib.lambda_function',
+    's3-to-rds-v2': 'app',
+}
+
+PRIMEIRO_USO = {
+    's3tords': ['boto3', 'botocore.config', 'pymysql'],
+    'lambdaS3-RDS': ['boto3', 'botocore.config', 'pymysql'],
+    's3-to-rds-v2': ['boto3', 'botocore.config', 'mysql.connector'],
+}
+
+LINHA = re.compile(r'import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+
+def codigo_import(modulo, extras):
+    codigo = f"import {modulo}"
+    codigo += ''.join(f"\ntry:\n    import {extra}\nexcept ImportError:\n    pass" for extra in extras)
+    return codigo
+
+
+def medir(projeto, codigo):
+    """Executa o código em um processo novo e retorna {módulo: (próprio_us, acumulado_us, nível)}"""
+    resultado = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', codigo],
+        cwd=os.path.join(LAB_DIR, projeto),
+        capture_output=True,
+        text=True
+    )
+    if resultado.returncode != 0:
+        raise SystemExit(f"Falha ao executar {codigo!r}:\n{resultado.stderr[-2000:]}")
+
+    tempos = {}
+    for linha in resultado.stderr.splitlines():
+        encontrado = LINHA.match(linha)
+        if encontrado:
+            proprio, acumulado, recuo, nome = encontrado.groups()
+            tempos[nome] = (int(proprio), int(acumulado), (len(recuo) - 1) // 2)
+    return tempos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--projeto', default='s3tords', choices=sorted(MODULOS))
+    parser.add_argument('--modulo', help='Módulo a importar (padrão: handler do projeto)')
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--primeiro-uso', action='store_true')
+    args = parser.parse_args()
+
+    modulo = args.modulo or MODULOS[args.projeto]
+    codigo = codigo_import(modulo, PRIMEIRO_USO[args.projeto] if args.primeiro_uso else [])
+    # Módulos carregados pela inicialização do interpretador (site, encodings...) ficam de fora
+    inicializacao = set(medir(args.projeto, 'pass'))
+    melhores = {}
+    for _ in range(args.repeticoes):
+        for nome, (proprio, acumulado, nivel) in medir(args.projeto, codigo).items():
+            if nome in inicializacao:
+                continue
+            atual = melhores.get(nome)
+            if atual is None or acumulado < atual[1]:
+                melhores[nome] = (proprio, acumulado, nivel)
+
+    # Módulos importados diretamente pelo código medido (nível 0) somam o custo total
+    raiz = {nome: tempos for nome, tempos in melhores.items() if tempos[2] == 0}
+    total = sum(acumulado for _, acumulado, _ in raiz.values())
+
+    print(f"Projeto: {args.projeto} - import {modulo}{' + primeiro uso' if args.primeiro_uso else ''}")
+    print(f"Total: {total / 1000:.1f} ms (menor de {args.repeticoes} execuções)\n")
+    print(f"{'módulo':<50} {'acumulado':>12} {'próprio':>10}")
+    for nome, (proprio, acumulado, _) in sorted(raiz.items(), key=lambda item: -item[1][1])[:args.top]:
+        print(f"{nome:<50} {acumulado / 1000:10.1f}ms {proprio / 1000:8.1f}ms")
+
+    pacotes = sorted(
+        ((nome, tempos) for nome, tempos in melhores.items() if nome.startswith(('chalicelib', 'app'))),
+        key=lambda item: -item[1][1]
+    )
+    if pacotes:
+        print(f"\n{'módulos do projeto':<50} {'acumulado':>12} {'próprio':>10}")
+        for nome, (proprio, acumulado, _) in pacotes[:args.top]:
+            print(f"{nome:<50} {acumulado / 1000:10.1f}ms {proprio / 1000:8.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Custo da saída Parquet (PARQUET_PREFIX) no handler e conferência dos arquivos gerados
+
+Uso:
+    python benchmarks/bench_parquet.py --linhas 200000
+    python benchmarks/bench_parquet.py --projeto lambdaS3-RDS --row-group 50000 --compressao zstd
+    python benchmarks/bench_parquet.py --sem-parquet   # mesma carga, para comparar a latência
+
+Cada invocação passa pelo handler completo com o container já quente; o S3 é simulado
+pelo moto e o banco pela conexão falsa de bench_cold_warm. Ao final, os arquivos de
+analytics/ são lidos de volta: cada tabela deve ter um arquivo por invocação, com todas
+as linhas do CSV e row groups de --row-group linhas (o último pode ser menor).
+"""
+import argparse
+import io
+import os
+import statistics
+import sys
+import time
+from contextlib import ExitStack
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_cold_warm import BUCKET, ConexaoFalsa, carregar_projeto, generate_test_data
+
+PREFIXO = 'analytics/'
+
+
+def conferir(s3, linhas: int, invocacoes: int, row_group: int):
+    """Lê os Parquet do prefixo e retorna o resumo por tabela; falha se algo não bater"""
+    import pyarrow.parquet as pq
+
+    tabelas = {}
+    paginas = s3.get_paginator('list_objects_v2').paginate(Bucket=BUCKET, Prefix=PREFIXO)
+    for objeto in (obj for pagina in paginas for obj in pagina.get('Contents', [])):
+        tabela = objeto['Key'][len(PREFIXO):].split('/', 1)[0]
+        dados = s3.get_object(Bucket=BUCKET, Key=objeto['Key'])['Body'].read()
+        metadados = pq.ParquetFile(io.BytesIO(dados)).metadata
+        grupos = [metadados.row_group(i).num_rows for i in range(metadados.num_row_groups)]
+        if metadados.num_rows != linhas or any(grupo != row_group for grupo in grupos[:-1]):
+            raise SystemExit(f"{objeto['Key']}: {metadados.num_rows} linhas, row groups {grupos}")
+        resumo = tabelas.setdefault(tabela, {'arquivos': 0, 'bytes': 0, 'row_groups': len(grupos)})
+        resumo['arquivos'] += 1
+        resumo['bytes'] += objeto['Size']
+    for tabela, resumo in tabelas.items():
+        if resumo['arquivos'] != invocacoes:
+            raise SystemExit(f"{tabela}: {resumo['arquivos']} arquivos para {invocacoes} invocações")
+    return tabelas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--projeto', default='s3tords', choices=['s3tords', 'lambdaS3-RDS'])
+    parser.add_argument('--linhas', type=int, default=100000)
+    parser.add_argument('--invocacoes', type=int, default=5)
+    parser.add_argument('--row-group', type=int, default=250000)
+    parser.add_argument('--compressao', default='snappy', choices=['snappy', 'zstd', 'gzip', 'none'])
+    parser.add_argument('--sem-parquet', action='store_true', help='Só a carga no banco, sem PARQUET_PREFIX')
+    args = parser.parse_args()
+
+    # Lidos na importação da configuração de cada projeto
+    os.environ['PARQUET_PREFIX'] = '' if args.sem_parquet else PREFIXO
+    os.environ['PARQUET_ROW_GROUP_ROWS'] = str(args.row_group)
+    os.environ['PARQUET_COMPRESSION'] = args.compressao
+
+    import boto3
+    from moto import mock_aws
+
+    conteudo = ('\n'.join(generate_test_data(args.linhas)) + '\n').encode('utf-8')
+
+    with ExitStack() as pilha:
+        pilha.enter_context(mock_aws())
+        pilha.enter_context(patch('pymysql.connect', ConexaoFalsa))
+        s3 = boto3.client('s3')
+        s3.create_bucket(Bucket=BUCKET)
+        invocar, _ = carregar_projeto(args.projeto)
+
+        # Aquecimento: cria clientes, pool e plano de projeção antes das medições
+        s3.put_object(Bucket=BUCKET, Key='entrada/aquecimento.csv', Body=conteudo[:10000])
+        invocar('entrada/aquecimento.csv')
+        for objeto in s3.list_objects_v2(Bucket=BUCKET, Prefix=PREFIXO).get('Contents', []):
+            s3.delete_object(Bucket=BUCKET, Key=objeto['Key'])
+
+        tempos = []
+        for i in range(args.invocacoes):
+            chave = f"entrada/arquivo_{i}.csv"
+            s3.put_object(Bucket=BUCKET, Key=chave, Body=conteudo)
+            inicio = time.perf_counter()
+            invocar(chave)
+            tempos.append((time.perf_counter() - inicio) * 1000)
+
+        modo = 'sem parquet' if args.sem_parquet else f"parquet {args.compressao}, row group {args.row_group:,}"
+        print(f"Projeto: {args.projeto} - {args.linhas:,} linhas ({len(conteudo) / 1024 / 1024:,.1f} MB), {modo}")
+        print(f"Latência: mediana {statistics.median(tempos):.1f} ms, mín {min(tempos):.1f} ms, máx {max(tempos):.1f} ms")
+        if not args.sem_parquet:
+            for tabela, resumo in conferir(s3, args.linhas, args.invocacoes, args.row_group).items():
+                print(f"  {tabela}: {resumo['arquivos']} arquivos, {resumo['row_groups']} row groups cada, "
+                      f"{resumo['bytes'] / resumo['arquivos'] / 1024 / 1024:.2f} MB por arquivo")
+
+
+if __name__ == '__main__':
+    main()
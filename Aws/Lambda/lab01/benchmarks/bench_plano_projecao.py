@@ -0,0 +1,152 @@
+"""Benchmark do plano de projeção compilado (linhas/s antes e depois)
+
+Uso:
+    python benchmarks/bench_plano_projecao.py --projeto s3tords --linhas 500000
+    python benchmarks/bench_plano_projecao.py --projeto lambdaS3-RDS --arquivo dados_teste.csv
+
+"Antes" reproduz a interpretação coluna a coluna do mapeamento; "depois" usa o
+caminho atual de cada projeto. Os dados vêm de gerador_dados.py.
+"""
+import argparse
+import csv
+import io
+import os
+import sys
+import time
+
+LAB_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, LAB_DIR)
+
+from gerador_dados import generate_test_data
+
+
+def _interpretado_s3tords(processor, content):
+    reader = csv.reader(io.StringIO(content), delimiter=processor.delimiter)
+    table_data = {table['name']: [] for table in processor.mappings}
+    for row_idx, row in enumerate(reader, 1):
+        if not row:
+            continue
+        for table in processor.mappings:
+            values = [processor._get_column_value(row, row_idx, col) for col in table['columns']]
+            table_data[table['name']].append(tuple(values))
+    return table_data
+
+
+def _interpretado_lambdas3rds(processador, conteudo):
+    leitor = csv.reader(io.StringIO(conteudo), delimiter=processador.delimitador)
+    dados = {tabela['tabela']: [] for tabela in processador.mapeamento}
+    for num_linha, linha in enumerate(leitor, 1):
+        if not linha:
+            continue
+        for tabela in processador.mapeamento:
+            valores = [processador._obter_valor_coluna(linha, num_linha, coluna) for coluna in tabela['colunas']]
+            dados[tabela['tabela']].append(tuple(valores))
+    return dados
+
+
+def _interpretado_v2(app, content, config):
+    reader = csv.reader(io.StringIO(content), delimiter=config['mapping']['file_delimiter'])
+    table_data = {table['name']: [] for table in config['mapping']['tables']}
+    for row in reader:
+        if not row:
+            continue
+        for table in config['mapping']['tables']:
+            values = []
+            for col in table['columns']:
+                source = col['source']
+                if source['type'] == 'column':
+                    value = row[source['index']] if source['index'] < len(row) else None
+                elif source['type'] == 'constant':
+                    value = source['value']
+                elif source['type'] == 'function':
+                    value = app.transform_value(None, source['value'])
+                else:
+                    value = None
+                if value is not None and 'transform' in source:
+                    value = app.transform_value(value, source['transform'])
+                values.append(value)
+            table_data[table['name']].append(tuple(values))
+    return table_data
+
+
+def _colunas_funcao(tabelas, chave_tabela, chave_colunas, chave_origem, tipo_funcao):
+    """Posições das colunas geradas por função ('now'), que variam entre execuções"""
+    return {
+        tabela[chave_tabela]: {
+            i for i, coluna in enumerate(tabela[chave_colunas])
+            if coluna[chave_origem].get('type', coluna[chave_origem].get('tipo')) == tipo_funcao
+        }
+        for tabela in tabelas
+    }
+
+
+def carregar_projeto(projeto):
+    """Retorna as funções (antes, depois) do projeto e as colunas a ignorar na comparação"""
+    sys.path.insert(0, os.path.join(LAB_DIR, projeto))
+    if projeto == 's3tords':
+        from chalicelib.core.config import TABLE_MAPPINGS
+        from chalicelib.services.processor import DataProcessor
+        processor = DataProcessor(TABLE_MAPPINGS)
+        mascara = _colunas_funcao(TABLE_MAPPINGS, 'name', 'columns', 'source', 'function')
+        return lambda c: _interpretado_s3tords(processor, c), processor.process_csv, mascara
+    if projeto == 'lambdaS3-RDS':
+        from chalicelib.core.config import carregar_mapeamento
+        from chalicelib.services.processador import ProcessadorArquivo
+        processador = ProcessadorArquivo(carregar_mapeamento())
+        mascara = _colunas_funcao(processador.mapeamento, 'tabela', 'colunas', 'origem', 'funcao')
+        return lambda c: _interpretado_lambdas3rds(processador, c), processador.processar, mascara
+    if projeto == 's3-to-rds-v2':
+        import app
+        config = app.get_config()
+        mascara = _colunas_funcao(config['mapping']['tables'], 'name', 'columns', 'source', 'function')
+        return lambda c: _interpretado_v2(app, c, config), lambda c: app.process_file(c, config), mascara
+    raise SystemExit(f"Projeto desconhecido: {projeto}")
+
+
+def mascarar(dados, mascara):
+    return {
+        tabela: [tuple(None if i in mascara[tabela] else v for i, v in enumerate(linha)) for linha in linhas]
+        for tabela, linhas in dados.items()
+    }
+
+
+def medir(nome, funcao, conteudo, linhas, repeticoes):
+    melhor = None
+    resultado = None
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao(conteudo)
+        duracao = time.perf_counter() - inicio
+        melhor = duracao if melhor is None else min(melhor, duracao)
+    print(f"{nome:<8} {melhor:8.3f}s  {linhas / melhor:12,.0f} linhas/s")
+    return resultado, melhor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--projeto', default='s3tords', choices=['s3tords', 'lambdaS3-RDS', 's3-to-rds-v2'])
+    parser.add_argument('--linhas', type=int, default=200000)
+    parser.add_argument('--arquivo', help='Arquivo gerado por gerador_dados.py (opcional)')
+    parser.add_argument('--repeticoes', type=int, default=3)
+    args = parser.parse_args()
+
+    if args.arquivo:
+        with open(args.arquivo) as f:
+            conteudo = f.read()
+    else:
+        conteudo = '\n'.join(generate_test_data(args.linhas))
+    linhas = conteudo.count('\n') + 1
+
+    antes, depois, mascara = carregar_projeto(args.projeto)
+    print(f"Projeto: {args.projeto} - {linhas:,} linhas")
+    esperado, t_antes = medir('antes', antes, conteudo, linhas, args.repeticoes)
+    obtido, t_depois = medir('depois', depois, conteudo, linhas, args.repeticoes)
+    print(f"Ganho: {t_antes / t_depois:.2f}x")
+
+    if mascarar(esperado, mascara) != mascarar(obtido, mascara):
+        raise SystemExit("ERRO: resultados diferentes entre os caminhos")
+    print("Resultados idênticos (exceto colunas de data atual)")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,5 @@
 import random
+import sys
 from datetime import datetime, timedelta
 
 def generate_test_data(num_records=1000):
@@ -17,10 +18,10 @@ def generate_test_data(num_records=1000):
                 used_irrp.add(irrp)
                 break
                 
-        # Gera CODRPP único (3 dígitos)
+        # Gera CODRPP único (3 dígitos); acima de 900 registros o espaço se esgota e repete
         while True:
             codrpp = f"{random.randint(100, 999)}"
-            if codrpp not in used_codrpp:
+            if codrpp not in used_codrpp or len(used_codrpp) >= 900:
                 used_codrpp.add(codrpp)
                 break
         
@@ -50,13 +51,16 @@ def generate_test_data(num_records=1000):
     
     return records
 
-# Gera 1000 registros
-test_data = generate_test_data(200)
+if __name__ == '__main__':
+    # Uso: python gerador_dados.py [num_registros] [arquivo]
+    num_records = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    file_name = sys.argv[2] if len(sys.argv) > 2 else 'dados_teste.csv'
+    test_data = generate_test_data(num_records)
 
-# Salva em arquivo CSV
-with open('dados_teste.csv', 'w') as f:
-    f.write('\n'.join(test_data))
+    # Salva em arquivo CSV
+    with open(file_name, 'w') as f:
+        f.write('\n'.join(test_data))
 
-print("Arquivo 'dados_teste.csv' gerado com sucesso com 1000 registros únicos.")
-print("Exemplo das primeiras linhas:")
-print('\n'.join(test_data[:2]))
\ No newline at end of file
+    print(f"Arquivo '{file_name}' gerado com sucesso com {num_records} registros.")
+    print("Exemplo das primeiras linhas:")
+    print('\n'.join(test_data[:2]))
\ No newline at end of file
@@ -4,7 +4,8 @@ import requests
 import json
 from datetime import datetime, timedelta 
 import logging
-from tempfile import NamedTemporaryFile
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from typing import List, Union
 
 
@@ -14,6 +15,9 @@ from typing import List, Union
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
+# Tamanho mínimo de parte do multipart upload no S3 (exceto a última)
+MIN_PART_SIZE = 5 * 1024 * 1024
+
 
 app = Chalice(app_name='lambda-rest-chalice')
 
@@ -44,9 +48,9 @@ def handler(event, context):
         date = (datetime.now() - timedelta(days=1)).date()
         data = MercadoBitcoinApi(coin=coin).get_data(date=date)
         
-        # 2. Criar nome único para o arquivo no S3
-        writer = S3Writer(coin=coin)
-        writer.write(data)
+        # 2. Gravar no S3 (o objeto é enviado ao sair do bloco)
+        with S3Writer(coin=coin) as writer:
+            writer.write(data)
         
         return {
             'statusCode': 200,
@@ -96,25 +100,132 @@ class MercadoBitcoinApi:
 
 
 
-# 2. Criar nome único para o arquivo no S3
+# 2. Gravar os registros no S3 (NDJSON, um registro por linha)
 class S3Writer:
-    def __init__(self, coin: str) -> None:
+    """Acumula registros em memória e grava objetos NDJSON de tamanho controlado
+
+    Um objeto é fechado ao atingir max_object_bytes ou max_records (0 = sem limite) e o
+    seguinte começa com um novo nome na mesma partição coin=/extracted_at=. Objetos
+    maiores que part_size sobem por multipart upload, com até max_concurrency partes
+    enviadas em paralelo enquanto os registros seguintes são acumulados.
+    """
+
+    def __init__(self, coin: str, bucket: str = None, s3=None, max_object_bytes: int = 128 * 1024 * 1024,
+                 max_records: int = 0, part_size: int = 8 * 1024 * 1024, max_concurrency: int = 4) -> None:
         self.coin = coin
-        self.tempfile = NamedTemporaryFile()
-        self.key = f"mercado_bitcoin/day-summary/coin={self.coin}/extracted_at={datetime.now().date()}/{datetime.now()}.json"
-        self.s3 = boto3.client("s3")
-
-    def _write_to_file(self, data: Union[List, dict]):
-        with open(self.tempfile.name, "a") as f:
-            f.write(json.dumps(data) + "\n")
-
-    def _write_file_to_s3(self):
-        self.s3.put_object(
-            Body=self.tempfile,
-            Bucket="dev-bucket-lab01",
-            Key=self.key
-        )
+        self.bucket = bucket or os.getenv("BUCKET_NAME", "dev-bucket-lab01")
+        self.s3 = s3 or boto3.client("s3")
+        self.max_object_bytes = max_object_bytes
+        self.max_records = max_records
+        # O S3 exige partes de pelo menos 5 MB (exceto a última)
+        self.part_size = max(part_size, MIN_PART_SIZE)
+        self.max_concurrency = max(1, max_concurrency)
+        self.keys: List[str] = []
+        self._executor = None
+        self._reset()
+
+    def _reset(self):
+        self._key = None
+        self._buffer = bytearray()
+        self._object_bytes = 0
+        self._records = 0
+        self._upload_id = None
+        self._parts = []
+
+    @property
+    def key(self) -> str:
+        """Último objeto gravado (ou o objeto em andamento)"""
+        return self._key or (self.keys[-1] if self.keys else None)
+
+    def _new_key(self) -> str:
+        now = datetime.now()
+        return (f"mercado_bitcoin/day-summary/coin={self.coin}/extracted_at={now.date()}/"
+                f"{now.strftime('%Y%m%dT%H%M%S%f')}-{len(self.keys):04d}.json")
 
     def write(self, data: Union[List, dict]):
-        self._write_to_file(data=data)
-        self._write_file_to_s3()
+        """Acrescenta os registros (uma lista vira uma linha por item)"""
+        for record in (data if isinstance(data, list) else [data]):
+            if self._key is None:
+                self._key = self._new_key()
+            line = (json.dumps(record) + "\n").encode("utf-8")
+            self._buffer += line
+            self._object_bytes += len(line)
+            self._records += 1
+            if len(self._buffer) >= self.part_size:
+                self._upload_part(bytes(self._buffer))
+                self._buffer.clear()
+            if self._object_bytes >= self.max_object_bytes or (self.max_records and self._records >= self.max_records):
+                self._finish_object()
+
+    def _upload_part(self, body: bytes):
+        if self._upload_id is None:
+            self._upload_id = self.s3.create_multipart_upload(
+                Bucket=self.bucket, Key=self._key, ContentType="application/x-ndjson"
+            )["UploadId"]
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.max_concurrency, thread_name_prefix="s3writer")
+        # Limita as partes em memória aguardando envio
+        pending = [part for part in self._parts if not part[1].done()]
+        if len(pending) >= self.max_concurrency:
+            wait([part[1] for part in pending], return_when=FIRST_COMPLETED)
+        number = len(self._parts) + 1
+        future = self._executor.submit(
+            self.s3.upload_part,
+            Bucket=self.bucket, Key=self._key, UploadId=self._upload_id, PartNumber=number, Body=body
+        )
+        self._parts.append((number, future))
+
+    def _finish_object(self):
+        if self._key is None:
+            return
+        try:
+            if self._upload_id is None:
+                self.s3.put_object(
+                    Body=bytes(self._buffer), Bucket=self.bucket, Key=self._key, ContentType="application/x-ndjson"
+                )
+            else:
+                if self._buffer:
+                    self._upload_part(bytes(self._buffer))
+                parts = [{"PartNumber": number, "ETag": future.result()["ETag"]} for number, future in self._parts]
+                self.s3.complete_multipart_upload(
+                    Bucket=self.bucket, Key=self._key, UploadId=self._upload_id, MultipartUpload={"Parts": parts}
+                )
+        except Exception:
+            self._abort()
+            raise
+        logger.info(f"{self._records} registros gravados em s3://{self.bucket}/{self._key} ({self._object_bytes} bytes)")
+        self.keys.append(self._key)
+        self._reset()
+
+    def _abort(self):
+        if self._upload_id is not None:
+            for _, future in self._parts:
+                future.cancel()
+            wait([future for _, future in self._parts])
+            try:
+                self.s3.abort_multipart_upload(Bucket=self.bucket, Key=self._key, UploadId=self._upload_id)
+            except Exception as e:
+                logger.warning(f"Falha ao abortar o multipart de {self._key}: {str(e)}")
+        self._reset()
+
+    def close(self) -> List[str]:
+        """Grava o objeto em andamento e retorna todas as chaves gravadas"""
+        try:
+            self._finish_object()
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+        return self.keys
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._abort()
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
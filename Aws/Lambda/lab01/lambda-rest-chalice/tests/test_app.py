@@ -1,8 +1,89 @@
+import json
+
+import pytest
 from chalice.test import Client
-from app import app
+from app import MIN_PART_SIZE, S3Writer, app
 
 
 def test_index():
     with Client(app) as client:
         response = client.http.get('/')
         assert response.json_body == {'hello': 'world'}
+
+
+class FakeS3:
+    """Cliente S3 mínimo em memória para o S3Writer"""
+
+    def __init__(self, fail_part=None):
+        self.objects = {}
+        self.uploads = {}
+        self.aborted = []
+        self.fail_part = fail_part
+
+    def put_object(self, Body, Bucket, Key, **kwargs):
+        self.objects[Key] = bytes(Body)
+
+    def create_multipart_upload(self, Bucket, Key, **kwargs):
+        upload_id = f"upload-{len(self.uploads)}"
+        self.uploads[upload_id] = {}
+        return {'UploadId': upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        if PartNumber == self.fail_part:
+            raise RuntimeError('falha na parte')
+        self.uploads[UploadId][PartNumber] = Body
+        return {'ETag': f'"{PartNumber}"'}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        parts = self.uploads.pop(UploadId)
+        numbers = [part['PartNumber'] for part in MultipartUpload['Parts']]
+        assert numbers == sorted(parts)
+        self.objects[Key] = b''.join(parts[number] for number in numbers)
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.uploads.pop(UploadId)
+        self.aborted.append(Key)
+
+
+def _records(count):
+    return [{'id': i, 'payload': 'x' * 100} for i in range(count)]
+
+
+def _lines(s3, keys):
+    return [json.loads(line) for key in keys for line in s3.objects[key].decode('utf-8').splitlines()]
+
+
+def test_s3_writer_rotates_by_record_count():
+    s3 = FakeS3()
+    with S3Writer(coin='BTC', bucket='bucket', s3=s3, max_records=40) as writer:
+        writer.write(_records(50))
+        writer.write(_records(50))
+
+    assert len(writer.keys) == 3
+    assert all('/coin=BTC/extracted_at=' in key for key in writer.keys)
+    assert [len(s3.objects[key].splitlines()) for key in writer.keys] == [40, 40, 20]
+    assert _lines(s3, writer.keys) == _records(50) + _records(50)
+    assert writer.key == writer.keys[-1]
+
+
+def test_s3_writer_uses_multipart_for_large_objects():
+    s3 = FakeS3()
+    records = _records(150000)
+    with S3Writer(coin='BTC', bucket='bucket', s3=s3, max_object_bytes=12 * 1024 * 1024,
+                  part_size=MIN_PART_SIZE, max_concurrency=3) as writer:
+        writer.write(records)
+
+    assert len(writer.keys) == 2
+    assert all(len(s3.objects[key]) <= 12 * 1024 * 1024 + 200 for key in writer.keys)
+    assert _lines(s3, writer.keys) == records
+    assert not s3.uploads
+
+
+def test_s3_writer_aborts_failed_multipart():
+    s3 = FakeS3(fail_part=2)
+    with pytest.raises(RuntimeError):
+        with S3Writer(coin='BTC', bucket='bucket', s3=s3, part_size=MIN_PART_SIZE) as writer:
+            writer.write(_records(120000))
+            writer.close()
+
+    assert s3.aborted and not s3.uploads and not s3.objects
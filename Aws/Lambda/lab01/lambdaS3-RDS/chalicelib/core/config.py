@@ -9,23 +9,69 @@ class ConfigDB:
     password: str = os.getenv('DB_PASSWORD')
     database: str = os.getenv('DB_NAME')
     port: int = int(os.getenv('DB_PORT', 3306))
+    tamanho_pool: int = int(os.getenv('DB_POOL_SIZE', 2))
+    ociosidade_maxima_pool: float = float(os.getenv('DB_POOL_MAX_IDLE', 300))
+    intervalo_ping_pool: float = float(os.getenv('DB_POOL_PING_INTERVAL', 5))
+    carregador: str = os.getenv('DB_LOADER', 'executemany')  # executemany | load_data
+    bytes_max_instrucao: int = int(os.getenv('DB_MAX_STATEMENT_BYTES', 16 * 1024 * 1024))
+    lote_minimo: int = int(os.getenv('BATCH_MIN', 100))
+    lote_maximo: int = int(os.getenv('BATCH_MAX', 20000))
+    latencia_alvo_lote: float = float(os.getenv('BATCH_TARGET_SECONDS', 1.0))
+    tabelas_paralelas: bool = os.getenv('DB_PARALLEL_TABLES', 'false').lower() == 'true'
+    particoes: int = int(os.getenv('DB_SHARDS', 1))
+    modo_particao: str = os.getenv('DB_SHARD_MODE', 'range')  # range | hash
+    deduplicar: bool = os.getenv('DB_DEDUP', 'false').lower() == 'true'
+    tipado: bool = os.getenv('DB_TYPED', 'false').lower() == 'true'
+    delta: bool = os.getenv('DB_DELTA', 'false').lower() == 'true'
+    tabela_delta: str = os.getenv('DB_DELTA_TABLE', 'etl_row_hash')
 
 @dataclass
 class ConfigGerenciador:
     entrada: str = 'entrada/'
     processados: str = 'processados/'
     erros: str = 'erros/'
+    leitura_streaming: bool = os.getenv('S3_STREAM_READ', 'false').lower() == 'true'
+    tamanho_bloco: int = int(os.getenv('S3_CHUNK_SIZE', 1024 * 1024))
+    tamanho_faixa: int = int(os.getenv('S3_RANGE_SIZE', 8 * 1024 * 1024))  # 0 desliga as faixas paralelas
+    faixas_simultaneas: int = int(os.getenv('S3_RANGE_CONCURRENCY', 8))
+    limite_copia_multipart: int = int(os.getenv('S3_MULTIPART_COPY_THRESHOLD', 128 * 1024 * 1024))
+    tamanho_parte_copia: int = int(os.getenv('S3_COPY_PART_SIZE', 64 * 1024 * 1024))
+    copias_simultaneas: int = int(os.getenv('S3_COPY_CONCURRENCY', 8))
+    compressao_arquivamento: str = os.getenv('ARCHIVE_COMPRESSION', 'none')  # none | gzip | zstd
+    nivel_compressao: int = int(os.getenv('ARCHIVE_COMPRESSION_LEVEL', 0))  # 0 = padrão do codec
+    registro: str = os.getenv('LEDGER', 'none')  # none | mysql | memory
+    tabela_registro: str = os.getenv('LEDGER_TABLE', 'etl_file_ledger')
+    duracao_lease: int = int(os.getenv('LEDGER_LEASE_SECONDS', 900))
+    agrupar_ate_bytes: int = int(os.getenv('COALESCE_MAX_BYTES', 0))  # > 0 agrupa arquivos até esse tamanho
+    arquivos_por_grupo: int = int(os.getenv('COALESCE_MAX_FILES', 200))
+    prefixo_parquet: str = os.getenv('PARQUET_PREFIX', '')  # ex.: analytics/ ('' desliga a saída Parquet)
+    bucket_parquet: str = os.getenv('PARQUET_BUCKET')  # None = bucket do arquivo de origem
+    linhas_row_group: int = int(os.getenv('PARQUET_ROW_GROUP_ROWS', 250000))
+    compressao_parquet: str = os.getenv('PARQUET_COMPRESSION', 'snappy')  # snappy | zstd | gzip | none
 
 @dataclass
 class ConfigProcessador:
     delimitador: str = ';'
     tamanho_lote: int = int(os.getenv('BATCH_SIZE', 1000))
+    colunar: bool = os.getenv('COLUMNAR', 'false').lower() == 'true'
+    pipeline: bool = os.getenv('PIPELINE', 'false').lower() == 'true'
+    fila_pipeline: int = int(os.getenv('PIPELINE_QUEUE_SIZE', 4))
+    processos: int = int(os.getenv('PARSE_PROCESSES', 0))  # > 1 liga o parsing em vários processos
+    diretorio_spill: str = os.getenv('SPILL_DIR')  # None = diretório temporário padrão (/tmp)
+
+@dataclass
+class ConfigAWS:
+    max_conexoes: int = int(os.getenv('AWS_MAX_POOL_CONNECTIONS', 10))
+    timeout_conexao: int = int(os.getenv('AWS_CONNECT_TIMEOUT', 5))
+    timeout_leitura: int = int(os.getenv('AWS_READ_TIMEOUT', 60))
+    tentativas: int = int(os.getenv('AWS_MAX_ATTEMPTS', 5))
 
 @dataclass
 class ConfigApp:
     db: ConfigDB = field(default_factory=ConfigDB)
     storage: ConfigGerenciador = field(default_factory=ConfigGerenciador)
     processor: ConfigProcessador = field(default_factory=ConfigProcessador)
+    aws: ConfigAWS = field(default_factory=ConfigAWS)
 
 
 def carregar_mapeamento() -> List[Dict[str, Any]]:
@@ -57,6 +103,7 @@ def carregar_mapeamento() -> List[Dict[str, Any]]:
         },
         {
             'tabela': 'tbv9086_carc_regr_prod_plar',
+            'depende_de': ['tbv9088_regr_prod_plar'],
             'colunas': [
                 {'nome': 'cod_regr_prod_plar', 'origem': {'tipo': 'coluna', 'index': 4}},
                 {'nome': 'cod_tipo_carc_espo_prod', 'origem': {'tipo': 'coluna', 'index': 0, 'transformacao': 'caracteres'}},
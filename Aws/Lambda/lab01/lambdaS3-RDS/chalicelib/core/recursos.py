@@ -0,0 +1,65 @@
+import threading
+from functools import cached_property
+from typing import Any, Dict, List
+from chalicelib.core.config import ConfigApp, carregar_mapeamento
+
+
+class RecursosExecucao:
+    """Recursos criados uma vez por ambiente de execução e reaproveitados nas invocações quentes
+
+    Clientes boto3 são criados sob demanda (serviços pouco usados não pagam o custo no
+    cold start) e compartilham a mesma configuração do botocore.
+    """
+
+    def __init__(self, config: ConfigApp = None):
+        self.config = config or ConfigApp()
+        self._clientes: Dict[str, Any] = {}
+        self._trava = threading.Lock()
+
+    @cached_property
+    def mapeamento(self) -> List[Dict[str, Any]]:
+        return carregar_mapeamento()
+
+    @cached_property
+    def config_boto(self):
+        from botocore.config import Config
+        aws = self.config.aws
+        return Config(
+            max_pool_connections=aws.max_conexoes,
+            tcp_keepalive=True,
+            connect_timeout=aws.timeout_conexao,
+            read_timeout=aws.timeout_leitura,
+            retries={'max_attempts': aws.tentativas, 'mode': 'standard'}
+        )
+
+    def cliente(self, servico: str):
+        """Cliente boto3 do serviço, criado na primeira chamada"""
+        cliente = self._clientes.get(servico)
+        if cliente is None:
+            with self._trava:
+                cliente = self._clientes.get(servico)
+                if cliente is None:
+                    import boto3
+                    cliente = self._clientes[servico] = boto3.client(servico, config=self.config_boto)
+        return cliente
+
+
+_recursos = None
+_trava_recursos = threading.Lock()
+
+
+def obter_recursos() -> RecursosExecucao:
+    """Recursos do ambiente de execução atual (criados na primeira invocação)"""
+    global _recursos
+    if _recursos is None:
+        with _trava_recursos:
+            if _recursos is None:
+                _recursos = RecursosExecucao()
+    return _recursos
+
+
+def reiniciar_recursos():
+    """Descarta os recursos em cache; a próxima invocação se comporta como cold start"""
+    global _recursos
+    with _trava_recursos:
+        _recursos = None
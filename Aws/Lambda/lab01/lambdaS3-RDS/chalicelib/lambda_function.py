@@ -1,68 +1,242 @@
-from typing import Dict, Any
-from .core.config import ConfigApp, carregar_mapeamento
+import os
+from typing import Any, Dict, List
+from .core.exceptions import ErroBancoDados
 from .core.logger import log
-from .services.armazenamento import GerenciadorS3
+from .core.recursos import RecursosExecucao, obter_recursos
+from .services.armazenamento import GerenciadorS3, iterar_linhas
+from .services.carga_paralela import CarregadorParalelo
 from .services.db import GerenciadorMySQL
+from .services.filtro_delta import FiltroDelta
+from .services.mapeamento import dependencias_tabelas
+from .services.pipeline_etapas import PipelineEtapas
 from .services.processador import ProcessadorArquivo
+from .services.registro_arquivos import ADQUIRIDO, RegistroArquivos, RegistroMemoria
+
+def dono_lease(contexto) -> str:
+    """aws_request_id da invocação (igual nas novas tentativas) ou um id aleatório fora da Lambda"""
+    return getattr(contexto, 'aws_request_id', None) or os.urandom(16).hex()
 
 class ProcessadorHandler:
     """Orquestrador principal do processamento"""
     
-    def __init__(self):
-        self.config = ConfigApp()
-        self.mapeamento = carregar_mapeamento()
-        self.armazenamento = GerenciadorS3(self.config.storage)
-        self.db = GerenciadorMySQL(self.config.db)
+    def __init__(self, recursos: RecursosExecucao = None):
+        recursos = recursos or obter_recursos()
+        self.config = recursos.config
+        self.mapeamento = recursos.mapeamento
+        self.armazenamento = GerenciadorS3(self.config.storage, cliente=recursos.cliente('s3'))
+        delta = FiltroDelta(self.mapeamento, self.config.db.tabela_delta) if self.config.db.delta else None
+        self.db = GerenciadorMySQL(self.config.db, delta=delta)
+        self.registro = self._criar_registro()
+        self.carregador_paralelo = CarregadorParalelo(self.db, dependencias_tabelas(self.mapeamento))
+        self.pipeline = PipelineEtapas(self.config.processor.fila_pipeline)
         self.processador = ProcessadorArquivo(
             self.mapeamento,
-            self.config.processor.delimitador
+            self.config.processor.delimitador,
+            colunar=self.config.processor.colunar
+        )
+        self.processamento_paralelo = self._criar_processamento_paralelo()
+        self.colunas = {
+            tabela['tabela']: [col['nome'] for col in tabela['colunas']]
+            for tabela in self.mapeamento
+        }
+        self.exportador_parquet = self._criar_exportador_parquet(recursos.cliente('s3'))
+        self._esquema = None
+        self._agrupador = None
+    
+    def _criar_processamento_paralelo(self):
+        """Parsing em vários processos sobre o arquivo em /tmp (None quando PARSE_PROCESSES <= 1)"""
+        if self.config.processor.processos <= 1:
+            return None
+        from .services.processamento_paralelo import ProcessamentoParalelo
+        return ProcessamentoParalelo(
+            self.processador,
+            self.config.processor.processos,
+            self.config.processor.diretorio_spill
+        )
+    
+    def _criar_exportador_parquet(self, cliente):
+        """Saída Parquet dos registros transformados (None quando PARQUET_PREFIX não está definido)"""
+        storage = self.config.storage
+        if not storage.prefixo_parquet:
+            return None
+        from .services.saida_parquet import ExportadorParquet, parquet_disponivel
+        if not parquet_disponivel():
+            log.warning("pyarrow não instalado - saída Parquet desligada")
+            return None
+        return ExportadorParquet(
+            cliente,
+            self.colunas,
+            storage.prefixo_parquet,
+            bucket=storage.bucket_parquet,
+            linhas_row_group=storage.linhas_row_group,
+            compressao=storage.compressao_parquet,
+            diretorio=self.config.processor.diretorio_spill
         )
     
-    def executar(self, evento: Dict) -> Dict[str, Any]:
-        """Método principal para execução do processamento"""
+    def criar_validador(self):
+        """Validador de tipos do arquivo (None quando DB_TYPED=false ou sem esquema)
+
+        O esquema é lido do INFORMATION_SCHEMA uma vez e reaproveitado nas invocações quentes.
+        """
+        if not self.config.db.tipado:
+            return None
+        if self._esquema is None:
+            self._esquema = self.db.carregar_esquema(list(self.colunas))
+            if self._esquema is None:
+                return None
+        return self._esquema.validador(self.processador.plano.tabelas, self.colunas)
+    
+    def _criar_registro(self):
+        """Registro de arquivos já processados (None quando LEDGER=none)"""
+        storage = self.config.storage
+        if storage.registro == 'mysql':
+            return RegistroArquivos(self.db, storage.tabela_registro, storage.duracao_lease)
+        if storage.registro == 'memory':
+            return RegistroMemoria(storage.duracao_lease)
+        return None
+    
+    def executar(self, evento: Dict, contexto=None) -> Dict[str, Any]:
+        """Método principal para execução do processamento
+
+        O aws_request_id do contexto é o dono dos leases do registro de arquivos: uma nova
+        tentativa da mesma invocação (que morreu sem liberar o lease) retoma o próprio lease.
+        """
         resultados = []
+        registros = evento.get('Records', [])
+        
+        if self.config.storage.agrupar_ate_bytes > 0:
+            # Arquivos pequenos em grupos: uma leitura paralela, uma transação e um arquivamento
+            from .services.agrupamento import separar_pequenos
+            grupos, registros = separar_pequenos(
+                registros,
+                self.config.storage.agrupar_ate_bytes,
+                self.config.storage.arquivos_por_grupo
+            )
+            for grupo in grupos:
+                resultados.extend(self.processar_grupo(grupo, contexto))
         
-        for registro in evento.get('Records', []):
-            try:
-                resultado = self._processar_registro(registro)
-                resultados.append({
-                    'status': 'sucesso',
-                    **resultado
-                })
-            except Exception as e:
-                log.error(f"Erro ao processar registro: {str(e)}")
-                resultados.append({
-                    'status': 'erro',
-                    'erro': str(e),
-                    'arquivo': registro.get('s3', {}).get('object', {}).get('key')
-                })
+        for registro in registros:
+            resultados.append(self.processar(registro, contexto))
+        
+        # Exclui os originais movidos, em lotes de delete_objects
+        nao_excluidos = self.armazenamento.excluir_pendentes()
         
         return {
             'statusCode': 200,
             'body': {
                 'processados': len([r for r in resultados if r['status'] == 'sucesso']),
                 'erros': len([r for r in resultados if r['status'] == 'erro']),
+                'ignorados': len([r for r in resultados if r['status'] == 'ignorado']),
+                'nao_excluidos': nao_excluidos,
                 'detalhes': resultados
             }
         }
     
-    def _processar_registro(self, registro: Dict) -> Dict:
+    def processar(self, registro: Dict, contexto=None) -> Dict[str, Any]:
+        """Processa um registro do evento; erros viram um resultado com status 'erro'
+
+        Os originais movidos só são excluídos em armazenamento.excluir_pendentes().
+        """
+        try:
+            resultado = self._processar_registro(registro, contexto)
+            return {
+                'status': 'sucesso',
+                **resultado
+            }
+        except Exception as e:
+            log.error(f"Erro ao processar registro: {str(e)}")
+            return {
+                'status': 'erro',
+                'erro': str(e),
+                'arquivo': registro.get('s3', {}).get('object', {}).get('key'),
+                'registros_duplicados': self.db.registros_duplicados(),
+                'registros_ignorados': self.db.registros_ignorados(),
+                'lotes': self.db.estatisticas_lotes()
+            }
+    
+    def processar_grupo(self, registros: List[Dict], contexto=None) -> List[Dict[str, Any]]:
+        """Processa vários arquivos pequenos em uma única transação; um resultado por registro"""
+        if self._agrupador is None:
+            from .services.agrupamento import AgrupadorArquivos
+            self._agrupador = AgrupadorArquivos(self)
+        return self._agrupador.processar(registros, dono_lease(contexto))
+    
+    def _processar_registro(self, registro: Dict, contexto=None) -> Dict:
         """Processa um registro individual do evento"""
         bucket = registro['s3']['bucket']['name']
         arquivo = registro['s3']['object']['key']
+        etag = registro['s3']['object'].get('eTag')
+        dono = dono_lease(contexto)
         
         log.info(f"Iniciando processamento de {bucket}/{arquivo}")
         
-        log.info(f"1. Obter arquivo.....")
-        conteudo = self.armazenamento.ler_conteudo(bucket, arquivo)
+        # 0. Entregas repetidas (at-least-once) ou concorrentes do mesmo arquivo/ETag
+        if self.registro is None or not etag:
+            return self._processar_arquivo(bucket, arquivo)
         
-        log.info(f"2. Processar dados..........")
-        dados = self.processador.processar(conteudo)
+        try:
+            estado = self.registro.adquirir(bucket, arquivo, etag, dono)
+        except Exception as e:
+            # Se adquirir falhar depois de gravar o lease, ele é liberado; o arquivo fica na entrada
+            self.registro.liberar(bucket, arquivo, etag, dono)
+            raise ErroBancoDados(f"Falha no registro de arquivos: {str(e)}")
+        if estado != ADQUIRIDO:
+            log.info(f"{bucket}/{arquivo} ({etag}) ignorado: {estado}")
+            return {'status': 'ignorado', 'arquivo': arquivo, 'motivo': estado}
 
-        #log.info(f"Dados para persistencia: {dados}")
-        #log.info(f"3. Persistir no banco..............")
-        #persistido = self.db.persistir(dados, self.mapeamento, self.config.db.tamanho_lote)
-        
+        try:
+            resultado = self._processar_arquivo(bucket, arquivo)
+        except Exception:
+            self.registro.liberar(bucket, arquivo, etag, dono)
+            raise
+        try:
+            self.registro.concluir(bucket, arquivo, etag, dono)
+        except Exception as e:
+            # O arquivo já foi persistido e movido; só o lease fica para expirar ou ser liberado
+            log.warning(f"Falha ao concluir {bucket}/{arquivo} no registro: {str(e)}")
+            self.registro.liberar(bucket, arquivo, etag, dono)
+        return resultado
+    
+    def _processar_arquivo(self, bucket: str, arquivo: str) -> Dict:
+        """Lê, processa, persiste e move o arquivo"""
+        validador = self.criar_validador()
+        etapas = None
+        # Cópia dos registros transformados em Parquet, enviada só após a persistência
+        saida = self.exportador_parquet.abrir(bucket, arquivo) if self.exportador_parquet is not None else None
+        espelhar = saida.espelhar if saida is not None else iter
+        try:
+            if self.processamento_paralelo is not None:
+                log.info(f"1. Gravar arquivo em /tmp; 2/3. processar em vários processos e persistir..........")
+                lotes = self.processamento_paralelo.iterar_lotes(
+                    self.armazenamento.ler_blocos(bucket, arquivo),
+                    self.config.db.lote_maximo,
+                    validador
+                )
+                persistidos = self._persistir(espelhar(lotes))
+            elif self.config.processor.pipeline:
+                log.info(f"1/2/3. Obter, processar e persistir em etapas simultâneas..........")
+                blocos = self.armazenamento.ler_blocos(bucket, arquivo)
+                persistidos, etapas = self.pipeline.executar(
+                    blocos,
+                    lambda blocos: espelhar(self.processador.iterar_lotes(iterar_linhas(blocos), self.config.db.lote_maximo, validador)),
+                    self._persistir
+                )
+            else:
+                log.info(f"1. Obter arquivo.....")
+                if self.config.storage.leitura_streaming:
+                    conteudo = self.armazenamento.ler_linhas(bucket, arquivo)
+                else:
+                    conteudo = self.armazenamento.ler_conteudo(bucket, arquivo)
+                
+                log.info(f"2/3. Processar dados e persistir no banco lote a lote..........")
+                # O processador entrega até lote_maximo registros e o banco divide conforme a latência
+                persistidos = self._persistir(espelhar(self.processador.iterar_lotes(conteudo, self.config.db.lote_maximo, validador)))
+            
+            # Falhas no envio do Parquet não afetam o arquivo
+            parquet = saida.concluir() if saida is not None else None
+        finally:
+            if saida is not None:
+                saida.descartar()
         
         log.info(f"4. Mover arquivo............................")
         novo_caminho = self.armazenamento.mover_arquivo(
@@ -71,9 +245,28 @@ class ProcessadorHandler:
         
         return {
             'arquivo': novo_caminho,
-            'registros_processados': {t: len(r) for t, r in dados.items()}
+            'registros_processados': persistidos,
+            'registros_rejeitados': validador.resumo() if validador else None,
+            'registros_duplicados': self.db.registros_duplicados(),
+            'registros_ignorados': self.db.registros_ignorados(),
+            'lotes': self.db.estatisticas_lotes(),
+            'pipeline': etapas,
+            'parquet': parquet
         }
+    
+    def _persistir(self, lotes) -> Dict[str, int]:
+        if self.config.db.tabelas_paralelas:
+            return self.carregador_paralelo.carregar(lotes, self.colunas, self.config.processor.tamanho_lote)
+        return self.db.persistir_lotes(lotes, self.colunas, self.config.processor.tamanho_lote)
+
+_handler = None
+
+def obter_handler() -> ProcessadorHandler:
+    """Handler criado na primeira invocação e reaproveitado enquanto o container estiver quente"""
+    global _handler
+    if _handler is None:
+        _handler = ProcessadorHandler()
+    return _handler
 
 def lambda_handler(event, context):
-    handler = ProcessadorHandler()
-    return handler.executar(event)
\ No newline at end of file
+    return obter_handler().executar(event, context)
\ No newline at end of file
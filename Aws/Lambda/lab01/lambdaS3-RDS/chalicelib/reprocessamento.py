@@ -0,0 +1,236 @@
+"""Reprocessamento em massa dos arquivos de um prefixo (entrada/, erros/ ...)
+
+Uso local, com S3 do moto_server/MinIO e MySQL local:
+    AWS_ENDPOINT_URL=http://localhost:5000 DB_HOST=localhost DB_USER=root DB_PASSWORD=... DB_NAME=lab \\
+        python -m chalicelib.reprocessamento --bucket meu-bucket --prefixo erros/ --simultaneos 8
+
+Os arquivos são lidos direto do prefixo informado (nada é copiado para entrada/, o que
+dispararia a notificação do S3) e, com sucesso, movidos para processados/. O checkpoint
+registra cada arquivo concluído depois que o original foi excluído do prefixo; uma nova
+execução após uma queda pula esses arquivos.
+"""
+import argparse
+import dataclasses
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterator, List, Optional, Set
+from .core.config import ConfigApp
+from .core.recursos import RecursosExecucao
+from .lambda_function import ProcessadorHandler
+from .services.registro_arquivos import CONCLUIDO
+
+# Arquivos movidos por thread antes de excluir os originais em lote
+EXCLUSOES_POR_LOTE = 100
+
+
+class Checkpoint:
+    """Arquivo JSONL com um registro por arquivo processado, gravado a cada conclusão"""
+
+    def __init__(self, caminho: Optional[str]):
+        self.caminho = caminho
+        self._trava = threading.Lock()
+
+    def concluidos(self) -> Set[str]:
+        """Chaves já concluídas em execuções anteriores
+
+        Só contam os sucessos e os arquivos que o registro já tinha como concluídos; um arquivo
+        ignorado por estar em outra invocação (ocupado) volta a ser processado.
+        """
+        if not self.caminho or not os.path.exists(self.caminho):
+            return set()
+        concluidos = set()
+        linha = '\n'
+        with open(self.caminho, encoding='utf-8') as entrada:
+            for linha in entrada:
+                try:
+                    item = json.loads(linha)
+                except ValueError:
+                    # Última linha cortada por uma queda no meio da gravação
+                    continue
+                if item.get('status') == 'sucesso' or (item.get('status') == 'ignorado' and item.get('motivo') == CONCLUIDO):
+                    concluidos.add(item['chave'])
+        if not linha.endswith('\n'):
+            # Termina a linha cortada para que o próximo registro não seja colado a ela
+            with open(self.caminho, 'a', encoding='utf-8') as saida:
+                saida.write('\n')
+        return concluidos
+
+    def registrar(self, chave: str, resultado: Dict[str, Any]):
+        if not self.caminho:
+            return
+        item = {'chave': chave, 'status': resultado.get('status'), 'arquivo': resultado.get('arquivo'),
+                'motivo': resultado.get('motivo'), 'erro': resultado.get('erro')}
+        with self._trava:
+            with open(self.caminho, 'a', encoding='utf-8') as saida:
+                saida.write(json.dumps(item, ensure_ascii=False) + '\n')
+                saida.flush()
+                os.fsync(saida.fileno())
+
+
+class Reprocessador:
+    """Lista um prefixo com paginação e processa os arquivos em paralelo com ProcessadorHandler
+
+    Cada thread usa seu próprio ProcessadorHandler (estatísticas e exclusões pendentes não
+    são compartilhadas); clientes boto3 e o pool de conexões são comuns a todas. Com
+    COALESCE_MAX_BYTES, os arquivos pequenos são processados em grupos de até
+    COALESCE_MAX_FILES, cada grupo em uma única transação.
+    """
+
+    def __init__(self, config: ConfigApp, prefixo: str, simultaneos: int = 4, checkpoint: Optional[str] = None):
+        """
+        Args:
+            config: Configuração base; a entrada passa a ser `prefixo`
+            prefixo: Prefixo a reprocessar (entrada/, erros/ ...)
+            simultaneos: Arquivos processados ao mesmo tempo
+            checkpoint: Caminho do JSONL de retomada (None desliga)
+        """
+        self.simultaneos = max(1, simultaneos)
+        storage = dataclasses.replace(config.storage, entrada=prefixo)
+        # Uma conexão por arquivo em andamento, sem abrir e fechar a cada devolução ao pool
+        db = dataclasses.replace(config.db, tamanho_pool=max(config.db.tamanho_pool, self.simultaneos))
+        self.recursos = RecursosExecucao(dataclasses.replace(config, storage=storage, db=db))
+        self.prefixo = prefixo
+        self.checkpoint = Checkpoint(checkpoint)
+        self._local = threading.local()
+        self._handlers = []
+        self._trava = threading.Lock()
+
+    def listar(self, bucket: str) -> Iterator[Dict[str, Any]]:
+        """Objetos do prefixo, página a página (list_objects_v2)"""
+        paginador = self.recursos.cliente('s3').get_paginator('list_objects_v2')
+        for pagina in paginador.paginate(Bucket=bucket, Prefix=self.prefixo):
+            for objeto in pagina.get('Contents', []):
+                if not objeto['Key'].endswith('/'):
+                    yield objeto
+
+    def _handler(self) -> ProcessadorHandler:
+        handler = getattr(self._local, 'handler', None)
+        if handler is None:
+            handler = self._local.handler = ProcessadorHandler(self.recursos)
+            self._local.movidos = 0
+            # Sucessos aguardando a exclusão do original para entrar no checkpoint
+            self._local.nao_registrados = []
+            with self._trava:
+                self._handlers.append((handler, self._local.nao_registrados))
+        return handler
+
+    def _excluir_pendentes(self, handler: ProcessadorHandler, nao_registrados: List[tuple]) -> List[str]:
+        """Exclui os originais movidos e só então registra os sucessos no checkpoint
+
+        Um original que não pôde ser excluído continua no prefixo e fica fora do checkpoint,
+        para que a próxima execução o processe de novo.
+        """
+        nao_excluidos = handler.armazenamento.excluir_pendentes()
+        pendentes = set(nao_excluidos)
+        for chave, resultado in nao_registrados:
+            if chave not in pendentes:
+                self.checkpoint.registrar(chave, resultado)
+        nao_registrados.clear()
+        return nao_excluidos
+
+    def _processar(self, bucket: str, objetos: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Processa um arquivo com processar ou, com mais de um, o grupo com processar_grupo"""
+        handler = self._handler()
+        registros = [{'s3': {
+            'bucket': {'name': bucket},
+            'object': {'key': objeto['Key'], 'eTag': objeto.get('ETag', '').strip('"'), 'size': objeto['Size']}
+        }} for objeto in objetos]
+        if len(registros) > 1:
+            resultados = handler.processar_grupo(registros)
+        else:
+            resultados = [handler.processar(registros[0])]
+        for objeto, resultado in zip(objetos, resultados):
+            if resultado['status'] == 'sucesso':
+                self._local.nao_registrados.append((objeto['Key'], resultado))
+                self._local.movidos += 1
+                if self._local.movidos % EXCLUSOES_POR_LOTE == 0:
+                    self._excluir_pendentes(handler, self._local.nao_registrados)
+            else:
+                self.checkpoint.registrar(objeto['Key'], resultado)
+        return resultados
+
+    def _unidades(self, bucket: str, concluidos: Set[str], resumo: Dict[str, Any]) -> Iterator[List[Dict[str, Any]]]:
+        """Arquivos a processar, um a um ou, com COALESCE_MAX_BYTES, os pequenos em grupos"""
+        storage = self.recursos.config.storage
+        grupo = []
+        for objeto in self.listar(bucket):
+            if objeto['Key'] in concluidos:
+                resumo['retomados'] += 1
+                continue
+            if storage.agrupar_ate_bytes <= 0 or objeto['Size'] > storage.agrupar_ate_bytes:
+                yield [objeto]
+                continue
+            grupo.append(objeto)
+            if len(grupo) >= storage.arquivos_por_grupo:
+                yield grupo
+                grupo = []
+        if grupo:
+            yield grupo
+
+    def executar(self, bucket: str) -> Dict[str, Any]:
+        """Processa todo o prefixo e retorna o resumo de vazão"""
+        concluidos = self.checkpoint.concluidos()
+        resumo = {'arquivos': 0, 'sucesso': 0, 'erros': 0, 'ignorados': 0, 'retomados': 0,
+                  'registros': 0, 'bytes': 0}
+        falhas = []
+        inicio = time.perf_counter()
+
+        def contabilizar(futuro, objetos):
+            for objeto, resultado in zip(objetos, futuro.result()):
+                resumo['arquivos'] += 1
+                if resultado['status'] == 'sucesso':
+                    resumo['sucesso'] += 1
+                    resumo['bytes'] += objeto['Size']
+                    resumo['registros'] += sum((resultado.get('registros_processados') or {}).values())
+                elif resultado['status'] == 'ignorado':
+                    resumo['ignorados'] += 1
+                else:
+                    resumo['erros'] += 1
+                    falhas.append({'arquivo': objeto['Key'], 'erro': resultado.get('erro')})
+
+        with ThreadPoolExecutor(self.simultaneos, thread_name_prefix='reprocessamento') as executor:
+            pendentes = {}
+            for objetos in self._unidades(bucket, concluidos, resumo):
+                # Lista sob demanda: no máximo 2x simultaneos arquivos ou grupos aguardando
+                if len(pendentes) >= 2 * self.simultaneos:
+                    prontos, _ = wait(pendentes, return_when=FIRST_COMPLETED)
+                    for futuro in prontos:
+                        contabilizar(futuro, pendentes.pop(futuro))
+                pendentes[executor.submit(self._processar, bucket, objetos)] = objetos
+            for futuro in list(pendentes):
+                contabilizar(futuro, pendentes.pop(futuro))
+
+        nao_excluidos = []
+        for handler, nao_registrados in self._handlers:
+            nao_excluidos.extend(self._excluir_pendentes(handler, nao_registrados))
+
+        segundos = time.perf_counter() - inicio
+        resumo.update({
+            'segundos': round(segundos, 3),
+            'arquivos_por_segundo': round(resumo['arquivos'] / segundos, 2) if segundos else None,
+            'registros_por_segundo': round(resumo['registros'] / segundos) if segundos else None,
+            'mb_por_segundo': round(resumo['bytes'] / 1024 / 1024 / segundos, 2) if segundos else None,
+            'falhas': falhas,
+            'nao_excluidos': nao_excluidos
+        })
+        return resumo
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bucket', required=True)
+    parser.add_argument('--prefixo', default='entrada/')
+    parser.add_argument('--simultaneos', type=int, default=int(os.getenv('BACKFILL_CONCURRENCY', 4)))
+    parser.add_argument('--checkpoint', default='reprocessamento.jsonl', help="JSONL de retomada ('' desliga)")
+    args = parser.parse_args()
+
+    reprocessador = Reprocessador(ConfigApp(), args.prefixo, args.simultaneos, args.checkpoint or None)
+    resumo = reprocessador.executar(args.bucket)
+    print(json.dumps(resumo, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
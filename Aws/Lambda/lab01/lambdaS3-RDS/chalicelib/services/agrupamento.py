@@ -0,0 +1,184 @@
+from typing import Any, Dict, List, Optional, Tuple
+from chalicelib.core.exceptions import ErroBancoDados, ErroProcessamento
+from chalicelib.core.logger import log
+from chalicelib.services.registro_arquivos import ADQUIRIDO
+
+
+def separar_pequenos(registros: List[Dict], max_bytes: int, max_arquivos: int) -> Tuple[List[List[Dict]], List[Dict]]:
+    """Separa os registros de até max_bytes em grupos de até max_arquivos; retorna (grupos, demais)
+
+    Registros sem tamanho no evento seguem o caminho normal.
+    """
+    pequenos, demais = [], []
+    for registro in registros:
+        tamanho = registro['s3']['object'].get('size')
+        if max_bytes > 0 and tamanho is not None and tamanho <= max_bytes:
+            pequenos.append(registro)
+        else:
+            demais.append(registro)
+    grupos = [pequenos[i:i + max_arquivos] for i in range(0, len(pequenos), max(1, max_arquivos))]
+    # Um arquivo sozinho não ganha nada com o agrupamento
+    demais.extend(grupo[0] for grupo in grupos if len(grupo) == 1)
+    return [grupo for grupo in grupos if len(grupo) > 1], demais
+
+
+class _Arquivo:
+    def __init__(self, registro: Dict):
+        self.bucket = registro['s3']['bucket']['name']
+        self.chave = registro['s3']['object']['key']
+        self.etag = registro['s3']['object'].get('eTag')
+        self.adquirido = False
+        self.lotes: List[Tuple[str, List[tuple]]] = []
+        self.validador = None
+        self.resultado: Optional[Dict[str, Any]] = None
+
+    def falhar(self, erro: Exception):
+        self.resultado = {'status': 'erro', 'erro': str(erro), 'arquivo': self.chave}
+
+
+class AgrupadorArquivos:
+    """Processa um grupo de arquivos pequenos com um download paralelo, uma transação e um arquivamento
+
+    Cada arquivo é lido e processado separadamente (um arquivo inválido só falha sozinho) e
+    os registros dos válidos são unidos por tabela em um único persistir_grupo. Se a
+    transação do grupo falhar, cada arquivo é regravado na sua própria transação, para que
+    só o arquivo com problema fique de fora. Como no caminho normal, arquivos com erro
+    permanecem na entrada e o registro de arquivos, quando ativo, vale por arquivo.
+    """
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.config = handler.config
+        self.simultaneos = max(1, self.config.storage.faixas_simultaneas)
+
+    def processar(self, registros: List[Dict], dono: str) -> List[Dict[str, Any]]:
+        from concurrent.futures import ThreadPoolExecutor
+
+        handler = self.handler
+        registro_arquivos = handler.registro
+        arquivos = [_Arquivo(registro) for registro in registros]
+
+        try:
+            # 0. Entregas repetidas (at-least-once) ou concorrentes do mesmo arquivo/ETag
+            for arquivo in arquivos:
+                if registro_arquivos is not None and arquivo.etag:
+                    self._adquirir(arquivo, dono)
+
+            ativos = [arquivo for arquivo in arquivos if arquivo.resultado is None]
+            with ThreadPoolExecutor(min(self.simultaneos, max(1, len(ativos))), thread_name_prefix='agrupamento') as executor:
+                # 1/2. Obter em paralelo e processar cada arquivo separadamente
+                for arquivo, conteudo in zip(ativos, executor.map(self._ler, ativos)):
+                    if isinstance(conteudo, Exception):
+                        arquivo.falhar(conteudo)
+                    else:
+                        self._processar(arquivo, conteudo)
+
+                # 3. Uma transação para todos os arquivos válidos
+                processados = [arquivo for arquivo in ativos if arquivo.resultado is None]
+                if processados:
+                    self._persistir(processados)
+
+                # 4. Mover os arquivos persistidos para processados
+                list(executor.map(self._mover, ativos))
+            db = handler.db
+            grupo = {
+                'arquivos': len(ativos),
+                'registros_duplicados': db.registros_duplicados(),
+                'registros_ignorados': db.registros_ignorados(),
+                'lotes': db.estatisticas_lotes()
+            }
+            for arquivo in ativos:
+                arquivo.resultado['grupo'] = grupo
+                if arquivo.adquirido and arquivo.resultado['status'] == 'sucesso':
+                    try:
+                        registro_arquivos.concluir(arquivo.bucket, arquivo.chave, arquivo.etag, dono)
+                        arquivo.adquirido = False
+                    except Exception as e:
+                        # O arquivo já foi persistido e movido; o lease é liberado no finally
+                        log.warning(f"Falha ao concluir {arquivo.bucket}/{arquivo.chave} no registro: {str(e)}")
+        finally:
+            for arquivo in arquivos:
+                if arquivo.adquirido:
+                    registro_arquivos.liberar(arquivo.bucket, arquivo.chave, arquivo.etag, dono)
+
+        log.info(f"Grupo de {len(arquivos)} arquivos: "
+                 f"{sum(arquivo.resultado['status'] == 'sucesso' for arquivo in arquivos)} com sucesso")
+        return [arquivo.resultado for arquivo in arquivos]
+
+    def _adquirir(self, arquivo: _Arquivo, dono: str):
+        # Marcado antes: se adquirir falhar depois de gravar o lease, o finally o libera
+        arquivo.adquirido = True
+        try:
+            estado = self.handler.registro.adquirir(arquivo.bucket, arquivo.chave, arquivo.etag, dono)
+        except Exception as e:
+            # Falha transitória do registro: o arquivo fica na entrada para uma nova entrega
+            log.error(f"Falha no registro de {arquivo.bucket}/{arquivo.chave}: {str(e)}")
+            arquivo.falhar(ErroBancoDados(f"Falha no registro de arquivos: {str(e)}"))
+            return
+        if estado != ADQUIRIDO:
+            arquivo.adquirido = False
+            log.info(f"{arquivo.bucket}/{arquivo.chave} ({arquivo.etag}) ignorado: {estado}")
+            arquivo.resultado = {'status': 'ignorado', 'arquivo': arquivo.chave, 'motivo': estado}
+
+    def _ler(self, arquivo: _Arquivo):
+        try:
+            return self.handler.armazenamento.ler_conteudo(arquivo.bucket, arquivo.chave)
+        except ErroProcessamento as e:
+            return e
+
+    def _processar(self, arquivo: _Arquivo, conteudo: str):
+        handler = self.handler
+        try:
+            arquivo.validador = handler.criar_validador()
+            arquivo.lotes = list(handler.processador.iterar_lotes(conteudo, self.config.db.lote_maximo, arquivo.validador))
+        except Exception as e:
+            log.error(f"Erro no processamento de {arquivo.chave}: {str(e)}")
+            arquivo.falhar(e)
+
+    def _persistir(self, arquivos: List[_Arquivo]):
+        handler = self.handler
+        unidos: Dict[str, List[tuple]] = {tabela: [] for tabela in handler.processador.ordem_carga}
+        for arquivo in arquivos:
+            for tabela, lote in arquivo.lotes:
+                unidos[tabela].extend(lote)
+        try:
+            handler.db.persistir_grupo(unidos.items(), handler.colunas)
+            for arquivo in arquivos:
+                arquivo.resultado = {'status': 'sucesso', 'registros_processados': self._contar(arquivo)}
+            return
+        except ErroBancoDados as e:
+            log.warning(f"Transação do grupo desfeita ({str(e)}) - gravando arquivo a arquivo")
+
+        for arquivo in arquivos:
+            try:
+                persistidos = handler.db.persistir_lotes(arquivo.lotes, handler.colunas, self.config.processor.tamanho_lote)
+                arquivo.resultado = {'status': 'sucesso', 'registros_processados': persistidos}
+            except ErroProcessamento as e:
+                log.error(f"Erro na persistência de {arquivo.chave}: {str(e)}")
+                arquivo.falhar(e)
+
+    def _contar(self, arquivo: _Arquivo) -> Dict[str, int]:
+        persistidos = {tabela: 0 for tabela in self.handler.colunas}
+        for tabela, lote in arquivo.lotes:
+            persistidos[tabela] += len(lote)
+        return persistidos
+
+    def _exportar(self, arquivo: _Arquivo):
+        """Parquet dos registros do arquivo, como no caminho normal (um arquivo por tabela)"""
+        saida = self.handler.exportador_parquet.abrir(arquivo.bucket, arquivo.chave)
+        for tabela, lote in arquivo.lotes:
+            saida.adicionar(tabela, lote)
+        arquivo.resultado['parquet'] = saida.concluir()
+
+    def _mover(self, arquivo: _Arquivo):
+        if arquivo.resultado['status'] == 'sucesso' and self.handler.exportador_parquet is not None:
+            self._exportar(arquivo)
+        arquivo.lotes = []
+        if arquivo.resultado['status'] == 'sucesso':
+            try:
+                arquivo.resultado['arquivo'] = self.handler.armazenamento.mover_arquivo(
+                    arquivo.bucket, arquivo.chave, sucesso=True
+                )
+            except ErroProcessamento as e:
+                arquivo.falhar(e)
+        arquivo.resultado['registros_rejeitados'] = arquivo.validador.resumo() if arquivo.validador else None
@@ -1,6 +1,31 @@
 from chalicelib.core.exceptions import ErroArmazenamento, ErroArquivoInvalido
 from chalicelib.core.logger import log
+from chalicelib.services.arquivamento import Arquivador
+from chalicelib.services.compressao import (
+    SUFIXOS, ZSTD, codec_pela_chave, codec_pelo_conteudo, descomprimir, separar_extensao, zstd_disponivel
+)
 from datetime import datetime
+from itertools import chain
+from typing import Dict, Iterable, Iterator, List
+import codecs
+
+
+def iterar_linhas(blocos: Iterable[bytes], codificacao: str = 'utf-8') -> Iterator[str]:
+    """Decodifica blocos de bytes de forma incremental e devolve linhas completas (com '\\n')
+
+    Caracteres multibyte e linhas partidas entre blocos são remontados; campos entre
+    aspas com quebra de linha ficam a cargo do csv.reader, que consome as linhas seguintes.
+    """
+    decodificador = codecs.getincrementaldecoder(codificacao)()
+    pendente = ''
+    for bloco in blocos:
+        linhas = (pendente + decodificador.decode(bloco)).split('\n')
+        pendente = linhas.pop()
+        for linha in linhas:
+            yield linha + '\n'
+    pendente += decodificador.decode(b'', final=True)
+    if pendente:
+        yield pendente
 
 class GerenciadorArquivos:
     def __init__(self, config):
@@ -27,49 +52,204 @@ class GerenciadorArquivos:
         raise NotImplementedError("Deve ser implementado pela subclasse")
 
 class GerenciadorS3(GerenciadorArquivos):
-    def __init__(self, config):
+    def __init__(self, config, cliente=None):
         super().__init__(config)
-        import boto3
-        self.cliente = boto3.client('s3')
-    
+        if cliente is None:
+            import boto3
+            cliente = boto3.client('s3')
+        self.cliente = cliente
+        self.arquivador = Arquivador(
+            cliente,
+            config.limite_copia_multipart,
+            config.tamanho_parte_copia,
+            config.copias_simultaneas,
+            config.nivel_compressao
+        )
+        # Codec detectado na leitura de cada arquivo, consultado ao arquivá-lo
+        self._codecs: Dict[str, str] = {}
+        self.compressao_arquivamento = config.compressao_arquivamento if config.compressao_arquivamento in SUFIXOS else None
+        if self.compressao_arquivamento == ZSTD and not zstd_disponivel():
+            log.warning("zstandard não instalado - arquivando sem compressão")
+            self.compressao_arquivamento = None
     
     def ler_conteudo(self, bucket: str, caminho: str) -> str:
         """Lê conteúdo de arquivo no S3"""
+        try:
+            return b''.join(self._abrir_blocos(bucket, caminho)).decode('utf-8')
+        except ErroArmazenamento:
+            raise
+        except Exception as e:
+            log.error(f"Falha ao ler arquivo: {str(e)}")
+            raise ErroArmazenamento(f"Erro ao ler arquivo: {str(e)}")
+    
+    def ler_linhas(self, bucket: str, caminho: str) -> Iterator[str]:
+        """Lê arquivo no S3 como iterador de linhas, sem carregar o conteúdo inteiro em memória"""
+        return self._iterar_linhas(self._abrir_blocos(bucket, caminho))
+    
+    def ler_blocos(self, bucket: str, caminho: str) -> Iterator[bytes]:
+        """Lê arquivo no S3 como iterador de blocos de bytes, sem decodificar"""
+        return self._abrir_blocos(bucket, caminho)
+    
+    def _abrir_blocos(self, bucket: str, caminho: str) -> Iterator[bytes]:
+        """Blocos do arquivo em ordem; objetos maiores que tamanho_faixa são baixados em faixas paralelas
+
+        A primeira requisição já pede a faixa inicial: o Content-Range informa o tamanho do
+        objeto, então arquivos pequenos continuam custando um único GET e não há HEAD extra.
+        """
         try:
             self.validar_local_arquivo(caminho)
-            resposta = self.cliente.get_object(
-                Bucket=bucket,
-                Key=caminho
-            )
-            return resposta['Body'].read().decode('utf-8')
+            if self.config.tamanho_faixa <= 0:
+                resposta = self.cliente.get_object(Bucket=bucket, Key=caminho)
+            else:
+                try:
+                    resposta = self.cliente.get_object(
+                        Bucket=bucket,
+                        Key=caminho,
+                        Range=f"bytes=0-{self.config.tamanho_faixa - 1}"
+                    )
+                except Exception as e:
+                    # Objeto vazio: não há faixa válida para pedir
+                    if getattr(e, 'response', {}).get('Error', {}).get('Code') != 'InvalidRange':
+                        raise
+                    resposta = self.cliente.get_object(Bucket=bucket, Key=caminho)
+        except Exception as e:
+            log.error(f"Falha ao ler arquivo: {str(e)}")
+            raise ErroArmazenamento(f"Erro ao ler arquivo: {str(e)}")
+        
+        faixa = resposta.get('ContentRange')
+        tamanho = int(faixa.rsplit('/', 1)[1]) if faixa else resposta['ContentLength']
+        if tamanho <= resposta['ContentLength']:
+            return self._descomprimir(caminho, self._iterar_blocos(resposta['Body']))
+        return self._descomprimir(caminho, self._iterar_faixas(bucket, caminho, resposta['Body'], tamanho, resposta.get('ETag')))
+    
+    def _descomprimir(self, caminho: str, blocos: Iterator[bytes]) -> Iterator[bytes]:
+        """Descomprime gzip/zstd em streaming, pelo início do conteúdo ou pela extensão"""
+        try:
+            primeiro = next(blocos, b'')
+            codec = codec_pelo_conteudo(primeiro) or codec_pela_chave(caminho)
+            if codec is not None:
+                log.info(f"{caminho} comprimido com {codec}")
+                self._codecs[caminho] = codec
+            yield from descomprimir(chain([primeiro], blocos), codec, self.config.tamanho_bloco)
+        except ErroArmazenamento:
+            raise
+        except Exception as e:
+            log.error(f"Falha ao ler arquivo: {str(e)}")
+            raise ErroArmazenamento(f"Erro ao ler arquivo: {str(e)}")
+        finally:
+            blocos.close()
+    
+    def _ler_faixa(self, bucket: str, caminho: str, inicio: int, fim: int, etag: str) -> bytes:
+        condicao = {'IfMatch': etag} if etag else {}
+        corpo = self.cliente.get_object(Bucket=bucket, Key=caminho, Range=f"bytes={inicio}-{fim}", **condicao)['Body']
+        try:
+            dados = corpo.read()
+        finally:
+            corpo.close()
+        if len(dados) != fim - inicio + 1:
+            raise ErroArmazenamento(f"Faixa {inicio}-{fim} incompleta: {len(dados)} bytes")
+        return dados
+    
+    def _iterar_faixas(self, bucket: str, caminho: str, primeira, tamanho: int, etag: str) -> Iterator[bytes]:
+        """Baixa as faixas restantes com até faixas_simultaneas GETs ao mesmo tempo
+
+        Cada bloco entregue termina em '\n' (o trecho final de uma faixa é juntado à
+        seguinte), então cada um pode ser decodificado e separado em linhas sozinho. Os
+        blocos saem na ordem do arquivo; campos entre aspas com quebra de linha seguem a
+        cargo do csv.reader. IfMatch garante que todas as faixas são da mesma versão do
+        objeto. Memória em uso: cerca de faixas_simultaneas * tamanho_faixa.
+        """
+        from collections import deque
+        from concurrent.futures import ThreadPoolExecutor
+        
+        parte = self.config.tamanho_faixa
+        simultaneas = max(1, self.config.faixas_simultaneas)
+        inicios = iter(range(parte, tamanho, parte))
+        executor = ThreadPoolExecutor(simultaneas, thread_name_prefix='s3-faixa')
+        pendentes = deque()
+        
+        def agendar():
+            inicio = next(inicios, None)
+            if inicio is not None:
+                pendentes.append(executor.submit(
+                    self._ler_faixa, bucket, caminho, inicio, min(inicio + parte, tamanho) - 1, etag
+                ))
+        
+        try:
+            for _ in range(simultaneas):
+                agendar()
+            dados = primeira.read()
+            resto = b''
+            while True:
+                dados = resto + dados
+                corte = dados.rfind(b'\n') + 1
+                resto = dados[corte:]
+                if corte:
+                    yield dados[:corte]
+                if not pendentes:
+                    break
+                dados = pendentes.popleft().result()
+                agendar()
+            if resto:
+                yield resto
+        except ErroArmazenamento:
+            raise
+        except Exception as e:
+            log.error(f"Falha ao ler arquivo: {str(e)}")
+            raise ErroArmazenamento(f"Erro ao ler arquivo: {str(e)}")
+        finally:
+            primeira.close()
+            executor.shutdown(cancel_futures=True)
+    
+    def _iterar_linhas(self, blocos: Iterator[bytes]) -> Iterator[str]:
+        try:
+            yield from iterar_linhas(blocos)
+        except ErroArmazenamento:
+            raise
+        except Exception as e:
+            log.error(f"Falha ao ler arquivo: {str(e)}")
+            raise ErroArmazenamento(f"Erro ao ler arquivo: {str(e)}")
+    
+    def _iterar_blocos(self, corpo) -> Iterator[bytes]:
+        try:
+            yield from corpo.iter_chunks(self.config.tamanho_bloco)
         except Exception as e:
             log.error(f"Falha ao ler arquivo: {str(e)}")
             raise ErroArmazenamento(f"Erro ao ler arquivo: {str(e)}")
+        finally:
+            corpo.close()
     
 
     def mover_arquivo(self, bucket: str, origem: str, sucesso: bool) -> str:
-        """Move arquivo entre pastas no S3 com a data e hora atual no nome"""
+        """Copia o arquivo entre pastas no S3 com a data e hora atual no nome
+
+        O original é excluído depois, em excluir_pendentes(). Com ARCHIVE_COMPRESSION,
+        arquivos lidos sem compressão vão comprimidos para processados/.
+        """
         try:
             destino_base = origem.replace(
                 self.config.entrada,
                 self.config.processados if sucesso else self.config.erros
             )
+            codec = self._codecs.pop(origem, None)
+            comprimir = None
+            if sucesso and self.compressao_arquivamento and codec is None and codec_pela_chave(origem) is None:
+                comprimir = self.compressao_arquivamento
             
-            # Adiciona a data e hora atual ao nome do arquivo
+            # Adiciona a data e hora atual ao nome do arquivo (nomes com vários pontos mantêm
+            # tudo antes da extensão; 'a.b.csv.gz' vira 'a.b_<data>.csv.gz')
             file_name = origem.split('/')[-1]
             current_date = datetime.now().strftime('%Y%m%d_%H%M%S')
-            processed_file_name = f"{file_name.split('.')[0]}_{current_date}.{file_name.split('.')[1]}"
+            nome, extensao = separar_extensao(file_name)
+            processed_file_name = f"{nome}_{current_date}{extensao}{SUFIXOS[comprimir] if comprimir else ''}"
             destino = '/'.join(destino_base.split('/')[:-1] + [processed_file_name])
             
-            self.cliente.copy_object(
-                Bucket=bucket,
-                CopySource={'Bucket': bucket, 'Key': origem},
-                Key=destino
-            )
-            self.cliente.delete_object(Bucket=bucket, Key=origem)
+            self.arquivador.mover(bucket, origem, destino, comprimir=comprimir)
             return destino
         except Exception as e:
             log.error(f"Falha ao mover arquivo: {str(e)}")
             raise ErroArmazenamento(f"Erro ao mover arquivo: {str(e)}")
-        
-    
\ No newline at end of file
+    
+    def excluir_pendentes(self) -> List[str]:
+        """Exclui os originais dos arquivos movidos; retorna as chaves que ficaram para trás"""
+        return self.arquivador.excluir_pendentes()
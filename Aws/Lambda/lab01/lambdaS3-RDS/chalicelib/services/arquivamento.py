@@ -0,0 +1,138 @@
+from typing import Dict, List, Optional, Tuple
+from chalicelib.core.logger import log
+
+# Limites do S3: partes de 5 MiB a 5 GiB, no máximo 10.000 partes por upload
+PARTE_MINIMA = 5 * 1024 * 1024
+MAXIMO_PARTES = 10000
+# delete_objects aceita até 1.000 chaves por chamada
+LOTE_EXCLUSAO = 1000
+# Blocos lidos do original ao arquivar com compressão
+BLOCO_COMPRESSAO = 1024 * 1024
+
+
+class Arquivador:
+    """Copia arquivos entre prefixos no próprio S3 e agrupa as exclusões dos originais
+
+    Objetos a partir de limite_multipart são copiados com UploadPartCopy em partes
+    paralelas (copy_object é uma única requisição e recusa objetos acima de 5 GB). Se a
+    cópia falhar no meio, o upload é abortado e o original fica onde estava. A exclusão
+    dos originais só acontece em excluir_pendentes(), em chamadas delete_objects de até
+    1.000 chaves por bucket.
+
+    Com comprimir, o original é lido e enviado comprimido em streaming (upload_fileobj, em
+    partes a partir de 8 MB): não há cópia no servidor que comprima.
+    """
+
+    def __init__(self, cliente, limite_multipart: int, tamanho_parte: int, simultaneas: int,
+                 nivel_compressao: int = 0):
+        self.cliente = cliente
+        self.nivel_compressao = nivel_compressao
+        self.limite_multipart = limite_multipart
+        self.tamanho_parte = max(PARTE_MINIMA, tamanho_parte)
+        self.simultaneas = max(1, simultaneas)
+        self._pendentes: Dict[str, List[str]] = {}
+
+    def mover(self, bucket: str, origem: str, destino: str, comprimir: Optional[str] = None):
+        """Copia origem para destino (comprimindo com o codec `comprimir`) e agenda a exclusão de origem"""
+        if comprimir:
+            self.copiar_comprimido(bucket, origem, destino, comprimir)
+        else:
+            self.copiar(bucket, origem, destino)
+        self._pendentes.setdefault(bucket, []).append(origem)
+
+    def copiar_comprimido(self, bucket: str, origem: str, destino: str, codec: str):
+        from boto3.s3.transfer import TransferConfig
+        from chalicelib.services.compressao import LeitorComprimido
+
+        resposta = self.cliente.get_object(Bucket=bucket, Key=origem)
+        extras = {'Metadata': resposta.get('Metadata', {})}
+        if resposta.get('ContentType'):
+            extras['ContentType'] = resposta['ContentType']
+        corpo = resposta['Body']
+        try:
+            self.cliente.upload_fileobj(
+                LeitorComprimido(corpo.iter_chunks(BLOCO_COMPRESSAO), codec, self.nivel_compressao),
+                bucket,
+                destino,
+                ExtraArgs=extras,
+                Config=TransferConfig(max_concurrency=self.simultaneas)
+            )
+        finally:
+            corpo.close()
+        log.info(f"{origem} arquivado com {codec} ({resposta['ContentLength']} bytes originais)")
+
+    def copiar(self, bucket: str, origem: str, destino: str):
+        cabecalho = self.cliente.head_object(Bucket=bucket, Key=origem)
+        if cabecalho['ContentLength'] < self.limite_multipart:
+            self.cliente.copy_object(
+                Bucket=bucket,
+                CopySource={'Bucket': bucket, 'Key': origem},
+                CopySourceIfMatch=cabecalho['ETag'],
+                Key=destino
+            )
+            return
+        self._copiar_multipart(bucket, origem, destino, cabecalho)
+
+    def _copiar_multipart(self, bucket: str, origem: str, destino: str, cabecalho: Dict):
+        from concurrent.futures import ThreadPoolExecutor
+
+        tamanho = cabecalho['ContentLength']
+        parte = max(self.tamanho_parte, -(-tamanho // MAXIMO_PARTES))
+        faixas = [(inicio, min(inicio + parte, tamanho) - 1) for inicio in range(0, tamanho, parte)]
+
+        extras = {'Metadata': cabecalho.get('Metadata', {})}
+        for campo in ('ContentType', 'ContentEncoding', 'ContentDisposition', 'CacheControl'):
+            if cabecalho.get(campo):
+                extras[campo] = cabecalho[campo]
+        upload_id = self.cliente.create_multipart_upload(Bucket=bucket, Key=destino, **extras)['UploadId']
+
+        def copiar_parte(numero: int, primeiro: int, ultimo: int) -> Tuple[int, str]:
+            resposta = self.cliente.upload_part_copy(
+                Bucket=bucket,
+                Key=destino,
+                UploadId=upload_id,
+                PartNumber=numero,
+                CopySource={'Bucket': bucket, 'Key': origem},
+                CopySourceIfMatch=cabecalho['ETag'],
+                CopySourceRange=f"bytes={primeiro}-{ultimo}"
+            )
+            return numero, resposta['CopyPartResult']['ETag']
+
+        try:
+            with ThreadPoolExecutor(min(self.simultaneas, len(faixas)), thread_name_prefix='s3-copia') as executor:
+                partes = list(executor.map(lambda args: copiar_parte(*args),
+                                           [(i, primeiro, ultimo) for i, (primeiro, ultimo) in enumerate(faixas, 1)]))
+            self.cliente.complete_multipart_upload(
+                Bucket=bucket,
+                Key=destino,
+                UploadId=upload_id,
+                MultipartUpload={'Parts': [{'PartNumber': numero, 'ETag': etag} for numero, etag in partes]}
+            )
+        except BaseException:
+            try:
+                self.cliente.abort_multipart_upload(Bucket=bucket, Key=destino, UploadId=upload_id)
+            except Exception as e:
+                log.error(f"Falha ao abortar cópia multipart de {origem}: {str(e)}")
+            raise
+        log.info(f"{origem} copiado em {len(partes)} partes ({tamanho} bytes)")
+
+    def excluir_pendentes(self) -> List[str]:
+        """Exclui os originais agendados; retorna as chaves que não puderam ser excluídas"""
+        falhas = []
+        pendentes, self._pendentes = self._pendentes, {}
+        for bucket, chaves in pendentes.items():
+            for i in range(0, len(chaves), LOTE_EXCLUSAO):
+                lote = chaves[i:i + LOTE_EXCLUSAO]
+                try:
+                    resposta = self.cliente.delete_objects(
+                        Bucket=bucket,
+                        Delete={'Objects': [{'Key': chave} for chave in lote], 'Quiet': True}
+                    )
+                except Exception as e:
+                    log.error(f"Falha ao excluir {len(lote)} arquivos de {bucket}: {str(e)}")
+                    falhas.extend(lote)
+                    continue
+                for erro in resposta.get('Errors', []):
+                    log.error(f"Falha ao excluir {erro.get('Key')}: {erro.get('Code')} {erro.get('Message')}")
+                    falhas.append(erro.get('Key'))
+        return falhas
@@ -0,0 +1,66 @@
+import os
+import tempfile
+from typing import Any, Iterable, List, TextIO
+
+# Erros do MySQL quando LOAD DATA LOCAL está desabilitado no servidor ou no cliente
+CODIGOS_INFILE_DESABILITADO = {1148, 2068, 3948}
+
+_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r', '\0': '\\0'})
+
+
+def valor_tsv(valor: Any) -> str:
+    """Valor no formato padrão do LOAD DATA (escape com '\\', NULL como \\N)"""
+    if valor is None:
+        return '\\N'
+    if isinstance(valor, str):
+        return valor.translate(_ESCAPES)
+    return str(valor)
+
+
+def gravar_tsv(registros: Iterable[tuple], saida: TextIO) -> int:
+    """Grava os registros como TSV e retorna a quantidade gravada"""
+    quantidade = 0
+    for registro in registros:
+        saida.write('\t'.join([valor_tsv(valor) for valor in registro]))
+        saida.write('\n')
+        quantidade += 1
+    return quantidade
+
+
+def tabela_staging(tabela: str) -> str:
+    return f"stg_{tabela}"
+
+
+def carregar_via_infile(conexao, tabela: str, colunas: List[str], registros: List[tuple], diretorio: str = None):
+    """Carrega os registros em uma tabela temporária via LOAD DATA LOCAL INFILE e faz o merge
+
+    A tabela de staging (CREATE TEMPORARY TABLE ... LIKE) vive na sessão, então é criada
+    uma vez por conexão do pool e esvaziada a cada lote. REPLACE no LOAD DATA mantém a
+    última ocorrência de cada chave, como o executemany com ON DUPLICATE KEY UPDATE.
+    Nada aqui faz commit implícito: o commit (ou rollback) fica com o chamador.
+    """
+    staging = tabela_staging(tabela)
+    cols = ', '.join(colunas)
+    updates = ', '.join([f"{c}=s.{c}" for c in colunas])
+
+    with tempfile.NamedTemporaryFile('w', suffix='.tsv', dir=diretorio, encoding='utf-8',
+                                     newline='', delete=False) as saida:
+        gravar_tsv(registros, saida)
+        caminho = saida.name
+
+    try:
+        with conexao.cursor() as cursor:
+            cursor.execute(f"CREATE TEMPORARY TABLE IF NOT EXISTS {staging} LIKE {tabela}")
+            # DELETE, não TRUNCATE: TRUNCATE faz commit implícito da transação do chamador
+            cursor.execute(f"DELETE FROM {staging}")
+            cursor.execute(
+                f"LOAD DATA LOCAL INFILE %s REPLACE INTO TABLE {staging} CHARACTER SET utf8mb4 "
+                f"FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n' ({cols})",
+                (caminho,)
+            )
+            cursor.execute(
+                f"INSERT INTO {tabela} ({cols}) SELECT {cols} FROM {staging} AS s "
+                f"ON DUPLICATE KEY UPDATE {updates}"
+            )
+    finally:
+        os.unlink(caminho)
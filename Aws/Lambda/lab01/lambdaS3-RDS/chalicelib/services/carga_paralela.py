@@ -0,0 +1,120 @@
+import queue
+import threading
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
+from chalicelib.core.exceptions import ErroBancoDados, ErroProcessamento
+from chalicelib.core.logger import log
+
+
+class CarregadorParalelo:
+    """Grava as tabelas mapeadas ao mesmo tempo, cada uma em sua thread e conexão do pool
+
+    Os lotes recebem um número de sequência na ordem em que o processador os gera. Uma
+    tabela dependente (FK) só grava o lote n depois que as tabelas referenciadas tiverem
+    feito commit de todos os seus lotes anteriores a n; tabelas independentes não esperam.
+    """
+
+    def __init__(self, db, dependencias: Dict[str, List[str]], tamanho_fila: int = 2):
+        """
+        Args:
+            db: GerenciadorMySQL usado para conexões, gravação e controle do tamanho de lote
+            dependencias: Tabelas referenciadas por cada tabela (além das FKs lidas do banco)
+            tamanho_fila: Lotes aguardando gravação por tabela (limita a memória em uso)
+        """
+        self.db = db
+        self.dependencias_mapeadas = dependencias
+        self.tamanho_fila = tamanho_fila
+        self._dependencias: Optional[Dict[str, List[str]]] = None
+
+    def dependencias(self, tabelas: List[str]) -> Dict[str, List[str]]:
+        """Dependências do mapeamento somadas às FKs do INFORMATION_SCHEMA (lidas uma vez)"""
+        if self._dependencias is None:
+            todas = {tabela: list(self.dependencias_mapeadas.get(tabela, [])) for tabela in tabelas}
+            for tabela, pais in self.db.chaves_estrangeiras(tabelas).items():
+                todas[tabela].extend(pai for pai in pais if pai not in todas[tabela])
+            self._dependencias = todas
+        return self._dependencias
+
+    def carregar(self, lotes: Iterable[Tuple[str, List[tuple]]], colunas: Dict[str, List[str]],
+                 tamanho_lote: Optional[int] = None) -> Dict[str, int]:
+        """Grava os lotes em paralelo por tabela, retornando registros por tabela"""
+        dependencias = self.dependencias(list(colunas))
+        persistidos = {tabela: 0 for tabela in colunas}
+        pendentes: Dict[str, Deque[int]] = {tabela: deque() for tabela in colunas}
+        filas = {tabela: queue.Queue(self.tamanho_fila) for tabela in colunas}
+        condicao = threading.Condition()
+        erros: List[Exception] = []
+
+        def liberado(tabela: str, seq: int) -> bool:
+            return bool(erros) or all(
+                not pendentes[pai] or pendentes[pai][0] > seq for pai in dependencias[tabela]
+            )
+
+        def gravador(tabela: str):
+            conexao = None
+            erro = None
+            vistas = set()
+            try:
+                conexao = self.db.conectar()
+                while True:
+                    item = filas[tabela].get()
+                    if item is None:
+                        break
+                    seq, lote = item
+                    with condicao:
+                        condicao.wait_for(lambda: liberado(tabela, seq))
+                        if erros:
+                            continue
+                    conexao = self.db._gravar_registros(conexao, tabela, colunas[tabela], lote, tamanho_lote or len(lote), vistas)
+                    persistidos[tabela] += len(lote)
+                    with condicao:
+                        pendentes[tabela].popleft()
+                        condicao.notify_all()
+            except Exception as e:
+                erro = e
+                log.error(f"Erro na gravação de {tabela}: {str(e)}")
+                with condicao:
+                    erros.append(e)
+                    condicao.notify_all()
+                # Esvazia a fila para não bloquear quem distribui os lotes
+                while filas[tabela].get() is not None:
+                    pass
+            finally:
+                if conexao is not None:
+                    self.db._finalizar(conexao, erro)
+
+        threads = [
+            threading.Thread(target=gravador, args=(tabela,), name=f"carga-{tabela}", daemon=True)
+            for tabela in colunas
+        ]
+        for thread in threads:
+            thread.start()
+
+        seq = 0
+        try:
+            for tabela, lote in lotes:
+                if erros:
+                    break
+                if not lote:
+                    continue
+                seq += 1
+                with condicao:
+                    pendentes[tabela].append(seq)
+                filas[tabela].put((seq, lote))
+        except Exception as e:
+            with condicao:
+                erros.insert(0, e)
+                condicao.notify_all()
+        finally:
+            for tabela in colunas:
+                filas[tabela].put(None)
+            for thread in threads:
+                thread.join()
+
+        if erros:
+            erro = erros[0]
+            if isinstance(erro, ErroProcessamento):
+                raise erro
+            log.error(f"Erro na persistência: {str(erro)}")
+            raise ErroBancoDados(f"Falha na persistência: {str(erro)}")
+        return persistidos
@@ -0,0 +1,164 @@
+import io
+from itertools import islice, repeat
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+from chalicelib.core.logger import log
+from chalicelib.services.mapeamento import PlanoProjecao
+
+
+def arrow_disponivel() -> bool:
+    """Indica se o pyarrow (dependência opcional) está instalado"""
+    try:
+        import pyarrow.csv  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def iterar_blocos_registro(linhas: Iterable[str], linhas_bloco: int) -> Iterator[str]:
+    """Agrupa linhas em blocos de texto que sempre terminam em fim de registro
+
+    O bloco só é fechado com número par de aspas acumuladas, ou seja, fora de um
+    campo entre aspas que contenha quebra de linha. A busca pelo fechamento lê no máximo
+    linhas_bloco linhas a mais: uma aspa solta não puxa o resto do arquivo para um bloco
+    só, e o bloco desbalanceado (que o Arrow rejeita) segue pelo caminho linha a linha.
+    """
+    linhas = iter(linhas)
+    while True:
+        bloco = list(islice(linhas, linhas_bloco))
+        if not bloco:
+            return
+        texto = ''.join(bloco)
+        aspas = texto.count('"')
+        extras = 0
+        while aspas % 2 and extras < linhas_bloco:
+            linha = next(linhas, None)
+            if linha is None:
+                break
+            texto += linha
+            aspas += linha.count('"')
+            extras += 1
+        if aspas % 2:
+            log.warning(f"Aspas sem fechamento em {len(bloco) + extras} linhas - bloco segue pelo caminho linha a linha")
+        yield texto
+
+
+def coluna_data(coluna, alternativa: Callable[[Any], Any]) -> List[Any]:
+    """'dd.mm.aaaa' -> 'aaaa-mm-dd 00:00:00'; valores com menos de 3 partes usam a alternativa"""
+    import pyarrow.compute as pc
+
+    partes = pc.split_pattern(coluna, '.')
+    validos = pc.greater_equal(pc.list_value_length(partes), 3)
+    todos_validos = pc.all(validos).as_py() is not False
+    if not todos_validos:
+        partes = pc.filter(partes, validos)
+
+    datas = pc.binary_join_element_wise(
+        pc.list_element(partes, 2), pc.list_element(partes, 1), pc.list_element(partes, 0), '-'
+    )
+    valores = pc.binary_join_element_wise(datas, ' 00:00:00', '').to_pylist()
+    if todos_validos:
+        return valores
+
+    convertidos = iter(valores)
+    return [
+        next(convertidos) if ok else alternativa(valor)
+        for ok, valor in zip(validos.to_pylist(), coluna.to_pylist())
+    ]
+
+
+def coluna_caracteres(coluna, alternativa: Callable[[Any], Any]) -> List[Any]:
+    """'C'/'c' -> 1, demais -> 2"""
+    import pyarrow.compute as pc
+
+    return pc.if_else(pc.equal(pc.utf8_upper(coluna), 'C'), 1, 2).to_pylist()
+
+
+class ProjetorColunar:
+    """Projeta um bloco de CSV em colunas Arrow, aplicando as transformações vetorizadas
+
+    Blocos que o parser do Arrow não reproduz exatamente como o csv.reader (linhas com
+    número de colunas diferente, BOM, erro de parse) retornam None e seguem pelo
+    caminho linha a linha.
+    """
+
+    def __init__(self, plano: PlanoProjecao, vetorizadas: Dict[Callable, Callable], delimitador: str = ';'):
+        import pyarrow as pa
+        import pyarrow.csv as pacsv
+
+        self.plano = plano
+        self.vetorizadas = vetorizadas
+        self.delimitador = delimitador
+        self.nomes = [f"f{indice}" for indice in sorted(set(plano.indices))]
+        self.transformacoes = {slot: (transformacao, nome) for slot, transformacao, nome in plano.transformacoes}
+        self._csv = pacsv
+        self._opcoes_leitura = pacsv.ReadOptions(autogenerate_column_names=True)
+        self._opcoes_conversao = pacsv.ConvertOptions(
+            include_columns=self.nomes,
+            column_types={nome: pa.string() for nome in self.nomes}
+        )
+
+    def _ler(self, texto: str):
+        invalidas = []
+
+        def ao_invalidar(linha):
+            invalidas.append(linha)
+            return 'skip'
+
+        try:
+            tabela = self._csv.read_csv(
+                io.BytesIO(texto.encode('utf-8')),
+                read_options=self._opcoes_leitura,
+                parse_options=self._csv.ParseOptions(
+                    delimiter=self.delimitador,
+                    newlines_in_values=True,
+                    invalid_row_handler=ao_invalidar
+                ),
+                convert_options=self._opcoes_conversao
+            )
+        except Exception as e:
+            log.warning(f"Bloco segue pelo caminho linha a linha: {str(e)}")
+            return None
+        return None if invalidas else tabela
+
+    def _valores_coluna(self, tabela, slot: int) -> List[Any]:
+        coluna = tabela.column(f"f{self.plano.indices[slot]}")
+        if slot not in self.transformacoes:
+            return coluna.to_pylist()
+
+        transformacao, nome = self.transformacoes[slot]
+        if transformacao in self.vetorizadas:
+            return self.vetorizadas[transformacao](coluna, transformacao)
+
+        valores = []
+        for valor in coluna.to_pylist():
+            try:
+                valores.append(transformacao(valor))
+            except Exception as e:
+                log.error(f"Erro na coluna {nome}: {str(e)}")
+                valores.append(None)
+        return valores
+
+    def projetar(self, texto: str, fixos: List[Any]) -> Optional[List[List[tuple]]]:
+        """Retorna as linhas de cada tabela do bloco (na ordem de plano.tabelas) ou None"""
+        if not self.nomes or texto.startswith('\ufeff'):
+            return None
+
+        tabela = self._ler(texto)
+        if tabela is None:
+            return None
+
+        tamanho = tabela.num_rows
+        slots = len(self.plano.indices)
+        colunas = [self._valores_coluna(tabela, slot) for slot in range(slots)]
+
+        resultados = []
+        for layout in self.plano.layouts:
+            if not layout:
+                resultados.append([()] * tamanho)
+                continue
+            origens = [
+                colunas[posicao] if posicao < slots else repeat(fixos[posicao - slots], tamanho)
+                for posicao in layout
+            ]
+            resultados.append(list(zip(*origens)))
+        return resultados
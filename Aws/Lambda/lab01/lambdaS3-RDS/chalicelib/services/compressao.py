@@ -0,0 +1,140 @@
+import zlib
+from typing import Iterable, Iterator, Optional, Tuple
+from chalicelib.core.exceptions import ErroArquivoInvalido
+
+GZIP = 'gzip'
+ZSTD = 'zstd'
+EXTENSOES = {'.gz': GZIP, '.gzip': GZIP, '.zst': ZSTD, '.zstd': ZSTD}
+SUFIXOS = {GZIP: '.gz', ZSTD: '.zst'}
+ASSINATURAS = ((b'\x1f\x8b', GZIP), (b'\x28\xb5\x2f\xfd', ZSTD))
+# wbits para ler/gravar o cabeçalho gzip com o zlib
+_WBITS_GZIP = 16 + zlib.MAX_WBITS
+
+
+def zstd_disponivel() -> bool:
+    """Indica se o zstandard (dependência opcional) está instalado"""
+    try:
+        import zstandard  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise ErroArquivoInvalido("Arquivo zstd, mas o pacote zstandard não está instalado")
+    return zstandard
+
+
+def separar_extensao(nome_arquivo: str) -> Tuple[str, str]:
+    """Separa nome e extensão, mantendo a extensão de compressão junto da anterior
+
+    'vendas.2024.01.csv.gz' -> ('vendas.2024.01', '.csv.gz'); 'leiame' -> ('leiame', '')
+    """
+    base, ponto, extensao = nome_arquivo.rpartition('.')
+    if not ponto or not base:
+        return nome_arquivo, ''
+    extensao = '.' + extensao
+    if extensao.lower() in EXTENSOES:
+        base_interna, ponto_interno, extensao_interna = base.rpartition('.')
+        if ponto_interno and base_interna:
+            return base_interna, f".{extensao_interna}{extensao}"
+    return base, extensao
+
+
+def codec_pela_chave(chave: str) -> Optional[str]:
+    _, ponto, extensao = chave.rpartition('.')
+    return EXTENSOES.get(f".{extensao.lower()}") if ponto else None
+
+
+def codec_pelo_conteudo(dados: bytes) -> Optional[str]:
+    for assinatura, codec in ASSINATURAS:
+        if dados.startswith(assinatura):
+            return codec
+    return None
+
+
+def _descomprimir_gzip(blocos: Iterable[bytes], tamanho_bloco: int) -> Iterator[bytes]:
+    descompressor = zlib.decompressobj(_WBITS_GZIP)
+    iniciado = False
+    for dados in blocos:
+        while dados:
+            iniciado = True
+            saida = descompressor.decompress(dados, tamanho_bloco)
+            if saida:
+                yield saida
+            if descompressor.eof:
+                # Membros concatenados (cat a.gz b.gz) formam um gzip válido
+                dados = descompressor.unused_data
+                descompressor = zlib.decompressobj(_WBITS_GZIP)
+                iniciado = False
+            else:
+                dados = descompressor.unconsumed_tail
+    saida = descompressor.flush()
+    if saida:
+        yield saida
+    if iniciado and not descompressor.eof:
+        raise ErroArquivoInvalido("Arquivo gzip truncado")
+
+
+def _descomprimir_zstd(blocos: Iterable[bytes], tamanho_bloco: int) -> Iterator[bytes]:
+    contexto = _zstandard().ZstdDecompressor()
+    descompressor = contexto.decompressobj(write_size=tamanho_bloco)
+    iniciado = False
+    for dados in blocos:
+        while dados:
+            iniciado = True
+            saida = descompressor.decompress(dados)
+            if saida:
+                yield saida
+            if descompressor.eof:
+                # Um arquivo pode ter vários frames (zstd -c a b > c.zst)
+                dados = descompressor.unused_data
+                descompressor = contexto.decompressobj(write_size=tamanho_bloco)
+                iniciado = False
+            else:
+                dados = b''
+    if iniciado:
+        raise ErroArquivoInvalido("Arquivo zstd truncado")
+
+
+def descomprimir(blocos: Iterable[bytes], codec: Optional[str], tamanho_bloco: int = 1024 * 1024) -> Iterator[bytes]:
+    """Descomprime os blocos em streaming; sem codec, devolve os blocos como vieram"""
+    if codec == GZIP:
+        return _descomprimir_gzip(blocos, tamanho_bloco)
+    if codec == ZSTD:
+        return _descomprimir_zstd(blocos, tamanho_bloco)
+    return iter(blocos)
+
+
+class LeitorComprimido:
+    """Objeto com read() que comprime os blocos sob demanda (para upload_fileobj)"""
+
+    def __init__(self, blocos: Iterable[bytes], codec: str, nivel: int = 0):
+        self._blocos = iter(blocos)
+        self._buffer = bytearray()
+        self._fim = False
+        if codec == GZIP:
+            self._compressor = zlib.compressobj(nivel or zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, _WBITS_GZIP)
+        elif codec == ZSTD:
+            self._compressor = _zstandard().ZstdCompressor(level=nivel or 3).compressobj()
+        else:
+            raise ValueError(f"Compressão desconhecida: {codec}")
+
+    def read(self, tamanho: int = -1) -> bytes:
+        while not self._fim and (tamanho < 0 or len(self._buffer) < tamanho):
+            bloco = next(self._blocos, None)
+            if bloco is None:
+                self._buffer += self._compressor.flush()
+                self._fim = True
+            else:
+                self._buffer += self._compressor.compress(bloco)
+        if tamanho < 0 or tamanho >= len(self._buffer):
+            dados = bytes(self._buffer)
+            self._buffer.clear()
+            return dados
+        dados = bytes(self._buffer[:tamanho])
+        del self._buffer[:tamanho]
+        return dados
@@ -1,7 +1,20 @@
-from chalicelib.core.exceptions import ErroBancoDados
+import time
+from concurrent.futures import ThreadPoolExecutor
+from chalicelib.core.exceptions import ErroBancoDados, ErroProcessamento
 from chalicelib.core.logger import log
-from typing import List
-import pymysql
+from chalicelib.services.carga_infile import CODIGOS_INFILE_DESABILITADO, carregar_via_infile
+from chalicelib.services.deduplicacao import manter_ultimo
+from chalicelib.services.lote_adaptativo import TamanhoLoteAdaptativo, disputa_lock
+from chalicelib.services.particionamento import particionar
+from chalicelib.services.pool_conexoes import conexao_perdida, obter_pool
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+# max_allowed_packet padrão do MySQL 5.7, usado quando o servidor não informa o seu
+MAX_ALLOWED_PACKET_PADRAO = 4 * 1024 * 1024
+# Folga para cabeçalho do pacote e comando
+FOLGA_PACOTE = 1024
+# Tentativas seguidas de um mesmo lote após deadlock/lock wait timeout
+TENTATIVAS_LOCK = 3
 
 class GerenciadorBanco:
     """Classe base genérica para operações de banco de dados"""
@@ -17,52 +30,363 @@ class GerenciadorBanco:
         raise NotImplementedError("Deve ser implementado pela subclasse")
 
 class GerenciadorMySQL(GerenciadorBanco):
-    def conectar(self):
-        """Implementação específica para MySQL"""
+    def __init__(self, config, conectar: Optional[Callable[[], Any]] = None, delta=None):
+        """
+        Args:
+            config: ConfigDB
+            conectar: Fábrica de conexões compatível com pymysql (padrão: pymysql.connect)
+            delta: FiltroDelta para gravar só registros novos ou alterados (padrão: grava todos)
+        """
+        super().__init__(config)
+        self.delta = delta
+        self.carregador = config.carregador
+        self._queries: Dict[tuple, str] = {}
+        self._bytes_instrucao: Optional[int] = None
+        # Um controlador por tabela; o tamanho aprendido vale para as próximas invocações
+        self.controladores: Dict[str, TamanhoLoteAdaptativo] = {}
+        self._chaves_primarias: Dict[str, List[str]] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.duplicados: Dict[str, int] = {}
+        self.pool = obter_pool(
+            (config.host, config.port, config.user, config.database),
+            conectar or self._abrir_conexao,
+            tamanho=config.tamanho_pool,
+            ociosidade_maxima=config.ociosidade_maxima_pool,
+            intervalo_ping=config.intervalo_ping_pool
+        )
+    
+    def _abrir_conexao(self):
+        import pymysql
+        return pymysql.connect(
+            host=self.config.host,
+            user=self.config.user,
+            password=self.config.password,
+            database=self.config.database,
+            port=self.config.port,
+            local_infile=self.config.carregador == 'load_data'
+        )
+    
+    def conectar(self, nova: bool = False):
+        """Obtém uma conexão do pool (ou abre uma nova)"""
         try:
-            return pymysql.connect(
-                host=self.config.host,
-                user=self.config.user,
-                password=self.config.password,
-                database=self.config.database,
-                port=self.config.port
-            )
+            return self.pool.conectar() if nova else self.pool.obter()
         except Exception as e:
             log.error(f"Erro de conexão: {str(e)}")
             raise ErroBancoDados(f"Falha na conexão: {str(e)}")
     
+    def _limite_instrucao(self, conexao) -> int:
+        """Tamanho máximo (bytes) de cada INSERT multi-linha, limitado pelo max_allowed_packet do servidor"""
+        if self._bytes_instrucao is None:
+            pacote = MAX_ALLOWED_PACKET_PADRAO
+            try:
+                with conexao.cursor() as cursor:
+                    cursor.execute("SELECT @@max_allowed_packet")
+                    pacote = int(cursor.fetchone()[0])
+            except Exception as e:
+                if conexao_perdida(e):
+                    raise
+                log.warning(f"max_allowed_packet indisponível, usando {pacote} bytes: {str(e)}")
+            self._bytes_instrucao = min(pacote, self.config.bytes_max_instrucao) - FOLGA_PACOTE
+            log.info(f"INSERT multi-linha limitado a {self._bytes_instrucao} bytes")
+        return self._bytes_instrucao
+    
+    def chaves_estrangeiras(self, tabelas: List[str]) -> Dict[str, List[str]]:
+        """Tabelas referenciadas (FK) por cada tabela informada, segundo o INFORMATION_SCHEMA"""
+        referencias: Dict[str, List[str]] = {tabela: [] for tabela in tabelas}
+        conexao = self.conectar()
+        erro = None
+        try:
+            with conexao.cursor() as cursor:
+                cursor.execute(
+                    "SELECT DISTINCT TABLE_NAME, REFERENCED_TABLE_NAME "
+                    "FROM INFORMATION_SCHEMA.KEY_COLUMN_USAGE "
+                    "WHERE TABLE_SCHEMA = DATABASE() AND REFERENCED_TABLE_NAME IS NOT NULL"
+                )
+                linhas = cursor.fetchall()
+            for filha, pai in linhas:
+                if filha in referencias and pai in referencias and pai != filha:
+                    referencias[filha].append(pai)
+        except Exception as e:
+            erro = e
+            log.warning(f"FKs indisponíveis no INFORMATION_SCHEMA, usando o mapeamento: {str(e)}")
+        finally:
+            self._finalizar(conexao, erro)
+        return referencias
+    
+    def carregar_esquema(self, tabelas: List[str]):
+        """Modelo de tipos das tabelas (ModeloEsquema) ou None se o INFORMATION_SCHEMA não responder"""
+        from chalicelib.services.esquema import ModeloEsquema
+        conexao = self.conectar()
+        erro = None
+        try:
+            return ModeloEsquema.carregar(conexao, tabelas)
+        except Exception as e:
+            erro = e
+            log.warning(f"Esquema das tabelas indisponível, gravando sem conversão de tipos: {str(e)}")
+            return None
+        finally:
+            self._finalizar(conexao, erro)
+    
+    def chave_primaria(self, conexao, tabela: str) -> List[str]:
+        """Colunas da chave primária da tabela (INFORMATION_SCHEMA, lidas uma vez por tabela)"""
+        if tabela not in self._chaves_primarias:
+            chave: List[str] = []
+            try:
+                with conexao.cursor() as cursor:
+                    cursor.execute(
+                        "SELECT COLUMN_NAME FROM INFORMATION_SCHEMA.KEY_COLUMN_USAGE "
+                        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND CONSTRAINT_NAME = 'PRIMARY' "
+                        "ORDER BY ORDINAL_POSITION",
+                        (tabela,)
+                    )
+                    chave = [linha[0] for linha in cursor.fetchall()]
+            except Exception as e:
+                if conexao_perdida(e):
+                    raise
+                log.warning(f"Chave primária de {tabela} indisponível: {str(e)}")
+            self._chaves_primarias[tabela] = chave
+        return self._chaves_primarias[tabela]
+    
+    def _carregar(self, conexao, tabela: str, colunas: List[str], dados: List[tuple]):
+        """Grava o lote com o carregador configurado (executemany ou LOAD DATA + merge)"""
+        if self.carregador == 'load_data':
+            try:
+                carregar_via_infile(conexao, tabela, colunas, dados)
+                return
+            except Exception as e:
+                if not e.args or e.args[0] not in CODIGOS_INFILE_DESABILITADO:
+                    raise
+                log.warning(f"LOAD DATA LOCAL indisponível ({str(e)}) - usando executemany")
+                self.carregador = 'executemany'
+        
+        chave = (tabela, tuple(colunas))
+        query = self._queries.get(chave)
+        if query is None:
+            query = self._queries[chave] = self._query_upsert(tabela, colunas)
+        # O pymysql reescreve o executemany em INSERTs multi-linha de até max_stmt_length bytes
+        limite = self._limite_instrucao(conexao)
+        with conexao.cursor() as cursor:
+            cursor.max_stmt_length = limite
+            cursor.executemany(query, dados)
+    
+    def _gravar(self, conexao, tabela: str, colunas: List[str], dados: List[tuple]):
+        """Grava o lote + commit; em conexão perdida, reconecta e repete o lote uma vez
+        
+        Retorna a conexão em uso (a nova, se houve reconexão). Se a nova tentativa falhar,
+        a exceção leva a nova conexão em `conexao`, para o rollback ser feito nela.
+        """
+        try:
+            self._carregar(conexao, tabela, colunas, dados)
+            conexao.commit()
+            return conexao
+        except Exception as e:
+            if not conexao_perdida(e):
+                raise
+            log.warning(f"Conexão perdida ({str(e)}) - reconectando")
+            self.pool.descartar(conexao)
+        
+        conexao = self.conectar(nova=True)
+        try:
+            self._carregar(conexao, tabela, colunas, dados)
+            conexao.commit()
+        except Exception as e:
+            e.conexao = conexao
+            raise
+        return conexao
+    
+    def _finalizar(self, conexao, erro: Optional[Exception] = None):
+        """Devolve a conexão ao pool; após erro, faz rollback e descarta se ela estiver inutilizável
+        
+        Se o erro indicar outra conexão em uso (reconexão no meio da gravação), é ela que é tratada.
+        """
+        conexao = getattr(erro, 'conexao', conexao)
+        if erro is None:
+            self.pool.devolver(conexao)
+            return
+        try:
+            conexao.rollback()
+        except Exception:
+            self.pool.descartar(conexao)
+            return
+        if conexao_perdida(erro):
+            self.pool.descartar(conexao)
+        else:
+            self.pool.devolver(conexao)
+    
+    @staticmethod
+    def _query_upsert(tabela: str, colunas: List[str]) -> str:
+        cols = ', '.join(colunas)
+        placeholders = ', '.join(['%s'] * len(colunas))
+        updates = ', '.join([f"{c}=VALUES({c})" for c in colunas])
+        
+        return f"""
+            INSERT INTO {tabela} ({cols})
+            VALUES ({placeholders})
+            ON DUPLICATE KEY UPDATE {updates}
+        """
+    
+    def controlador(self, tabela: str, inicial: int) -> TamanhoLoteAdaptativo:
+        if tabela not in self.controladores:
+            self.controladores[tabela] = TamanhoLoteAdaptativo(
+                inicial,
+                self.config.lote_minimo,
+                self.config.lote_maximo,
+                self.config.latencia_alvo_lote
+            )
+        return self.controladores[tabela]
+    
+    def estatisticas_lotes(self) -> Dict[str, Dict[str, Any]]:
+        """Tamanhos escolhidos e vazão por tabela desde a última chamada"""
+        estatisticas = {}
+        for tabela, controlador in self.controladores.items():
+            estatisticas[tabela] = controlador.estatisticas()
+            controlador.zerar_estatisticas()
+        return estatisticas
+    
+    def _gravar_adaptativo(self, conexao, tabela: str, colunas: List[str], dados: List[tuple],
+                           controlador: TamanhoLoteAdaptativo):
+        """Grava os dados em lotes do tamanho escolhido pelo controlador, medindo a latência de cada um
+        
+        Deadlock ou lock wait timeout desfazem só o lote atual, que é refeito com o tamanho reduzido.
+        """
+        i = 0
+        tentativas = 0
+        while i < len(dados):
+            parte = dados[i:i + controlador.tamanho]
+            inicio = time.perf_counter()
+            try:
+                conexao = self._gravar(conexao, tabela, colunas, parte)
+            except Exception as e:
+                # Após reconexão, o rollback e as próximas tentativas usam a nova conexão
+                conexao = getattr(e, 'conexao', conexao)
+                if not disputa_lock(e) or tentativas >= TENTATIVAS_LOCK:
+                    e.conexao = conexao
+                    raise
+                tentativas += 1
+                conexao.rollback()
+                controlador.registrar(len(parte), time.perf_counter() - inicio, erro_lock=e.args[0])
+                log.warning(f"Disputa de lock em {tabela} ({str(e)}) - refazendo com {controlador.tamanho} registros")
+                continue
+            duracao = time.perf_counter() - inicio
+            controlador.registrar(len(parte), duracao)
+            tentativas = 0
+            i += len(parte)
+            log.info(f"Lote de {len(parte)} registros de {tabela} persistido em {duracao:.3f}s")
+        return conexao
+    
+    def _gravar_particao(self, tabela: str, colunas: List[str], dados: List[tuple], controlador: TamanhoLoteAdaptativo):
+        conexao = self.conectar()
+        try:
+            conexao = self._gravar_adaptativo(conexao, tabela, colunas, dados, controlador)
+        except Exception as e:
+            self._finalizar(conexao, e)
+            raise
+        self._finalizar(conexao)
+    
+    def registros_ignorados(self) -> Dict[str, int]:
+        """Registros sem alteração ignorados no modo delta, por tabela, desde a última chamada"""
+        return self.delta.registros_ignorados() if self.delta else {}
+    
+    def registros_duplicados(self) -> Dict[str, int]:
+        """Registros duplicados (mesma chave primária no arquivo) descartados, por tabela, desde a última chamada"""
+        duplicados, self.duplicados = self.duplicados, {}
+        return duplicados
+    
+    def _filtrar_registros(self, conexao, tabela: str, colunas: List[str],
+                           dados: List[tuple], vistas: Optional[Set] = None) -> Tuple[List[tuple], Optional[List[tuple]]]:
+        """Aplica DB_DEDUP e o modo delta; retorna (registros a gravar, hashes a registrar após o commit)
+        
+        Com DB_DEDUP, cada lote mantém só o último registro de cada chave primária antes do upsert.
+        vistas guarda as chaves já gravadas nos lotes anteriores do mesmo arquivo: uma chave
+        repetida em outro lote é descartada, e cada chave chega ao MySQL uma vez por arquivo.
+        """
+        chave = self.chave_primaria(conexao, tabela) if self.delta or self.config.deduplicar else None
+        if not chave or any(coluna not in colunas for coluna in chave):
+            return dados, None
+        
+        if self.config.deduplicar:
+            dados, descartados = manter_ultimo(dados, [colunas.index(coluna) for coluna in chave], vistas)
+            self.duplicados[tabela] = self.duplicados.get(tabela, 0) + descartados
+            if descartados:
+                log.info(f"{descartados} registros duplicados de {tabela} descartados (mantido o último)")
+        if not self.delta:
+            return dados, None
+        return self.delta.alterados(conexao, tabela, colunas, dados, chave)
+    
+    def _gravar_registros(self, conexao, tabela: str, colunas: List[str], dados: List[tuple], tamanho_lote: int,
+                          vistas: Optional[Set] = None):
+        """Grava os registros (só os novos ou alterados, no modo delta); retorna a conexão em uso"""
+        dados, hashes = self._filtrar_registros(conexao, tabela, colunas, dados, vistas)
+        if dados:
+            conexao = self._gravar_particoes(conexao, tabela, colunas, dados, tamanho_lote)
+        if hashes:
+            try:
+                self.delta.registrar(conexao, hashes, self._limite_instrucao(conexao))
+            except Exception as e:
+                e.conexao = conexao
+                raise
+        return conexao
+    
+    def _gravar_particoes(self, conexao, tabela: str, colunas: List[str], dados: List[tuple], tamanho_lote: int):
+        """Grava os registros na conexão informada ou, com DB_SHARDS > 1, em partições paralelas
+        
+        Cada partição é um grupo disjunto de chaves primárias (faixa ou hash), gravado em sua
+        própria conexão e com seu próprio controlador de lote ("tabela[n]" nas estatísticas,
+        com deadlocks por partição). Retorna a conexão em uso pelo chamador.
+        """
+        particoes = self.config.particoes
+        if particoes <= 1 or len(dados) < 2 * self.config.lote_minimo:
+            return self._gravar_adaptativo(conexao, tabela, colunas, dados, self.controlador(tabela, tamanho_lote))
+        
+        chave = self.chave_primaria(conexao, tabela)
+        if not chave or any(coluna not in colunas for coluna in chave):
+            return self._gravar_adaptativo(conexao, tabela, colunas, dados, self.controlador(tabela, tamanho_lote))
+        
+        posicoes = [colunas.index(coluna) for coluna in chave]
+        partes = particionar(dados, posicoes, particoes, self.config.modo_particao)
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=particoes, thread_name_prefix='particao')
+        futuros = [
+            self._executor.submit(
+                self._gravar_particao, tabela, colunas, parte,
+                self.controlador(f"{tabela}[{i}]", max(1, tamanho_lote // particoes))
+            )
+            for i, parte in enumerate(partes)
+        ]
+        erros = [futuro.exception() for futuro in futuros]
+        erros = [erro for erro in erros if erro is not None]
+        if erros:
+            raise erros[0]
+        return conexao
+    
     def inserir_lote(self, tabela: str, colunas: List[str], dados: List[tuple], tamanho_lote: int = 1000):
-        """Implementação de upsert em lote para MySQL"""
+        """Implementação de upsert em lote para MySQL (tamanho_lote é o inicial, ajustado pela latência)"""
         conexao = self.conectar()
-        cursor = conexao.cursor()
         
         try:
-            cols = ', '.join(colunas)
-            placeholders = ', '.join(['%s'] * len(colunas))
-            updates = ', '.join([f"{c}=VALUES({c})" for c in colunas])
-            
-            query = f"""
-                INSERT INTO {tabela} ({cols})
-                VALUES ({placeholders})
-                ON DUPLICATE KEY UPDATE {updates}
-            """
-            
-            for i in range(0, len(dados), tamanho_lote):
-                cursor.executemany(query, dados[i:i + tamanho_lote])
-                conexao.commit()
-                log.info(f"Lote {i//tamanho_lote + 1} persistido")
+            conexao = self._gravar_registros(conexao, tabela, colunas, dados, tamanho_lote)
+            self._finalizar(conexao)
                 
         except Exception as e:
-            conexao.rollback()
+            self._finalizar(conexao, e)
             log.error(f"Erro na persistência: {str(e)}")
             raise ErroBancoDados(f"Falha na persistência: {str(e)}")
-        finally:
-            cursor.close()
-            conexao.close()
 
 
 
     def persistir(self, dados: List[tuple], mapeamento: str ,tamanho_lote: int) -> bool:
+        if self.config.tabelas_paralelas:
+            from chalicelib.services.carga_paralela import CarregadorParalelo
+            from chalicelib.services.mapeamento import dependencias_tabelas, ordem_carga
+            colunas = {
+                t['tabela']: [col['nome'] for col in t['colunas']]
+                for t in mapeamento if dados.get(t['tabela'])
+            }
+            lotes = [(tabela, dados[tabela]) for tabela in ordem_carga(mapeamento) if tabela in colunas]
+            CarregadorParalelo(self, dependencias_tabelas(mapeamento)).carregar(lotes, colunas, tamanho_lote)
+            log.info("Dados persistidos com sucesso")
+            return True
+        
         try:
             for tabela, registros in dados.items():
                 if not registros:
@@ -78,4 +402,78 @@ class GerenciadorMySQL(GerenciadorBanco):
             return True
         except Exception as e:
             log.error(f"Erro ao persistir dados: {str(e)}")
-            raise ErroBancoDados(f"Falha ao persistir dados: {str(e)}")        
\ No newline at end of file
+            raise ErroBancoDados(f"Falha ao persistir dados: {str(e)}")
+    
+    def persistir_lotes(self, lotes: Iterable[Tuple[str, List[tuple]]], colunas: Dict[str, List[str]],
+                        tamanho_lote: Optional[int] = None) -> Dict[str, int]:
+        """Grava cada lote assim que é gerado (pipeline em streaming), retornando registros por tabela
+        
+        Lotes recebidos maiores que o tamanho escolhido pelo controlador da tabela são
+        divididos; tamanho_lote é o tamanho inicial (padrão: o primeiro lote recebido).
+        """
+        conexao = self.conectar()
+        persistidos = {tabela: 0 for tabela in colunas}
+        # Chaves já gravadas por tabela, para o DB_DEDUP valer no arquivo inteiro
+        vistas = {tabela: set() for tabela in colunas}
+        
+        try:
+            for tabela, lote in lotes:
+                if not lote:
+                    continue
+                conexao = self._gravar_registros(conexao, tabela, colunas[tabela], lote, tamanho_lote or len(lote), vistas[tabela])
+                persistidos[tabela] += len(lote)
+            self._finalizar(conexao)
+            return persistidos
+        except ErroProcessamento as e:
+            self._finalizar(conexao, e)
+            raise
+        except Exception as e:
+            self._finalizar(conexao, e)
+            log.error(f"Erro na persistência: {str(e)}")
+            raise ErroBancoDados(f"Falha na persistência: {str(e)}")
+    
+    def persistir_grupo(self, lotes: Iterable[Tuple[str, List[tuple]]], colunas: Dict[str, List[str]]) -> Dict[str, int]:
+        """Grava os lotes de vários arquivos pequenos em uma única transação, retornando registros por tabela
+        
+        Sem divisão adaptativa, partições nem nova tentativa: qualquer erro desfaz o grupo
+        inteiro e o chamador decide como repetir. Os lotes devem vir na ordem de carga; no
+        modo delta, os hashes são filtrados antes da primeira escrita e registrados após o commit.
+        Nenhuma instrução antes do commit pode fazer commit implícito (a staging do
+        load_data é esvaziada com DELETE, não TRUNCATE).
+        """
+        conexao = self.conectar()
+        persistidos = {tabela: 0 for tabela in colunas}
+        # Se o grupo for desfeito, o chamador regrava arquivo a arquivo e os registros são contados de novo
+        duplicados = dict(self.duplicados)
+        ignorados = dict(self.delta.ignorados) if self.delta else None
+        vistas = {tabela: set() for tabela in colunas}
+        
+        try:
+            preparados = []
+            hashes = []
+            for tabela, lote in lotes:
+                if not lote:
+                    continue
+                persistidos[tabela] += len(lote)
+                dados, hashes_tabela = self._filtrar_registros(conexao, tabela, colunas[tabela], lote, vistas[tabela])
+                if dados:
+                    preparados.append((tabela, dados))
+                hashes.extend(hashes_tabela or [])
+            
+            inicio = time.perf_counter()
+            for tabela, dados in preparados:
+                self._carregar(conexao, tabela, colunas[tabela], dados)
+            conexao.commit()
+            if hashes:
+                self.delta.registrar(conexao, hashes, self._limite_instrucao(conexao))
+            self._finalizar(conexao)
+            log.info(f"{sum(len(dados) for _, dados in preparados)} registros de {len(preparados)} lotes "
+                     f"persistidos em uma transação ({time.perf_counter() - inicio:.3f}s)")
+            return persistidos
+        except Exception as e:
+            self._finalizar(conexao, e)
+            self.duplicados = duplicados
+            if self.delta:
+                self.delta.ignorados = ignorados
+            log.error(f"Erro na persistência do grupo: {str(e)}")
+            raise ErroBancoDados(f"Falha na persistência do grupo: {str(e)}")
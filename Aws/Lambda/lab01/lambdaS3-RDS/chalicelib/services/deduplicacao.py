@@ -0,0 +1,31 @@
+import hashlib
+from operator import itemgetter
+from typing import Callable, List, Optional, Set, Tuple
+
+
+def _leitor_chave(posicoes: List[int]) -> Callable[[tuple], object]:
+    """Chave de uma coluna fica como o próprio valor; chaves compostas viram um digest de 16 bytes"""
+    if len(posicoes) == 1:
+        return itemgetter(posicoes[0])
+    seletor = itemgetter(*posicoes)
+    return lambda registro: hashlib.blake2b('\x1f'.join(map(repr, seletor(registro))).encode(), digest_size=16).digest()
+
+
+def manter_ultimo(registros: List[tuple], posicoes: List[int], vistas: Optional[Set] = None) -> Tuple[List[tuple], int]:
+    """Mantém só o último registro de cada chave primária, na ordem das últimas ocorrências
+
+    Retorna (registros, duplicados descartados). Percorre os registros de trás para
+    frente guardando apenas as chaves já vistas, sem copiar os registros para um dicionário.
+    Com vistas (as chaves dos lotes anteriores do arquivo), registros com chaves já gravadas
+    também são descartados e as chaves mantidas são acrescentadas a ele.
+    """
+    chave = _leitor_chave(posicoes)
+    vistas = set() if vistas is None else vistas
+    mantidos = []
+    for registro in reversed(registros):
+        valor = chave(registro)
+        if valor not in vistas:
+            vistas.add(valor)
+            mantidos.append(registro)
+    mantidos.reverse()
+    return mantidos, len(registros) - len(mantidos)
@@ -0,0 +1,195 @@
+import re
+from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Callable, Dict, FrozenSet, List, Optional
+from chalicelib.core.logger import log
+
+TIPOS_INTEIROS = {'tinyint', 'smallint', 'mediumint', 'int', 'integer', 'bigint'}
+TIPOS_DECIMAIS = {'decimal', 'numeric'}
+TIPOS_PONTO_FLUTUANTE = {'float', 'double', 'real'}
+TIPOS_TEXTO = {'char', 'varchar', 'tinytext', 'text', 'mediumtext', 'longtext'}
+
+# CHECK (coluna IN ('A', 'B', ...)), como o MySQL 8 devolve em CHECK_CLAUSE
+_CHECK_IN = re.compile(r"^\(*`?(\w+)`?\s+in\s*\((.*)\)\)*$", re.IGNORECASE | re.DOTALL)
+_ENTRE_ASPAS = re.compile(r"'((?:[^'\\]|\\.|'')*)'")
+
+# Amostras de rejeição devolvidas no resultado do handler
+MAX_AMOSTRAS = 10
+
+
+def _para_int(valor: Any) -> int:
+    return valor if isinstance(valor, int) else int(str(valor).strip())
+
+
+def _para_datetime(valor: Any) -> datetime:
+    return valor if isinstance(valor, datetime) else datetime.fromisoformat(str(valor).strip())
+
+
+def _para_date(valor: Any) -> date:
+    if isinstance(valor, datetime):
+        return valor.date()
+    return valor if isinstance(valor, date) else date.fromisoformat(str(valor).strip()[:10])
+
+
+@dataclass(frozen=True)
+class ColunaEsquema:
+    nome: str
+    tipo: str
+    tamanho_maximo: Optional[int]
+    aceita_nulo: bool
+    permitidos: Optional[FrozenSet[str]] = None
+
+    def conversor(self) -> Callable[[Any], Any]:
+        """Converte o valor para o tipo nativo da coluna; ValueError se o servidor o recusaria"""
+        if self.tipo in TIPOS_INTEIROS:
+            converter = _para_int
+        elif self.tipo in TIPOS_DECIMAIS:
+            converter = lambda valor: valor if isinstance(valor, Decimal) else Decimal(str(valor).strip())
+        elif self.tipo in TIPOS_PONTO_FLUTUANTE:
+            converter = float
+        elif self.tipo in ('datetime', 'timestamp'):
+            converter = _para_datetime
+        elif self.tipo == 'date':
+            converter = _para_date
+        elif self.tipo in TIPOS_TEXTO:
+            converter = str
+        else:
+            converter = None
+
+        nome, aceita_nulo, tamanho_maximo, permitidos = self.nome, self.aceita_nulo, self.tamanho_maximo, self.permitidos
+
+        def converter_valor(valor: Any) -> Any:
+            if valor is None:
+                if not aceita_nulo:
+                    raise ValueError(f"{nome}: NULL em coluna NOT NULL")
+                return None
+            if converter is not None:
+                try:
+                    valor = converter(valor)
+                except (TypeError, ValueError, ArithmeticError):
+                    raise ValueError(f"{nome}: {valor!r} não é {self.tipo}")
+            if tamanho_maximo is not None and isinstance(valor, str) and len(valor) > tamanho_maximo:
+                raise ValueError(f"{nome}: {len(valor)} caracteres excede {self.tipo}({tamanho_maximo})")
+            if permitidos is not None and str(valor) not in permitidos:
+                raise ValueError(f"{nome}: {valor!r} fora do CHECK ({', '.join(sorted(permitidos))})")
+            return valor
+
+        return converter_valor
+
+
+class ModeloEsquema:
+    """Tipos, tamanhos, nulabilidade e CHECKs simples das tabelas mapeadas (INFORMATION_SCHEMA)"""
+
+    def __init__(self, tabelas: Dict[str, Dict[str, ColunaEsquema]]):
+        self.tabelas = tabelas
+
+    @classmethod
+    def carregar(cls, conexao, tabelas: List[str]) -> 'ModeloEsquema':
+        marcadores = ', '.join(['%s'] * len(tabelas))
+        with conexao.cursor() as cursor:
+            cursor.execute(
+                "SELECT TABLE_NAME, COLUMN_NAME, DATA_TYPE, CHARACTER_MAXIMUM_LENGTH, IS_NULLABLE "
+                "FROM INFORMATION_SCHEMA.COLUMNS "
+                f"WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME IN ({marcadores})",
+                tabelas
+            )
+            colunas = [tuple(linha) for linha in cursor.fetchall()]
+
+        permitidos: Dict[tuple, FrozenSet[str]] = {}
+        try:
+            with conexao.cursor() as cursor:
+                # CHECK_CONSTRAINTS existe a partir do MySQL 8.0.16
+                cursor.execute(
+                    "SELECT tc.TABLE_NAME, cc.CHECK_CLAUSE "
+                    "FROM INFORMATION_SCHEMA.TABLE_CONSTRAINTS tc "
+                    "JOIN INFORMATION_SCHEMA.CHECK_CONSTRAINTS cc "
+                    "ON cc.CONSTRAINT_SCHEMA = tc.CONSTRAINT_SCHEMA AND cc.CONSTRAINT_NAME = tc.CONSTRAINT_NAME "
+                    f"WHERE tc.TABLE_SCHEMA = DATABASE() AND tc.CONSTRAINT_TYPE = 'CHECK' AND tc.TABLE_NAME IN ({marcadores})",
+                    tabelas
+                )
+                checks = [tuple(linha) for linha in cursor.fetchall()]
+            for tabela, clausula in checks:
+                encontrado = _CHECK_IN.match(clausula.strip())
+                if encontrado:
+                    valores = frozenset(v.replace("''", "'") for v in _ENTRE_ASPAS.findall(encontrado.group(2)))
+                    permitidos[(tabela, encontrado.group(1))] = valores
+        except Exception as e:
+            log.warning(f"CHECKs indisponíveis no INFORMATION_SCHEMA: {str(e)}")
+
+        modelo: Dict[str, Dict[str, ColunaEsquema]] = {}
+        for tabela, coluna, tipo, tamanho, nulo in colunas:
+            tipo = tipo.lower()
+            modelo.setdefault(tabela, {})[coluna] = ColunaEsquema(
+                nome=coluna,
+                tipo=tipo,
+                tamanho_maximo=int(tamanho) if tamanho is not None and tipo in TIPOS_TEXTO else None,
+                aceita_nulo=nulo == 'YES',
+                permitidos=permitidos.get((tabela, coluna))
+            )
+        return cls(modelo)
+
+    def validador(self, tabelas: List[str], colunas: Dict[str, List[str]]) -> 'ValidadorRegistros':
+        return ValidadorRegistros(self, tabelas, colunas)
+
+
+class ValidadorRegistros:
+    """Converte os lotes de um arquivo para os tipos do banco e rejeita linhas inválidas
+
+    Os lotes de todas as tabelas vêm alinhados (a linha n do arquivo está na posição n
+    de cada lote). Uma linha rejeitada em qualquer tabela sai de todas, para que uma
+    tabela dependente nunca receba um registro cujo registro-pai foi descartado.
+    """
+
+    def __init__(self, modelo: ModeloEsquema, tabelas: List[str], colunas: Dict[str, List[str]]):
+        self.tabelas = tabelas
+        self.conversores = []
+        for tabela in tabelas:
+            esquema = modelo.tabelas.get(tabela, {})
+            self.conversores.append([
+                esquema[coluna].conversor() if coluna in esquema else None
+                for coluna in colunas[tabela]
+            ])
+        self.rejeitados = 0
+        self.por_tabela: Dict[str, int] = {}
+        self.amostras: List[str] = []
+
+    def converter(self, lotes: List[List[tuple]]) -> List[List[tuple]]:
+        """Retorna os lotes convertidos, sem as linhas rejeitadas"""
+        if not lotes or not lotes[0]:
+            return lotes
+        convertidos = [[] for _ in lotes]
+        saidas = [lote.append for lote in convertidos]
+        planos = list(zip(self.tabelas, self.conversores))
+
+        for valores in zip(*lotes):
+            registros = []
+            try:
+                for (tabela, conversores), registro in zip(planos, valores):
+                    registros.append(tuple([
+                        converter(valor) if converter is not None else valor
+                        for converter, valor in zip(conversores, registro)
+                    ]))
+            except ValueError as e:
+                self._rejeitar(tabela, str(e))
+                continue
+            for adicionar, registro in zip(saidas, registros):
+                adicionar(registro)
+        return convertidos
+
+    def _rejeitar(self, tabela: str, motivo: str):
+        self.rejeitados += 1
+        self.por_tabela[tabela] = self.por_tabela.get(tabela, 0) + 1
+        if len(self.amostras) < MAX_AMOSTRAS:
+            self.amostras.append(f"{tabela}.{motivo}")
+            log.warning(f"Linha rejeitada em {tabela}.{motivo}")
+
+    def incorporar(self, resumo: Dict[str, Any]):
+        """Soma as rejeições de um validador que rodou em outro processo"""
+        self.rejeitados += resumo['linhas']
+        for tabela, quantidade in resumo['por_tabela'].items():
+            self.por_tabela[tabela] = self.por_tabela.get(tabela, 0) + quantidade
+        self.amostras.extend(resumo['amostras'][:MAX_AMOSTRAS - len(self.amostras)])
+
+    def resumo(self) -> Dict[str, Any]:
+        return {'linhas': self.rejeitados, 'por_tabela': self.por_tabela, 'amostras': self.amostras}
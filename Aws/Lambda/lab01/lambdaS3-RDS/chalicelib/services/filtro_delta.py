@@ -0,0 +1,106 @@
+import hashlib
+from operator import itemgetter
+from typing import Dict, List, Tuple
+from chalicelib.core.logger import log
+
+# Parâmetros por SELECT ... IN na consulta dos hashes gravados
+LOTE_CONSULTA = 1000
+
+
+def _resumo(valores: tuple) -> bytes:
+    return hashlib.blake2b('\x1f'.join(map(repr, valores)).encode(), digest_size=16).digest()
+
+
+class FiltroDelta:
+    """Detecta registros novos ou alterados pelo hash das colunas de negócio
+
+    Para cada chave primária fica guardado, em uma tabela auxiliar no MySQL, o hash das
+    colunas vindas do arquivo ou constantes (colunas 'funcao', como a data de atualização,
+    ficam de fora). Só os registros com hash diferente do gravado seguem para o upsert. Os
+    hashes são gravados depois do commit dos dados: uma falha entre os dois commits faz o
+    registro ser regravado na próxima carga, nunca ignorado.
+    """
+
+    def __init__(self, mapeamento: List[Dict], tabela: str = 'etl_row_hash'):
+        self.tabela = tabela
+        self.colunas_hash = {
+            item['tabela']: [col['nome'] for col in item['colunas'] if col['origem'].get('tipo') != 'funcao']
+            for item in mapeamento
+        }
+        self.ignorados: Dict[str, int] = {}
+        self._criada = False
+
+    def _criar_tabela(self, conexao):
+        if not self._criada:
+            with conexao.cursor() as cursor:
+                cursor.execute(
+                    f"CREATE TABLE IF NOT EXISTS {self.tabela} ("
+                    "table_name VARCHAR(64) NOT NULL, "
+                    "pk_hash BINARY(16) NOT NULL, "
+                    "row_hash BINARY(16) NOT NULL, "
+                    "PRIMARY KEY (table_name, pk_hash)"
+                    ") ENGINE=InnoDB"
+                )
+            self._criada = True
+
+    def alterados(self, conexao, tabela: str, colunas: List[str], registros: List[tuple],
+                  chave: List[str]) -> Tuple[List[tuple], List[tuple]]:
+        """Retorna (registros a gravar, hashes a registrar após o commit)
+
+        Registros repetidos para a mesma chave mantêm só a última ocorrência, como no upsert.
+        """
+        posicoes_hash = [colunas.index(coluna) for coluna in self.colunas_hash.get(tabela, colunas) if coluna in colunas]
+        ler_chave = itemgetter(*[colunas.index(coluna) for coluna in chave])
+        ler_valores = itemgetter(*posicoes_hash)
+
+        ultimos: Dict[bytes, Tuple[bytes, tuple]] = {}
+        for registro in registros:
+            pk = ler_chave(registro)
+            valores = ler_valores(registro)
+            ultimos[_resumo(pk if isinstance(pk, tuple) else (pk,))] = (
+                _resumo(valores if isinstance(valores, tuple) else (valores,)), registro
+            )
+
+        self._criar_tabela(conexao)
+        gravados: Dict[bytes, bytes] = {}
+        hashes_pk = list(ultimos)
+        with conexao.cursor() as cursor:
+            for i in range(0, len(hashes_pk), LOTE_CONSULTA):
+                parte = hashes_pk[i:i + LOTE_CONSULTA]
+                cursor.execute(
+                    f"SELECT pk_hash, row_hash FROM {self.tabela} "
+                    f"WHERE table_name = %s AND pk_hash IN ({', '.join(['%s'] * len(parte))})",
+                    [tabela] + parte
+                )
+                for pk_hash, row_hash in cursor.fetchall():
+                    gravados[bytes(pk_hash)] = bytes(row_hash)
+
+        alterados = []
+        hashes = []
+        for pk_hash, (row_hash, registro) in ultimos.items():
+            if gravados.get(pk_hash) != row_hash:
+                alterados.append(registro)
+                hashes.append((tabela, pk_hash, row_hash))
+
+        # Só os registros iguais ao hash gravado; repetições da chave no lote não contam
+        ignorados = len(ultimos) - len(alterados)
+        self.ignorados[tabela] = self.ignorados.get(tabela, 0) + ignorados
+        if ignorados:
+            log.info(f"{ignorados} de {len(registros)} registros de {tabela} sem alteração - ignorados")
+        return alterados, hashes
+
+    def registrar(self, conexao, hashes: List[tuple], max_stmt_length: int):
+        """Registra os hashes dos registros gravados (commit próprio)"""
+        with conexao.cursor() as cursor:
+            cursor.max_stmt_length = max_stmt_length
+            cursor.executemany(
+                f"INSERT INTO {self.tabela} (table_name, pk_hash, row_hash) VALUES (%s, %s, %s) "
+                "ON DUPLICATE KEY UPDATE row_hash = VALUES(row_hash)",
+                hashes
+            )
+        conexao.commit()
+
+    def registros_ignorados(self) -> Dict[str, int]:
+        """Registros ignorados por tabela desde a última chamada"""
+        ignorados, self.ignorados = self.ignorados, {}
+        return ignorados
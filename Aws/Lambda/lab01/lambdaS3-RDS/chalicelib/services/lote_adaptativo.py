@@ -0,0 +1,69 @@
+from typing import Any, Dict, Optional
+
+LOCK_WAIT_TIMEOUT = 1205
+DEADLOCK = 1213
+# Deadlock e lock wait timeout: sinal de disputa de locks, o lote é refeito menor
+CODIGOS_DISPUTA_LOCK = {LOCK_WAIT_TIMEOUT, DEADLOCK}
+
+
+def disputa_lock(erro: Exception) -> bool:
+    return bool(getattr(erro, 'args', None)) and erro.args[0] in CODIGOS_DISPUTA_LOCK
+
+
+class TamanhoLoteAdaptativo:
+    """Tamanho de lote ajustado em tempo de execução (AIMD)
+
+    Lotes gravados dentro da latência alvo aumentam o tamanho em `passo` registros;
+    lotes lentos ou que esbarram em locks reduzem pela metade. O tamanho fica entre
+    minimo e maximo e é mantido entre invocações quentes.
+    """
+
+    def __init__(self, inicial: int, minimo: int, maximo: int, latencia_alvo: float,
+                 passo: int = None, reducao: float = 0.5):
+        self.minimo = max(1, minimo)
+        self.maximo = max(self.minimo, maximo)
+        self.tamanho = min(max(inicial, self.minimo), self.maximo)
+        self.latencia_alvo = latencia_alvo
+        self.passo = passo or self.minimo
+        self.reducao = reducao
+        self.zerar_estatisticas()
+
+    def registrar(self, registros: int, segundos: float, erro_lock: Optional[int] = None):
+        """Registra um lote gravado (ou que falhou com o erro de lock informado) e ajusta o próximo tamanho"""
+        self._tamanhos.append(self.tamanho)
+        disputa = erro_lock is not None
+        if erro_lock == DEADLOCK:
+            self._deadlocks += 1
+        elif disputa:
+            self._timeouts_lock += 1
+        else:
+            self._lotes += 1
+            self._registros += registros
+            self._segundos += segundos
+
+        if disputa or segundos > self.latencia_alvo:
+            self.tamanho = max(self.minimo, int(self.tamanho * self.reducao))
+        else:
+            self.tamanho = min(self.maximo, self.tamanho + self.passo)
+
+    def estatisticas(self) -> Dict[str, Any]:
+        """Tamanhos escolhidos e vazão desde o último zerar_estatisticas()"""
+        return {
+            'lotes': self._lotes,
+            'registros': self._registros,
+            'segundos': round(self._segundos, 3),
+            'registros_por_segundo': round(self._registros / self._segundos) if self._segundos else None,
+            'deadlocks': self._deadlocks,
+            'timeouts_lock': self._timeouts_lock,
+            'tamanho_minimo': min(self._tamanhos) if self._tamanhos else self.tamanho,
+            'tamanho_maximo': max(self._tamanhos) if self._tamanhos else self.tamanho,
+            'proximo_tamanho': self.tamanho
+        }
+
+    def zerar_estatisticas(self):
+        self._tamanhos = []
+        self._lotes = 0
+        self._registros = 0
+        self._segundos = 0.0
+        self._deadlocks = 0
+        self._timeouts_lock = 0
@@ -0,0 +1,155 @@
+from operator import itemgetter
+from typing import Any, Callable, Dict, List, Optional
+from chalicelib.core.logger import log
+
+
+def _seletor(posicoes: List[int]) -> Callable[[List[Any]], tuple]:
+    """itemgetter que sempre retorna tupla (inclusive para 0 ou 1 posição)"""
+    if not posicoes:
+        return lambda valores: ()
+    if len(posicoes) == 1:
+        posicao = posicoes[0]
+        return lambda valores: (valores[posicao],)
+    return itemgetter(*posicoes)
+
+
+class PlanoProjecao:
+    """Plano de projeção pré-compilado a partir do mapeamento
+
+    Cada coluna de origem (index + transformação) é lida uma única vez por linha e
+    compartilhada entre as tabelas; constantes e funções são resolvidas uma vez por arquivo.
+    """
+
+    def __init__(self, tabelas: List[str], indices: List[int], transformacoes: List[tuple],
+                 colunas_fixas: List[Dict], layouts: List[List[int]], resolver: Callable[[Dict], Any]):
+        self.tabelas = tabelas
+        self.indices = indices
+        self.transformacoes = transformacoes
+        self.colunas_fixas = colunas_fixas
+        self.layouts = layouts
+        self.resolver = resolver
+
+    def preparar_fixos(self) -> List[Any]:
+        """Resolve as colunas que não dependem da linha (uma vez por arquivo)"""
+        fixos = []
+        for coluna in self.colunas_fixas:
+            try:
+                fixos.append(self.resolver(coluna))
+            except Exception as e:
+                log.error(f"Erro na coluna {coluna['nome']}: {str(e)}")
+                fixos.append(None)
+        return fixos
+
+    def preparar(self, fixos: Optional[List[Any]] = None) -> Callable[[List[str], int], List[tuple]]:
+        """Resolve constantes/funções e retorna o projetor de linhas (uma tupla por tabela)"""
+        if fixos is None:
+            fixos = self.preparar_fixos()
+
+        indices = self.indices
+        transformacoes = self.transformacoes
+        seletores = [_seletor(layout) for layout in self.layouts]
+        ler = _seletor(indices)
+        tamanho_minimo = max(indices) + 1 if indices else 0
+
+        def projetar(linha: List[str], num_linha: int) -> List[tuple]:
+            if len(linha) >= tamanho_minimo:
+                valores = list(ler(linha))
+            else:
+                tamanho = len(linha)
+                valores = [linha[i] if i < tamanho else None for i in indices]
+
+            for slot, transformacao, nome in transformacoes:
+                valor = valores[slot]
+                if valor is not None:
+                    try:
+                        valores[slot] = transformacao(valor)
+                    except Exception as e:
+                        log.error(f"Erro na coluna {nome}, linha {num_linha}: {str(e)}")
+                        valores[slot] = None
+
+            valores += fixos
+            return [seletor(valores) for seletor in seletores]
+
+        return projetar
+
+
+def compilar_mapeamento(mapeamento: List[Dict], obter_transformacao: Callable[[str], Optional[Callable]],
+                        resolver: Callable[[Dict], Any]) -> PlanoProjecao:
+    """Compila o mapeamento em um plano de projeção por tabela
+
+    Args:
+        mapeamento: Lista de tabelas no formato de carregar_mapeamento()
+        obter_transformacao: Retorna a função de uma transformação ('data', 'caracteres', ...)
+        resolver: Resolve colunas que não dependem da linha (constantes e funções)
+    """
+    slots: Dict[tuple, int] = {}
+    indices: List[int] = []
+    transformacoes: List[tuple] = []
+    colunas_fixas: List[Dict] = []
+    layouts_colunas: List[List[tuple]] = []
+
+    for tabela in mapeamento:
+        layout = []
+        for coluna in tabela['colunas']:
+            origem = coluna['origem']
+            if origem.get('tipo') != 'coluna':
+                colunas_fixas.append(coluna)
+                layout.append(('fixo', len(colunas_fixas) - 1))
+                continue
+
+            transformacao = obter_transformacao(origem['transformacao']) if 'transformacao' in origem else None
+            chave = (origem['index'], transformacao)
+            if chave not in slots:
+                slots[chave] = len(indices)
+                indices.append(origem['index'])
+                if transformacao is not None:
+                    transformacoes.append((slots[chave], transformacao, coluna['nome']))
+            layout.append(('slot', slots[chave]))
+        layouts_colunas.append(layout)
+
+    # Valores fixos ficam após os slots lidos da linha
+    layouts = [
+        [posicao if tipo == 'slot' else len(indices) + posicao for tipo, posicao in layout]
+        for layout in layouts_colunas
+    ]
+
+    return PlanoProjecao(
+        tabelas=[tabela['tabela'] for tabela in mapeamento],
+        indices=indices,
+        transformacoes=transformacoes,
+        colunas_fixas=colunas_fixas,
+        layouts=layouts,
+        resolver=resolver
+    )
+
+
+def dependencias_tabelas(mapeamento: List[Dict]) -> Dict[str, List[str]]:
+    """Tabelas mapeadas referenciadas (FK) por cada tabela, conforme 'depende_de'"""
+    nomes = [tabela['tabela'] for tabela in mapeamento]
+    return {
+        tabela['tabela']: [dep for dep in tabela.get('depende_de', []) if dep in nomes]
+        for tabela in mapeamento
+    }
+
+
+def ordem_carga(mapeamento: List[Dict]) -> List[str]:
+    """Ordena as tabelas para que as referenciadas em 'depende_de' (FK) sejam gravadas antes"""
+    nomes = [tabela['tabela'] for tabela in mapeamento]
+    dependencias = dependencias_tabelas(mapeamento)
+    ordem: List[str] = []
+    visitando = set()
+
+    def visitar(nome: str):
+        if nome in ordem:
+            return
+        if nome in visitando:
+            raise ValueError(f"Dependência circular entre tabelas envolvendo {nome}")
+        visitando.add(nome)
+        for dependencia in dependencias[nome]:
+            visitar(dependencia)
+        visitando.discard(nome)
+        ordem.append(nome)
+
+    for nome in nomes:
+        visitar(nome)
+    return ordem
@@ -0,0 +1,44 @@
+import zlib
+from operator import itemgetter
+from typing import List
+
+
+def particionar_por_faixa(registros: List[tuple], posicoes: List[int], particoes: int) -> List[List[tuple]]:
+    """Divide os registros em faixas contíguas da chave primária, ordenadas pela chave
+
+    Registros com a mesma chave ficam sempre na mesma faixa (na ordem original, para que
+    a última ocorrência continue prevalecendo) e faixas diferentes não compartilham gaps
+    do índice, exceto nas fronteiras.
+    """
+    chave = itemgetter(*posicoes)
+    ordenados = sorted(registros, key=chave)
+    tamanho = -(-len(ordenados) // particoes)
+    resultado = []
+    inicio = 0
+    while inicio < len(ordenados):
+        fim = min(inicio + tamanho, len(ordenados))
+        while fim < len(ordenados) and chave(ordenados[fim]) == chave(ordenados[fim - 1]):
+            fim += 1
+        resultado.append(ordenados[inicio:fim])
+        inicio = fim
+    return resultado
+
+
+def particionar_por_hash(registros: List[tuple], posicoes: List[int], particoes: int) -> List[List[tuple]]:
+    """Distribui os registros pelo hash (crc32) da chave primária, mantendo a ordem original"""
+    chave = itemgetter(*posicoes)
+    resultado = [[] for _ in range(particoes)]
+    for registro in registros:
+        resultado[zlib.crc32(repr(chave(registro)).encode()) % particoes].append(registro)
+    return [particao for particao in resultado if particao]
+
+
+def particionar(registros: List[tuple], posicoes: List[int], particoes: int, modo: str = 'range') -> List[List[tuple]]:
+    """Particiona os registros em até `particoes` grupos disjuntos pela chave primária (range | hash)"""
+    if modo == 'range':
+        try:
+            return particionar_por_faixa(registros, posicoes, particoes)
+        except TypeError:
+            # Chave com None ou tipos mistos não ordena; o hash continua disjunto
+            pass
+    return particionar_por_hash(registros, posicoes, particoes)
@@ -0,0 +1,199 @@
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Tuple
+
+# Marca o fim dos itens de uma fila
+_FIM = object()
+# Intervalo para as etapas bloqueadas conferirem se o pipeline foi interrompido
+_ESPERA = 0.1
+
+
+class PipelineInterrompido(Exception):
+    """Outra etapa falhou; a etapa atual para sem concluir o trabalho"""
+    pass
+
+
+class EstatisticasEtapa:
+    def __init__(self, nome: str):
+        self.nome = nome
+        self.itens = 0
+        self.segundos = 0.0
+        self.espera_entrada = 0.0
+        self.espera_saida = 0.0
+
+    def ocupado(self) -> float:
+        return max(0.0, self.segundos - self.espera_entrada - self.espera_saida)
+
+    def resumo(self) -> Dict[str, Any]:
+        return {
+            'itens': self.itens,
+            'segundos': round(self.segundos, 3),
+            'ocupado': round(self.ocupado(), 3),
+            'espera_entrada': round(self.espera_entrada, 3),
+            'espera_saida': round(self.espera_saida, 3)
+        }
+
+
+class FilaLimitada:
+    """Fila com capacidade fixa entre duas etapas; put bloqueia quando cheia (contrapressão)"""
+
+    def __init__(self, capacidade: int, interrompido: threading.Event):
+        self.capacidade = capacidade
+        self.fila = queue.Queue(capacidade)
+        self.interrompido = interrompido
+        self.maxima = 0
+        self.soma = 0
+        self.amostras = 0
+        self.bloqueios = 0
+
+    def colocar(self, item, etapa: EstatisticasEtapa):
+        profundidade = self.fila.qsize()
+        self.maxima = max(self.maxima, profundidade)
+        self.soma += profundidade
+        self.amostras += 1
+        if profundidade >= self.capacidade:
+            self.bloqueios += 1
+        inicio = time.perf_counter()
+        try:
+            while True:
+                if self.interrompido.is_set():
+                    raise PipelineInterrompido()
+                try:
+                    self.fila.put(item, timeout=_ESPERA)
+                    return
+                except queue.Full:
+                    pass
+        finally:
+            etapa.espera_saida += time.perf_counter() - inicio
+
+    def encerrar(self):
+        while not self.interrompido.is_set():
+            try:
+                self.fila.put(_FIM, timeout=_ESPERA)
+                return
+            except queue.Full:
+                pass
+
+    def consumir(self, etapa: EstatisticasEtapa) -> Iterator[Any]:
+        while True:
+            inicio = time.perf_counter()
+            try:
+                while True:
+                    if self.interrompido.is_set():
+                        raise PipelineInterrompido()
+                    try:
+                        item = self.fila.get(timeout=_ESPERA)
+                        break
+                    except queue.Empty:
+                        pass
+            finally:
+                etapa.espera_entrada += time.perf_counter() - inicio
+            if item is _FIM:
+                return
+            yield item
+
+    def resumo(self) -> Dict[str, Any]:
+        return {
+            'capacidade': self.capacidade,
+            'maxima': self.maxima,
+            'media': round(self.soma / self.amostras, 2) if self.amostras else 0,
+            'cheia': self.bloqueios
+        }
+
+
+class PipelineEtapas:
+    """Download, processamento e gravação rodando ao mesmo tempo, ligados por filas limitadas
+
+    Cada etapa tem sua thread (a gravação usa a thread do chamador). Com as filas cheias a
+    etapa anterior fica bloqueada, então um banco lento segura o download e a memória em
+    uso fica limitada a tamanho_fila blocos e tamanho_fila lotes. A duração total tende à
+    da etapa mais lenta em vez da soma das três.
+    """
+
+    def __init__(self, tamanho_fila: int = 4):
+        self.tamanho_fila = max(1, tamanho_fila)
+
+    def executar(self, blocos: Iterable[bytes], processar: Callable[[Iterable[bytes]], Iterable[Any]],
+                 gravar: Callable[[Iterable[Any]], Any]) -> Tuple[Any, Dict[str, Any]]:
+        """Retorna o resultado de gravar e as estatísticas por etapa e fila
+
+        Args:
+            blocos: Iterador de blocos do arquivo (a leitura acontece na etapa de download)
+            processar: Recebe os blocos e gera os lotes (tabela, registros)
+            gravar: Recebe os lotes e os persiste
+        """
+        interrompido = threading.Event()
+        fila_blocos = FilaLimitada(self.tamanho_fila, interrompido)
+        fila_lotes = FilaLimitada(self.tamanho_fila, interrompido)
+        download = EstatisticasEtapa('download')
+        processamento = EstatisticasEtapa('processamento')
+        gravacao = EstatisticasEtapa('gravacao')
+        erros: List[Exception] = []
+
+        def falhar(erro: Exception):
+            if not isinstance(erro, PipelineInterrompido):
+                erros.append(erro)
+            interrompido.set()
+
+        def baixar():
+            inicio = time.perf_counter()
+            try:
+                for bloco in blocos:
+                    download.itens += 1
+                    fila_blocos.colocar(bloco, download)
+                fila_blocos.encerrar()
+            except Exception as e:
+                falhar(e)
+            finally:
+                # Fecha o corpo da resposta do S3 também quando a leitura é interrompida
+                fechar = getattr(blocos, 'close', None)
+                if fechar is not None:
+                    fechar()
+                download.segundos = time.perf_counter() - inicio
+
+        def processar_blocos():
+            inicio = time.perf_counter()
+            try:
+                for lote in processar(fila_blocos.consumir(processamento)):
+                    processamento.itens += 1
+                    fila_lotes.colocar(lote, processamento)
+                fila_lotes.encerrar()
+            except Exception as e:
+                falhar(e)
+            finally:
+                processamento.segundos = time.perf_counter() - inicio
+
+        def contar(lotes: Iterator[Any]) -> Iterator[Any]:
+            for lote in lotes:
+                gravacao.itens += 1
+                yield lote
+
+        threads = [
+            threading.Thread(target=baixar, name='pipeline-download', daemon=True),
+            threading.Thread(target=processar_blocos, name='pipeline-processamento', daemon=True)
+        ]
+        inicio = time.perf_counter()
+        for thread in threads:
+            thread.start()
+
+        resultado = None
+        try:
+            resultado = gravar(contar(fila_lotes.consumir(gravacao)))
+        except Exception as e:
+            falhar(e)
+        finally:
+            gravacao.segundos = time.perf_counter() - inicio
+            for thread in threads:
+                thread.join()
+
+        if erros:
+            raise erros[0]
+
+        etapas = {etapa.nome: etapa.resumo() for etapa in (download, processamento, gravacao)}
+        return resultado, {
+            'segundos': round(time.perf_counter() - inicio, 3),
+            'gargalo': max((download, processamento, gravacao), key=EstatisticasEtapa.ocupado).nome,
+            'etapas': etapas,
+            'filas': {'blocos': fila_blocos.resumo(), 'lotes': fila_lotes.resumo()}
+        }
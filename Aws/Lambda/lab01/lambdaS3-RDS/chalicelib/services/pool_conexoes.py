@@ -0,0 +1,112 @@
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Tuple
+from chalicelib.core.logger import log
+
+# Erros do cliente MySQL que indicam conexão perdida (servidor reiniciado, wait_timeout, rede)
+CODIGOS_CONEXAO_PERDIDA = {2006, 2013, 2014, 2045, 2055}
+
+
+def conexao_perdida(erro: Exception) -> bool:
+    """Indica se o erro veio de uma conexão que não pode mais ser usada"""
+    err = sys.modules.get('pymysql.err')
+    if err is None:
+        return False
+    if isinstance(erro, err.InterfaceError):
+        return True
+    return (
+        isinstance(erro, err.OperationalError)
+        and bool(erro.args)
+        and erro.args[0] in CODIGOS_CONEXAO_PERDIDA
+    )
+
+
+class PoolConexoes:
+    """Pool de conexões no escopo do módulo, reaproveitado entre invocações quentes da Lambda
+
+    Conexões ociosas há mais de ociosidade_maxima segundos são fechadas; as ociosas há
+    mais de intervalo_ping segundos passam por ping() antes de voltar ao uso.
+    """
+
+    def __init__(self, conectar: Callable[[], Any], tamanho: int = 2, ociosidade_maxima: float = 300.0,
+                 intervalo_ping: float = 5.0, relogio: Callable[[], float] = time.monotonic):
+        self.conectar = conectar
+        self.tamanho = tamanho
+        self.ociosidade_maxima = ociosidade_maxima
+        self.intervalo_ping = intervalo_ping
+        self.relogio = relogio
+        self._ociosas: List[Tuple[Any, float]] = []
+        self._trava = threading.Lock()
+
+    def obter(self) -> Any:
+        """Retorna uma conexão ociosa ainda válida ou abre uma nova"""
+        while True:
+            with self._trava:
+                if not self._ociosas:
+                    break
+                conexao, ultimo_uso = self._ociosas.pop()
+
+            ociosa = self.relogio() - ultimo_uso
+            if ociosa > self.ociosidade_maxima:
+                log.info(f"Conexão ociosa há {ociosa:.0f}s descartada")
+                self._fechar(conexao)
+                continue
+            if ociosa > self.intervalo_ping:
+                try:
+                    conexao.ping(reconnect=False)
+                except Exception as e:
+                    log.warning(f"Conexão inválida no ping, descartando: {str(e)}")
+                    self._fechar(conexao)
+                    continue
+            return conexao
+
+        return self.conectar()
+
+    def devolver(self, conexao: Any):
+        """Devolve a conexão ao pool (ou fecha, se o pool já estiver cheio)"""
+        with self._trava:
+            if len(self._ociosas) < self.tamanho:
+                self._ociosas.append((conexao, self.relogio()))
+                return
+        self._fechar(conexao)
+
+    def descartar(self, conexao: Any):
+        """Fecha uma conexão que não deve voltar ao pool"""
+        self._fechar(conexao)
+
+    def limpar(self):
+        """Fecha todas as conexões ociosas"""
+        with self._trava:
+            ociosas, self._ociosas = self._ociosas, []
+        for conexao, _ in ociosas:
+            self._fechar(conexao)
+
+    @staticmethod
+    def _fechar(conexao: Any):
+        try:
+            conexao.close()
+        except Exception:
+            pass
+
+
+_POOLS: Dict[tuple, PoolConexoes] = {}
+_TRAVA_POOLS = threading.Lock()
+
+
+def obter_pool(chave: tuple, conectar: Callable[[], Any], **opcoes) -> PoolConexoes:
+    """Retorna o pool do destino informado, criando-o na primeira chamada do container"""
+    with _TRAVA_POOLS:
+        pool = _POOLS.get(chave)
+        if pool is None:
+            pool = _POOLS[chave] = PoolConexoes(conectar, **opcoes)
+        return pool
+
+
+def reiniciar_pools():
+    """Fecha e descarta todos os pools (testes e troca de credenciais)"""
+    with _TRAVA_POOLS:
+        pools = list(_POOLS.values())
+        _POOLS.clear()
+    for pool in pools:
+        pool.limpar()
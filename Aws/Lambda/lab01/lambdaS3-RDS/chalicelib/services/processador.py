@@ -1,46 +1,125 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple, Union
 from chalicelib.core.logger import log
+from chalicelib.services.esquema import ValidadorRegistros
+from chalicelib.services.mapeamento import compilar_mapeamento, ordem_carga
 from chalicelib.services.transformar import TransformadorDados
+from chalicelib.services import colunar
 
 
+# Versões vetorizadas (Arrow) das transformações, usadas pelo caminho colunar
+VETORIZADAS = {
+    TransformadorDados.obter_transformacao('data'): colunar.coluna_data,
+    TransformadorDados.obter_transformacao('caracteres'): colunar.coluna_caracteres
+}
+
 
 class ProcessadorArquivo:
-    def __init__(self, mapeamento: List[Dict], delimitador: str = ';'):
+    def __init__(self, mapeamento: List[Dict], delimitador: str = ';', colunar: bool = False):
         """
         Args:
             mapeamento: Lista de dicionários com configuração das tabelas/colunas
             delimitador: Delimitador do arquivo (padrão: ;)
+            colunar: Usa o caminho colunar (pyarrow) quando disponível
         """
         self.mapeamento = mapeamento
         self.delimitador = delimitador
+        self.colunar = colunar
         self.transformador = TransformadorDados()
+        self.plano = compilar_mapeamento(
+            mapeamento,
+            self.transformador.obter_transformacao,
+            resolver=lambda coluna: self._obter_valor_coluna([], 0, coluna)
+        )
+        self.ordem_carga = ordem_carga(mapeamento)
     
-    def processar(self, conteudo: str) -> Dict[str, List[tuple]]:
-        """Processa conteúdo do arquivo e retorna dados estruturados"""
+    def processar(self, conteudo: Union[str, Iterable[str]]) -> Dict[str, List[tuple]]:
+        """Processa conteúdo do arquivo (texto ou iterador de linhas) e retorna dados estruturados"""
+        dados = {tabela['tabela']: [] for tabela in self.mapeamento}
+        for tabela, lote in self.iterar_lotes(conteudo):
+            dados[tabela].extend(lote)
+        return dados
+    
+    def iterar_lotes(self, conteudo: Union[str, Iterable[str]], tamanho_lote: int = 10000,
+                     validador: Optional[ValidadorRegistros] = None) -> Iterator[Tuple[str, List[tuple]]]:
+        """Gera (tabela, lote) assim que tamanho_lote linhas estiverem prontas
+
+        Os lotes de cada bloco saem na ordem de carga (tabelas referenciadas primeiro),
+        de modo que as linhas-pai já estejam gravadas quando o lote dependente chegar.
+        Com validador, os valores saem nos tipos do banco e linhas inválidas são rejeitadas.
+        """
         import csv
         from io import StringIO
         
-        leitor = csv.reader(StringIO(conteudo), delimiter=self.delimitador)
-        dados = {tabela['tabela']: [] for tabela in self.mapeamento}
+        linhas = StringIO(conteudo) if isinstance(conteudo, str) else conteudo
+        if self.colunar:
+            if colunar.arrow_disponivel():
+                yield from self._iterar_lotes_colunar(linhas, tamanho_lote, validador)
+                return
+            log.warning("pyarrow não instalado - usando processamento linha a linha")
+        
+        leitor = csv.reader(linhas, delimiter=self.delimitador)
+        tabelas = self.plano.tabelas
+        ordem = [tabelas.index(nome) for nome in self.ordem_carga]
+        projetar = self.plano.preparar()
+        
+        buffers = [[] for _ in tabelas]
+        saidas = [buffer.append for buffer in buffers]
+        pendentes = 0
         
         for num_linha, linha in enumerate(leitor, 1):
             if not linha:
                 log.warning(f"Linha {num_linha} vazia - ignorando")
                 continue
             
-            for tabela in self.mapeamento:
-                valores = []
-                for coluna in tabela['colunas']:
-                    try:
-                        valor = self._obter_valor_coluna(linha, num_linha, coluna)
-                        valores.append(valor)
-                    except Exception as e:
-                        log.error(f"Erro na coluna {coluna['nome']}, linha {num_linha}: {str(e)}")
-                        valores.append(None)
-                
-                dados[tabela['tabela']].append(tuple(valores))
+            for adicionar, valores in zip(saidas, projetar(linha, num_linha)):
+                adicionar(valores)
+            pendentes += 1
+            
+            if pendentes >= tamanho_lote:
+                if validador is not None:
+                    buffers = validador.converter(buffers)
+                for i in ordem:
+                    yield tabelas[i], buffers[i]
+                buffers = [[] for _ in tabelas]
+                saidas = [buffer.append for buffer in buffers]
+                pendentes = 0
         
-        return dados
+        if pendentes:
+            if validador is not None:
+                buffers = validador.converter(buffers)
+            for i in ordem:
+                yield tabelas[i], buffers[i]
+    
+    def _iterar_lotes_colunar(self, linhas: Iterable[str], tamanho_lote: int,
+                              validador: Optional[ValidadorRegistros] = None) -> Iterator[Tuple[str, List[tuple]]]:
+        """Caminho colunar: cada bloco de tamanho_lote linhas é projetado via Arrow"""
+        import csv
+        from io import StringIO
+        
+        tabelas = self.plano.tabelas
+        ordem = [tabelas.index(nome) for nome in self.ordem_carga]
+        fixos = self.plano.preparar_fixos()
+        projetar = self.plano.preparar(fixos)
+        projetor = colunar.ProjetorColunar(self.plano, VETORIZADAS, self.delimitador)
+        primeira_linha = 1
+        
+        for texto in colunar.iterar_blocos_registro(linhas, tamanho_lote):
+            lotes = projetor.projetar(texto, fixos)
+            if lotes is None:
+                lotes = [[] for _ in tabelas]
+                leitor = csv.reader(StringIO(texto), delimiter=self.delimitador)
+                for num_linha, linha in enumerate(leitor, primeira_linha):
+                    if not linha:
+                        log.warning(f"Linha {num_linha} vazia - ignorando")
+                        continue
+                    for lote, valores in zip(lotes, projetar(linha, num_linha)):
+                        lote.append(valores)
+            primeira_linha += texto.count('\n')
+            if validador is not None:
+                lotes = validador.converter(lotes)
+            
+            for i in ordem:
+                yield tabelas[i], lotes[i]
     
     def _obter_valor_coluna(self, linha: List[str], num_linha: int, coluna: Dict[str, Any]) -> Any:
         """Obtém valor processado para uma coluna específica"""
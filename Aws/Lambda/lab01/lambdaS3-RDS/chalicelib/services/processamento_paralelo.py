@@ -0,0 +1,194 @@
+import mmap
+import os
+import pickle
+import shutil
+import tempfile
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
+from chalicelib.core.exceptions import ErroProcessamento
+from chalicelib.core.logger import log
+
+# Abaixo disso por processo, o custo de criar os processos supera o ganho
+FATIA_MINIMA = 1024 * 1024
+
+# Espaço em /tmp reservado para os lotes em pickle, por byte do arquivo (medido ~1,3x no
+# mapeamento de exemplo; a folga cobre mapeamentos que repetem colunas em várias tabelas)
+BYTES_PICKLE_POR_BYTE = 2
+
+
+def dividir_fatias(mm, tamanho: int, partes: int) -> List[Tuple[int, int]]:
+    """Divide [0, tamanho) em até `partes` fatias que começam e terminam em fim de linha"""
+    limites = [0]
+    for i in range(1, partes):
+        quebra = mm.find(b'\n', max(limites[-1], tamanho * i // partes))
+        if quebra == -1:
+            break
+        if quebra + 1 < tamanho:
+            limites.append(quebra + 1)
+    limites.append(tamanho)
+    return [(inicio, fim) for inicio, fim in zip(limites, limites[1:]) if fim > inicio]
+
+
+def iterar_linhas_mmap(mm, inicio: int, fim: int) -> Iterator[str]:
+    """Linhas de mm[inicio:fim] lidas direto do mapeamento, sem copiar a fatia"""
+    mm.seek(inicio)
+    while mm.tell() < fim:
+        yield mm.readline().decode('utf-8')
+
+
+def _processar_fatia(processador, caminho: str, inicio: int, fim: int, tamanho_lote: int, validador, saida: str, conexao):
+    """Processo filho: grava os lotes da fatia em `saida` (pickle) e avisa o pai pelo pipe"""
+    try:
+        with open(caminho, 'rb') as origem, mmap.mmap(origem.fileno(), 0, access=mmap.ACCESS_READ) as mm, \
+                open(saida, 'wb') as destino:
+            for lote in processador.iterar_lotes(iterar_linhas_mmap(mm, inicio, fim), tamanho_lote, validador):
+                pickle.dump(lote, destino, protocol=pickle.HIGHEST_PROTOCOL)
+        conexao.send(('ok', validador.resumo() if validador is not None else None))
+    except BaseException as e:
+        conexao.send(('erro', f"{type(e).__name__}: {str(e)}"))
+    finally:
+        conexao.close()
+
+
+def _ler_lotes(caminho: str) -> Iterator[Tuple[str, List[tuple]]]:
+    with open(caminho, 'rb') as origem:
+        while True:
+            try:
+                yield pickle.load(origem)
+            except EOFError:
+                return
+
+
+class ProcessamentoParalelo:
+    """Grava o arquivo em /tmp, mapeia com mmap e divide o parsing entre processos
+
+    O arquivo é cortado em fatias terminadas em '\\n' e cada processo (fork, herdando o
+    ProcessadorArquivo já compilado) lê a sua direto do mmap. Os lotes de cada fatia vão
+    para um arquivo próprio em /tmp e são devolvidos na ordem do arquivo assim que a
+    fatia termina, sem esperar as seguintes. Usa Process + Pipe porque o Lambda não tem
+    /dev/shm (Pool e Queue do multiprocessing não funcionam lá).
+
+    Arquivos com aspas podem ter quebra de linha dentro de um campo; nesse caso, para
+    arquivos pequenos e quando não há espaço livre no diretório para os lotes em pickle
+    (o /tmp do Lambda tem 512 MB por padrão e já guarda o próprio arquivo), o parsing é
+    feito em um único processo sobre o mesmo mmap.
+    """
+
+    def __init__(self, processador, processos: int, diretorio: Optional[str] = None):
+        self.processador = processador
+        self.processos = processos
+        self.diretorio = diretorio
+
+    def gravar_temporario(self, blocos: Iterable[bytes]) -> str:
+        """Grava os blocos em um arquivo temporário e retorna o caminho"""
+        with tempfile.NamedTemporaryFile('wb', suffix='.csv', dir=self.diretorio, delete=False) as saida:
+            try:
+                for bloco in blocos:
+                    saida.write(bloco)
+            except BaseException:
+                saida.close()
+                os.unlink(saida.name)
+                raise
+        return saida.name
+
+    def iterar_lotes(self, blocos: Iterable[bytes], tamanho_lote: int = 10000,
+                     validador=None) -> Iterator[Tuple[str, List[tuple]]]:
+        """Gera (tabela, lote) na mesma ordem de ProcessadorArquivo.iterar_lotes
+
+        O arquivo é gravado e os processos são criados já nesta chamada, e não no primeiro
+        next(): o fork acontece antes de quem consome os lotes iniciar suas threads.
+        """
+        lotes = self._iterar_lotes(blocos, tamanho_lote, validador)
+        next(lotes)
+        return lotes
+
+    def _iterar_lotes(self, blocos: Iterable[bytes], tamanho_lote: int,
+                      validador) -> Iterator[Optional[Tuple[str, List[tuple]]]]:
+        """Primeiro item None (arquivo gravado e processos criados), depois os lotes"""
+        caminho = self.gravar_temporario(blocos)
+        trabalhadores: List[Tuple[Any, Any, str]] = []
+        try:
+            tamanho = os.path.getsize(caminho)
+            if tamanho:
+                with open(caminho, 'rb') as origem, mmap.mmap(origem.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    partes = min(self.processos, tamanho // FATIA_MINIMA)
+                    if partes > 1 and mm.find(b'"') != -1:
+                        log.info("Arquivo com aspas - parsing em um único processo")
+                        partes = 1
+                    if partes > 1 and not self._cabe_no_diretorio(tamanho):
+                        partes = 1
+                    fatias = dividir_fatias(mm, tamanho, partes) if partes > 1 else [(0, tamanho)]
+                if len(fatias) > 1:
+                    self._iniciar_processos(trabalhadores, caminho, fatias, tamanho_lote, validador)
+            yield None
+            if not tamanho:
+                return
+            if not trabalhadores:
+                with open(caminho, 'rb') as origem, mmap.mmap(origem.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    yield from self.processador.iterar_lotes(iterar_linhas_mmap(mm, 0, tamanho), tamanho_lote, validador)
+                return
+            yield from self._coletar(trabalhadores, validador)
+        finally:
+            self._encerrar_processos(trabalhadores)
+            os.unlink(caminho)
+
+    def _cabe_no_diretorio(self, tamanho: int) -> bool:
+        """Indica se o diretório comporta os lotes em pickle de um arquivo de `tamanho` bytes"""
+        livre = shutil.disk_usage(self.diretorio or tempfile.gettempdir()).free
+        necessario = tamanho * BYTES_PICKLE_POR_BYTE
+        if livre < necessario:
+            log.warning(f"{livre / 1024 / 1024:.0f} MB livres para {necessario / 1024 / 1024:.0f} MB de lotes "
+                        f"- parsing em um único processo")
+            return False
+        return True
+
+    def _iniciar_processos(self, trabalhadores: List[Tuple[Any, Any, str]], caminho: str,
+                           fatias: List[Tuple[int, int]], tamanho_lote: int, validador):
+        """Cria um processo por fatia, acrescentando (processo, pipe, arquivo de lotes) a `trabalhadores`"""
+        import multiprocessing
+
+        # fork (e não forkserver/spawn) para o filho herdar o ProcessadorArquivo compilado sem
+        # pickle. É seguro porque só é chamado depois que o arquivo inteiro foi gravado
+        # (as threads dos GETs por faixa já terminaram) e antes de quem consome os lotes
+        # criar threads (DB_PARALLEL_TABLES, partições). Threads ociosas de invocações
+        # anteriores (pool de partições) esperam na própria fila sem segurar locks usados no
+        # filho, que só usa o processador, o validador, o mmap, o pipe e o logging (cujos
+        # locks o Python reinicia após o fork). Conexões MySQL e clientes boto3 não são usados.
+        contexto = multiprocessing.get_context('fork')
+        for i, (inicio, fim) in enumerate(fatias):
+            saida = f"{caminho}.{i}.pickle"
+            receptor, emissor = contexto.Pipe(duplex=False)
+            processo = contexto.Process(
+                target=_processar_fatia,
+                args=(self.processador, caminho, inicio, fim, tamanho_lote, validador, saida, emissor),
+                daemon=True
+            )
+            processo.start()
+            emissor.close()
+            trabalhadores.append((processo, receptor, saida))
+        log.info(f"Parsing em {len(trabalhadores)} processos")
+
+    @staticmethod
+    def _coletar(trabalhadores: List[Tuple[Any, Any, str]], validador) -> Iterator[Tuple[str, List[tuple]]]:
+        """Devolve os lotes de cada fatia, na ordem do arquivo, assim que a fatia termina"""
+        for processo, receptor, saida in trabalhadores:
+            try:
+                situacao, detalhe = receptor.recv()
+            except EOFError:
+                situacao, detalhe = 'erro', f"processo terminou com código {processo.exitcode}"
+            processo.join()
+            if situacao != 'ok':
+                raise ErroProcessamento(f"Falha no parsing paralelo: {detalhe}")
+            if validador is not None and detalhe is not None:
+                validador.incorporar(detalhe)
+            yield from _ler_lotes(saida)
+            os.unlink(saida)
+
+    @staticmethod
+    def _encerrar_processos(trabalhadores: List[Tuple[Any, Any, str]]):
+        for processo, receptor, saida in trabalhadores:
+            if processo.is_alive():
+                processo.terminate()
+            processo.join()
+            receptor.close()
+            if os.path.exists(saida):
+                os.unlink(saida)
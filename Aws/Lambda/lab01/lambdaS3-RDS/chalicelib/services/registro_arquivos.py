@@ -0,0 +1,142 @@
+import hashlib
+import threading
+import time
+from typing import Callable, Dict, Tuple
+from chalicelib.core.logger import log
+
+# Resultados de adquirir()
+ADQUIRIDO = 'adquirido'
+CONCLUIDO = 'concluido'
+OCUPADO = 'ocupado'
+
+
+def _hash_arquivo(bucket: str, arquivo: str, etag: str) -> bytes:
+    return hashlib.blake2b(f"{bucket}\x1f{arquivo}\x1f{etag}".encode(), digest_size=16).digest()
+
+
+class RegistroArquivos:
+    """Registro de arquivos processados por bucket/chave/ETag, em uma tabela no MySQL
+
+    Antes de processar, a invocação toma um lease curto sobre o arquivo; entregas
+    duplicadas de um arquivo já concluído custam uma consulta, e uma entrega concorrente
+    encontra o lease ativo e desiste. Um lease expirado (invocação que morreu no meio)
+    pode ser tomado por outra. Os tempos usam o relógio do servidor.
+    """
+
+    def __init__(self, db, tabela: str = 'etl_file_ledger', duracao_lease: int = 900):
+        self.db = db
+        self.tabela = tabela
+        self.duracao_lease = duracao_lease
+        self._criada = False
+
+    def _executar(self, query: str, args: tuple = None, consultar: bool = False):
+        conexao = self.db.conectar()
+        erro = None
+        try:
+            with conexao.cursor() as cursor:
+                if not self._criada:
+                    cursor.execute(
+                        f"CREATE TABLE IF NOT EXISTS {self.tabela} ("
+                        "file_hash BINARY(16) NOT NULL, "
+                        "bucket VARCHAR(255) NOT NULL, "
+                        "object_key VARCHAR(1024) NOT NULL, "
+                        "etag VARCHAR(128) NOT NULL, "
+                        "status VARCHAR(16) NOT NULL, "
+                        "owner VARCHAR(64) NOT NULL, "
+                        "lease_until BIGINT NOT NULL, "
+                        "updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP, "
+                        "PRIMARY KEY (file_hash)"
+                        ") ENGINE=InnoDB"
+                    )
+                    self._criada = True
+                cursor.execute(query, args)
+                linha = cursor.fetchone() if consultar else None
+            conexao.commit()
+            return linha
+        except Exception as e:
+            erro = e
+            raise
+        finally:
+            self.db._finalizar(conexao, erro)
+
+    def _estado(self, hash_arquivo: bytes):
+        linha = self._executar(
+            f"SELECT status, owner FROM {self.tabela} WHERE file_hash = %s", (hash_arquivo,), consultar=True
+        )
+        return tuple(linha) if linha else (None, None)
+
+    def adquirir(self, bucket: str, arquivo: str, etag: str, dono: str) -> str:
+        """Toma o lease do arquivo: ADQUIRIDO, CONCLUIDO (já processado) ou OCUPADO (em outra invocação)"""
+        hash_arquivo = _hash_arquivo(bucket, arquivo, etag)
+        status, _ = self._estado(hash_arquivo)
+        if status == CONCLUIDO:
+            return CONCLUIDO
+
+        # owner é atualizado antes de lease_until: no ON DUPLICATE KEY UPDATE cada
+        # atribuição já enxerga as anteriores
+        self._executar(
+            f"INSERT INTO {self.tabela} (file_hash, bucket, object_key, etag, status, owner, lease_until) "
+            "VALUES (%s, %s, %s, %s, 'processando', %s, UNIX_TIMESTAMP() + %s) "
+            "ON DUPLICATE KEY UPDATE "
+            "owner = IF(status <> 'concluido' AND lease_until < UNIX_TIMESTAMP(), VALUES(owner), owner), "
+            "lease_until = IF(owner = VALUES(owner), VALUES(lease_until), lease_until)",
+            (hash_arquivo, bucket, arquivo[:1024], etag, dono, self.duracao_lease)
+        )
+        status, atual = self._estado(hash_arquivo)
+        if status == CONCLUIDO:
+            return CONCLUIDO
+        return ADQUIRIDO if atual == dono else OCUPADO
+
+    def concluir(self, bucket: str, arquivo: str, etag: str, dono: str):
+        """Marca o arquivo como concluído (entregas seguintes são ignoradas)"""
+        self._executar(
+            f"UPDATE {self.tabela} SET status = 'concluido', lease_until = 0 WHERE file_hash = %s AND owner = %s",
+            (_hash_arquivo(bucket, arquivo, etag), dono)
+        )
+
+    def liberar(self, bucket: str, arquivo: str, etag: str, dono: str):
+        """Libera o lease sem concluir, para que uma nova entrega possa reprocessar o arquivo"""
+        try:
+            self._executar(
+                f"UPDATE {self.tabela} SET lease_until = 0 "
+                "WHERE file_hash = %s AND owner = %s AND status <> 'concluido'",
+                (_hash_arquivo(bucket, arquivo, etag), dono)
+            )
+        except Exception as e:
+            # O lease expira sozinho; a falha não deve mascarar o erro original
+            log.warning(f"Falha ao liberar o lease de {bucket}/{arquivo}: {str(e)}")
+
+
+class RegistroMemoria:
+    """Mesma interface de RegistroArquivos, em memória do container (desenvolvimento e testes)"""
+
+    def __init__(self, duracao_lease: int = 900, relogio: Callable[[], float] = time.time):
+        self.duracao_lease = duracao_lease
+        self.relogio = relogio
+        self._entradas: Dict[bytes, Tuple[str, str, float]] = {}
+        self._trava = threading.Lock()
+
+    def adquirir(self, bucket: str, arquivo: str, etag: str, dono: str) -> str:
+        hash_arquivo = _hash_arquivo(bucket, arquivo, etag)
+        agora = self.relogio()
+        with self._trava:
+            status, atual, validade = self._entradas.get(hash_arquivo, (None, None, 0))
+            if status == CONCLUIDO:
+                return CONCLUIDO
+            if atual not in (None, dono) and validade >= agora:
+                return OCUPADO
+            self._entradas[hash_arquivo] = ('processando', dono, agora + self.duracao_lease)
+            return ADQUIRIDO
+
+    def concluir(self, bucket: str, arquivo: str, etag: str, dono: str):
+        hash_arquivo = _hash_arquivo(bucket, arquivo, etag)
+        with self._trava:
+            if self._entradas.get(hash_arquivo, (None, None, 0))[1] == dono:
+                self._entradas[hash_arquivo] = (CONCLUIDO, dono, 0)
+
+    def liberar(self, bucket: str, arquivo: str, etag: str, dono: str):
+        hash_arquivo = _hash_arquivo(bucket, arquivo, etag)
+        with self._trava:
+            status, atual, _ = self._entradas.get(hash_arquivo, (None, None, 0))
+            if atual == dono and status != CONCLUIDO:
+                self._entradas[hash_arquivo] = (status, dono, 0)
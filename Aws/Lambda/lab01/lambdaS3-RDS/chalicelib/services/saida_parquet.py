@@ -0,0 +1,200 @@
+import os
+import tempfile
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from chalicelib.core.logger import log
+from chalicelib.services.compressao import separar_extensao
+
+TIPO_CONTEUDO = 'application/vnd.apache.parquet'
+
+
+def parquet_disponivel() -> bool:
+    """Indica se o pyarrow (dependência opcional) está instalado"""
+    try:
+        import pyarrow.parquet  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def chave_particao(prefixo: str, tabela: str, data: str, chave_origem: str) -> str:
+    """prefixo/tabela/dt=AAAA-MM-DD/nome.parquet, com o nome do arquivo de origem
+
+    Reprocessar o mesmo arquivo no mesmo dia sobrescreve a saída anterior em vez de duplicá-la.
+    """
+    nome, _ = separar_extensao(chave_origem.rsplit('/', 1)[-1])
+    return f"{prefixo}{tabela}/dt={data}/{nome}.parquet"
+
+
+class _GravadorTabela:
+    """ParquetWriter de uma tabela sobre um arquivo temporário
+
+    Os registros são acumulados em colunas Arrow e gravados em row groups de exatamente
+    linhas_row_group linhas (o último pode ser menor), independente do tamanho dos lotes.
+    Os tipos vêm do primeiro lote; colunas só com None nele viram string.
+    """
+
+    def __init__(self, colunas: List[str], linhas_row_group: int, compressao: str, diretorio: Optional[str]):
+        self.colunas = colunas
+        self.linhas_row_group = max(1, linhas_row_group)
+        self.compressao = compressao
+        with tempfile.NamedTemporaryFile(suffix='.parquet', dir=diretorio, delete=False) as saida:
+            self.caminho = saida.name
+        self.esquema = None
+        self.gravador = None
+        self.pendentes = []
+        self.linhas_pendentes = 0
+        self.linhas = 0
+
+    def adicionar(self, registros: List[tuple]):
+        import pyarrow as pa
+
+        if not registros:
+            return
+        valores = list(zip(*registros))
+        if self.esquema is None:
+            arrays = []
+            for coluna in valores:
+                array = pa.array(coluna)
+                arrays.append(array.cast(pa.string()) if pa.types.is_null(array.type) else array)
+            self.esquema = pa.schema([pa.field(nome, array.type) for nome, array in zip(self.colunas, arrays)])
+        else:
+            arrays = [pa.array(coluna, type=campo.type) for coluna, campo in zip(valores, self.esquema)]
+
+        self.pendentes.append(pa.RecordBatch.from_arrays(arrays, schema=self.esquema))
+        self.linhas_pendentes += len(registros)
+        self.linhas += len(registros)
+        while self.linhas_pendentes >= self.linhas_row_group:
+            self._gravar(self.linhas_row_group)
+
+    def _gravar(self, tamanho: int):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if self.gravador is None:
+            self.gravador = pq.ParquetWriter(self.caminho, self.esquema, compression=self.compressao)
+        tabela = pa.Table.from_batches(self.pendentes, schema=self.esquema)
+        self.gravador.write_table(tabela.slice(0, tamanho), row_group_size=tamanho)
+        resto = tabela.slice(tamanho)
+        self.pendentes = resto.to_batches()
+        self.linhas_pendentes = resto.num_rows
+
+    def fechar(self):
+        if self.linhas_pendentes:
+            self._gravar(self.linhas_pendentes)
+        if self.gravador is not None:
+            self.gravador.close()
+            self.gravador = None
+
+    def descartar(self):
+        try:
+            if self.gravador is not None:
+                self.gravador.close()
+        finally:
+            self.gravador = None
+            if os.path.exists(self.caminho):
+                os.unlink(self.caminho)
+
+
+class SaidaParquet:
+    """Saída Parquet de um arquivo de origem: um arquivo por tabela, enviado só em concluir()
+
+    Falhas aqui nunca interrompem a carga no banco: a saída do arquivo é descartada,
+    o erro é registrado no log e devolvido no resultado.
+    """
+
+    def __init__(self, exportador: 'ExportadorParquet', bucket: str, chave: str):
+        self.exportador = exportador
+        self.bucket = exportador.bucket or bucket
+        self.chave = chave
+        self.data = datetime.now(timezone.utc).strftime('%Y-%m-%d')
+        self.gravadores: Dict[str, _GravadorTabela] = {}
+        self.erro: Optional[str] = None
+
+    def espelhar(self, lotes: Iterable[Tuple[str, List[tuple]]]) -> Iterator[Tuple[str, List[tuple]]]:
+        """Repassa os lotes (tabela, registros) como vieram, copiando cada um para o Parquet"""
+        for tabela, registros in lotes:
+            self.adicionar(tabela, registros)
+            yield tabela, registros
+
+    def adicionar(self, tabela: str, registros: List[tuple]):
+        if self.erro is not None:
+            return
+        try:
+            gravador = self.gravadores.get(tabela)
+            if gravador is None:
+                exportador = self.exportador
+                gravador = self.gravadores[tabela] = _GravadorTabela(
+                    exportador.colunas[tabela], exportador.linhas_row_group, exportador.compressao, exportador.diretorio
+                )
+            gravador.adicionar(registros)
+        except Exception as e:
+            self._falhar(f"Falha ao gerar o Parquet de {tabela}: {str(e)}")
+
+    def concluir(self) -> Dict[str, Any]:
+        """Fecha os arquivos e envia ao S3; retorna as chaves e registros por tabela (ou o erro)"""
+        if self.erro is not None:
+            return {'erro': self.erro}
+        arquivos, registros = {}, {}
+        try:
+            for tabela, gravador in self.gravadores.items():
+                if not gravador.linhas:
+                    continue
+                gravador.fechar()
+                chave = chave_particao(self.exportador.prefixo, tabela, self.data, self.chave)
+                self.exportador.cliente.upload_file(
+                    gravador.caminho, self.bucket, chave, ExtraArgs={'ContentType': TIPO_CONTEUDO}
+                )
+                arquivos[tabela] = chave
+                registros[tabela] = gravador.linhas
+        except Exception as e:
+            self._falhar(f"Falha ao enviar o Parquet de {self.chave}: {str(e)}")
+            return {'erro': self.erro, 'arquivos': arquivos}
+        finally:
+            self.descartar()
+        log.info(f"Parquet de {self.chave}: {registros}")
+        return {'arquivos': arquivos, 'registros': registros}
+
+    def descartar(self):
+        """Remove os arquivos temporários sem enviar (arquivo com erro)"""
+        for gravador in self.gravadores.values():
+            gravador.descartar()
+        self.gravadores = {}
+
+    def _falhar(self, mensagem: str):
+        log.warning(mensagem)
+        self.erro = mensagem
+        self.descartar()
+
+
+class ExportadorParquet:
+    """Grava os registros transformados de cada tabela em Parquet, particionado por tabela e data
+
+    Os arquivos são montados em /tmp (SPILL_DIR) enquanto os lotes vão para o banco e só
+    são enviados depois que o arquivo de origem foi persistido com sucesso. Guardam todos
+    os registros transformados do arquivo, inclusive os que DB_DEDUP (chave repetida) e o
+    modo delta (registro sem alteração) não enviam ao MySQL.
+    """
+
+    def __init__(self, cliente, colunas: Dict[str, List[str]], prefixo: str, bucket: Optional[str] = None,
+                 linhas_row_group: int = 250000, compressao: str = 'snappy', diretorio: Optional[str] = None):
+        """
+        Args:
+            cliente: Cliente boto3 do S3
+            colunas: Colunas de cada tabela, na ordem das tuplas dos lotes
+            prefixo: Prefixo da saída (ex.: analytics/)
+            bucket: Bucket da saída (None = o bucket do arquivo de origem)
+            linhas_row_group: Registros por row group
+            compressao: Codec do Parquet (snappy, zstd, gzip, none)
+            diretorio: Diretório dos arquivos temporários (None = /tmp)
+        """
+        self.cliente = cliente
+        self.colunas = colunas
+        self.prefixo = prefixo if not prefixo or prefixo.endswith('/') else prefixo + '/'
+        self.bucket = bucket
+        self.linhas_row_group = linhas_row_group
+        self.compressao = compressao
+        self.diretorio = diretorio
+
+    def abrir(self, bucket: str, chave: str) -> SaidaParquet:
+        return SaidaParquet(self, bucket, chave)
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Any
+from typing import Any, Callable, Optional
 
 
 class TransformadorDados:
@@ -8,16 +8,16 @@ class TransformadorDados:
     @staticmethod
     def aplicar_transformacao(valor: Any, tipo: str) -> Any:
         """Aplica transformação conforme tipo especificado"""
-        transformacoes = {
-            'data': TransformadorDados._transformar_data,
-            'caracteres': TransformadorDados._transformar_caracteres,
-            'dataatul': TransformadorDados._transformar_data_atual
-        }
-        
-        if tipo in transformacoes:
-            return transformacoes[tipo](valor)
+        transformacao = TransformadorDados.obter_transformacao(tipo)
+        if transformacao:
+            return transformacao(valor)
         return valor
     
+    @staticmethod
+    def obter_transformacao(tipo: str) -> Optional[Callable[[Any], Any]]:
+        """Retorna a função de transformação do tipo especificado (ou None)"""
+        return _TRANSFORMACOES.get(tipo)
+    
     @staticmethod
     def _transformar_data(valor: str) -> str:
         try:
@@ -32,4 +32,11 @@ class TransformadorDados:
     
     @staticmethod
     def _transformar_data_atual(_: Any) -> str:
-        return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
\ No newline at end of file
+        return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
+_TRANSFORMACOES = {
+    'data': TransformadorDados._transformar_data,
+    'caracteres': TransformadorDados._transformar_caracteres,
+    'dataatul': TransformadorDados._transformar_data_atual
+}
\ No newline at end of file
@@ -0,0 +1,132 @@
+import pytest
+from chalicelib.services.pool_conexoes import reiniciar_pools
+
+
+class CursorFalso:
+    def __init__(self, conexao):
+        self.conexao = conexao
+        self.max_stmt_length = None
+        self._resultado = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def execute(self, query, parametros=None):
+        self.conexao.executar('execute', query, parametros)
+        self._resultado = self.conexao.resultados(query, parametros)
+
+    def executemany(self, query, registros):
+        self.conexao.executar('executemany', query, list(registros))
+
+    def fetchone(self):
+        return self._resultado[0] if self._resultado else None
+
+    def fetchall(self):
+        return list(self._resultado)
+
+
+class ConexaoFalsa:
+    """Conexão compatível com pymysql que registra as instruções, commits e rollbacks
+
+    `falhar` recebe (operação, query, parâmetros) e pode levantar a exceção que quiser.
+    """
+
+    def __init__(self, registro=None, falhar=None, chaves_primarias=None):
+        self.registro = [] if registro is None else registro
+        self.falhar = falhar
+        self.chaves_primarias = chaves_primarias or {}
+        self.fechada = False
+        self.pings = 0
+
+    def executar(self, operacao, query, parametros):
+        if self.fechada:
+            raise RuntimeError('conexão fechada')
+        if self.falhar is not None:
+            self.falhar(operacao, query, parametros)
+        self.registro.append((self, operacao, ' '.join(query.split()), parametros))
+
+    def resultados(self, query, parametros):
+        # Linhas como tuplas, como no cursor padrão do pymysql usado pelo GerenciadorMySQL
+        if 'max_allowed_packet' in query:
+            return [(4 * 1024 * 1024,)]
+        if "CONSTRAINT_NAME = 'PRIMARY'" in query:
+            return [(coluna,) for coluna in self.chaves_primarias.get(parametros[0], [])]
+        return []
+
+    def cursor(self):
+        return CursorFalso(self)
+
+    def commit(self):
+        self.executar('commit', 'COMMIT', None)
+
+    def rollback(self):
+        self.executar('rollback', 'ROLLBACK', None)
+
+    def ping(self, reconnect=False):
+        self.pings += 1
+        if self.fechada:
+            raise RuntimeError('conexão fechada')
+
+    def close(self):
+        self.fechada = True
+
+    def operacoes(self):
+        return [(op, query) for conexao, op, query, _ in self.registro if conexao is self]
+
+
+@pytest.fixture(autouse=True)
+def pools_limpos():
+    # Pools são globais ao módulo (sobrevivem entre invocações); cada teste começa do zero
+    reiniciar_pools()
+    yield
+    reiniciar_pools()
+
+
+BUCKET = 'dev-bucket-lab01'
+
+
+def linhas_csv(quantidade: int, inicio: int = 0) -> str:
+    """CSV no layout do mapeamento de exemplo (8 colunas separadas por ';')"""
+    return ''.join(f"C;{i};01.02.2024;x;COD{i};y;z;Nome {i}\n" for i in range(inicio, inicio + quantidade))
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    """S3 do moto com o bucket do laboratório criado"""
+    moto = pytest.importorskip('moto')
+    import boto3
+
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    with moto.mock_aws():
+        cliente = boto3.client('s3')
+        cliente.create_bucket(Bucket=BUCKET)
+        yield cliente
+
+
+@pytest.fixture
+def banco_falso(monkeypatch):
+    """pymysql.connect devolvendo ConexaoFalsa; retorna o registro compartilhado das conexões"""
+    import pymysql
+
+    registro = []
+    monkeypatch.setattr(pymysql, 'connect', lambda **kwargs: ConexaoFalsa(registro))
+    return registro
+
+
+def gravar(s3, chave: str, corpo) -> dict:
+    """Grava o objeto e retorna o registro do evento S3 correspondente"""
+    s3.put_object(Bucket=BUCKET, Key=chave, Body=corpo)
+    cabecalho = s3.head_object(Bucket=BUCKET, Key=chave)
+    return {'s3': {
+        'bucket': {'name': BUCKET},
+        'object': {'key': chave, 'size': cabecalho['ContentLength'], 'eTag': cabecalho['ETag'].strip('"')}
+    }}
+
+
+def chaves(s3, prefixo: str = '') -> list:
+    return sorted(obj['Key'] for obj in s3.list_objects_v2(Bucket=BUCKET, Prefix=prefixo).get('Contents', []))
@@ -0,0 +1,90 @@
+import gzip
+
+import pytest
+from chalicelib.core.config import ConfigGerenciador
+from chalicelib.core.exceptions import ErroArmazenamento
+from chalicelib.services.armazenamento import GerenciadorS3
+from tests.conftest import BUCKET, linhas_csv
+
+# Linhas de tamanhos diferentes, para que as faixas cortem linhas em pontos variados
+CONTEUDO = ''.join(f"{linha.rstrip()};{'x' * (i % 37)}\n" for i, linha in enumerate(linhas_csv(2000).splitlines())).encode()
+
+
+class ClienteContador:
+    """Cliente S3 que registra os Range de cada get_object; `apos_primeiro` roda depois do primeiro GET"""
+
+    def __init__(self, cliente, apos_primeiro=None):
+        self.cliente = cliente
+        self.apos_primeiro = apos_primeiro
+        self.faixas = []
+
+    def get_object(self, **kwargs):
+        resposta = self.cliente.get_object(**kwargs)
+        self.faixas.append(kwargs.get('Range'))
+        if self.apos_primeiro is not None and len(self.faixas) == 1:
+            self.apos_primeiro()
+        return resposta
+
+    def __getattr__(self, nome):
+        return getattr(self.cliente, nome)
+
+
+def armazenamento(cliente, **opcoes):
+    return GerenciadorS3(ConfigGerenciador(tamanho_faixa=4096, faixas_simultaneas=3, **opcoes), cliente=cliente)
+
+
+@pytest.mark.parametrize('corpo', [CONTEUDO, CONTEUDO.rstrip(b'\n')], ids=['terminado', 'sem-quebra-final'])
+def test_faixas_remontam_o_objeto_em_ordem(s3, corpo):
+    s3.put_object(Bucket=BUCKET, Key='entrada/grande.csv', Body=corpo)
+    cliente = ClienteContador(s3)
+
+    blocos = list(armazenamento(cliente).ler_blocos(BUCKET, 'entrada/grande.csv'))
+
+    assert b''.join(blocos) == corpo
+    # Todo bloco, menos o último, termina em fim de linha
+    assert all(bloco.endswith(b'\n') for bloco in blocos[:-1])
+    # Faixas disjuntas de 4096 bytes cobrindo o objeto (as threads terminam em qualquer ordem)
+    esperadas = {f"bytes={inicio}-{min(inicio + 4096, len(corpo)) - 1}" for inicio in range(0, len(corpo), 4096)}
+    assert len(cliente.faixas) == len(esperadas) and set(cliente.faixas) == esperadas
+
+
+def test_linhas_em_faixas_iguais_ao_arquivo(s3):
+    s3.put_object(Bucket=BUCKET, Key='entrada/grande.csv', Body=CONTEUDO)
+
+    linhas = list(armazenamento(s3).ler_linhas(BUCKET, 'entrada/grande.csv'))
+
+    assert ''.join(linhas) == CONTEUDO.decode()
+
+
+def test_objeto_comprimido_e_remontado_antes_de_descomprimir(s3):
+    s3.put_object(Bucket=BUCKET, Key='entrada/grande.csv.gz', Body=gzip.compress(CONTEUDO))
+    cliente = ClienteContador(s3)
+
+    assert armazenamento(cliente).ler_conteudo(BUCKET, 'entrada/grande.csv.gz') == CONTEUDO.decode()
+    assert len(cliente.faixas) > 1
+
+
+def test_objeto_pequeno_custa_um_unico_get(s3):
+    s3.put_object(Bucket=BUCKET, Key='entrada/pequeno.csv', Body=b'C;1;01.02.2024\n')
+    cliente = ClienteContador(s3)
+
+    assert armazenamento(cliente).ler_conteudo(BUCKET, 'entrada/pequeno.csv') == 'C;1;01.02.2024\n'
+    assert cliente.faixas == ['bytes=0-4095']
+
+
+def test_objeto_vazio_e_lido_sem_faixa(s3):
+    s3.put_object(Bucket=BUCKET, Key='entrada/vazio.csv', Body=b'')
+    cliente = ClienteContador(s3)
+
+    assert armazenamento(cliente).ler_conteudo(BUCKET, 'entrada/vazio.csv') == ''
+    # InvalidRange na primeira faixa: uma leitura simples do objeto
+    assert cliente.faixas[-1] is None
+
+
+def test_objeto_substituido_durante_a_leitura_em_faixas_falha(s3):
+    s3.put_object(Bucket=BUCKET, Key='entrada/grande.csv', Body=CONTEUDO)
+    substituir = lambda: s3.put_object(Bucket=BUCKET, Key='entrada/grande.csv', Body=CONTEUDO + b'nova versao\n')
+    cliente = ClienteContador(s3, apos_primeiro=substituir)
+
+    with pytest.raises(ErroArmazenamento):
+        list(armazenamento(cliente).ler_blocos(BUCKET, 'entrada/grande.csv'))
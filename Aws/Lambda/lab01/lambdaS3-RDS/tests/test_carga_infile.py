@@ -0,0 +1,22 @@
+from chalicelib.services.carga_infile import carregar_via_infile, valor_tsv
+from tests.conftest import ConexaoFalsa
+
+
+def test_carregar_via_infile_nunca_faz_commit_implicito(tmp_path):
+    conexao = ConexaoFalsa()
+    carregar_via_infile(conexao, 'produto', ['id', 'nome'], [(1, 'a\tb'), (2, None)], diretorio=str(tmp_path))
+
+    queries = [query for _, query in conexao.operacoes()]
+    # TRUNCATE (mesmo em tabela temporária) faria commit da transação do chamador
+    assert not any(query.startswith(('TRUNCATE', 'COMMIT', 'ROLLBACK')) for query in queries)
+    assert queries[0] == 'CREATE TEMPORARY TABLE IF NOT EXISTS stg_produto LIKE produto'
+    assert queries[1] == 'DELETE FROM stg_produto'
+    assert queries[2].startswith('LOAD DATA LOCAL INFILE')
+    assert queries[3].startswith('INSERT INTO produto (id, nome) SELECT id, nome FROM stg_produto')
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_valor_tsv_escapes_e_nulo():
+    assert valor_tsv(None) == '\\N'
+    assert valor_tsv('a\tb\nc\\') == 'a\\tb\\nc\\\\'
+    assert valor_tsv(3) == '3'
@@ -0,0 +1,17 @@
+from chalicelib.services.colunar import iterar_blocos_registro
+
+
+def test_quebra_de_linha_entre_aspas_fica_no_mesmo_bloco():
+    linhas = ['1;"a\n', 'b";x\n', '2;c;y\n', '3;d;z\n']
+
+    assert list(iterar_blocos_registro(linhas, 1)) == ['1;"a\nb";x\n', '2;c;y\n', '3;d;z\n']
+
+
+def test_aspa_solta_le_no_maximo_linhas_bloco_a_mais():
+    linhas = ['1;"a;x\n'] + [f"{i};b;y\n" for i in range(2, 101)]
+
+    blocos = list(iterar_blocos_registro(linhas, 10))
+
+    assert ''.join(blocos) == ''.join(linhas)
+    # O bloco com a aspa solta para em 2 x 10 linhas; o resto do arquivo segue em blocos normais
+    assert [bloco.count('\n') for bloco in blocos] == [20] + [10] * 8
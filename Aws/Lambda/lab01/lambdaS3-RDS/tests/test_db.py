@@ -0,0 +1,89 @@
+import pytest
+from chalicelib.core.config import ConfigDB
+from chalicelib.core.exceptions import ErroBancoDados
+from chalicelib.services.db import GerenciadorMySQL
+from tests.conftest import ConexaoFalsa
+
+COLUNAS = {'pai': ['id', 'nome'], 'filho': ['id', 'pai_id']}
+
+
+def gerenciador(conexao, **opcoes):
+    config = ConfigDB(host='db', user='u', database='lab', **opcoes)
+    return GerenciadorMySQL(config, conectar=lambda: conexao)
+
+
+@pytest.mark.parametrize('carregador', ['executemany', 'load_data'])
+def test_persistir_grupo_faz_um_commit_no_final(carregador):
+    conexao = ConexaoFalsa()
+    lotes = [('pai', [(1, 'a'), (2, 'b')]), ('filho', [(10, 1)]), ('pai', [(3, 'c')])]
+
+    persistidos = gerenciador(conexao, carregador=carregador).persistir_grupo(lotes, COLUNAS)
+
+    assert persistidos == {'pai': 3, 'filho': 1}
+    operacoes = [op for op, _ in conexao.operacoes()]
+    assert operacoes.count('commit') == 1
+    # Nada antes do commit final pode ter encerrado a transação
+    escritas = [query for op, query in conexao.operacoes() if op != 'commit']
+    assert operacoes[-1] == 'commit'
+    assert not any(query.startswith(('TRUNCATE', 'ROLLBACK')) for query in escritas)
+
+
+@pytest.mark.parametrize('carregador', ['executemany', 'load_data'])
+def test_persistir_grupo_com_falha_desfaz_sem_commit(carregador):
+    def falhar(operacao, query, parametros):
+        if operacao in ('executemany', 'execute') and query.lstrip().startswith('INSERT INTO filho'):
+            raise RuntimeError('FK inválida')
+
+    conexao = ConexaoFalsa(falhar=falhar)
+    with pytest.raises(ErroBancoDados):
+        gerenciador(conexao, carregador=carregador).persistir_grupo([('pai', [(1, 'a')]), ('filho', [(10, 9)])], COLUNAS)
+
+    operacoes = [op for op, _ in conexao.operacoes()]
+    assert 'commit' not in operacoes
+    assert operacoes[-1] == 'rollback'
+
+
+def _reconexao_seguida_de_deadlock(deadlocks):
+    """Fábrica: a 1ª conexão cai no primeiro INSERT; a 2ª dá `deadlocks` deadlocks antes de gravar"""
+    from pymysql.err import OperationalError
+
+    registro = []
+    estado = {'deadlocks': deadlocks}
+
+    def perdida(operacao, query, parametros):
+        if operacao == 'executemany':
+            raise OperationalError(2013, 'Lost connection to MySQL server during query')
+
+    def deadlock(operacao, query, parametros):
+        if operacao == 'executemany' and estado['deadlocks']:
+            estado['deadlocks'] -= 1
+            raise OperationalError(1213, 'Deadlock found when trying to get lock')
+
+    conexoes = [ConexaoFalsa(registro, falhar=perdida), ConexaoFalsa(registro, falhar=deadlock)]
+    return conexoes, iter(conexoes).__next__
+
+
+def test_disputa_de_lock_apos_reconexao_desfaz_na_conexao_nova():
+    (antiga, nova), conectar = _reconexao_seguida_de_deadlock(deadlocks=1)
+    db = GerenciadorMySQL(ConfigDB(host='db', user='u', database='lab', lote_minimo=1), conectar=conectar)
+
+    assert db.persistir_lotes([('pai', [(1, 'a'), (2, 'b')])], COLUNAS) == {'pai': 2, 'filho': 0}
+
+    assert antiga.fechada and ('rollback', 'ROLLBACK') not in antiga.operacoes()
+    finais = [op for op, _ in nova.operacoes() if op in ('rollback', 'commit')]
+    assert finais[0] == 'rollback' and set(finais[1:]) == {'commit'}
+    assert [conexao for conexao, _ in db.pool._ociosas] == [nova]
+
+
+def test_tentativas_de_lock_esgotadas_apos_reconexao_devolvem_a_conexao_nova():
+    (antiga, nova), conectar = _reconexao_seguida_de_deadlock(deadlocks=100)
+    db = GerenciadorMySQL(ConfigDB(host='db', user='u', database='lab', lote_minimo=1), conectar=conectar)
+
+    with pytest.raises(ErroBancoDados):
+        db.persistir_lotes([('pai', [(1, 'a')])], COLUNAS)
+
+    assert ('rollback', 'ROLLBACK') not in antiga.operacoes()
+    assert 'commit' not in [op for op, _ in nova.operacoes()]
+    assert [op for op, _ in nova.operacoes()][-1] == 'rollback'
+    # A conexão nova volta ao pool em vez de ficar com a transação aberta
+    assert [conexao for conexao, _ in db.pool._ociosas] == [nova]
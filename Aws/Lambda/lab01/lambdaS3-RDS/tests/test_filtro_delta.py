@@ -0,0 +1,68 @@
+import pytest
+from chalicelib.core.config import ConfigDB
+from chalicelib.core.exceptions import ErroBancoDados
+from chalicelib.services.db import GerenciadorMySQL
+from chalicelib.services.filtro_delta import FiltroDelta, _resumo
+from tests.conftest import ConexaoFalsa
+
+MAPEAMENTO = [{'tabela': 'pai', 'colunas': [
+    {'nome': 'id', 'origem': {'tipo': 'coluna', 'index': 0}},
+    {'nome': 'nome', 'origem': {'tipo': 'coluna', 'index': 1}},
+]}]
+COLUNAS = {'pai': ['id', 'nome']}
+
+
+class HashesGravados(ConexaoFalsa):
+    """ConexaoFalsa que responde à consulta de hashes com os valores já gravados por chave"""
+
+    def __init__(self, gravados, **opcoes):
+        super().__init__(chaves_primarias={'pai': ['id']}, **opcoes)
+        self.gravados = {_resumo((pk,)): _resumo(valores) for pk, valores in gravados.items()}
+
+    def resultados(self, query, parametros):
+        if query.startswith('SELECT pk_hash'):
+            return [(pk_hash, self.gravados[pk_hash]) for pk_hash in parametros[1:] if pk_hash in self.gravados]
+        return super().resultados(query, parametros)
+
+
+def test_ignorados_contam_so_os_registros_iguais_ao_hash_gravado():
+    conexao = HashesGravados({1: (1, 'a'), 2: (2, 'antigo')})
+    delta = FiltroDelta(MAPEAMENTO)
+    # 1 igual ao gravado (repetido no lote), 2 alterado, 3 novo (repetido no lote)
+    registros = [(1, 'a'), (1, 'a'), (2, 'b'), (3, 'c'), (3, 'd')]
+
+    alterados, hashes = delta.alterados(conexao, 'pai', COLUNAS['pai'], registros, ['id'])
+
+    assert sorted(alterados) == [(2, 'b'), (3, 'd')]
+    assert len(hashes) == 2
+    assert delta.registros_ignorados() == {'pai': 1}
+
+
+def test_grupo_desfeito_nao_mantem_as_contagens():
+    def falhar(operacao, query, parametros):
+        if operacao == 'executemany' and query.lstrip().startswith('INSERT INTO pai'):
+            raise RuntimeError('falha no grupo')
+
+    conexao = HashesGravados({1: (1, 'a')}, falhar=falhar)
+    db = GerenciadorMySQL(ConfigDB(host='db', user='u', database='lab', deduplicar=True),
+                          conectar=lambda: conexao, delta=FiltroDelta(MAPEAMENTO))
+
+    with pytest.raises(ErroBancoDados):
+        db.persistir_grupo([('pai', [(1, 'a'), (2, 'b'), (2, 'b')])], COLUNAS)
+
+    # O chamador regrava arquivo a arquivo; o grupo desfeito não pode ter contado nada
+    assert db.registros_ignorados() == {}
+    assert db.registros_duplicados() == {}
+
+
+def test_deduplicacao_vale_para_todos_os_lotes_do_arquivo():
+    conexao = ConexaoFalsa(chaves_primarias={'pai': ['id']})
+    db = GerenciadorMySQL(ConfigDB(host='db', user='u', database='lab', deduplicar=True), conectar=lambda: conexao)
+
+    db.persistir_lotes([('pai', [(1, 'a'), (2, 'b'), (2, 'c')]), ('pai', [(2, 'd'), (3, 'e')])], COLUNAS)
+
+    gravados = [registro for _, operacao, query, parametros in conexao.registro
+                if operacao == 'executemany' and query.startswith('INSERT INTO pai') for registro in parametros]
+    # A chave 2 chega ao MySQL uma vez: o último do primeiro lote em que aparece
+    assert gravados == [(1, 'a'), (2, 'c'), (3, 'e')]
+    assert db.registros_duplicados() == {'pai': 2}
@@ -0,0 +1,83 @@
+from types import SimpleNamespace
+
+from chalicelib.core.config import ConfigApp, ConfigDB, ConfigGerenciador
+from chalicelib.core.recursos import RecursosExecucao
+from chalicelib.lambda_function import ProcessadorHandler
+from chalicelib.services.registro_arquivos import RegistroMemoria
+from tests.conftest import chaves, gravar, linhas_csv
+
+
+class RegistroInstavel(RegistroMemoria):
+    """Registro em memória que falha no adquirir dos arquivos informados, depois de tomar o lease"""
+
+    def __init__(self, falhando):
+        super().__init__()
+        self.falhando = falhando
+        self.liberados = []
+
+    def adquirir(self, bucket, arquivo, etag, dono):
+        estado = super().adquirir(bucket, arquivo, etag, dono)
+        if arquivo in self.falhando:
+            raise ConnectionError('registro indisponível')
+        return estado
+
+    def liberar(self, bucket, arquivo, etag, dono):
+        self.liberados.append(arquivo)
+        super().liberar(bucket, arquivo, etag, dono)
+
+
+def handler_com(registro, **storage):
+    config = ConfigApp(db=ConfigDB(host='db', user='u', database='lab'), storage=ConfigGerenciador(**storage))
+    handler = ProcessadorHandler(RecursosExecucao(config))
+    handler.registro = registro
+    return handler
+
+
+def test_falha_no_registro_vira_erro_do_arquivo(s3, banco_falso):
+    registros = [gravar(s3, f"entrada/{nome}.csv", linhas_csv(5)) for nome in 'abc']
+    registro = RegistroInstavel({'entrada/b.csv'})
+
+    corpo = handler_com(registro).executar({'Records': registros})['body']
+
+    assert (corpo['processados'], corpo['erros']) == (2, 1)
+    falhos = [resultado for resultado in corpo['detalhes'] if resultado['status'] == 'erro']
+    assert falhos[0]['arquivo'] == 'entrada/b.csv' and 'registro' in falhos[0]['erro']
+    assert registro.liberados == ['entrada/b.csv']
+    # O arquivo com falha no registro fica na entrada; os demais foram movidos e excluídos
+    assert chaves(s3, 'entrada/') == ['entrada/b.csv']
+    assert len(chaves(s3, 'processados/')) == 2
+
+
+def test_agrupador_libera_o_lease_quando_adquirir_falha(s3, banco_falso):
+    registros = [gravar(s3, f"entrada/{nome}.csv", linhas_csv(5)) for nome in 'abc']
+    registro = RegistroInstavel({'entrada/b.csv'})
+
+    corpo = handler_com(registro, agrupar_ate_bytes=10000).executar({'Records': registros})['body']
+
+    assert [resultado['status'] for resultado in corpo['detalhes']] == ['sucesso', 'erro', 'sucesso']
+    assert registro.liberados == ['entrada/b.csv']
+    assert chaves(s3, 'entrada/') == ['entrada/b.csv']
+    # Uma nova entrega de b (sem falha no registro) pode tomar o lease liberado
+    registro.falhando = set()
+    etag = registros[1]['s3']['object']['eTag']
+    assert registro.adquirir(registros[1]['s3']['bucket']['name'], 'entrada/b.csv', etag, 'outro') == 'adquirido'
+
+
+def test_nova_tentativa_da_mesma_invocacao_retoma_o_proprio_lease(s3, banco_falso):
+    registro_evento = gravar(s3, 'entrada/a.csv', linhas_csv(5))
+    bucket = registro_evento['s3']['bucket']['name']
+    etag = registro_evento['s3']['object']['eTag']
+    registro = RegistroMemoria()
+    # Tentativa anterior da invocação req-1 morreu depois de tomar o lease
+    assert registro.adquirir(bucket, 'entrada/a.csv', etag, 'req-1') == 'adquirido'
+    handler = handler_com(registro)
+
+    outra = handler.executar({'Records': [registro_evento]}, SimpleNamespace(aws_request_id='req-2'))['body']
+    assert outra['ignorados'] == 1 and outra['detalhes'][0]['motivo'] == 'ocupado'
+    assert chaves(s3, 'entrada/') == ['entrada/a.csv']
+
+    corpo = handler.executar({'Records': [registro_evento]}, SimpleNamespace(aws_request_id='req-1'))['body']
+
+    assert corpo['processados'] == 1
+    assert chaves(s3, 'entrada/') == []
+    assert registro.adquirir(bucket, 'entrada/a.csv', etag, 'req-3') == 'concluido'
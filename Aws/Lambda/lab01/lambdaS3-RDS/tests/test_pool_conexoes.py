@@ -0,0 +1,101 @@
+from chalicelib.core.config import ConfigDB
+from chalicelib.services.db import GerenciadorMySQL
+from chalicelib.services.pool_conexoes import PoolConexoes
+from tests.conftest import ConexaoFalsa
+
+COLUNAS = {'pai': ['id', 'nome'], 'filho': ['id', 'pai_id']}
+
+
+class Relogio:
+    def __init__(self):
+        self.agora = 1000.0
+
+    def __call__(self):
+        return self.agora
+
+
+def pool_com(relogio, **opcoes):
+    abertas = []
+
+    def conectar():
+        abertas.append(ConexaoFalsa())
+        return abertas[-1]
+
+    return PoolConexoes(conectar, relogio=relogio, **opcoes), abertas
+
+
+def test_conexao_ociosa_reaproveitada_sem_ping_dentro_do_intervalo():
+    relogio = Relogio()
+    pool, abertas = pool_com(relogio, intervalo_ping=5)
+
+    conexao = pool.obter()
+    pool.devolver(conexao)
+    relogio.agora += 4
+
+    assert pool.obter() is conexao
+    assert len(abertas) == 1 and conexao.pings == 0
+
+
+def test_conexao_ociosa_alem_do_intervalo_passa_por_ping_e_e_trocada_se_morta():
+    relogio = Relogio()
+    pool, abertas = pool_com(relogio, intervalo_ping=5)
+    viva, morta = pool.obter(), pool.obter()
+    pool.devolver(viva)
+    pool.devolver(morta)
+    morta.fechada = True
+    relogio.agora += 10
+
+    # A última devolvida sai primeiro: falha no ping, é descartada e a seguinte é usada
+    assert pool.obter() is viva
+    assert morta.pings == 1 and viva.pings == 1
+    # Sem ociosas, abre uma nova
+    assert pool.obter() is abertas[2]
+
+
+def test_conexao_ociosa_alem_do_maximo_e_fechada_sem_ping():
+    relogio = Relogio()
+    pool, abertas = pool_com(relogio, ociosidade_maxima=300)
+    antiga = pool.obter()
+    pool.devolver(antiga)
+    relogio.agora += 301
+
+    assert pool.obter() is abertas[1]
+    assert antiga.fechada and antiga.pings == 0
+
+
+def test_devolver_com_pool_cheio_fecha_a_conexao():
+    pool, abertas = pool_com(Relogio(), tamanho=1)
+    primeira, segunda = pool.obter(), pool.obter()
+    pool.devolver(primeira)
+    pool.devolver(segunda)
+
+    assert [conexao for conexao, _ in pool._ociosas] == [primeira]
+    assert segunda.fechada and not primeira.fechada
+
+
+def test_invocacoes_quentes_compartilham_o_pool(banco_falso):
+    config = ConfigDB(host='db', user='u', database='lab', intervalo_ping_pool=0)
+    primeiro = GerenciadorMySQL(config)
+    primeiro.persistir_lotes([('pai', [(1, 'a')])], COLUNAS)
+
+    # Próxima invocação quente: novo gerenciador, mesmo pool e mesma conexão, validada por ping
+    segundo = GerenciadorMySQL(config)
+    segundo.persistir_lotes([('pai', [(2, 'b')])], COLUNAS)
+
+    assert segundo.pool is primeiro.pool
+    conexoes = {conexao for conexao, _, _, _ in banco_falso}
+    assert len(conexoes) == 1 and conexoes.pop().pings == 1
+
+
+def test_invocacao_quente_reconecta_quando_a_conexao_do_pool_morreu(banco_falso):
+    config = ConfigDB(host='db', user='u', database='lab', intervalo_ping_pool=0)
+    primeiro = GerenciadorMySQL(config)
+    primeiro.persistir_lotes([('pai', [(1, 'a')])], COLUNAS)
+    (antiga, _), = primeiro.pool._ociosas
+    antiga.fechada = True  # wait_timeout do servidor entre as invocações
+
+    GerenciadorMySQL(config).persistir_lotes([('pai', [(2, 'b')])], COLUNAS)
+
+    novas = [conexao for conexao, _ in primeiro.pool._ociosas]
+    assert len(novas) == 1 and novas[0] is not antiga
+    assert ('commit', 'COMMIT') in novas[0].operacoes()
@@ -0,0 +1,67 @@
+import io
+import re
+
+from chalicelib.core.config import carregar_mapeamento
+from chalicelib.services import processamento_paralelo
+from chalicelib.services.processador import ProcessadorArquivo
+from chalicelib.services.processamento_paralelo import ProcessamentoParalelo
+from tests.conftest import linhas_csv
+
+# ~2,5 MB: acima de FATIA_MINIMA por processo com 2 processos
+CONTEUDO = linhas_csv(60000).encode('utf-8')
+
+
+def paralelo(tmp_path):
+    return ProcessamentoParalelo(ProcessadorArquivo(carregar_mapeamento()), 2, str(tmp_path))
+
+
+def registros(lotes):
+    """Registros por tabela, sem a data de atualização (função avaliada no momento do parsing)"""
+    agora = re.compile(r'\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}$')
+    tabelas = {}
+    for tabela, lote in lotes:
+        tabelas.setdefault(tabela, []).extend(
+            tuple(None if isinstance(valor, str) and agora.match(valor) else valor for valor in registro)
+            for registro in lote
+        )
+    return tabelas
+
+
+def esperado(processamento):
+    return registros(processamento.processador.iterar_lotes(io.StringIO(CONTEUDO.decode('utf-8')), 5000, None))
+
+
+def test_processamento_paralelo_igual_ao_de_um_processo(tmp_path):
+    processamento = paralelo(tmp_path)
+
+    assert registros(processamento.iterar_lotes([CONTEUDO], 5000)) == esperado(processamento)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_pouco_espaco_livre_usa_um_unico_processo(tmp_path, monkeypatch):
+    processamento = paralelo(tmp_path)
+    monkeypatch.setattr(processamento_paralelo.shutil, 'disk_usage',
+                        lambda caminho: type('Uso', (), {'free': len(CONTEUDO)})())
+
+    def sem_fork(*args):
+        raise AssertionError('não deveria criar processos sem espaço para os lotes')
+
+    monkeypatch.setattr(processamento, '_iniciar_processos', sem_fork)
+
+    assert registros(processamento.iterar_lotes([CONTEUDO], 5000)) == esperado(processamento)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_processos_criados_antes_de_consumir_os_lotes(tmp_path, monkeypatch):
+    processamento = paralelo(tmp_path)
+    iniciados = []
+    iniciar_processos = processamento._iniciar_processos
+    monkeypatch.setattr(processamento, '_iniciar_processos', lambda trabalhadores, *args: iniciados.append(
+        iniciar_processos(trabalhadores, *args)))
+
+    lotes = processamento.iterar_lotes([CONTEUDO], 5000)
+
+    # O fork acontece antes de quem consome os lotes criar threads
+    assert len(iniciados) == 1
+    lotes.close()
+    assert list(tmp_path.iterdir()) == []
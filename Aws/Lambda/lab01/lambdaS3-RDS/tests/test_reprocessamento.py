@@ -0,0 +1,60 @@
+import json
+
+from chalicelib.core.config import ConfigApp, ConfigDB
+from chalicelib.reprocessamento import Reprocessador
+from chalicelib.services.arquivamento import Arquivador
+from tests.conftest import BUCKET, chaves, linhas_csv
+
+CONFIG = ConfigApp(db=ConfigDB(host='db', user='u', database='lab'))
+
+
+def gravar_checkpoint(caminho, itens):
+    caminho.write_text(''.join(json.dumps(item) + '\n' for item in itens) + '{"chave": "cortada', encoding='utf-8')
+
+
+def test_reprocessa_o_prefixo_e_retoma_do_checkpoint(s3, banco_falso, tmp_path):
+    for nome in 'abcde':
+        s3.put_object(Bucket=BUCKET, Key=f"erros/{nome}.csv", Body=linhas_csv(5))
+    checkpoint = tmp_path / 'reprocessamento.jsonl'
+    # Execução anterior interrompida: a e b concluídos, c já concluído no registro, d em outra invocação
+    gravar_checkpoint(checkpoint, [
+        {'chave': 'erros/a.csv', 'status': 'sucesso'},
+        {'chave': 'erros/b.csv', 'status': 'sucesso'},
+        {'chave': 'erros/c.csv', 'status': 'ignorado', 'motivo': 'concluido'},
+        {'chave': 'erros/d.csv', 'status': 'ignorado', 'motivo': 'ocupado'},
+    ])
+
+    resumo = Reprocessador(CONFIG, 'erros/', simultaneos=2, checkpoint=str(checkpoint)).executar(BUCKET)
+
+    assert (resumo['retomados'], resumo['sucesso'], resumo['erros']) == (3, 2, 0)
+    assert chaves(s3, 'erros/') == ['erros/a.csv', 'erros/b.csv', 'erros/c.csv']
+    assert len(chaves(s3, 'processados/')) == 2
+    linhas = checkpoint.read_text(encoding='utf-8').splitlines()
+    # A linha cortada foi terminada; d (ocupado na execução anterior) e e foram registrados depois dela
+    assert sorted(json.loads(linha)['chave'] for linha in linhas[5:]) == ['erros/d.csv', 'erros/e.csv']
+
+    # Nova execução: tudo já está no checkpoint
+    de_novo = Reprocessador(CONFIG, 'erros/', simultaneos=2, checkpoint=str(checkpoint)).executar(BUCKET)
+    assert (de_novo['arquivos'], de_novo['retomados']) == (0, 3)
+
+
+def test_checkpoint_gravado_depois_da_exclusao_dos_originais(s3, banco_falso, tmp_path, monkeypatch):
+    for nome in 'abc':
+        s3.put_object(Bucket=BUCKET, Key=f"erros/{nome}.csv", Body=linhas_csv(5))
+    checkpoint = tmp_path / 'reprocessamento.jsonl'
+    excluir_pendentes = Arquivador.excluir_pendentes
+
+    def excluir_falhando_b(self):
+        # Nenhum sucesso pode estar no checkpoint antes da exclusão dos originais
+        assert not checkpoint.exists() or checkpoint.read_text(encoding='utf-8') == ''
+        pendentes = [chave for lote in self._pendentes.values() for chave in lote]
+        excluir_pendentes(self)
+        return ['erros/b.csv'] if 'erros/b.csv' in pendentes else []
+
+    monkeypatch.setattr(Arquivador, 'excluir_pendentes', excluir_falhando_b)
+    resumo = Reprocessador(CONFIG, 'erros/', simultaneos=1, checkpoint=str(checkpoint)).executar(BUCKET)
+
+    assert resumo['sucesso'] == 3 and resumo['nao_excluidos'] == ['erros/b.csv']
+    registrados = [json.loads(linha)['chave'] for linha in checkpoint.read_text(encoding='utf-8').splitlines()]
+    # O original que ficou para trás volta a ser processado na próxima execução
+    assert sorted(registrados) == ['erros/a.csv', 'erros/c.csv']
@@ -0,0 +1,78 @@
+import io
+from datetime import datetime, timezone
+
+import pytest
+from chalicelib.core.config import ConfigApp, ConfigDB, ConfigGerenciador, ConfigProcessador
+from chalicelib.core.recursos import RecursosExecucao
+from chalicelib.lambda_function import ProcessadorHandler
+from chalicelib.services.saida_parquet import ExportadorParquet
+from tests.conftest import BUCKET, ConexaoFalsa, chaves, gravar, linhas_csv
+
+pq = pytest.importorskip('pyarrow.parquet')
+
+
+def handler_com(tmp_path, **storage):
+    config = ConfigApp(
+        db=ConfigDB(host='db', user='u', database='lab'),
+        storage=ConfigGerenciador(prefixo_parquet='analytics/', **storage),
+        processor=ConfigProcessador(diretorio_spill=str(tmp_path))
+    )
+    return ProcessadorHandler(RecursosExecucao(config))
+
+
+def ler_parquet(s3, chave):
+    resposta = s3.get_object(Bucket=BUCKET, Key=chave)
+    return pq.ParquetFile(io.BytesIO(resposta['Body'].read())), resposta['ContentType']
+
+
+def test_handler_grava_um_parquet_por_tabela_legivel_de_volta(s3, banco_falso, tmp_path):
+    handler = handler_com(tmp_path, linhas_row_group=30)
+    registro = gravar(s3, 'entrada/lote_01.csv', linhas_csv(100))
+
+    corpo = handler.executar({'Records': [registro]})['body']
+
+    data = datetime.now(timezone.utc).strftime('%Y-%m-%d')
+    assert corpo['processados'] == 1
+    assert chaves(s3, 'analytics/') == sorted(f"analytics/{tabela}/dt={data}/lote_01.parquet" for tabela in handler.colunas)
+    for tabela, colunas in handler.colunas.items():
+        parquet, tipo = ler_parquet(s3, f"analytics/{tabela}/dt={data}/lote_01.parquet")
+        assert tipo == 'application/vnd.apache.parquet'
+        assert parquet.schema_arrow.names == colunas
+        metadados = parquet.metadata
+        assert [metadados.row_group(i).num_rows for i in range(metadados.num_row_groups)] == [30, 30, 30, 10]
+        # Sem DB_DEDUP nem delta, os mesmos registros que foram para o banco, na mesma ordem
+        gravados = [parametros for _, op, query, parametros in banco_falso
+                    if op == 'executemany' and f"INSERT INTO {tabela} " in query]
+        assert [tuple(linha.values()) for linha in parquet.read().to_pylist()] == [r for lote in gravados for r in lote]
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_carga_com_falha_nao_envia_parquet(s3, tmp_path, monkeypatch):
+    import pymysql
+
+    def falhar(operacao, query, parametros):
+        if operacao == 'executemany':
+            raise RuntimeError('banco indisponível')
+
+    monkeypatch.setattr(pymysql, 'connect', lambda **kwargs: ConexaoFalsa(falhar=falhar))
+    registro = gravar(s3, 'entrada/lote_02.csv', linhas_csv(10))
+
+    corpo = handler_com(tmp_path).executar({'Records': [registro]})['body']
+
+    assert corpo['erros'] == 1
+    assert chaves(s3, 'analytics/') == []
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_coluna_so_com_none_no_primeiro_lote_vira_string(s3, tmp_path):
+    exportador = ExportadorParquet(s3, {'t': ['id', 'obs']}, 'analytics', diretorio=str(tmp_path))
+    saida = exportador.abrir(BUCKET, 'entrada/x.csv')
+    saida.adicionar('t', [(1, None), (2, None)])
+    saida.adicionar('t', [(3, 'texto')])
+
+    resultado = saida.concluir()
+
+    parquet, _ = ler_parquet(s3, resultado['arquivos']['t'])
+    assert str(parquet.schema_arrow.field('obs').type) == 'string'
+    assert parquet.read().to_pylist() == [{'id': 1, 'obs': None}, {'id': 2, 'obs': None}, {'id': 3, 'obs': 'texto'}]
+    assert resultado['registros'] == {'t': 3}
@@ -1,15 +1,31 @@
 from chalice import Chalice
-import mysql.connector
-import boto3
+import codecs
 import csv
 import io
 import json
 import os
+import sys
 import logging
+import threading
+import time
+import zlib
 from datetime import datetime
+from itertools import chain
+from operator import itemgetter
 
 app = Chalice(app_name='file-processor')
 
+# boto3 e mysql.connector são carregados no primeiro uso (cold start menor) e
+# continuam acessíveis como app.boto3 / app.mysql
+def __getattr__(name):
+    if name == 'boto3':
+        import boto3
+        return boto3
+    if name == 'mysql':
+        import mysql.connector
+        return mysql
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 # Configurações
 def get_config():
     return {
@@ -24,7 +40,15 @@ def get_config():
             'bucket': os.getenv('S3_BUCKET', 'dev-bucket-lab01'),
             'input_prefix': 'entrada/',
             'processed_prefix': 'processados/',
-            'error_prefix': 'erros/'
+            'error_prefix': 'erros/',
+            'stream_read': os.getenv('S3_STREAM_READ', 'false').lower() == 'true',
+            'chunk_size': int(os.getenv('S3_CHUNK_SIZE', 1024 * 1024))
+        },
+        'db_pool': {
+            'size': int(os.getenv('DB_POOL_SIZE', 2)),
+            'max_idle': float(os.getenv('DB_POOL_MAX_IDLE', 300)),
+            'ping_interval': float(os.getenv('DB_POOL_PING_INTERVAL', 5)),
+            'max_statement_bytes': int(os.getenv('DB_MAX_STATEMENT_BYTES', 16 * 1024 * 1024))
         },
         'batch_size': int(os.getenv('BATCH_SIZE', 1000)),
         'mapping': {
@@ -57,73 +81,333 @@ def get_config():
     }
 
 # Transformações
-def transform_value(value, transform_type):
-    if transform_type == 'date':
-        try:
-            day, month, year = value.split('.')
-            return f"{year}-{month}-{day} 00:00:00"
-        except:
-            return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    elif transform_type == 'ippi':
-        return 1 if value and value.upper() == 'C' else 2
-    elif transform_type == 'now':
+def transform_date(value):
+    try:
+        day, month, year = value.split('.')
+        return f"{year}-{month}-{day} 00:00:00"
+    except:
         return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+def transform_ippi(value):
+    return 1 if value and value.upper() == 'C' else 2
+
+def transform_now(_):
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+TRANSFORMS = {
+    'date': transform_date,
+    'ippi': transform_ippi,
+    'now': transform_now
+}
+
+def transform_value(value, transform_type):
+    transform = TRANSFORMS.get(transform_type)
+    return transform(value) if transform else value
+
+# Valor de colunas que não dependem da linha (constantes e funções)
+def resolve_source(source):
+    if source['type'] == 'constant':
+        value = source['value']
+    elif source['type'] == 'function':
+        value = transform_value(None, source['value'])
+    else:
+        value = None
+    
+    if value is not None and 'transform' in source:
+        value = transform_value(value, source['transform'])
     return value
 
-# Processamento de arquivo
+# Compila o mapeamento em um plano de projeção: cada coluna de origem é lida uma vez
+# por linha e compartilhada entre as tabelas, e constantes são resolvidas uma vez por arquivo
+def compile_mapping(tables):
+    slots = {}
+    indexes = []
+    transforms = []
+    bound = []
+    layouts = []
+    
+    for table in tables:
+        layout = []
+        for col in table['columns']:
+            source = col['source']
+            if source.get('type') != 'column':
+                try:
+                    value = resolve_source(source)
+                except Exception as col_error:
+                    logging.error(f"Erro ao processar coluna {col['name']}: {str(col_error)}")
+                    value = None
+                bound.append(value)
+                layout.append(('bound', len(bound) - 1))
+                continue
+            
+            transform = source.get('transform') if source.get('transform') in TRANSFORMS else None
+            key = (source['index'], transform)
+            if key not in slots:
+                slots[key] = len(indexes)
+                indexes.append(source['index'])
+                if transform:
+                    transforms.append((slots[key], TRANSFORMS[transform], col['name']))
+            layout.append(('slot', slots[key]))
+        layouts.append(layout)
+    
+    # Valores fixos ficam após os slots lidos da linha
+    layouts = [[pos if kind == 'slot' else len(indexes) + pos for kind, pos in layout] for layout in layouts]
+    
+    return {
+        'tables': [table['name'] for table in tables],
+        'indexes': indexes,
+        'transforms': transforms,
+        'bound': bound,
+        'read': _getter(indexes),
+        'min_len': max(indexes) + 1 if indexes else 0,
+        'getters': [_getter(layout) for layout in layouts]
+    }
+
+def _getter(positions):
+    if not positions:
+        return lambda values: ()
+    if len(positions) == 1:
+        return lambda values, pos=positions[0]: (values[pos],)
+    return itemgetter(*positions)
+
+def project_row(plan, row, row_idx):
+    size = len(row)
+    if size >= plan['min_len']:
+        values = list(plan['read'](row))
+    else:
+        values = []
+        for index in plan['indexes']:
+            if index >= size:
+                logging.warning(f"Índice {index} fora do range na linha {row_idx} - usando valor padrão")
+                values.append(None)
+            else:
+                values.append(row[index])
+    
+    for slot, transform, name in plan['transforms']:
+        if values[slot] is not None:
+            try:
+                values[slot] = transform(values[slot])
+            except Exception as col_error:
+                logging.error(f"Erro ao processar coluna {name} na linha {row_idx}: {str(col_error)}")
+                values[slot] = None
+    
+    values += plan['bound']
+    return [getter(values) for getter in plan['getters']]
+
+# Leitura incremental: decodifica blocos de bytes e devolve linhas completas (com '\n'),
+# remontando caracteres multibyte e linhas partidas entre blocos
+def iter_lines(chunks, encoding='utf-8'):
+    decoder = codecs.getincrementaldecoder(encoding)()
+    pending = ''
+    for chunk in chunks:
+        lines = (pending + decoder.decode(chunk)).split('\n')
+        pending = lines.pop()
+        for line in lines:
+            yield line + '\n'
+    pending += decoder.decode(b'', final=True)
+    if pending:
+        yield pending
+
+# Entrada comprimida (.gz / .zst ou assinatura no início do conteúdo), descomprimida em
+# streaming antes da decodificação; zstd depende do pacote opcional zstandard
+COMPRESSED_EXTENSIONS = {'.gz': 'gzip', '.gzip': 'gzip', '.zst': 'zstd', '.zstd': 'zstd'}
+COMPRESSION_MAGIC = ((b'\x1f\x8b', 'gzip'), (b'\x28\xb5\x2f\xfd', 'zstd'))
+
+def detect_codec(key, head):
+    for magic, codec in COMPRESSION_MAGIC:
+        if head.startswith(magic):
+            return codec
+    _, dot, ext = key.rpartition('.')
+    return COMPRESSED_EXTENSIONS.get(f".{ext.lower()}") if dot else None
+
+def _new_decompressor(codec):
+    if codec == 'gzip':
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    import zstandard
+    return zstandard.ZstdDecompressor().decompressobj()
+
+def iter_decompressed(chunks, key):
+    chunks = iter(chunks)
+    first = next(chunks, b'')
+    codec = detect_codec(key, first)
+    if codec is None:
+        if first:
+            yield first
+        yield from chunks
+        return
+    decompressor = _new_decompressor(codec)
+    started = False
+    for data in chain([first], chunks):
+        while data:
+            started = True
+            output = decompressor.decompress(data)
+            if output:
+                yield output
+            if decompressor.eof:
+                # Membros/frames concatenados formam um arquivo válido
+                data = decompressor.unused_data
+                decompressor = _new_decompressor(codec)
+                started = False
+            else:
+                data = b''
+    if started:
+        raise ValueError(f"Arquivo {codec} truncado")
+
+# Processamento de arquivo (conteúdo em texto ou iterador de linhas)
 def process_file(content, config):
     logging.info("Processando arquivo CSV")
-    reader = csv.reader(io.StringIO(content), delimiter=config['mapping']['file_delimiter'])
-    rows = list(reader)
+    lines = io.StringIO(content) if isinstance(content, str) else content
+    reader = csv.reader(lines, delimiter=config['mapping']['file_delimiter'])
     table_data = {table['name']: [] for table in config['mapping']['tables']}
+    plan = compile_mapping(config['mapping']['tables'])
+    outputs = [table_data[name].append for name in plan['tables']]
     
-    for row_idx, row in enumerate(rows, 1):
+    for row_idx, row in enumerate(reader, 1):
         try:
             # Verifica se a linha tem conteúdo válido
             if not row or len(row) == 0:
                 logging.warning(f"Linha {row_idx} vazia - ignorando")
                 continue
-                
-            for table in config['mapping']['tables']:
-                values = []
-                for col in table['columns']:
-                    source = col['source']
-                    try:
-                        if source['type'] == 'column':
-                            # Verifica se o índice existe na linha
-                            if source['index'] >= len(row):
-                                logging.warning(f"Índice {source['index']} fora do range na linha {row_idx} - usando valor padrão")
-                                value = None
-                            else:
-                                value = row[source['index']]
-                        elif source['type'] == 'constant':
-                            value = source['value']
-                        elif source['type'] == 'function':
-                            value = transform_value(None, source['value'])
-                        else:
-                            value = None
-                        
-                        if value is not None and 'transform' in source:
-                            value = transform_value(value, source['transform'])
-                        
-                        values.append(value)
-                    except Exception as col_error:
-                        logging.error(f"Erro ao processar coluna {col['name']} na linha {row_idx}: {str(col_error)}")
-                        values.append(None)  # Usa None como fallback
-                
-                table_data[table['name']].append(tuple(values))
+            
+            for append, values in zip(outputs, project_row(plan, row, row_idx)):
+                append(values)
         except Exception as e:
             logging.error(f"Erro ao processar linha {row_idx}: {str(e)}")
             continue
     
     return table_data
 
-# Banco de dados (restante do código permanece igual)
-def save_to_db(table_data, config):
+# Pool de conexões no escopo do módulo: sobrevive entre invocações quentes da Lambda.
+# Conexões ociosas além de max_idle são fechadas; além de ping_interval passam por ping()
+_POOL = {'idle': [], 'lock': threading.Lock()}
+CONNECTION_LOST_CODES = {2006, 2013, 2014, 2045, 2055}
+
+def is_connection_lost(error):
+    errors = sys.modules.get('mysql.connector.errors')
+    if errors is None:
+        return False
+    if isinstance(error, errors.InterfaceError):
+        return True
+    return isinstance(error, errors.OperationalError) and error.errno in CONNECTION_LOST_CODES
+
+def _pool_key(config):
+    return tuple(sorted(config['db'].items()))
+
+def _close_connection(conn):
     try:
-        conn = mysql.connector.connect(**config['db'])
-        cursor = conn.cursor()
+        conn.close()
+    except Exception:
+        pass
+
+def get_connection(config, fresh=False):
+    options = config.get('db_pool', {})
+    key = _pool_key(config)
+    while not fresh:
+        with _POOL['lock']:
+            idle = [entry for entry in _POOL['idle'] if entry[0] == key]
+            if not idle:
+                break
+            entry = idle[-1]
+            _POOL['idle'].remove(entry)
         
+        _, conn, last_used = entry
+        idle_for = time.monotonic() - last_used
+        if idle_for > options.get('max_idle', 300):
+            logging.info(f"Conexão ociosa há {idle_for:.0f}s descartada")
+            _close_connection(conn)
+            continue
+        if idle_for > options.get('ping_interval', 5):
+            try:
+                conn.ping(reconnect=False)
+            except Exception as e:
+                logging.warning(f"Conexão inválida no ping, descartando: {str(e)}")
+                _close_connection(conn)
+                continue
+        return conn
+    
+    import mysql.connector
+    return mysql.connector.connect(**config['db'])
+
+def release_connection(conn, config):
+    key = _pool_key(config)
+    with _POOL['lock']:
+        if sum(1 for entry in _POOL['idle'] if entry[0] == key) < config.get('db_pool', {}).get('size', 2):
+            _POOL['idle'].append((key, conn, time.monotonic()))
+            return
+    _close_connection(conn)
+
+def reset_pool():
+    with _POOL['lock']:
+        idle, _POOL['idle'] = _POOL['idle'], []
+        _PACKET_BUDGET.clear()
+    for _, conn, _ in idle:
+        _close_connection(conn)
+
+# Lotes do executemany dimensionados em bytes: o mysql.connector junta todas as linhas
+# de uma chamada em um único INSERT, que não pode passar do max_allowed_packet
+DEFAULT_MAX_ALLOWED_PACKET = 4 * 1024 * 1024
+PACKET_HEADROOM = 64 * 1024
+_PACKET_BUDGET = {}
+
+def packet_budget(conn, config):
+    key = _pool_key(config)
+    budget = _PACKET_BUDGET.get(key)
+    if budget is None:
+        packet = DEFAULT_MAX_ALLOWED_PACKET
+        try:
+            cursor = conn.cursor()
+            try:
+                cursor.execute("SELECT @@max_allowed_packet")
+                value = cursor.fetchone()[0]
+            finally:
+                cursor.close()
+            if isinstance(value, int):
+                packet = value
+        except Exception as e:
+            if is_connection_lost(e):
+                raise
+            logging.warning(f"max_allowed_packet indisponível, usando {packet} bytes: {str(e)}")
+        cap = int(config.get('db_pool', {}).get('max_statement_bytes', 16 * 1024 * 1024))
+        budget = _PACKET_BUDGET[key] = min(packet, cap) - PACKET_HEADROOM
+    return budget
+
+# Caracteres que o escape do MySQL troca por 2 bytes (\\, \', \", \n, \r, \0, \Z)
+_ESCAPED_CHARS = '\\\'"\n\r\x00\x1a'
+
+def _row_bytes(row):
+    # Tamanho do literal da linha no VALUES: parênteses, vírgula entre linhas e ", " entre
+    # valores; strings escapadas e entre aspas, datas e demais não numéricos entre aspas
+    size = 3
+    for value in row:
+        if value is None:
+            size += 4 + 2
+        elif isinstance(value, (int, float)):
+            size += len(str(value)) + 2
+        elif isinstance(value, str):
+            size += len(value.encode('utf-8')) + sum(map(value.count, _ESCAPED_CHARS)) + 2 + 2
+        else:
+            size += len(str(value)) + 2 + 2
+    return size
+
+def iter_byte_batches(rows, budget):
+    batch = []
+    size = 0
+    for row in rows:
+        row_size = _row_bytes(row)
+        if batch and size + row_size > budget:
+            yield batch
+            batch = []
+            size = 0
+        batch.append(row)
+        size += row_size
+    if batch:
+        yield batch
+
+# Banco de dados (restante do código permanece igual)
+def _write_tables(conn, table_data, config):
+    budget = packet_budget(conn, config)
+    cursor = conn.cursor()
+    try:
         for table_name, data in table_data.items():
             if not data:
                 continue
@@ -137,32 +421,77 @@ def save_to_db(table_data, config):
                 ON DUPLICATE KEY UPDATE {', '.join(f"{col}=VALUES({col})" for col in columns)}
             """
             
-            for i in range(0, len(data), config['batch_size']):
-                cursor.executemany(query, data[i:i+config['batch_size']])
-                logging.info(f"Persistido lote {i//config['batch_size'] + 1}")
+            for i, batch in enumerate(iter_byte_batches(data, budget), 1):
+                cursor.executemany(query, batch)
+                logging.info(f"Persistido lote {i} ({len(batch)} linhas)")
         
         conn.commit()
-        logging.info("Dados persistidos com sucesso")
-        return True
-    except Exception as e:
-        logging.error(f"Erro na persistência: {str(e)}")
-        if conn:
-            conn.rollback()
-        raise
     finally:
-        if conn and conn.is_connected():
-            conn.close()
+        cursor.close()
+
+def save_to_db(table_data, config):
+    conn = None
+    # Conexão perdida (ex.: encerrada pelo servidor enquanto ociosa) é refeita uma vez
+    for attempt in range(2):
+        try:
+            conn = get_connection(config, fresh=attempt > 0)
+            _write_tables(conn, table_data, config)
+            logging.info("Dados persistidos com sucesso")
+            release_connection(conn, config)
+            return True
+        except Exception as e:
+            if conn is not None and is_connection_lost(e):
+                _close_connection(conn)
+                conn = None
+                if attempt == 0:
+                    logging.warning(f"Conexão perdida ({str(e)}) - reconectando")
+                    continue
+            logging.error(f"Erro na persistência: {str(e)}")
+            if conn is not None:
+                try:
+                    conn.rollback()
+                    release_connection(conn, config)
+                except Exception:
+                    _close_connection(conn)
+            raise
 
             
 
+# Clientes boto3 criados uma vez por ambiente de execução (sob demanda) e
+# reaproveitados nas invocações quentes
+_CLIENTS = {}
+
+def _boto_config():
+    from botocore.config import Config
+    return Config(
+        max_pool_connections=int(os.getenv('AWS_MAX_POOL_CONNECTIONS', 10)),
+        tcp_keepalive=True,
+        connect_timeout=int(os.getenv('AWS_CONNECT_TIMEOUT', 5)),
+        read_timeout=int(os.getenv('AWS_READ_TIMEOUT', 60)),
+        retries={'max_attempts': int(os.getenv('AWS_MAX_ATTEMPTS', 5)), 'mode': 'standard'}
+    )
+
+def get_client(service):
+    client = _CLIENTS.get(service)
+    if client is None:
+        import boto3
+        client = _CLIENTS[service] = boto3.client(service, config=_boto_config())
+    return client
+
+def reset_clients():
+    _CLIENTS.clear()
+
 # S3 (restante do código permanece igual)
 def handle_s3_file(file_key, config):
-    s3 = boto3.client('s3')
+    s3 = get_client('s3')
     
     try:
         # Obter arquivo
         response = s3.get_object(Bucket=config['s3']['bucket'], Key=file_key)
-        content = response['Body'].read().decode('utf-8')
+        if config['s3'].get('stream_read'):
+            content = iter_lines(iter_decompressed(response['Body'].iter_chunks(config['s3']['chunk_size']), file_key))
+        else:
+            content = b''.join(iter_decompressed([response['Body'].read()], file_key)).decode('utf-8')
         
         # Processar
         table_data = process_file(content, config)
@@ -203,12 +532,13 @@ def handle_s3_file(file_key, config):
             'file': file_key
         }
 
-# Handler do Chalice
+# Handler do Chalice (configuração lida uma vez por ambiente de execução)
+CONFIG = get_config()
+
 @app.on_s3_event(
-    bucket=get_config()['s3']['bucket'],
+    bucket=CONFIG['s3']['bucket'],
     events=['s3:ObjectCreated:*'],
-    prefix=get_config()['s3']['input_prefix']
+    prefix=CONFIG['s3']['input_prefix']
 )
 def handle_s3_event(event):
-    config = get_config()
-    return handle_s3_file(event.key, config)
\ No newline at end of file
+    return handle_s3_file(event.key, CONFIG)
\ No newline at end of file
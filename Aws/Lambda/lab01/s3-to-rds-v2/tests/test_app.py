@@ -6,6 +6,20 @@ from unittest.mock import patch
 from app import process_file
 from datetime import datetime
 from app import transform_value
+from app import compile_mapping, get_config, iter_lines
+from app import reset_pool, reset_clients, get_client, iter_byte_batches
+from app import detect_codec, iter_decompressed
+import gzip
+import mysql.connector
+
+@pytest.fixture(autouse=True)
+def cold_start():
+    # Pool e clientes são globais (sobrevivem entre invocações); cada teste começa do zero
+    reset_pool()
+    reset_clients()
+    yield
+    reset_pool()
+    reset_clients()
 
 @pytest.fixture
 def mock_config():
@@ -237,13 +251,132 @@ def test_transform_value_no_transform():
     assert transform_value('some_value', 'unknown') == 'some_value'
 
 
+def test_compile_mapping_shares_source_columns():
+    plan = compile_mapping(get_config()['mapping']['tables'])
+    # índices 4 e 7 são usados por mais de uma coluna, mas lidos uma única vez
+    assert sorted(plan['indexes']) == [0, 1, 2, 4, 7]
 
 
+def test_process_file_two_tables_constants_after_shared_columns():
+    config = get_config()
+    content = "C;12345678;01.02.2023;01.03.2023;456;789;05.02.2023;text_1"
+    table_data = process_file(content, config)
+    row_9088 = table_data['tbv9088_regr_prod_plar'][0]
+    row_9086 = table_data['tbv9086_carc_regr_prod_plar'][0]
+    assert row_9088[:5] == ('456', 'text_1', 'text_1', 'S', '2023-02-01 00:00:00')
+    assert row_9088[6] == '000000000'
+    assert row_9086[:3] == ('456', 1, '12345678')
+    assert row_9086[4] == '000000000'
 
 
 
+def test_iter_lines_multibyte_and_quoted_newline_across_chunks():
+    content = 'C;1;01.01.2023;x;"linha\nquebrada";5;6;ação€\r\nI;2;02.02.2023;y;7;8;9;fim'
+    raw = content.encode('utf-8')
+    chunks = [raw[i:i + 3] for i in range(0, len(raw), 3)]
+    lines = list(iter_lines(chunks))
+    assert ''.join(lines) == content
+    assert all(line.endswith('\n') for line in lines[:-1])
 
 
+def test_process_file_from_line_iterator(mock_config):
+    content = "value1;value2;01.01.2023;C;value5;value6;value7;text\n"
+    chunks = [content.encode('utf-8')[i:i + 4] for i in range(0, len(content), 4)]
+    assert process_file(iter_lines(chunks), mock_config) == process_file(content, mock_config)
 
 
+@patch('app.mysql.connector.connect')
+def test_save_to_db_reuses_pooled_connection(mock_connect, mock_config):
+    table_data = {'tbv9088_regr_prod_plar': [('value1',)]}
+    save_to_db(table_data, mock_config)
+    save_to_db(table_data, mock_config)
+    assert mock_connect.call_count == 1
+
+
+@patch('app.mysql.connector.connect')
+def test_save_to_db_reconnects_on_lost_connection(mock_connect, mock_config):
+    stale, fresh = MagicMock(), MagicMock()
+    stale.cursor.return_value.executemany.side_effect = mysql.connector.errors.OperationalError(
+        msg='Lost connection to MySQL server during query', errno=2013
+    )
+    mock_connect.side_effect = [stale, fresh]
+
+    assert save_to_db({'tbv9088_regr_prod_plar': [('value1',)]}, mock_config) is True
+    stale.close.assert_called()
+    fresh.commit.assert_called_once()
+
+
+@patch('app.boto3.client')
+def test_get_client_created_once_per_environment(mock_boto3_client):
+    assert get_client('s3') is get_client('s3')
+    mock_boto3_client.assert_called_once()
+
+
+def test_iter_byte_batches_respects_budget():
+    rows = [('x' * 255, 1)] * 10 + [('y', 2)] * 100
+    batches = list(iter_byte_batches(rows, 1024))
+    assert [row for batch in batches for row in batch] == rows
+    assert all(sum(len(v[0]) for v in batch) < 1024 for batch in batches)
+    assert len(batches[0]) == 3
+
+
+
+def test_iter_byte_batches_counts_escaping_and_quoted_dates():
+    from mysql.connector.conversion import MySQLConverter
+    converter = MySQLConverter()
+
+    def values_bytes(batch):
+        # VALUES montado como no executemany: literais escapados entre aspas
+        literals = [b'(' + b', '.join(bytes(converter.quote(converter.escape(converter.to_mysql(v)))) for v in row) + b')'
+                    for row in batch]
+        return len(b','.join(literals))
+
+    rows = [('"\\\'' * 60 + 'ação\n', datetime(2023, 1, 1, 12, 30), 7, None)] * 40
+    budget = 4096
+    batches = list(iter_byte_batches(rows, budget))
+    assert [row for batch in batches for row in batch] == rows
+    assert all(values_bytes(batch) <= budget for batch in batches)
+    # O orçamento é aproveitado: mais uma linha passaria do limite
+    assert values_bytes(batches[0] + [rows[0]]) > budget
+
+@patch('app.mysql.connector.connect')
+def test_save_to_db_sizes_statements_by_max_allowed_packet(mock_connect, mock_config):
+    mock_cursor = mock_connect.return_value.cursor.return_value
+    mock_cursor.fetchone.return_value = (64 * 1024 + 2000,)
+    rows = [('value1', 'x' * 255)] * 20
+
+    save_to_db({'tbv9088_regr_prod_plar': rows}, mock_config)
+    calls = mock_cursor.executemany.call_args_list
+    assert len(calls) > 1
+    assert sum(len(c.args[1]) for c in calls) == 20
+
+
+
+def test_iter_decompressed_gzip_members_across_chunks():
+    content = "value1;value2;01.01.2023;C;value5;ação\n" * 50
+    raw = gzip.compress(content[:300].encode('utf-8')) + gzip.compress(content[300:].encode('utf-8'))
+    chunks = [raw[i:i + 7] for i in range(0, len(raw), 7)]
+    assert detect_codec('entrada/a.b.csv', raw[:7]) == 'gzip'
+    assert ''.join(iter_lines(iter_decompressed(chunks, 'entrada/a.b.csv'))) == content
+    assert b''.join(iter_decompressed([b'a;b\n'], 'entrada/a.csv')) == b'a;b\n'
+
+
+def test_iter_decompressed_truncated_gzip():
+    raw = gzip.compress(b"value1;value2\n" * 100)
+    with pytest.raises(ValueError):
+        b''.join(iter_decompressed([raw[:len(raw) // 2]], 'entrada/a.csv.gz'))
+
 
+@patch('app.boto3.client')
+@patch('app.save_to_db')
+def test_handle_s3_file_gzip_input(mock_save_to_db, mock_boto3_client, mock_config):
+    mock_s3 = MagicMock()
+    mock_boto3_client.return_value = mock_s3
+    content = b"value1;value2;01.01.2023;C;value5;value6;value7;text\n"
+    mock_s3.get_object.return_value = {'Body': MagicMock(read=lambda: gzip.compress(content))}
+
+    result = handle_s3_file('entrada/test.2023.csv.gz', mock_config)
+
+    assert result['status'] == 'success'
+    assert result['processed_tables']['tbv9088_regr_prod_plar'] == 1
+    assert mock_save_to_db.call_args.args[0] == process_file(content.decode('utf-8'), mock_config)
@@ -41,7 +41,12 @@ def read_and_move_s3_file(bucket_name, file_key, config):
         file_name = file_key.split('/')[-1]
         
         # Criar novo nome com data de processamento
-        processed_file_name = f"{file_name.split('.')[0]}_{current_date}.{file_name.split('.')[1]}"
+        # Nomes com vários pontos mantêm tudo antes da extensão ('a.b.csv.gz' -> 'a.b_<data>.csv.gz')
+        base_name, extension = os.path.splitext(file_name)
+        if extension.lower() in ('.gz', '.zst'):
+            base_name, inner_extension = os.path.splitext(base_name)
+            extension = inner_extension + extension
+        processed_file_name = f"{base_name}_{current_date}{extension}"
         
         # Mover arquivo para processados com novo nome
         new_key = file_key.replace(
@@ -1,4 +1,3 @@
-import boto3
 import csv
 import io
 import os
@@ -52,8 +51,24 @@ def get_config():
     }
 
 
+# Cliente S3 criado uma vez por ambiente de execução e reaproveitado entre registros e invocações
+_s3_client = None
+
+def get_s3_client():
+    global _s3_client
+    if _s3_client is None:
+        import boto3
+        from botocore.config import Config
+        _s3_client = boto3.client('s3', config=Config(
+            max_pool_connections=10,
+            tcp_keepalive=True,
+            retries={'max_attempts': 5, 'mode': 'standard'}
+        ))
+    return _s3_client
+
+
 def read_and_move_s3_file(bucket_name, file_key, config):
-    s3 = boto3.client('s3')
+    s3 = get_s3_client()
     try:
         # Validar prefixo de entrada
         if not file_key.startswith(config['s3']['input_prefix']):
@@ -78,7 +93,12 @@ def read_and_move_s3_file(bucket_name, file_key, config):
         file_name = file_key.split('/')[-1]
         
         # Criar novo nome com data de processamento
-        processed_file_name = f"{file_name.split('.')[0]}_{current_date}.{file_name.split('.')[1]}"
+        # Nomes com vários pontos mantêm tudo antes da extensão ('a.b.csv.gz' -> 'a.b_<data>.csv.gz')
+        base_name, extension = os.path.splitext(file_name)
+        if extension.lower() in ('.gz', '.zst'):
+            base_name, inner_extension = os.path.splitext(base_name)
+            extension = inner_extension + extension
+        processed_file_name = f"{base_name}_{current_date}{extension}"
         
         # Mover arquivo para processados com novo nome
         new_key = file_key.replace(
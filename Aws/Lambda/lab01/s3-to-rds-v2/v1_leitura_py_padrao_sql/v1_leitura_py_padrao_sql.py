@@ -1,12 +1,9 @@
-import boto3
 import csv
 import io
 import os
 import json
 import logging
 from datetime import datetime
-from sqlalchemy import create_engine, text
-from sqlalchemy.orm import sessionmaker
 
 # Configurações
 def get_config():
@@ -87,7 +84,9 @@ def process_file(content, config):
     return table_data
 
 # Banco de dados com SQLAlchemy (mantido igual)
+# SQLAlchemy só é importado quando o banco é usado de fato (fora do cold start)
 def get_engine(config):
+    from sqlalchemy import create_engine
     db = config['db']
     connection_string = (
         f"mysql+mysqlconnector://{db['user']}:{db['password']}@{db['host']}:{db['port']}/{db['database']}"
@@ -95,6 +94,8 @@ def get_engine(config):
     return create_engine(connection_string)
 
 def save_to_db(table_data, config):
+    from sqlalchemy import text
+    from sqlalchemy.orm import sessionmaker
     engine = get_engine(config)
     Session = sessionmaker(bind=engine)
     session = Session()
@@ -127,9 +128,25 @@ def save_to_db(table_data, config):
         session.close()
 
 
+# Cliente S3 criado uma vez por ambiente de execução e reaproveitado entre registros e invocações
+_s3_client = None
+
+def get_s3_client():
+    global _s3_client
+    if _s3_client is None:
+        import boto3
+        from botocore.config import Config
+        _s3_client = boto3.client('s3', config=Config(
+            max_pool_connections=10,
+            tcp_keepalive=True,
+            retries={'max_attempts': 5, 'mode': 'standard'}
+        ))
+    return _s3_client
+
+
 # Função de processamento do S3
 def process_s3_file(bucket_name, file_key, config):
-    s3 = boto3.client('s3')
+    s3 = get_s3_client()
     try:
         # Validar prefixo de entrada
         if not file_key.startswith(config['s3']['input_prefix']):
@@ -148,7 +165,12 @@ def process_s3_file(bucket_name, file_key, config):
         # Obter data atual para adicionar ao nome do arquivo
         current_date = datetime.now().strftime('%Y%m%d_%H%M%S')
         file_name = file_key.split('/')[-1]
-        processed_file_name = f"{file_name.split('.')[0]}_{current_date}.{file_name.split('.')[1]}"
+        # Nomes com vários pontos mantêm tudo antes da extensão ('a.b.csv.gz' -> 'a.b_<data>.csv.gz')
+        base_name, extension = os.path.splitext(file_name)
+        if extension.lower() in ('.gz', '.zst'):
+            base_name, inner_extension = os.path.splitext(base_name)
+            extension = inner_extension + extension
+        processed_file_name = f"{base_name}_{current_date}{extension}"
         
         # Mover arquivo para processados com novo nome
         new_key = file_key.replace(
@@ -0,0 +1,241 @@
+"""Reprocessamento em massa dos arquivos de um prefixo (entrada/, erros/ ...)
+
+Uso local, com S3 do moto_server/MinIO e MySQL local:
+    AWS_ENDPOINT_URL=http://localhost:5000 DB_HOST=localhost DB_USER=root DB_PASSWORD=... DB_SCHEMA=lab \\
+        python -m chalicelib.backfill --bucket meu-bucket --prefix erros/ --workers 8
+
+Os arquivos são lidos direto do prefixo informado (nada é copiado para entrada/, o que
+dispararia a notificação do S3) e, com sucesso, movidos para processados/. O checkpoint
+registra cada arquivo concluído depois que o original foi excluído do prefixo; uma nova
+execução após uma queda pula esses arquivos.
+"""
+import argparse
+import dataclasses
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterator, List, Optional, Set
+from chalicelib.core.config import AppConfig
+from chalicelib.core.logger import logger
+from chalicelib.core.runtime import Runtime
+from chalicelib.lambda_function import process_record
+from chalicelib.services.ledger import DONE
+
+# Arquivos movidos por thread antes de excluir os originais em lote
+DELETES_PER_FLUSH = 100
+
+
+class Checkpoint:
+    """Arquivo JSONL com um registro por arquivo processado, gravado a cada conclusão"""
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def completed(self) -> Set[str]:
+        """Chaves já concluídas em execuções anteriores
+
+        Só contam os sucessos e os arquivos que o ledger já tinha como concluídos; um arquivo
+        ignorado por estar em outra invocação (BUSY) volta a ser processado.
+        """
+        if not self.path or not os.path.exists(self.path):
+            return set()
+        completed = set()
+        line = '\n'
+        with open(self.path, encoding='utf-8') as source:
+            for line in source:
+                try:
+                    item = json.loads(line)
+                except ValueError:
+                    # Última linha cortada por uma queda no meio da gravação
+                    continue
+                if item.get('status') == 'success' or (item.get('status') == 'skipped' and item.get('reason') == DONE):
+                    completed.add(item['key'])
+        if not line.endswith('\n'):
+            # Termina a linha cortada para que o próximo registro não seja colado a ela
+            with open(self.path, 'a', encoding='utf-8') as output:
+                output.write('\n')
+        return completed
+
+    def record(self, key: str, result: Dict[str, Any]):
+        if not self.path:
+            return
+        item = {'key': key, 'status': result.get('status'), 'file': result.get('file'),
+                'reason': result.get('reason'), 'error': result.get('error')}
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as output:
+                output.write(json.dumps(item, ensure_ascii=False) + '\n')
+                output.flush()
+                os.fsync(output.fileno())
+
+
+class Backfill:
+    """Lista um prefixo com paginação e processa os arquivos em paralelo com process_record
+
+    Cada thread usa seu próprio Runtime (estatísticas do banco e exclusões pendentes não
+    são compartilhadas); o pool de conexões é comum a todas, pois é indexado pela configuração.
+    Com COALESCE_MAX_BYTES, os arquivos pequenos são processados em grupos de até
+    COALESCE_MAX_FILES, cada grupo em uma única transação.
+    """
+
+    def __init__(self, config: AppConfig, prefix: str, workers: int = 4, checkpoint: Optional[str] = None):
+        """
+        Args:
+            config: Configuração base; a entrada passa a ser `prefix`
+            prefix: Prefixo a reprocessar (entrada/, erros/ ...)
+            workers: Arquivos processados ao mesmo tempo
+            checkpoint: Caminho do JSONL de retomada (None desliga)
+        """
+        self.workers = max(1, workers)
+        s3 = dataclasses.replace(config.s3, input_prefix=prefix)
+        # Uma conexão por arquivo em andamento, sem abrir e fechar a cada devolução ao pool
+        db = dataclasses.replace(config.db, pool_size=max(config.db.pool_size, self.workers))
+        self.config = dataclasses.replace(config, s3=s3, db=db)
+        self.prefix = prefix
+        self.checkpoint = Checkpoint(checkpoint)
+        self._local = threading.local()
+        self._runtimes = []
+        self._lock = threading.Lock()
+
+    def list(self, bucket: str) -> Iterator[Dict[str, Any]]:
+        """Objetos do prefixo, página a página (list_objects_v2)"""
+        paginator = self._runtime().client('s3').get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=bucket, Prefix=self.prefix):
+            for obj in page.get('Contents', []):
+                if not obj['Key'].endswith('/'):
+                    yield obj
+
+    def _runtime(self) -> Runtime:
+        runtime = getattr(self._local, 'runtime', None)
+        if runtime is None:
+            runtime = self._local.runtime = Runtime(self.config)
+            self._local.moved = 0
+            # Sucessos aguardando a exclusão do original para entrar no checkpoint
+            self._local.unflushed = []
+            with self._lock:
+                # boto3.client() na sessão padrão não é seguro entre threads
+                runtime.client('s3')
+                self._runtimes.append((runtime, self._local.unflushed))
+        return runtime
+
+    def _flush(self, runtime: Runtime, unflushed: List[tuple]) -> List[str]:
+        """Exclui os originais movidos e só então registra os sucessos no checkpoint
+
+        Um original que não pôde ser excluído continua no prefixo e fica fora do checkpoint,
+        para que a próxima execução o processe de novo.
+        """
+        undeleted = runtime.storage.flush_deletes()
+        skipped = set(undeleted)
+        for key, result in unflushed:
+            if key not in skipped:
+                self.checkpoint.record(key, result)
+        unflushed.clear()
+        return undeleted
+
+    def _process(self, bucket: str, objects: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Processa um arquivo com process_record ou, com mais de um, o grupo com o Coalescer"""
+        runtime = self._runtime()
+        records = [{'s3': {
+            'bucket': {'name': bucket},
+            'object': {'key': obj['Key'], 'eTag': obj.get('ETag', '').strip('"'), 'size': obj['Size']}
+        }} for obj in objects]
+        try:
+            if len(records) > 1:
+                results = runtime.coalescer.process(records, os.urandom(16).hex())
+            else:
+                results = [process_record(records[0], None, runtime)]
+        except Exception as e:
+            logger.error(f"Erro ao processar {', '.join(obj['Key'] for obj in objects)}: {str(e)}")
+            results = [{'status': 'error', 'file': obj['Key'], 'error': str(e)} for obj in objects]
+        for obj, result in zip(objects, results):
+            if result['status'] == 'success':
+                self._local.unflushed.append((obj['Key'], result))
+                self._local.moved += 1
+                if self._local.moved % DELETES_PER_FLUSH == 0:
+                    self._flush(runtime, self._local.unflushed)
+            else:
+                self.checkpoint.record(obj['Key'], result)
+        return results
+
+    def _units(self, bucket: str, completed: Set[str], summary: Dict[str, Any]) -> Iterator[List[Dict[str, Any]]]:
+        """Arquivos a processar, um a um ou, com COALESCE_MAX_BYTES, os pequenos em grupos"""
+        max_bytes = self.config.coalesce_max_bytes
+        group = []
+        for obj in self.list(bucket):
+            if obj['Key'] in completed:
+                summary['resumed'] += 1
+                continue
+            if max_bytes <= 0 or obj['Size'] > max_bytes:
+                yield [obj]
+                continue
+            group.append(obj)
+            if len(group) >= self.config.coalesce_max_files:
+                yield group
+                group = []
+        if group:
+            yield group
+
+    def run(self, bucket: str) -> Dict[str, Any]:
+        """Processa todo o prefixo e retorna o resumo de vazão"""
+        completed = self.checkpoint.completed()
+        summary = {'files': 0, 'success': 0, 'errors': 0, 'skipped': 0, 'resumed': 0, 'rows': 0, 'bytes': 0}
+        failures = []
+        start = time.perf_counter()
+
+        def account(future, objects):
+            for obj, result in zip(objects, future.result()):
+                summary['files'] += 1
+                if result['status'] == 'success':
+                    summary['success'] += 1
+                    summary['bytes'] += obj['Size']
+                    summary['rows'] += sum((result.get('processed') or {}).values())
+                elif result['status'] == 'skipped':
+                    summary['skipped'] += 1
+                else:
+                    summary['errors'] += 1
+                    failures.append({'file': obj['Key'], 'error': result.get('error')})
+
+        with ThreadPoolExecutor(self.workers, thread_name_prefix='backfill') as executor:
+            pending = {}
+            for objects in self._units(bucket, completed, summary):
+                # Lista sob demanda: no máximo 2x workers arquivos ou grupos aguardando
+                if len(pending) >= 2 * self.workers:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        account(future, pending.pop(future))
+                pending[executor.submit(self._process, bucket, objects)] = objects
+            for future in list(pending):
+                account(future, pending.pop(future))
+
+        undeleted = []
+        for runtime, unflushed in self._runtimes:
+            undeleted.extend(self._flush(runtime, unflushed))
+
+        seconds = time.perf_counter() - start
+        summary.update({
+            'seconds': round(seconds, 3),
+            'files_per_second': round(summary['files'] / seconds, 2) if seconds else None,
+            'rows_per_second': round(summary['rows'] / seconds) if seconds else None,
+            'mb_per_second': round(summary['bytes'] / 1024 / 1024 / seconds, 2) if seconds else None,
+            'failures': failures,
+            'undeleted_files': undeleted
+        })
+        return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bucket', required=True)
+    parser.add_argument('--prefix', default='entrada/')
+    parser.add_argument('--workers', type=int, default=int(os.getenv('BACKFILL_CONCURRENCY', 4)))
+    parser.add_argument('--checkpoint', default='backfill.jsonl', help="JSONL de retomada ('' desliga)")
+    args = parser.parse_args()
+
+    summary = Backfill(AppConfig(), args.prefix, args.workers, args.checkpoint or None).run(args.bucket)
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -8,18 +8,60 @@ class DBConfig:
     password: str = os.getenv('DB_PASSWORD')
     database: str = os.getenv('DB_SCHEMA')
     port: int = 3306
+    pool_size: int = int(os.getenv('DB_POOL_SIZE', 2))
+    pool_max_idle: float = float(os.getenv('DB_POOL_MAX_IDLE', 300))
+    pool_ping_interval: float = float(os.getenv('DB_POOL_PING_INTERVAL', 5))
+    loader: str = os.getenv('DB_LOADER', 'executemany')  # executemany | load_data
+    max_statement_bytes: int = int(os.getenv('DB_MAX_STATEMENT_BYTES', 16 * 1024 * 1024))
+    batch_min: int = int(os.getenv('BATCH_MIN', 100))
+    batch_max: int = int(os.getenv('BATCH_MAX', 20000))
+    batch_target_seconds: float = float(os.getenv('BATCH_TARGET_SECONDS', 1.0))
+    parallel_tables: bool = os.getenv('DB_PARALLEL_TABLES', 'false').lower() == 'true'
+    shards: int = int(os.getenv('DB_SHARDS', 1))
+    shard_mode: str = os.getenv('DB_SHARD_MODE', 'range')  # range | hash
+    dedup: bool = os.getenv('DB_DEDUP', 'false').lower() == 'true'
+    typed: bool = os.getenv('DB_TYPED', 'false').lower() == 'true'
+    delta: bool = os.getenv('DB_DELTA', 'false').lower() == 'true'
+    delta_table: str = os.getenv('DB_DELTA_TABLE', 'etl_row_hash')
 
 @dataclass
 class S3Config:
     input_prefix: str = 'entrada/'
     processed_prefix: str = 'processados/'
     error_prefix: str = 'erros/'
+    stream_read: bool = os.getenv('S3_STREAM_READ', 'false').lower() == 'true'
+    chunk_size: int = int(os.getenv('S3_CHUNK_SIZE', 1024 * 1024))
+    range_size: int = int(os.getenv('S3_RANGE_SIZE', 8 * 1024 * 1024))  # 0 desliga as faixas paralelas
+    range_concurrency: int = int(os.getenv('S3_RANGE_CONCURRENCY', 8))
+    multipart_copy_threshold: int = int(os.getenv('S3_MULTIPART_COPY_THRESHOLD', 128 * 1024 * 1024))
+    copy_part_size: int = int(os.getenv('S3_COPY_PART_SIZE', 64 * 1024 * 1024))
+    copy_concurrency: int = int(os.getenv('S3_COPY_CONCURRENCY', 8))
+    archive_compression: str = os.getenv('ARCHIVE_COMPRESSION', 'none')  # none | gzip | zstd
+    archive_compression_level: int = int(os.getenv('ARCHIVE_COMPRESSION_LEVEL', 0))  # 0 = padrão do codec
+    max_pool_connections: int = int(os.getenv('S3_MAX_POOL_CONNECTIONS', 10))
+    connect_timeout: int = int(os.getenv('S3_CONNECT_TIMEOUT', 5))
+    read_timeout: int = int(os.getenv('S3_READ_TIMEOUT', 60))
+    max_attempts: int = int(os.getenv('S3_MAX_ATTEMPTS', 5))
 
 @dataclass
 class AppConfig:
     db: DBConfig = field(default_factory=DBConfig)  
     s3: S3Config = field(default_factory=S3Config)  
     batch_size: int = int(os.getenv('BATCH_SIZE', 1000))
+    columnar: bool = os.getenv('COLUMNAR', 'false').lower() == 'true'
+    pipeline: bool = os.getenv('PIPELINE', 'false').lower() == 'true'
+    pipeline_queue_size: int = int(os.getenv('PIPELINE_QUEUE_SIZE', 4))
+    parse_processes: int = int(os.getenv('PARSE_PROCESSES', 0))  # > 1 liga o parsing em vários processos
+    spill_dir: str = os.getenv('SPILL_DIR')  # None = diretório temporário padrão (/tmp)
+    ledger: str = os.getenv('LEDGER', 'none')  # none | mysql | memory
+    ledger_table: str = os.getenv('LEDGER_TABLE', 'etl_file_ledger')
+    ledger_lease_seconds: int = int(os.getenv('LEDGER_LEASE_SECONDS', 900))
+    coalesce_max_bytes: int = int(os.getenv('COALESCE_MAX_BYTES', 0))  # > 0 agrupa arquivos até esse tamanho
+    coalesce_max_files: int = int(os.getenv('COALESCE_MAX_FILES', 200))
+    parquet_prefix: str = os.getenv('PARQUET_PREFIX', '')  # ex.: analytics/ ('' desliga a saída Parquet)
+    parquet_bucket: str = os.getenv('PARQUET_BUCKET')  # None = bucket do arquivo de origem
+    parquet_row_group_rows: int = int(os.getenv('PARQUET_ROW_GROUP_ROWS', 250000))
+    parquet_compression: str = os.getenv('PARQUET_COMPRESSION', 'snappy')  # snappy | zstd | gzip | none
 
 # Mapeamento das colunas (exemplo)
 TABLE_MAPPINGS = [
@@ -37,6 +79,7 @@ TABLE_MAPPINGS = [
     },
     {
         'name': 'tbv9086_carc_regr_prod_plar',
+        'depends_on': ['tbv9088_regr_prod_plar'],
         'columns': [
             {'name': 'cod_regr_prod_plar', 'source': {'type': 'column', 'index': 4}},
             {'name': 'cod_tipo_carc_espo_prod', 'source': {'type': 'column', 'index': 0, 'transform': 'ippi'}},
@@ -0,0 +1,141 @@
+import threading
+from functools import cached_property
+from typing import Any, Dict, List
+from chalicelib.core.config import AppConfig, TABLE_MAPPINGS
+from chalicelib.core.logger import logger
+
+
+class Runtime:
+    """Recursos criados uma vez por ambiente de execução e reaproveitados nas invocações quentes
+
+    Clientes boto3 são criados sob demanda (serviços pouco usados não pagam o custo no
+    cold start) e compartilham a mesma configuração do botocore.
+    """
+
+    def __init__(self, config: AppConfig = None):
+        self.config = config or AppConfig()
+        self._clients: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    @cached_property
+    def boto_config(self):
+        from botocore.config import Config
+        s3 = self.config.s3
+        return Config(
+            max_pool_connections=s3.max_pool_connections,
+            tcp_keepalive=True,
+            connect_timeout=s3.connect_timeout,
+            read_timeout=s3.read_timeout,
+            retries={'max_attempts': s3.max_attempts, 'mode': 'standard'}
+        )
+
+    def client(self, service: str):
+        """Cliente boto3 do serviço, criado na primeira chamada"""
+        client = self._clients.get(service)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(service)
+                if client is None:
+                    import boto3
+                    client = self._clients[service] = boto3.client(service, config=self.boto_config)
+        return client
+
+    @cached_property
+    def storage(self):
+        from chalicelib.services.storage import StorageService
+        return StorageService(self.config.s3, client=self.client('s3'))
+
+    @cached_property
+    def database(self):
+        from chalicelib.services.database import DatabaseService
+        delta = None
+        if self.config.db.delta:
+            from chalicelib.services.delta import DeltaFilter
+            delta = DeltaFilter(TABLE_MAPPINGS, self.config.db.delta_table)
+        return DatabaseService(self.config.db, delta=delta)
+
+    @cached_property
+    def loader(self):
+        from chalicelib.services.mapping import table_dependencies
+        from chalicelib.services.parallel_loader import ParallelLoader
+        return ParallelLoader(self.database, table_dependencies(TABLE_MAPPINGS))
+
+    @cached_property
+    def pipeline(self):
+        from chalicelib.services.pipeline import StagedPipeline
+        return StagedPipeline(self.config.pipeline_queue_size)
+
+    @cached_property
+    def spill(self):
+        from chalicelib.services.spill import SpillParser
+        return SpillParser(self.processor, self.config.parse_processes, self.config.spill_dir)
+
+    @cached_property
+    def coalescer(self):
+        from chalicelib.services.coalesce import Coalescer
+        return Coalescer(self)
+
+    @cached_property
+    def schema(self):
+        """Tipos das tabelas mapeadas, lidos uma vez por container (None se indisponível)"""
+        return self.database.load_schema([table['name'] for table in TABLE_MAPPINGS])
+
+    @cached_property
+    def ledger(self):
+        """Registro de arquivos já processados (None quando LEDGER=none)"""
+        from chalicelib.services.ledger import FileLedger, MemoryLedger
+        if self.config.ledger == 'mysql':
+            return FileLedger(self.database, self.config.ledger_table, self.config.ledger_lease_seconds)
+        if self.config.ledger == 'memory':
+            return MemoryLedger(self.config.ledger_lease_seconds)
+        return None
+
+    @cached_property
+    def parquet(self):
+        """Saída Parquet das linhas transformadas (None quando PARQUET_PREFIX não está definido)"""
+        config = self.config
+        if not config.parquet_prefix:
+            return None
+        from chalicelib.services.parquet_output import ParquetExporter, parquet_available
+        if not parquet_available():
+            logger.warning("pyarrow não instalado - saída Parquet desligada")
+            return None
+        return ParquetExporter(
+            self.client('s3'),
+            self.columns,
+            config.parquet_prefix,
+            bucket=config.parquet_bucket,
+            row_group_rows=config.parquet_row_group_rows,
+            compression=config.parquet_compression,
+            directory=config.spill_dir
+        )
+
+    @cached_property
+    def processor(self):
+        from chalicelib.services.processor import DataProcessor
+        return DataProcessor(TABLE_MAPPINGS, columnar=self.config.columnar)
+
+    @cached_property
+    def columns(self) -> Dict[str, List[str]]:
+        return {table['name']: [col['name'] for col in table['columns']] for table in TABLE_MAPPINGS}
+
+
+_runtime = None
+_runtime_lock = threading.Lock()
+
+
+def get_runtime() -> Runtime:
+    """Runtime do ambiente de execução atual (criado na primeira invocação)"""
+    global _runtime
+    if _runtime is None:
+        with _runtime_lock:
+            if _runtime is None:
+                _runtime = Runtime()
+    return _runtime
+
+
+def reset_runtime():
+    """Descarta o runtime em cache; a próxima invocação se comporta como cold start"""
+    global _runtime
+    with _runtime_lock:
+        _runtime = None
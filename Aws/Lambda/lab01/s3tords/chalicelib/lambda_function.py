@@ -1,65 +1,148 @@
 import json
-from chalicelib.core.config import AppConfig, TABLE_MAPPINGS
+import os
 from chalicelib.core.exceptions import ProcessingError
 from chalicelib.core.logger import logger
-from chalicelib.services.storage import StorageService
-from chalicelib.services.database import DatabaseService
-from chalicelib.services.processor import DataProcessor
+from chalicelib.core.runtime import Runtime, get_runtime
+from chalicelib.services.storage import iter_lines
 
-def lambda_handler(event, context):
+def write_batches(runtime, batches):
+    """Grava os lotes (tabela, registros) por tabela em paralelo ou em sequência, conforme DB_PARALLEL_TABLES"""
+    config = runtime.config
+    if config.db.parallel_tables:
+        return runtime.loader.load(batches, runtime.columns, config.batch_size)
+    return runtime.database.upsert_batches(batches, runtime.columns, config.batch_size)
+
+def process_record(record, context, runtime: Runtime):
+    """Processa um registro do evento S3; os originais movidos só são excluídos em storage.flush_deletes()"""
+    config = runtime.config
+    storage = runtime.storage
+    database = runtime.database
+    processor = runtime.processor
+    columns = runtime.columns
+    ledger = runtime.ledger
     
-    # Configurações
-    config = AppConfig()
+    bucket = record['s3']['bucket']['name']
+    key = record['s3']['object']['key']
+    etag = record['s3']['object'].get('eTag')
+    owner = getattr(context, 'aws_request_id', None) or os.urandom(16).hex()
+    leased = False
+    validator = None
+    stages = None
+    # Cópia das linhas transformadas em Parquet, enviada só após a gravação no banco
+    output = runtime.parquet.open(bucket, key) if runtime.parquet is not None else None
+    tee = output.tee if output is not None else iter
     
-    # Inicializa serviços
-    storage = StorageService(config.s3)
-    database = DatabaseService(config.db)
-    processor = DataProcessor(TABLE_MAPPINGS)
+    try:
+        # 0. Entregas repetidas (at-least-once) ou concorrentes do mesmo arquivo/ETag
+        if ledger is not None and etag:
+            # Marcado antes: se acquire falhar depois de gravar o lease, o finally o libera
+            leased = True
+            try:
+                state = ledger.acquire(bucket, key, etag, owner)
+            except Exception as e:
+                # Falha transitória do ledger: o arquivo fica na entrada para uma nova entrega
+                logger.error(f"Falha no ledger de {bucket}/{key}: {str(e)}")
+                return {'status': 'error', 'file': key, 'error': f"Falha no ledger: {str(e)}"}
+            if state != 'acquired':
+                leased = False
+                logger.info(f"{bucket}/{key} ({etag}) ignorado: {state}")
+                return {'status': 'skipped', 'file': key, 'reason': state}
+        
+        if config.db.typed and runtime.schema is not None:
+            validator = runtime.schema.validator(processor.plan.tables, columns)
+        
+        if config.parse_processes > 1:
+            # 1. Gravar o arquivo em /tmp; 2/3. processar em vários processos e salvar lote a lote
+            batches = runtime.spill.iter_batches(storage.stream_chunks(bucket, key), config.db.batch_max, validator)
+            processed = write_batches(runtime, tee(batches))
+        elif config.pipeline:
+            # 1/2/3. Download, processamento e gravação em etapas simultâneas
+            processed, stages = runtime.pipeline.run(
+                storage.stream_chunks(bucket, key),
+                lambda chunks: tee(processor.iter_batches(iter_lines(chunks), config.db.batch_max, validator)),
+                lambda batches: write_batches(runtime, batches)
+            )
+        else:
+            # 1. Obter arquivo (inteiro ou como iterador de linhas)
+            if config.s3.stream_read:
+                content = storage.stream_file(bucket, key)
+            else:
+                content = storage.get_file(bucket, key)
+            
+            # 2/3. Processar dados e salvar no banco lote a lote; o processador entrega até
+            # batch_max linhas e o banco divide conforme a latência observada
+            processed = write_batches(runtime, tee(processor.iter_batches(content, config.db.batch_max, validator)))
+
+        # 3.1 Enviar o Parquet das tabelas (falhas não afetam o arquivo)
+        analytics = output.commit() if output is not None else None
+
+        # 4. Mover arquivo para processados
+        new_key = storage.move_file(bucket, key, success=True)
+        if leased:
+            try:
+                ledger.complete(bucket, key, etag, owner)
+                leased = False
+            except Exception as e:
+                # O arquivo já foi gravado e movido; o lease é liberado no finally
+                logger.warning(f"Falha ao concluir {bucket}/{key} no ledger: {str(e)}")
+        
+        return {
+            'status': 'success',
+            'file': new_key,
+            'processed': processed,
+            'rejected': validator.summary() if validator else None,
+            'duplicates': database.collapsed_rows(),
+            'skipped': database.skipped_rows(),
+            'batching': database.batch_stats(),
+            'pipeline': stages,
+            'parquet': analytics
+        }
+        
+    except ProcessingError as e:
+        logger.error(f"Erro no processamento: {str(e)}")
+        new_key = storage.move_file(bucket, key, success=False)
+        return {
+            'status': 'error',
+            'file': new_key,
+            'error': str(e),
+            'rejected': validator.summary() if validator else None,
+            'duplicates': database.collapsed_rows(),
+            'skipped': database.skipped_rows(),
+            'batching': database.batch_stats()
+        }
+    finally:
+        if output is not None:
+            output.discard()
+        if leased:
+            ledger.release(bucket, key, etag, owner)
+
+def lambda_handler(event, context, runtime: Runtime = None):
     
+    # Serviços e configurações criados uma vez por ambiente de execução
+    runtime = runtime or get_runtime()
+    config = runtime.config
+    records = event['Records']
     results = []
+    if config.coalesce_max_bytes > 0:
+        from chalicelib.services.coalesce import split_small
+        
+        # Arquivos pequenos em grupos: um download paralelo, uma transação e um arquivamento
+        groups, records = split_small(records, config.coalesce_max_bytes, config.coalesce_max_files)
+        owner = getattr(context, 'aws_request_id', None) or os.urandom(16).hex()
+        for group in groups:
+            results.extend(runtime.coalescer.process(group, owner))
+    results.extend(process_record(record, context, runtime) for record in records)
     
-    for record in event['Records']:
-        try:
-            bucket = record['s3']['bucket']['name']
-            key = record['s3']['object']['key']
-            
-            # 1. Obter arquivo
-            content = storage.get_file(bucket, key)
-            
-            # 2. Processar dados
-            table_data = processor.process_csv(content)
-            
-            # 3. Salvar no banco
-            for table_name, data in table_data.items():
-                if not data:
-                    continue
-                
-                columns = [col['name'] for col in next(t for t in TABLE_MAPPINGS if t['name'] == table_name)['columns']]      
-                database.bulk_upsert(table=table_name, columns=columns, data=data, batch_size=config.batch_size)
-
-            # 4. Mover arquivo para processados
-            new_key = storage.move_file(bucket, key, success=True)
-            
-            results.append({
-                'status': 'success',
-                'file': new_key,
-                'processed': {k: len(v) for k, v in table_data.items()}
-            })
-            
-        except ProcessingError as e:
-            logger.error(f"Erro no processamento: {str(e)}")
-            new_key = storage.move_file(bucket, key, success=False)
-            results.append({
-                'status': 'error',
-                'file': new_key,
-                'error': str(e)
-            })
+    # 5. Excluir os originais movidos, em lotes de delete_objects
+    undeleted = runtime.storage.flush_deletes()
     
     return {
         'statusCode': 200,
         'body': {
             'processed_files': len([r for r in results if r['status'] == 'success']),
             'failed_files': len([r for r in results if r['status'] == 'error']),
+            'skipped_files': len([r for r in results if r['status'] == 'skipped']),
+            'undeleted_files': undeleted,
             'details': results
         }
     }
\ No newline at end of file
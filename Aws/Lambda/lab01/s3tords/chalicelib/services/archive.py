@@ -0,0 +1,138 @@
+from typing import Dict, List, Optional, Tuple
+from chalicelib.core.logger import logger
+
+# Limites do S3: partes de 5 MiB a 5 GiB, no máximo 10.000 partes por upload
+MIN_PART_SIZE = 5 * 1024 * 1024
+MAX_PARTS = 10000
+# delete_objects aceita até 1.000 chaves por chamada
+DELETE_BATCH = 1000
+# Blocos lidos do original ao arquivar com compressão
+COMPRESS_READ_SIZE = 1024 * 1024
+
+
+class Archiver:
+    """Copia arquivos entre prefixos no próprio S3 e agrupa as exclusões dos originais
+
+    Objetos a partir de multipart_threshold são copiados com UploadPartCopy em partes
+    paralelas (copy_object é uma única requisição e recusa objetos acima de 5 GB). Se a
+    cópia falhar no meio, o upload é abortado e o original fica onde estava. A exclusão
+    dos originais só acontece em flush_deletes(), em chamadas delete_objects de até
+    1.000 chaves por bucket.
+
+    Com compress, o original é lido e enviado comprimido em streaming (upload_fileobj, em
+    partes a partir de 8 MB): não há cópia no servidor que comprima.
+    """
+
+    def __init__(self, client, multipart_threshold: int, part_size: int, concurrency: int,
+                 compression_level: int = 0):
+        self.client = client
+        self.compression_level = compression_level
+        self.multipart_threshold = multipart_threshold
+        self.part_size = max(MIN_PART_SIZE, part_size)
+        self.concurrency = max(1, concurrency)
+        self._pending: Dict[str, List[str]] = {}
+
+    def move(self, bucket: str, key: str, new_key: str, compress: Optional[str] = None):
+        """Copia key para new_key (comprimindo com o codec `compress`) e agenda a exclusão de key"""
+        if compress:
+            self.copy_compressed(bucket, key, new_key, compress)
+        else:
+            self.copy(bucket, key, new_key)
+        self._pending.setdefault(bucket, []).append(key)
+
+    def copy(self, bucket: str, key: str, new_key: str):
+        head = self.client.head_object(Bucket=bucket, Key=key)
+        if head['ContentLength'] < self.multipart_threshold:
+            self.client.copy_object(
+                Bucket=bucket,
+                CopySource={'Bucket': bucket, 'Key': key},
+                CopySourceIfMatch=head['ETag'],
+                Key=new_key
+            )
+            return
+        self._copy_multipart(bucket, key, new_key, head)
+
+    def copy_compressed(self, bucket: str, key: str, new_key: str, codec: str):
+        from boto3.s3.transfer import TransferConfig
+        from chalicelib.services.compression import CompressingReader
+
+        response = self.client.get_object(Bucket=bucket, Key=key)
+        extra = {'Metadata': response.get('Metadata', {})}
+        if response.get('ContentType'):
+            extra['ContentType'] = response['ContentType']
+        body = response['Body']
+        try:
+            self.client.upload_fileobj(
+                CompressingReader(body.iter_chunks(COMPRESS_READ_SIZE), codec, self.compression_level),
+                bucket,
+                new_key,
+                ExtraArgs=extra,
+                Config=TransferConfig(max_concurrency=self.concurrency)
+            )
+        finally:
+            body.close()
+        logger.info(f"{key} arquivado com {codec} ({response['ContentLength']} bytes originais)")
+
+    def _copy_multipart(self, bucket: str, key: str, new_key: str, head: Dict):
+        from concurrent.futures import ThreadPoolExecutor
+
+        size = head['ContentLength']
+        part_size = max(self.part_size, -(-size // MAX_PARTS))
+        ranges = [(start, min(start + part_size, size) - 1) for start in range(0, size, part_size)]
+
+        extra = {'Metadata': head.get('Metadata', {})}
+        for field in ('ContentType', 'ContentEncoding', 'ContentDisposition', 'CacheControl'):
+            if head.get(field):
+                extra[field] = head[field]
+        upload_id = self.client.create_multipart_upload(Bucket=bucket, Key=new_key, **extra)['UploadId']
+
+        def copy_part(number: int, first: int, last: int) -> Tuple[int, str]:
+            response = self.client.upload_part_copy(
+                Bucket=bucket,
+                Key=new_key,
+                UploadId=upload_id,
+                PartNumber=number,
+                CopySource={'Bucket': bucket, 'Key': key},
+                CopySourceIfMatch=head['ETag'],
+                CopySourceRange=f"bytes={first}-{last}"
+            )
+            return number, response['CopyPartResult']['ETag']
+
+        try:
+            with ThreadPoolExecutor(min(self.concurrency, len(ranges)), thread_name_prefix='s3-copy') as pool:
+                parts = list(pool.map(lambda args: copy_part(*args),
+                                      [(i, first, last) for i, (first, last) in enumerate(ranges, 1)]))
+            self.client.complete_multipart_upload(
+                Bucket=bucket,
+                Key=new_key,
+                UploadId=upload_id,
+                MultipartUpload={'Parts': [{'PartNumber': number, 'ETag': etag} for number, etag in parts]}
+            )
+        except BaseException:
+            try:
+                self.client.abort_multipart_upload(Bucket=bucket, Key=new_key, UploadId=upload_id)
+            except Exception as e:
+                logger.error(f"Erro ao abortar cópia multipart de {key}: {str(e)}")
+            raise
+        logger.info(f"{key} copiado em {len(parts)} partes ({size} bytes)")
+
+    def flush_deletes(self) -> List[str]:
+        """Exclui os originais agendados; retorna as chaves que não puderam ser excluídas"""
+        failed = []
+        pending, self._pending = self._pending, {}
+        for bucket, keys in pending.items():
+            for i in range(0, len(keys), DELETE_BATCH):
+                batch = keys[i:i + DELETE_BATCH]
+                try:
+                    response = self.client.delete_objects(
+                        Bucket=bucket,
+                        Delete={'Objects': [{'Key': key} for key in batch], 'Quiet': True}
+                    )
+                except Exception as e:
+                    logger.error(f"Erro ao excluir {len(batch)} arquivos de {bucket}: {str(e)}")
+                    failed.extend(batch)
+                    continue
+                for error in response.get('Errors', []):
+                    logger.error(f"Erro ao excluir {error.get('Key')}: {error.get('Code')} {error.get('Message')}")
+                    failed.append(error.get('Key'))
+        return failed
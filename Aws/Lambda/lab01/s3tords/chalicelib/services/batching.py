@@ -0,0 +1,69 @@
+from typing import Any, Dict, Optional
+
+LOCK_WAIT_TIMEOUT = 1205
+DEADLOCK = 1213
+# Deadlock e lock wait timeout: sinal de disputa de locks, o lote é refeito menor
+LOCK_ERROR_CODES = {LOCK_WAIT_TIMEOUT, DEADLOCK}
+
+
+def is_lock_error(error: Exception) -> bool:
+    return bool(getattr(error, 'args', None)) and error.args[0] in LOCK_ERROR_CODES
+
+
+class AdaptiveBatchSize:
+    """Tamanho de lote ajustado em tempo de execução (AIMD)
+
+    Lotes gravados dentro da latência alvo aumentam o tamanho em `step` linhas; lotes
+    lentos ou que esbarram em locks reduzem pela metade. O tamanho fica entre minimum
+    e maximum e é mantido entre invocações quentes.
+    """
+
+    def __init__(self, initial: int, minimum: int, maximum: int, target_seconds: float,
+                 step: int = None, decrease: float = 0.5):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.size = min(max(initial, self.minimum), self.maximum)
+        self.target_seconds = target_seconds
+        self.step = step or self.minimum
+        self.decrease = decrease
+        self.reset_stats()
+
+    def record(self, rows: int, seconds: float, lock_error: Optional[int] = None):
+        """Registra um lote gravado (ou que falhou com o erro de lock informado) e ajusta o próximo tamanho"""
+        self._sizes.append(self.size)
+        congested = lock_error is not None
+        if lock_error == DEADLOCK:
+            self._deadlocks += 1
+        elif congested:
+            self._lock_timeouts += 1
+        else:
+            self._batches += 1
+            self._rows += rows
+            self._seconds += seconds
+
+        if congested or seconds > self.target_seconds:
+            self.size = max(self.minimum, int(self.size * self.decrease))
+        else:
+            self.size = min(self.maximum, self.size + self.step)
+
+    def stats(self) -> Dict[str, Any]:
+        """Tamanhos escolhidos e vazão desde o último reset_stats()"""
+        return {
+            'batches': self._batches,
+            'rows': self._rows,
+            'seconds': round(self._seconds, 3),
+            'rows_per_second': round(self._rows / self._seconds) if self._seconds else None,
+            'deadlocks': self._deadlocks,
+            'lock_wait_timeouts': self._lock_timeouts,
+            'min_size': min(self._sizes) if self._sizes else self.size,
+            'max_size': max(self._sizes) if self._sizes else self.size,
+            'next_size': self.size
+        }
+
+    def reset_stats(self):
+        self._sizes = []
+        self._batches = 0
+        self._rows = 0
+        self._seconds = 0.0
+        self._deadlocks = 0
+        self._lock_timeouts = 0
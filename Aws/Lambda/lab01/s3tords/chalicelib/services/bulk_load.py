@@ -0,0 +1,66 @@
+import os
+import tempfile
+from typing import Any, Iterable, List, TextIO
+
+# Erros do MySQL quando LOAD DATA LOCAL está desabilitado no servidor ou no cliente
+LOCAL_INFILE_DISABLED_CODES = {1148, 2068, 3948}
+
+_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r', '\0': '\\0'})
+
+
+def tsv_value(value: Any) -> str:
+    """Valor no formato padrão do LOAD DATA (escape com '\\', NULL como \\N)"""
+    if value is None:
+        return '\\N'
+    if isinstance(value, str):
+        return value.translate(_ESCAPES)
+    return str(value)
+
+
+def write_tsv(rows: Iterable[tuple], stream: TextIO) -> int:
+    """Grava as linhas como TSV e retorna a quantidade gravada"""
+    count = 0
+    for row in rows:
+        stream.write('\t'.join([tsv_value(value) for value in row]))
+        stream.write('\n')
+        count += 1
+    return count
+
+
+def staging_table(table: str) -> str:
+    return f"stg_{table}"
+
+
+def load_data_upsert(conn, table: str, columns: List[str], rows: List[tuple], tmp_dir: str = None):
+    """Carrega as linhas em uma tabela temporária via LOAD DATA LOCAL INFILE e faz o merge
+
+    A tabela de staging (CREATE TEMPORARY TABLE ... LIKE) vive na sessão, então é criada
+    uma vez por conexão do pool e esvaziada a cada lote. REPLACE no LOAD DATA mantém a
+    última ocorrência de cada chave, como o executemany com ON DUPLICATE KEY UPDATE.
+    Nada aqui faz commit implícito: o commit (ou rollback) fica com o chamador.
+    """
+    staging = staging_table(table)
+    cols = ', '.join(columns)
+    updates = ', '.join([f"{c}=s.{c}" for c in columns])
+
+    with tempfile.NamedTemporaryFile('w', suffix='.tsv', dir=tmp_dir, encoding='utf-8',
+                                     newline='', delete=False) as stream:
+        write_tsv(rows, stream)
+        path = stream.name
+
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f"CREATE TEMPORARY TABLE IF NOT EXISTS {staging} LIKE {table}")
+            # DELETE, não TRUNCATE: TRUNCATE faz commit implícito da transação do chamador
+            cursor.execute(f"DELETE FROM {staging}")
+            cursor.execute(
+                f"LOAD DATA LOCAL INFILE %s REPLACE INTO TABLE {staging} CHARACTER SET utf8mb4 "
+                f"FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n' ({cols})",
+                (path,)
+            )
+            cursor.execute(
+                f"INSERT INTO {table} ({cols}) SELECT {cols} FROM {staging} AS s "
+                f"ON DUPLICATE KEY UPDATE {updates}"
+            )
+    finally:
+        os.unlink(path)
@@ -0,0 +1,182 @@
+from typing import Any, Dict, List, Optional, Tuple
+from chalicelib.core.exceptions import DatabaseError, ProcessingError
+from chalicelib.core.logger import logger
+
+
+def split_small(records: List[Dict], max_bytes: int, max_files: int) -> Tuple[List[List[Dict]], List[Dict]]:
+    """Separa os registros de até max_bytes em grupos de até max_files; retorna (grupos, demais)
+
+    Registros sem tamanho no evento seguem o caminho normal.
+    """
+    small, other = [], []
+    for record in records:
+        size = record['s3']['object'].get('size')
+        if max_bytes > 0 and size is not None and size <= max_bytes:
+            small.append(record)
+        else:
+            other.append(record)
+    groups = [small[i:i + max_files] for i in range(0, len(small), max(1, max_files))]
+    # Um arquivo sozinho não ganha nada com o agrupamento
+    other.extend(group[0] for group in groups if len(group) == 1)
+    return [group for group in groups if len(group) > 1], other
+
+
+class _File:
+    def __init__(self, record: Dict):
+        self.bucket = record['s3']['bucket']['name']
+        self.key = record['s3']['object']['key']
+        self.etag = record['s3']['object'].get('eTag')
+        self.leased = False
+        self.batches: List[Tuple[str, List[tuple]]] = []
+        self.validator = None
+        self.result: Optional[Dict[str, Any]] = None
+
+    def fail(self, error: Exception):
+        self.result = {'status': 'error', 'error': str(error)}
+
+
+class Coalescer:
+    """Processa um grupo de arquivos pequenos com um download paralelo, uma transação e um arquivamento
+
+    Cada arquivo é lido e processado separadamente (um arquivo inválido só falha sozinho) e
+    as linhas dos válidos são unidas por tabela em um único upsert_group. Se a transação do
+    grupo falhar, cada arquivo é regravado na sua própria transação, para que só o arquivo
+    com problema vá para erros/. O ledger, quando ativo, vale por arquivo como no caminho normal.
+    """
+
+    def __init__(self, runtime):
+        self.runtime = runtime
+        self.config = runtime.config
+        self.workers = max(1, self.config.s3.range_concurrency)
+
+    def process(self, records: List[Dict], owner: str) -> List[Dict[str, Any]]:
+        from concurrent.futures import ThreadPoolExecutor
+
+        runtime = self.runtime
+        ledger = runtime.ledger
+        files = [_File(record) for record in records]
+
+        try:
+            # 0. Entregas repetidas (at-least-once) ou concorrentes do mesmo arquivo/ETag
+            for file in files:
+                if ledger is not None and file.etag:
+                    self._acquire(file, owner)
+
+            active = [file for file in files if file.result is None]
+            with ThreadPoolExecutor(min(self.workers, max(1, len(active))), thread_name_prefix='coalesce') as pool:
+                # 1/2. Baixar em paralelo e processar cada arquivo separadamente
+                for file, content in zip(active, pool.map(self._download, active)):
+                    if isinstance(content, Exception):
+                        file.fail(content)
+                    else:
+                        self._parse(file, content)
+
+                # 3. Uma transação para todos os arquivos válidos
+                parsed = [file for file in active if file.result is None]
+                if parsed:
+                    self._write(parsed)
+
+                # 4. Mover os arquivos para processados/erros
+                list(pool.map(self._archive, active))
+            database = runtime.database
+            group = {
+                'files': len(active),
+                'duplicates': database.collapsed_rows(),
+                'skipped': database.skipped_rows(),
+                'batching': database.batch_stats()
+            }
+            for file in active:
+                file.result['group'] = group
+                if file.leased and file.result['status'] == 'success':
+                    try:
+                        ledger.complete(file.bucket, file.key, file.etag, owner)
+                        file.leased = False
+                    except Exception as e:
+                        # O arquivo já foi gravado e movido; o lease é liberado no finally
+                        logger.warning(f"Falha ao concluir {file.bucket}/{file.key} no ledger: {str(e)}")
+        finally:
+            for file in files:
+                if file.leased:
+                    ledger.release(file.bucket, file.key, file.etag, owner)
+
+        logger.info(f"Grupo de {len(files)} arquivos: "
+                    f"{sum(file.result['status'] == 'success' for file in files)} com sucesso")
+        return [file.result for file in files]
+
+    def _acquire(self, file: _File, owner: str):
+        # Marcado antes: se acquire falhar depois de gravar o lease, o finally o libera
+        file.leased = True
+        try:
+            state = self.runtime.ledger.acquire(file.bucket, file.key, file.etag, owner)
+        except Exception as e:
+            # Falha transitória do ledger: o arquivo fica na entrada para uma nova entrega
+            logger.error(f"Falha no ledger de {file.bucket}/{file.key}: {str(e)}")
+            file.result = {'status': 'error', 'file': file.key, 'error': f"Falha no ledger: {str(e)}"}
+            return
+        if state != 'acquired':
+            file.leased = False
+            logger.info(f"{file.bucket}/{file.key} ({file.etag}) ignorado: {state}")
+            file.result = {'status': 'skipped', 'file': file.key, 'reason': state}
+
+    def _download(self, file: _File):
+        try:
+            return self.runtime.storage.get_file(file.bucket, file.key)
+        except ProcessingError as e:
+            return e
+
+    def _parse(self, file: _File, content: str):
+        runtime = self.runtime
+        if self.config.db.typed and runtime.schema is not None:
+            file.validator = runtime.schema.validator(runtime.processor.plan.tables, runtime.columns)
+        try:
+            file.batches = list(runtime.processor.iter_batches(content, self.config.db.batch_max, file.validator))
+        except ProcessingError as e:
+            logger.error(f"Erro no processamento de {file.key}: {str(e)}")
+            file.fail(e)
+
+    def _write(self, files: List[_File]):
+        runtime = self.runtime
+        merged: Dict[str, List[tuple]] = {table: [] for table in runtime.processor.load_order}
+        for file in files:
+            for table, batch in file.batches:
+                merged[table].extend(batch)
+        try:
+            runtime.database.upsert_group(merged.items(), runtime.columns)
+            for file in files:
+                file.result = {'status': 'success', 'processed': self._count(file)}
+            return
+        except DatabaseError as e:
+            logger.warning(f"Transação do grupo desfeita ({str(e)}) - gravando arquivo a arquivo")
+
+        for file in files:
+            try:
+                processed = runtime.database.upsert_batches(file.batches, runtime.columns, self.config.batch_size)
+                file.result = {'status': 'success', 'processed': processed}
+            except ProcessingError as e:
+                logger.error(f"Erro na persistência de {file.key}: {str(e)}")
+                file.fail(e)
+
+    def _count(self, file: _File) -> Dict[str, int]:
+        processed = {table: 0 for table in self.runtime.columns}
+        for table, batch in file.batches:
+            processed[table] += len(batch)
+        return processed
+
+    def _export(self, file: _File):
+        """Parquet das linhas do arquivo, como no caminho normal (um arquivo por tabela)"""
+        output = self.runtime.parquet.open(file.bucket, file.key)
+        for table, batch in file.batches:
+            output.add(table, batch)
+        file.result['parquet'] = output.commit()
+
+    def _archive(self, file: _File):
+        storage = self.runtime.storage
+        success = file.result['status'] == 'success'
+        if success and self.runtime.parquet is not None:
+            self._export(file)
+        file.result['rejected'] = file.validator.summary() if file.validator else None
+        file.batches = []
+        try:
+            file.result['file'] = storage.move_file(file.bucket, file.key, success=success)
+        except ProcessingError as e:
+            file.result.update({'status': 'error', 'file': file.key, 'error': str(e)})
@@ -0,0 +1,164 @@
+import io
+from itertools import islice, repeat
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+from chalicelib.core.logger import logger
+from chalicelib.services.mapping import ProjectionPlan
+
+
+def arrow_available() -> bool:
+    """Indica se o pyarrow (dependência opcional) está instalado"""
+    try:
+        import pyarrow.csv  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def iter_record_chunks(lines: Iterable[str], chunk_lines: int) -> Iterator[str]:
+    """Agrupa linhas em blocos de texto que sempre terminam em fim de registro
+
+    O bloco só é fechado com número par de aspas acumuladas, ou seja, fora de um
+    campo entre aspas que contenha quebra de linha. A busca pelo fechamento lê no máximo
+    chunk_lines linhas a mais: uma aspa solta não puxa o resto do arquivo para um bloco
+    só, e o bloco desbalanceado (que o Arrow rejeita) segue pelo caminho linha a linha.
+    """
+    lines = iter(lines)
+    while True:
+        chunk = list(islice(lines, chunk_lines))
+        if not chunk:
+            return
+        text = ''.join(chunk)
+        quotes = text.count('"')
+        extra = 0
+        while quotes % 2 and extra < chunk_lines:
+            line = next(lines, None)
+            if line is None:
+                break
+            text += line
+            quotes += line.count('"')
+            extra += 1
+        if quotes % 2:
+            logger.warning(f"Aspas sem fechamento em {len(chunk) + extra} linhas - bloco segue pelo caminho linha a linha")
+        yield text
+
+
+def date_column(column, fallback: Callable[[Any], Any]) -> List[Any]:
+    """'dd.mm.yyyy' -> 'yyyy-mm-dd 00:00:00'; valores sem exatamente 3 partes usam o fallback"""
+    import pyarrow.compute as pc
+
+    parts = pc.split_pattern(column, '.')
+    valid = pc.equal(pc.list_value_length(parts), 3)
+    all_valid = pc.all(valid).as_py() is not False
+    if not all_valid:
+        parts = pc.filter(parts, valid)
+
+    dates = pc.binary_join_element_wise(
+        pc.list_element(parts, 2), pc.list_element(parts, 1), pc.list_element(parts, 0), '-'
+    )
+    values = pc.binary_join_element_wise(dates, ' 00:00:00', '').to_pylist()
+    if all_valid:
+        return values
+
+    converted = iter(values)
+    return [
+        next(converted) if ok else fallback(value)
+        for ok, value in zip(valid.to_pylist(), column.to_pylist())
+    ]
+
+
+def ippi_column(column, fallback: Callable[[Any], Any]) -> List[Any]:
+    """'C'/'c' -> 1, demais -> 2"""
+    import pyarrow.compute as pc
+
+    return pc.if_else(pc.equal(pc.utf8_upper(column), 'C'), 1, 2).to_pylist()
+
+
+class ColumnarProjector:
+    """Projeta um bloco de CSV em colunas Arrow, aplicando as transformações vetorizadas
+
+    Blocos que o parser do Arrow não reproduz exatamente como o csv.reader (linhas com
+    número de colunas diferente, BOM, erro de parse) retornam None e seguem pelo
+    caminho linha a linha.
+    """
+
+    def __init__(self, plan: ProjectionPlan, vectorized: Dict[Callable, Callable], delimiter: str = ';'):
+        import pyarrow as pa
+        import pyarrow.csv as pacsv
+
+        self.plan = plan
+        self.vectorized = vectorized
+        self.delimiter = delimiter
+        self.names = [f"f{index}" for index in sorted(set(plan.indexes))]
+        self.transforms = {slot: (transform, name) for slot, transform, name in plan.transforms}
+        self._csv = pacsv
+        self._read_options = pacsv.ReadOptions(autogenerate_column_names=True)
+        self._convert_options = pacsv.ConvertOptions(
+            include_columns=self.names,
+            column_types={name: pa.string() for name in self.names}
+        )
+
+    def _read(self, text: str):
+        invalid = []
+
+        def on_invalid(row):
+            invalid.append(row)
+            return 'skip'
+
+        try:
+            table = self._csv.read_csv(
+                io.BytesIO(text.encode('utf-8')),
+                read_options=self._read_options,
+                parse_options=self._csv.ParseOptions(
+                    delimiter=self.delimiter,
+                    newlines_in_values=True,
+                    invalid_row_handler=on_invalid
+                ),
+                convert_options=self._convert_options
+            )
+        except Exception as e:
+            logger.warning(f"Bloco segue pelo caminho linha a linha: {str(e)}")
+            return None
+        return None if invalid else table
+
+    def _column_values(self, table, slot: int) -> List[Any]:
+        column = table.column(f"f{self.plan.indexes[slot]}")
+        if slot not in self.transforms:
+            return column.to_pylist()
+
+        transform, name = self.transforms[slot]
+        if transform in self.vectorized:
+            return self.vectorized[transform](column, transform)
+
+        values = []
+        for value in column.to_pylist():
+            try:
+                values.append(transform(value))
+            except Exception as e:
+                logger.error(f"Erro na coluna {name}: {str(e)}")
+                values.append(None)
+        return values
+
+    def project(self, text: str, constants: List[Any]) -> Optional[List[List[tuple]]]:
+        """Retorna as linhas de cada tabela do bloco (na ordem de plan.tables) ou None"""
+        if not self.names or text.startswith('\ufeff'):
+            return None
+
+        table = self._read(text)
+        if table is None:
+            return None
+
+        size = table.num_rows
+        slots = len(self.plan.indexes)
+        columns = [self._column_values(table, slot) for slot in range(slots)]
+
+        results = []
+        for layout in self.plan.layouts:
+            if not layout:
+                results.append([()] * size)
+                continue
+            sources = [
+                columns[position] if position < slots else repeat(constants[position - slots], size)
+                for position in layout
+            ]
+            results.append(list(zip(*sources)))
+        return results
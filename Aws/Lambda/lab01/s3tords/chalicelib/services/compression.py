@@ -0,0 +1,140 @@
+import zlib
+from typing import Iterable, Iterator, Optional, Tuple
+from chalicelib.core.exceptions import InvalidFileError
+
+GZIP = 'gzip'
+ZSTD = 'zstd'
+EXTENSIONS = {'.gz': GZIP, '.gzip': GZIP, '.zst': ZSTD, '.zstd': ZSTD}
+SUFFIXES = {GZIP: '.gz', ZSTD: '.zst'}
+MAGIC = ((b'\x1f\x8b', GZIP), (b'\x28\xb5\x2f\xfd', ZSTD))
+# wbits para ler/gravar o cabeçalho gzip com o zlib
+_GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+
+def zstd_available() -> bool:
+    """Indica se o zstandard (dependência opcional) está instalado"""
+    try:
+        import zstandard  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise InvalidFileError("Arquivo zstd, mas o pacote zstandard não está instalado")
+    return zstandard
+
+
+def split_extension(file_name: str) -> Tuple[str, str]:
+    """Separa nome e extensão, mantendo a extensão de compressão junto da anterior
+
+    'vendas.2024.01.csv.gz' -> ('vendas.2024.01', '.csv.gz'); 'leiame' -> ('leiame', '')
+    """
+    stem, dot, ext = file_name.rpartition('.')
+    if not dot or not stem:
+        return file_name, ''
+    ext = '.' + ext
+    if ext.lower() in EXTENSIONS:
+        inner_stem, inner_dot, inner_ext = stem.rpartition('.')
+        if inner_dot and inner_stem:
+            return inner_stem, f".{inner_ext}{ext}"
+    return stem, ext
+
+
+def codec_from_key(key: str) -> Optional[str]:
+    _, dot, ext = key.rpartition('.')
+    return EXTENSIONS.get(f".{ext.lower()}") if dot else None
+
+
+def codec_from_magic(data: bytes) -> Optional[str]:
+    for magic, codec in MAGIC:
+        if data.startswith(magic):
+            return codec
+    return None
+
+
+def _gunzip(chunks: Iterable[bytes], chunk_size: int) -> Iterator[bytes]:
+    decompressor = zlib.decompressobj(_GZIP_WBITS)
+    started = False
+    for data in chunks:
+        while data:
+            started = True
+            output = decompressor.decompress(data, chunk_size)
+            if output:
+                yield output
+            if decompressor.eof:
+                # Membros concatenados (cat a.gz b.gz) formam um gzip válido
+                data = decompressor.unused_data
+                decompressor = zlib.decompressobj(_GZIP_WBITS)
+                started = False
+            else:
+                data = decompressor.unconsumed_tail
+    output = decompressor.flush()
+    if output:
+        yield output
+    if started and not decompressor.eof:
+        raise InvalidFileError("Arquivo gzip truncado")
+
+
+def _unzstd(chunks: Iterable[bytes], chunk_size: int) -> Iterator[bytes]:
+    context = _zstandard().ZstdDecompressor()
+    decompressor = context.decompressobj(write_size=chunk_size)
+    started = False
+    for data in chunks:
+        while data:
+            started = True
+            output = decompressor.decompress(data)
+            if output:
+                yield output
+            if decompressor.eof:
+                # Um arquivo pode ter vários frames (zstd -c a b > c.zst)
+                data = decompressor.unused_data
+                decompressor = context.decompressobj(write_size=chunk_size)
+                started = False
+            else:
+                data = b''
+    if started:
+        raise InvalidFileError("Arquivo zstd truncado")
+
+
+def decompress(chunks: Iterable[bytes], codec: Optional[str], chunk_size: int = 1024 * 1024) -> Iterator[bytes]:
+    """Descomprime os blocos em streaming; sem codec, devolve os blocos como vieram"""
+    if codec == GZIP:
+        return _gunzip(chunks, chunk_size)
+    if codec == ZSTD:
+        return _unzstd(chunks, chunk_size)
+    return iter(chunks)
+
+
+class CompressingReader:
+    """Objeto com read() que comprime os blocos sob demanda (para upload_fileobj)"""
+
+    def __init__(self, chunks: Iterable[bytes], codec: str, level: int = 0):
+        self._chunks = iter(chunks)
+        self._buffer = bytearray()
+        self._done = False
+        if codec == GZIP:
+            self._compressor = zlib.compressobj(level or zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, _GZIP_WBITS)
+        elif codec == ZSTD:
+            self._compressor = _zstandard().ZstdCompressor(level=level or 3).compressobj()
+        else:
+            raise ValueError(f"Compressão desconhecida: {codec}")
+
+    def read(self, size: int = -1) -> bytes:
+        while not self._done and (size < 0 or len(self._buffer) < size):
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                self._buffer += self._compressor.flush()
+                self._done = True
+            else:
+                self._buffer += self._compressor.compress(chunk)
+        if size < 0 or size >= len(self._buffer):
+            data = bytes(self._buffer)
+            self._buffer.clear()
+            return data
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
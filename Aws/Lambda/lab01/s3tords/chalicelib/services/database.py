@@ -1,53 +1,437 @@
-import pymysql
-from pymysql.cursors import DictCursor
-from typing import List
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
 from chalicelib.core.config import DBConfig
-from chalicelib.core.exceptions import DatabaseError
+from chalicelib.core.exceptions import DatabaseError, ProcessingError
 from chalicelib.core.logger import logger
+from chalicelib.services.batching import AdaptiveBatchSize, is_lock_error
+from chalicelib.services.bulk_load import LOCAL_INFILE_DISABLED_CODES, load_data_upsert
+from chalicelib.services.dedup import keep_last
+from chalicelib.services.pool import get_pool, is_connection_lost
+from chalicelib.services.sharding import shard_rows
+
+# max_allowed_packet padrão do MySQL 5.7, usado quando o servidor não informa o seu
+DEFAULT_MAX_ALLOWED_PACKET = 4 * 1024 * 1024
+# Folga para cabeçalho do pacote e comando
+PACKET_HEADROOM = 1024
+# Tentativas seguidas de um mesmo lote após deadlock/lock wait timeout
+LOCK_RETRIES = 3
 
 class DatabaseService:
-    def __init__(self, config: DBConfig):
+    def __init__(self, config: DBConfig, connect: Optional[Callable[[], Any]] = None, delta=None):
+        """
+        Args:
+            config: Configuração do banco
+            connect: Fábrica de conexões compatível com pymysql (padrão: pymysql.connect)
+            delta: DeltaFilter para gravar só linhas novas ou alteradas (padrão: grava todas)
+        """
         self.config = config
+        self.delta = delta
+        self.loader = config.loader
+        self._queries: Dict[tuple, str] = {}
+        self._statement_bytes: Optional[int] = None
+        # Um controlador por tabela; o tamanho aprendido vale para as próximas invocações
+        self.controllers: Dict[str, AdaptiveBatchSize] = {}
+        self._primary_keys: Dict[str, List[str]] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.duplicates: Dict[str, int] = {}
+        self.pool = get_pool(
+            (config.host, config.port, config.user, config.database),
+            connect or self._connect,
+            size=config.pool_size,
+            max_idle=config.pool_max_idle,
+            ping_interval=config.pool_ping_interval
+        )
+    
+    def _connect(self):
+        import pymysql
+        from pymysql.cursors import DictCursor
+        return pymysql.connect(
+            host=self.config.host,
+            user=self.config.user,
+            password=self.config.password,
+            database=self.config.database,
+            port=self.config.port,
+            cursorclass=DictCursor,
+            local_infile=self.config.loader == 'load_data'
+        )
     
-    def _get_connection(self):
+    def _get_connection(self, fresh: bool = False):
         try:
-            return pymysql.connect(
-                host=self.config.host,
-                user=self.config.user,
-                password=self.config.password,
-                database=self.config.database,
-                port=self.config.port,
-                cursorclass=DictCursor
-            )
+            return self.pool.connect() if fresh else self.pool.acquire()
         except Exception as e:
             logger.error(f"Erro de conexão: {str(e)}")
             raise DatabaseError(f"Falha na conexão: {str(e)}")
     
+    def _statement_budget(self, conn) -> int:
+        """Tamanho máximo (bytes) de cada INSERT multi-linha, limitado pelo max_allowed_packet do servidor"""
+        if self._statement_bytes is None:
+            packet = DEFAULT_MAX_ALLOWED_PACKET
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT @@max_allowed_packet AS max_allowed_packet")
+                    row = cursor.fetchone()
+                packet = int(row['max_allowed_packet'] if isinstance(row, dict) else row[0])
+            except Exception as e:
+                if is_connection_lost(e):
+                    raise
+                logger.warning(f"max_allowed_packet indisponível, usando {packet} bytes: {str(e)}")
+            self._statement_bytes = min(packet, self.config.max_statement_bytes) - PACKET_HEADROOM
+            logger.info(f"INSERT multi-linha limitado a {self._statement_bytes} bytes")
+        return self._statement_bytes
+    
+    def foreign_keys(self, tables: List[str]) -> Dict[str, List[str]]:
+        """Tabelas referenciadas (FK) por cada tabela informada, segundo o INFORMATION_SCHEMA"""
+        references: Dict[str, List[str]] = {table: [] for table in tables}
+        conn = self._get_connection()
+        error = None
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    "SELECT DISTINCT TABLE_NAME AS child, REFERENCED_TABLE_NAME AS parent "
+                    "FROM INFORMATION_SCHEMA.KEY_COLUMN_USAGE "
+                    "WHERE TABLE_SCHEMA = DATABASE() AND REFERENCED_TABLE_NAME IS NOT NULL"
+                )
+                rows = cursor.fetchall()
+            for row in rows:
+                child, parent = (row['child'], row['parent']) if isinstance(row, dict) else row
+                if child in references and parent in references and parent != child:
+                    references[child].append(parent)
+        except Exception as e:
+            error = e
+            logger.warning(f"FKs indisponíveis no INFORMATION_SCHEMA, usando o mapeamento: {str(e)}")
+        finally:
+            self._finish(conn, error)
+        return references
+    
+    def load_schema(self, tables: List[str]):
+        """Modelo de tipos das tabelas (SchemaModel) ou None se o INFORMATION_SCHEMA não responder"""
+        from chalicelib.services.schema import SchemaModel
+        conn = self._get_connection()
+        error = None
+        try:
+            return SchemaModel.load(conn, tables)
+        except Exception as e:
+            error = e
+            logger.warning(f"Esquema das tabelas indisponível, gravando sem conversão de tipos: {str(e)}")
+            return None
+        finally:
+            self._finish(conn, error)
+    
+    def primary_key(self, conn, table: str) -> List[str]:
+        """Colunas da chave primária da tabela (INFORMATION_SCHEMA, lidas uma vez por tabela)"""
+        if table not in self._primary_keys:
+            key: List[str] = []
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute(
+                        "SELECT COLUMN_NAME AS name FROM INFORMATION_SCHEMA.KEY_COLUMN_USAGE "
+                        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND CONSTRAINT_NAME = 'PRIMARY' "
+                        "ORDER BY ORDINAL_POSITION",
+                        (table,)
+                    )
+                    key = [row['name'] if isinstance(row, dict) else row[0] for row in cursor.fetchall()]
+            except Exception as e:
+                if is_connection_lost(e):
+                    raise
+                logger.warning(f"Chave primária de {table} indisponível: {str(e)}")
+            self._primary_keys[table] = key
+        return self._primary_keys[table]
+    
+    def _load(self, conn, table: str, columns: List[str], data: List[tuple]):
+        """Grava o lote com o carregador configurado (executemany ou LOAD DATA + merge)"""
+        if self.loader == 'load_data':
+            try:
+                load_data_upsert(conn, table, columns, data)
+                return
+            except Exception as e:
+                if not e.args or e.args[0] not in LOCAL_INFILE_DISABLED_CODES:
+                    raise
+                logger.warning(f"LOAD DATA LOCAL indisponível ({str(e)}) - usando executemany")
+                self.loader = 'executemany'
+        
+        key = (table, tuple(columns))
+        query = self._queries.get(key)
+        if query is None:
+            query = self._queries[key] = self._upsert_query(table, columns)
+        # O pymysql reescreve o executemany em INSERTs multi-linha de até max_stmt_length bytes
+        budget = self._statement_budget(conn)
+        with conn.cursor() as cursor:
+            cursor.max_stmt_length = budget
+            cursor.executemany(query, data)
+    
+    def _write(self, conn, table: str, columns: List[str], data: List[tuple]):
+        """Grava o lote + commit; em conexão perdida, reconecta e repete o lote uma vez
+        
+        Retorna a conexão em uso (a nova, se houve reconexão). Se a nova tentativa falhar,
+        a exceção leva a nova conexão em `connection`, para o rollback ser feito nela.
+        """
+        try:
+            self._load(conn, table, columns, data)
+            conn.commit()
+            return conn
+        except Exception as e:
+            if not is_connection_lost(e):
+                raise
+            logger.warning(f"Conexão perdida ({str(e)}) - reconectando")
+            self.pool.discard(conn)
+        
+        conn = self._get_connection(fresh=True)
+        try:
+            self._load(conn, table, columns, data)
+            conn.commit()
+        except Exception as e:
+            e.connection = conn
+            raise
+        return conn
+    
+    def _finish(self, conn, error: Optional[Exception] = None):
+        """Devolve a conexão ao pool; após erro, faz rollback e descarta se ela estiver inutilizável
+        
+        Se o erro indicar outra conexão em uso (reconexão no meio da escrita), é ela que é tratada.
+        """
+        conn = getattr(error, 'connection', conn)
+        if error is None:
+            self.pool.release(conn)
+            return
+        try:
+            conn.rollback()
+        except Exception:
+            self.pool.discard(conn)
+            return
+        if is_connection_lost(error):
+            self.pool.discard(conn)
+        else:
+            self.pool.release(conn)
+    
+    @staticmethod
+    def _upsert_query(table: str, columns: List[str]) -> str:
+        cols = ', '.join(columns)
+        placeholders = ', '.join(['%s'] * len(columns))
+        updates = ', '.join([f"{c}=VALUES({c})" for c in columns])
+        
+        return f"""
+            INSERT INTO {table} ({cols})
+            VALUES ({placeholders})
+            ON DUPLICATE KEY UPDATE {updates}
+        """
+    
+    def controller(self, table: str, initial: int) -> AdaptiveBatchSize:
+        if table not in self.controllers:
+            self.controllers[table] = AdaptiveBatchSize(
+                initial,
+                self.config.batch_min,
+                self.config.batch_max,
+                self.config.batch_target_seconds
+            )
+        return self.controllers[table]
+    
+    def batch_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Tamanhos escolhidos e vazão por tabela desde a última chamada"""
+        stats = {}
+        for table, controller in self.controllers.items():
+            stats[table] = controller.stats()
+            controller.reset_stats()
+        return stats
+    
+    def _write_adaptive(self, conn, table: str, columns: List[str], data: List[tuple], controller: AdaptiveBatchSize):
+        """Grava os dados em lotes do tamanho escolhido pelo controlador, medindo a latência de cada um
+        
+        Deadlock ou lock wait timeout desfazem só o lote atual, que é refeito com o tamanho reduzido.
+        """
+        i = 0
+        retries = 0
+        while i < len(data):
+            chunk = data[i:i + controller.size]
+            start = time.perf_counter()
+            try:
+                conn = self._write(conn, table, columns, chunk)
+            except Exception as e:
+                # Após reconexão, o rollback e as próximas tentativas usam a nova conexão
+                conn = getattr(e, 'connection', conn)
+                if not is_lock_error(e) or retries >= LOCK_RETRIES:
+                    e.connection = conn
+                    raise
+                retries += 1
+                conn.rollback()
+                controller.record(len(chunk), time.perf_counter() - start, lock_error=e.args[0])
+                logger.warning(f"Disputa de lock em {table} ({str(e)}) - refazendo com {controller.size} linhas")
+                continue
+            elapsed = time.perf_counter() - start
+            controller.record(len(chunk), elapsed)
+            retries = 0
+            i += len(chunk)
+            logger.info(f"Lote de {len(chunk)} linhas de {table} persistido em {elapsed:.3f}s")
+        return conn
+    
+    def _write_shard(self, table: str, columns: List[str], data: List[tuple], controller: AdaptiveBatchSize):
+        conn = self._get_connection()
+        try:
+            conn = self._write_adaptive(conn, table, columns, data, controller)
+        except Exception as e:
+            self._finish(conn, e)
+            raise
+        self._finish(conn)
+    
+    def skipped_rows(self) -> Dict[str, int]:
+        """Linhas sem alteração ignoradas no modo delta, por tabela, desde a última chamada"""
+        return self.delta.skipped_rows() if self.delta else {}
+    
+    def collapsed_rows(self) -> Dict[str, int]:
+        """Linhas duplicadas (mesma chave primária no arquivo) descartadas, por tabela, desde a última chamada"""
+        duplicates, self.duplicates = self.duplicates, {}
+        return duplicates
+    
+    def _filter_rows(self, conn, table: str, columns: List[str], data: List[tuple],
+                     seen: Optional[Set] = None) -> Tuple[List[tuple], Optional[List[tuple]]]:
+        """Aplica DB_DEDUP e o modo delta; retorna (linhas a gravar, hashes a registrar após o commit)
+        
+        Com DB_DEDUP, cada lote mantém só a última linha de cada chave primária antes do upsert.
+        seen guarda as chaves já gravadas nos lotes anteriores do mesmo arquivo: uma chave
+        repetida em outro lote é descartada, e cada chave chega ao MySQL uma vez por arquivo.
+        """
+        key = self.primary_key(conn, table) if self.delta or self.config.dedup else None
+        if not key or any(column not in columns for column in key):
+            return data, None
+        
+        if self.config.dedup:
+            data, collapsed = keep_last(data, [columns.index(column) for column in key], seen)
+            self.duplicates[table] = self.duplicates.get(table, 0) + collapsed
+            if collapsed:
+                logger.info(f"{collapsed} linhas duplicadas de {table} descartadas (mantida a última)")
+        if not self.delta:
+            return data, None
+        return self.delta.changed(conn, table, columns, data, key)
+    
+    def _write_rows(self, conn, table: str, columns: List[str], data: List[tuple], batch_size: int,
+                    seen: Optional[Set] = None):
+        """Grava as linhas (só as novas ou alteradas, no modo delta); retorna a conexão em uso"""
+        data, hashes = self._filter_rows(conn, table, columns, data, seen)
+        if data:
+            conn = self._write_shards(conn, table, columns, data, batch_size)
+        if hashes:
+            try:
+                self.delta.record(conn, hashes, self._statement_budget(conn))
+            except Exception as e:
+                e.connection = conn
+                raise
+        return conn
+    
+    def _write_shards(self, conn, table: str, columns: List[str], data: List[tuple], batch_size: int):
+        """Grava as linhas na conexão informada ou, com DB_SHARDS > 1, em shards paralelos
+        
+        Cada shard é um grupo disjunto de chaves primárias (faixa ou hash), gravado em sua
+        própria conexão e com seu próprio controlador de lote ("tabela[n]" nas estatísticas,
+        com deadlocks por shard). Retorna a conexão em uso pelo chamador.
+        """
+        shards = self.config.shards
+        if shards <= 1 or len(data) < 2 * self.config.batch_min:
+            return self._write_adaptive(conn, table, columns, data, self.controller(table, batch_size))
+        
+        key = self.primary_key(conn, table)
+        if not key or any(column not in columns for column in key):
+            return self._write_adaptive(conn, table, columns, data, self.controller(table, batch_size))
+        
+        positions = [columns.index(column) for column in key]
+        parts = shard_rows(data, positions, shards, self.config.shard_mode)
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=shards, thread_name_prefix='shard')
+        futures = [
+            self._executor.submit(
+                self._write_shard, table, columns, part,
+                self.controller(f"{table}[{i}]", max(1, batch_size // shards))
+            )
+            for i, part in enumerate(parts)
+        ]
+        errors = [future.exception() for future in futures]
+        errors = [error for error in errors if error is not None]
+        if errors:
+            raise errors[0]
+        return conn
+    
     def bulk_upsert(self, table: str, columns: List[str], data: List[tuple], batch_size: int = 1000):
-        """Insere/atualiza dados em lote"""
+        """Insere/atualiza dados em lote (batch_size é o tamanho inicial, ajustado pela latência)"""
         conn = self._get_connection()
-        cursor = conn.cursor()
         
         try:
-            cols = ', '.join(columns)
-            placeholders = ', '.join(['%s'] * len(columns))
-            updates = ', '.join([f"{c}=VALUES({c})" for c in columns])
-            
-            query = f"""
-                INSERT INTO {table} ({cols})
-                VALUES ({placeholders})
-                ON DUPLICATE KEY UPDATE {updates}
-            """
-            
-            for i in range(0, len(data), batch_size):
-                cursor.executemany(query, data[i:i + batch_size])
-                conn.commit()
-                logger.info(f"Lote {i//batch_size + 1} persistido")
+            conn = self._write_rows(conn, table, columns, data, batch_size)
+            self._finish(conn)
                 
         except Exception as e:
-            conn.rollback()
+            self._finish(conn, e)
             logger.error(f"Erro na persistência: {str(e)}")
             raise DatabaseError(f"Falha na persistência: {str(e)}")
-        finally:
-            cursor.close()
-            conn.close()
\ No newline at end of file
+    
+    def upsert_batches(self, batches: Iterable[Tuple[str, List[tuple]]], columns: Dict[str, List[str]],
+                       batch_size: Optional[int] = None) -> Dict[str, int]:
+        """Grava cada lote assim que é gerado (pipeline em streaming), retornando linhas por tabela
+        
+        Lotes recebidos maiores que o tamanho escolhido pelo controlador da tabela são
+        divididos; batch_size é o tamanho inicial (padrão: o primeiro lote recebido).
+        """
+        conn = self._get_connection()
+        processed = {table: 0 for table in columns}
+        # Chaves já gravadas por tabela, para o DB_DEDUP valer no arquivo inteiro
+        seen = {table: set() for table in columns}
+        
+        try:
+            for table, batch in batches:
+                if not batch:
+                    continue
+                conn = self._write_rows(conn, table, columns[table], batch, batch_size or len(batch), seen[table])
+                processed[table] += len(batch)
+            self._finish(conn)
+            return processed
+        except ProcessingError as e:
+            self._finish(conn, e)
+            raise
+        except Exception as e:
+            self._finish(conn, e)
+            logger.error(f"Erro na persistência: {str(e)}")
+            raise DatabaseError(f"Falha na persistência: {str(e)}")
+    
+    def upsert_group(self, batches: Iterable[Tuple[str, List[tuple]]], columns: Dict[str, List[str]]) -> Dict[str, int]:
+        """Grava os lotes de vários arquivos pequenos em uma única transação, retornando linhas por tabela
+        
+        Sem divisão adaptativa, shards nem nova tentativa: qualquer erro desfaz o grupo inteiro
+        e o chamador decide como repetir. Os lotes devem vir na ordem de carga; no modo delta,
+        os hashes são filtrados antes da primeira escrita e registrados após o commit.
+        Nenhuma instrução antes do commit pode fazer commit implícito (a staging do
+        load_data é esvaziada com DELETE, não TRUNCATE).
+        """
+        conn = self._get_connection()
+        processed = {table: 0 for table in columns}
+        # Se o grupo for desfeito, o chamador regrava arquivo a arquivo e as linhas são contadas de novo
+        duplicates = dict(self.duplicates)
+        skipped = dict(self.delta.skipped) if self.delta else None
+        seen = {table: set() for table in columns}
+        
+        try:
+            staged = []
+            hashes = []
+            for table, batch in batches:
+                if not batch:
+                    continue
+                processed[table] += len(batch)
+                data, table_hashes = self._filter_rows(conn, table, columns[table], batch, seen[table])
+                if data:
+                    staged.append((table, data))
+                hashes.extend(table_hashes or [])
+            
+            start = time.perf_counter()
+            for table, data in staged:
+                self._load(conn, table, columns[table], data)
+            conn.commit()
+            if hashes:
+                self.delta.record(conn, hashes, self._statement_budget(conn))
+            self._finish(conn)
+            logger.info(f"{sum(len(data) for _, data in staged)} linhas de {len(staged)} lotes "
+                        f"persistidas em uma transação ({time.perf_counter() - start:.3f}s)")
+            return processed
+        except Exception as e:
+            self._finish(conn, e)
+            self.duplicates = duplicates
+            if self.delta:
+                self.delta.skipped = skipped
+            logger.error(f"Erro na persistência do grupo: {str(e)}")
+            raise DatabaseError(f"Falha na persistência do grupo: {str(e)}")
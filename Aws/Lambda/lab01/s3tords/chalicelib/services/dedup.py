@@ -0,0 +1,31 @@
+import hashlib
+from operator import itemgetter
+from typing import Callable, List, Optional, Set, Tuple
+
+
+def _key_reader(positions: List[int]) -> Callable[[tuple], object]:
+    """Chave de uma coluna fica como o próprio valor; chaves compostas viram um digest de 16 bytes"""
+    if len(positions) == 1:
+        return itemgetter(positions[0])
+    getter = itemgetter(*positions)
+    return lambda row: hashlib.blake2b('\x1f'.join(map(repr, getter(row))).encode(), digest_size=16).digest()
+
+
+def keep_last(rows: List[tuple], positions: List[int], seen: Optional[Set] = None) -> Tuple[List[tuple], int]:
+    """Mantém só a última linha de cada chave primária, na ordem das últimas ocorrências
+
+    Retorna (linhas, duplicatas descartadas). Percorre as linhas de trás para frente
+    guardando apenas as chaves já vistas, sem copiar as linhas para um dicionário.
+    Com seen (as chaves dos lotes anteriores do arquivo), linhas com chaves já gravadas
+    também são descartadas e as chaves mantidas são acrescentadas a ele.
+    """
+    key = _key_reader(positions)
+    seen = set() if seen is None else seen
+    kept = []
+    for row in reversed(rows):
+        value = key(row)
+        if value not in seen:
+            seen.add(value)
+            kept.append(row)
+    kept.reverse()
+    return kept, len(rows) - len(kept)
@@ -0,0 +1,107 @@
+import hashlib
+from operator import itemgetter
+from typing import Dict, List, Tuple
+from chalicelib.core.logger import logger
+
+# Parâmetros por SELECT ... IN na consulta dos hashes gravados
+LOOKUP_CHUNK = 1000
+
+
+def _digest(values: tuple) -> bytes:
+    return hashlib.blake2b('\x1f'.join(map(repr, values)).encode(), digest_size=16).digest()
+
+
+class DeltaFilter:
+    """Detecta linhas novas ou alteradas pelo hash das colunas de negócio
+
+    Para cada chave primária fica guardado, em uma tabela auxiliar no MySQL, o hash das
+    colunas vindas do arquivo ou constantes (colunas 'function', como a data de atualização,
+    ficam de fora). Só as linhas com hash diferente do gravado seguem para o upsert. Os
+    hashes são gravados depois do commit dos dados: uma falha entre os dois commits faz a
+    linha ser regravada na próxima carga, nunca ignorada.
+    """
+
+    def __init__(self, mappings: List[Dict], table: str = 'etl_row_hash'):
+        self.table = table
+        self.hashed_columns = {
+            mapping['name']: [col['name'] for col in mapping['columns'] if col['source'].get('type') != 'function']
+            for mapping in mappings
+        }
+        self.skipped: Dict[str, int] = {}
+        self._created = False
+
+    def _ensure_table(self, conn):
+        if not self._created:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                    "table_name VARCHAR(64) NOT NULL, "
+                    "pk_hash BINARY(16) NOT NULL, "
+                    "row_hash BINARY(16) NOT NULL, "
+                    "PRIMARY KEY (table_name, pk_hash)"
+                    ") ENGINE=InnoDB"
+                )
+            self._created = True
+
+    def changed(self, conn, table: str, columns: List[str], rows: List[tuple],
+                key: List[str]) -> Tuple[List[tuple], List[tuple]]:
+        """Retorna (linhas a gravar, hashes a registrar após o commit)
+
+        Linhas repetidas para a mesma chave mantêm só a última ocorrência, como no upsert.
+        """
+        hashed = [columns.index(column) for column in self.hashed_columns.get(table, columns) if column in columns]
+        read_key = itemgetter(*[columns.index(column) for column in key])
+        read_hashed = itemgetter(*hashed)
+
+        latest: Dict[bytes, Tuple[bytes, tuple]] = {}
+        for row in rows:
+            pk = read_key(row)
+            values = read_hashed(row)
+            latest[_digest(pk if isinstance(pk, tuple) else (pk,))] = (
+                _digest(values if isinstance(values, tuple) else (values,)), row
+            )
+
+        self._ensure_table(conn)
+        stored: Dict[bytes, bytes] = {}
+        pk_hashes = list(latest)
+        with conn.cursor() as cursor:
+            for i in range(0, len(pk_hashes), LOOKUP_CHUNK):
+                chunk = pk_hashes[i:i + LOOKUP_CHUNK]
+                cursor.execute(
+                    f"SELECT pk_hash, row_hash FROM {self.table} "
+                    f"WHERE table_name = %s AND pk_hash IN ({', '.join(['%s'] * len(chunk))})",
+                    [table] + chunk
+                )
+                for row in cursor.fetchall():
+                    pk_hash, row_hash = (row['pk_hash'], row['row_hash']) if isinstance(row, dict) else row
+                    stored[bytes(pk_hash)] = bytes(row_hash)
+
+        changed = []
+        hashes = []
+        for pk_hash, (row_hash, row) in latest.items():
+            if stored.get(pk_hash) != row_hash:
+                changed.append(row)
+                hashes.append((table, pk_hash, row_hash))
+
+        # Só as linhas iguais ao hash gravado; repetições da chave no lote não contam
+        skipped = len(latest) - len(changed)
+        self.skipped[table] = self.skipped.get(table, 0) + skipped
+        if skipped:
+            logger.info(f"{skipped} de {len(rows)} linhas de {table} sem alteração - ignoradas")
+        return changed, hashes
+
+    def record(self, conn, hashes: List[tuple], max_stmt_length: int):
+        """Registra os hashes das linhas gravadas (commit próprio)"""
+        with conn.cursor() as cursor:
+            cursor.max_stmt_length = max_stmt_length
+            cursor.executemany(
+                f"INSERT INTO {self.table} (table_name, pk_hash, row_hash) VALUES (%s, %s, %s) "
+                "ON DUPLICATE KEY UPDATE row_hash = VALUES(row_hash)",
+                hashes
+            )
+        conn.commit()
+
+    def skipped_rows(self) -> Dict[str, int]:
+        """Linhas ignoradas por tabela desde a última chamada"""
+        skipped, self.skipped = self.skipped, {}
+        return skipped
@@ -0,0 +1,141 @@
+import hashlib
+import threading
+import time
+from typing import Callable, Dict, Tuple
+from chalicelib.core.logger import logger
+
+# Resultados de acquire()
+ACQUIRED = 'acquired'
+DONE = 'done'
+BUSY = 'busy'
+
+
+def _file_hash(bucket: str, key: str, etag: str) -> bytes:
+    return hashlib.blake2b(f"{bucket}\x1f{key}\x1f{etag}".encode(), digest_size=16).digest()
+
+
+class FileLedger:
+    """Registro de arquivos processados por bucket/chave/ETag, em uma tabela no MySQL
+
+    Antes de processar, a invocação toma um lease curto sobre o arquivo; entregas
+    duplicadas de um arquivo já concluído custam uma consulta, e uma entrega concorrente
+    encontra o lease ativo e desiste. Um lease expirado (invocação que morreu no meio)
+    pode ser tomado por outra. Os tempos usam o relógio do servidor.
+    """
+
+    def __init__(self, database, table: str = 'etl_file_ledger', lease_seconds: int = 900):
+        self.database = database
+        self.table = table
+        self.lease_seconds = lease_seconds
+        self._created = False
+
+    def _execute(self, query: str, args: tuple = None, fetch: bool = False):
+        conn = self.database._get_connection()
+        error = None
+        try:
+            with conn.cursor() as cursor:
+                if not self._created:
+                    cursor.execute(
+                        f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                        "file_hash BINARY(16) NOT NULL, "
+                        "bucket VARCHAR(255) NOT NULL, "
+                        "object_key VARCHAR(1024) NOT NULL, "
+                        "etag VARCHAR(128) NOT NULL, "
+                        "status VARCHAR(16) NOT NULL, "
+                        "owner VARCHAR(64) NOT NULL, "
+                        "lease_until BIGINT NOT NULL, "
+                        "updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP, "
+                        "PRIMARY KEY (file_hash)"
+                        ") ENGINE=InnoDB"
+                    )
+                    self._created = True
+                cursor.execute(query, args)
+                row = cursor.fetchone() if fetch else None
+            conn.commit()
+            return row
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.database._finish(conn, error)
+
+    def _state(self, file_hash: bytes):
+        row = self._execute(f"SELECT status, owner FROM {self.table} WHERE file_hash = %s", (file_hash,), fetch=True)
+        if row is None:
+            return None, None
+        return (row['status'], row['owner']) if isinstance(row, dict) else tuple(row)
+
+    def acquire(self, bucket: str, key: str, etag: str, owner: str) -> str:
+        """Toma o lease do arquivo: ACQUIRED, DONE (já concluído) ou BUSY (em outra invocação)"""
+        file_hash = _file_hash(bucket, key, etag)
+        status, _ = self._state(file_hash)
+        if status == DONE:
+            return DONE
+
+        # owner é atualizado antes de lease_until: no ON DUPLICATE KEY UPDATE cada
+        # atribuição já enxerga as anteriores
+        self._execute(
+            f"INSERT INTO {self.table} (file_hash, bucket, object_key, etag, status, owner, lease_until) "
+            "VALUES (%s, %s, %s, %s, 'processing', %s, UNIX_TIMESTAMP() + %s) "
+            "ON DUPLICATE KEY UPDATE "
+            "owner = IF(status <> 'done' AND lease_until < UNIX_TIMESTAMP(), VALUES(owner), owner), "
+            "lease_until = IF(owner = VALUES(owner), VALUES(lease_until), lease_until)",
+            (file_hash, bucket, key[:1024], etag, owner, self.lease_seconds)
+        )
+        status, current = self._state(file_hash)
+        if status == DONE:
+            return DONE
+        return ACQUIRED if current == owner else BUSY
+
+    def complete(self, bucket: str, key: str, etag: str, owner: str):
+        """Marca o arquivo como concluído (entregas seguintes são ignoradas)"""
+        self._execute(
+            f"UPDATE {self.table} SET status = 'done', lease_until = 0 WHERE file_hash = %s AND owner = %s",
+            (_file_hash(bucket, key, etag), owner)
+        )
+
+    def release(self, bucket: str, key: str, etag: str, owner: str):
+        """Libera o lease sem concluir, para que uma nova entrega possa reprocessar o arquivo"""
+        try:
+            self._execute(
+                f"UPDATE {self.table} SET lease_until = 0 WHERE file_hash = %s AND owner = %s AND status <> 'done'",
+                (_file_hash(bucket, key, etag), owner)
+            )
+        except Exception as e:
+            # O lease expira sozinho; a falha não deve mascarar o erro original
+            logger.warning(f"Falha ao liberar o lease de {bucket}/{key}: {str(e)}")
+
+
+class MemoryLedger:
+    """Mesma interface de FileLedger, em memória do container (desenvolvimento e testes)"""
+
+    def __init__(self, lease_seconds: int = 900, clock: Callable[[], float] = time.time):
+        self.lease_seconds = lease_seconds
+        self.clock = clock
+        self._entries: Dict[bytes, Tuple[str, str, float]] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, bucket: str, key: str, etag: str, owner: str) -> str:
+        file_hash = _file_hash(bucket, key, etag)
+        now = self.clock()
+        with self._lock:
+            status, current, lease_until = self._entries.get(file_hash, (None, None, 0))
+            if status == DONE:
+                return DONE
+            if current not in (None, owner) and lease_until >= now:
+                return BUSY
+            self._entries[file_hash] = ('processing', owner, now + self.lease_seconds)
+            return ACQUIRED
+
+    def complete(self, bucket: str, key: str, etag: str, owner: str):
+        file_hash = _file_hash(bucket, key, etag)
+        with self._lock:
+            if self._entries.get(file_hash, (None, None, 0))[1] == owner:
+                self._entries[file_hash] = (DONE, owner, 0)
+
+    def release(self, bucket: str, key: str, etag: str, owner: str):
+        file_hash = _file_hash(bucket, key, etag)
+        with self._lock:
+            status, current, _ = self._entries.get(file_hash, (None, None, 0))
+            if current == owner and status != DONE:
+                self._entries[file_hash] = (status, owner, 0)
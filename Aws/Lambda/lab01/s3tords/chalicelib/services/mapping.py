@@ -0,0 +1,155 @@
+from operator import itemgetter
+from typing import Any, Callable, Dict, List, Optional
+from chalicelib.core.logger import logger
+
+
+def _getter(positions: List[int]) -> Callable[[List[Any]], tuple]:
+    """itemgetter que sempre retorna tupla (inclusive para 0 ou 1 posição)"""
+    if not positions:
+        return lambda values: ()
+    if len(positions) == 1:
+        position = positions[0]
+        return lambda values: (values[position],)
+    return itemgetter(*positions)
+
+
+class ProjectionPlan:
+    """Plano de projeção pré-compilado a partir de TABLE_MAPPINGS
+
+    Cada coluna de origem (índice + transformação) é lida uma única vez por linha e
+    compartilhada entre as tabelas; constantes e funções são resolvidas uma vez por arquivo.
+    """
+
+    def __init__(self, tables: List[str], indexes: List[int], transforms: List[tuple],
+                 bound_columns: List[Dict], layouts: List[List[int]], resolve: Callable[[Dict], Any]):
+        self.tables = tables
+        self.indexes = indexes
+        self.transforms = transforms
+        self.bound_columns = bound_columns
+        self.layouts = layouts
+        self.resolve = resolve
+
+    def bind_constants(self) -> List[Any]:
+        """Resolve as colunas que não dependem da linha (uma vez por arquivo)"""
+        constants = []
+        for col in self.bound_columns:
+            try:
+                constants.append(self.resolve(col))
+            except Exception as e:
+                logger.error(f"Erro na coluna {col['name']}: {str(e)}")
+                constants.append(None)
+        return constants
+
+    def bind(self, constants: Optional[List[Any]] = None) -> Callable[[List[str], int], List[tuple]]:
+        """Resolve constantes/funções e retorna o projetor de linhas (uma tupla por tabela)"""
+        if constants is None:
+            constants = self.bind_constants()
+
+        indexes = self.indexes
+        transforms = self.transforms
+        getters = [_getter(layout) for layout in self.layouts]
+        read = _getter(indexes)
+        min_len = max(indexes) + 1 if indexes else 0
+
+        def project(row: List[str], row_idx: int) -> List[tuple]:
+            if len(row) >= min_len:
+                values = list(read(row))
+            else:
+                size = len(row)
+                values = [row[i] if i < size else None for i in indexes]
+
+            for slot, transform, name in transforms:
+                value = values[slot]
+                if value is not None:
+                    try:
+                        values[slot] = transform(value)
+                    except Exception as e:
+                        logger.error(f"Erro na coluna {name}, linha {row_idx}: {str(e)}")
+                        values[slot] = None
+
+            values += constants
+            return [getter(values) for getter in getters]
+
+        return project
+
+
+def compile_mappings(mappings: List[Dict], transforms: Dict[str, Callable[[Any], Any]],
+                     resolve: Callable[[Dict], Any]) -> ProjectionPlan:
+    """Compila os mapeamentos em um plano de projeção por tabela
+
+    Args:
+        mappings: Lista de tabelas no formato de TABLE_MAPPINGS
+        transforms: Transformações disponíveis ('date', 'ippi', ...)
+        resolve: Resolve colunas que não dependem da linha (constantes e funções)
+    """
+    slots: Dict[tuple, int] = {}
+    indexes: List[int] = []
+    slot_transforms: List[tuple] = []
+    bound_columns: List[Dict] = []
+    column_layouts: List[List[tuple]] = []
+
+    for table in mappings:
+        layout = []
+        for col in table['columns']:
+            source = col['source']
+            if source.get('type') != 'column':
+                bound_columns.append(col)
+                layout.append(('bound', len(bound_columns) - 1))
+                continue
+
+            transform: Optional[Callable] = transforms.get(source.get('transform'))
+            key = (source['index'], transform)
+            if key not in slots:
+                slots[key] = len(indexes)
+                indexes.append(source['index'])
+                if transform is not None:
+                    slot_transforms.append((slots[key], transform, col['name']))
+            layout.append(('slot', slots[key]))
+        column_layouts.append(layout)
+
+    # Constantes ficam após os slots lidos da linha
+    layouts = [
+        [position if kind == 'slot' else len(indexes) + position for kind, position in layout]
+        for layout in column_layouts
+    ]
+
+    return ProjectionPlan(
+        tables=[table['name'] for table in mappings],
+        indexes=indexes,
+        transforms=slot_transforms,
+        bound_columns=bound_columns,
+        layouts=layouts,
+        resolve=resolve
+    )
+
+
+def table_dependencies(mappings: List[Dict]) -> Dict[str, List[str]]:
+    """Tabelas mapeadas referenciadas (FK) por cada tabela, conforme 'depends_on'"""
+    names = [table['name'] for table in mappings]
+    return {
+        table['name']: [dep for dep in table.get('depends_on', []) if dep in names]
+        for table in mappings
+    }
+
+
+def load_order(mappings: List[Dict]) -> List[str]:
+    """Ordena as tabelas para que as referenciadas em 'depends_on' (FK) sejam gravadas antes"""
+    names = [table['name'] for table in mappings]
+    dependencies = table_dependencies(mappings)
+    order: List[str] = []
+    visiting = set()
+
+    def visit(name: str):
+        if name in order:
+            return
+        if name in visiting:
+            raise ValueError(f"Dependência circular entre tabelas envolvendo {name}")
+        visiting.add(name)
+        for dependency in dependencies[name]:
+            visit(dependency)
+        visiting.discard(name)
+        order.append(name)
+
+    for name in names:
+        visit(name)
+    return order
@@ -0,0 +1,120 @@
+import queue
+import threading
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
+from chalicelib.core.exceptions import DatabaseError, ProcessingError
+from chalicelib.core.logger import logger
+
+
+class ParallelLoader:
+    """Grava as tabelas mapeadas ao mesmo tempo, cada uma em sua thread e conexão do pool
+
+    Os lotes recebem um número de sequência na ordem em que o processador os gera. Uma
+    tabela dependente (FK) só grava o lote n depois que as tabelas referenciadas tiverem
+    feito commit de todos os seus lotes anteriores a n; tabelas independentes não esperam.
+    """
+
+    def __init__(self, database, dependencies: Dict[str, List[str]], queue_size: int = 2):
+        """
+        Args:
+            database: DatabaseService usado para conexões, gravação e controle do tamanho de lote
+            dependencies: Tabelas referenciadas por cada tabela (além das FKs lidas do banco)
+            queue_size: Lotes aguardando gravação por tabela (limita a memória em uso)
+        """
+        self.database = database
+        self.mapped_dependencies = dependencies
+        self.queue_size = queue_size
+        self._dependencies: Optional[Dict[str, List[str]]] = None
+
+    def dependencies(self, tables: List[str]) -> Dict[str, List[str]]:
+        """Dependências do mapeamento somadas às FKs do INFORMATION_SCHEMA (lidas uma vez)"""
+        if self._dependencies is None:
+            merged = {table: list(self.mapped_dependencies.get(table, [])) for table in tables}
+            for table, parents in self.database.foreign_keys(tables).items():
+                merged[table].extend(parent for parent in parents if parent not in merged[table])
+            self._dependencies = merged
+        return self._dependencies
+
+    def load(self, batches: Iterable[Tuple[str, List[tuple]]], columns: Dict[str, List[str]],
+             batch_size: Optional[int] = None) -> Dict[str, int]:
+        """Grava os lotes em paralelo por tabela, retornando linhas por tabela"""
+        dependencies = self.dependencies(list(columns))
+        processed = {table: 0 for table in columns}
+        pending: Dict[str, Deque[int]] = {table: deque() for table in columns}
+        queues = {table: queue.Queue(self.queue_size) for table in columns}
+        condition = threading.Condition()
+        errors: List[Exception] = []
+
+        def ready(table: str, seq: int) -> bool:
+            return bool(errors) or all(
+                not pending[parent] or pending[parent][0] > seq for parent in dependencies[table]
+            )
+
+        def worker(table: str):
+            conn = None
+            error = None
+            seen = set()
+            try:
+                conn = self.database._get_connection()
+                while True:
+                    item = queues[table].get()
+                    if item is None:
+                        break
+                    seq, batch = item
+                    with condition:
+                        condition.wait_for(lambda: ready(table, seq))
+                        if errors:
+                            continue
+                    conn = self.database._write_rows(conn, table, columns[table], batch, batch_size or len(batch), seen)
+                    processed[table] += len(batch)
+                    with condition:
+                        pending[table].popleft()
+                        condition.notify_all()
+            except Exception as e:
+                error = e
+                logger.error(f"Erro na gravação de {table}: {str(e)}")
+                with condition:
+                    errors.append(e)
+                    condition.notify_all()
+                # Esvazia a fila para não bloquear quem distribui os lotes
+                while queues[table].get() is not None:
+                    pass
+            finally:
+                if conn is not None:
+                    self.database._finish(conn, error)
+
+        threads = [
+            threading.Thread(target=worker, args=(table,), name=f"loader-{table}", daemon=True)
+            for table in columns
+        ]
+        for thread in threads:
+            thread.start()
+
+        seq = 0
+        try:
+            for table, batch in batches:
+                if errors:
+                    break
+                if not batch:
+                    continue
+                seq += 1
+                with condition:
+                    pending[table].append(seq)
+                queues[table].put((seq, batch))
+        except Exception as e:
+            with condition:
+                errors.insert(0, e)
+                condition.notify_all()
+        finally:
+            for table in columns:
+                queues[table].put(None)
+            for thread in threads:
+                thread.join()
+
+        if errors:
+            error = errors[0]
+            if isinstance(error, ProcessingError):
+                raise error
+            logger.error(f"Erro na persistência: {str(error)}")
+            raise DatabaseError(f"Falha na persistência: {str(error)}")
+        return processed
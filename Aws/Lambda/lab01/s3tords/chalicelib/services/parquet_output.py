@@ -0,0 +1,200 @@
+import os
+import tempfile
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from chalicelib.core.logger import logger
+from chalicelib.services.compression import split_extension
+
+CONTENT_TYPE = 'application/vnd.apache.parquet'
+
+
+def parquet_available() -> bool:
+    """Indica se o pyarrow (dependência opcional) está instalado"""
+    try:
+        import pyarrow.parquet  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def partition_key(prefix: str, table: str, date: str, source_key: str) -> str:
+    """prefixo/tabela/dt=AAAA-MM-DD/nome.parquet, com o nome do arquivo de origem
+
+    Reprocessar o mesmo arquivo no mesmo dia sobrescreve a saída anterior em vez de duplicá-la.
+    """
+    name, _ = split_extension(source_key.rsplit('/', 1)[-1])
+    return f"{prefix}{table}/dt={date}/{name}.parquet"
+
+
+class _TableWriter:
+    """ParquetWriter de uma tabela sobre um arquivo temporário
+
+    As linhas são acumuladas em colunas Arrow e gravadas em row groups de exatamente
+    row_group_rows linhas (o último pode ser menor), independente do tamanho dos lotes.
+    Os tipos vêm do primeiro lote; colunas só com None nele viram string.
+    """
+
+    def __init__(self, columns: List[str], row_group_rows: int, compression: str, directory: Optional[str]):
+        self.columns = columns
+        self.row_group_rows = max(1, row_group_rows)
+        self.compression = compression
+        with tempfile.NamedTemporaryFile(suffix='.parquet', dir=directory, delete=False) as output:
+            self.path = output.name
+        self.schema = None
+        self.writer = None
+        self.pending = []
+        self.pending_rows = 0
+        self.rows = 0
+
+    def add(self, rows: List[tuple]):
+        import pyarrow as pa
+
+        if not rows:
+            return
+        values = list(zip(*rows))
+        if self.schema is None:
+            arrays = []
+            for column in values:
+                array = pa.array(column)
+                arrays.append(array.cast(pa.string()) if pa.types.is_null(array.type) else array)
+            self.schema = pa.schema([pa.field(name, array.type) for name, array in zip(self.columns, arrays)])
+        else:
+            arrays = [pa.array(column, type=field.type) for column, field in zip(values, self.schema)]
+
+        self.pending.append(pa.RecordBatch.from_arrays(arrays, schema=self.schema))
+        self.pending_rows += len(rows)
+        self.rows += len(rows)
+        while self.pending_rows >= self.row_group_rows:
+            self._write(self.row_group_rows)
+
+    def _write(self, size: int):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(self.path, self.schema, compression=self.compression)
+        table = pa.Table.from_batches(self.pending, schema=self.schema)
+        self.writer.write_table(table.slice(0, size), row_group_size=size)
+        rest = table.slice(size)
+        self.pending = rest.to_batches()
+        self.pending_rows = rest.num_rows
+
+    def close(self):
+        if self.pending_rows:
+            self._write(self.pending_rows)
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+    def discard(self):
+        try:
+            if self.writer is not None:
+                self.writer.close()
+        finally:
+            self.writer = None
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+
+class ParquetOutput:
+    """Saída Parquet de um arquivo de origem: um arquivo por tabela, enviado só em commit()
+
+    Falhas aqui nunca interrompem a carga no banco: a saída do arquivo é descartada,
+    o erro é registrado no log e devolvido no resultado.
+    """
+
+    def __init__(self, exporter: 'ParquetExporter', bucket: str, key: str):
+        self.exporter = exporter
+        self.bucket = exporter.bucket or bucket
+        self.key = key
+        self.date = datetime.now(timezone.utc).strftime('%Y-%m-%d')
+        self.writers: Dict[str, _TableWriter] = {}
+        self.error: Optional[str] = None
+
+    def tee(self, batches: Iterable[Tuple[str, List[tuple]]]) -> Iterator[Tuple[str, List[tuple]]]:
+        """Repassa os lotes (tabela, linhas) como vieram, copiando cada um para o Parquet"""
+        for table, rows in batches:
+            self.add(table, rows)
+            yield table, rows
+
+    def add(self, table: str, rows: List[tuple]):
+        if self.error is not None:
+            return
+        try:
+            writer = self.writers.get(table)
+            if writer is None:
+                exporter = self.exporter
+                writer = self.writers[table] = _TableWriter(
+                    exporter.columns[table], exporter.row_group_rows, exporter.compression, exporter.directory
+                )
+            writer.add(rows)
+        except Exception as e:
+            self._fail(f"Falha ao gerar o Parquet de {table}: {str(e)}")
+
+    def commit(self) -> Dict[str, Any]:
+        """Fecha os arquivos e envia ao S3; retorna as chaves e linhas por tabela (ou o erro)"""
+        if self.error is not None:
+            return {'error': self.error}
+        files, rows = {}, {}
+        try:
+            for table, writer in self.writers.items():
+                if not writer.rows:
+                    continue
+                writer.close()
+                key = partition_key(self.exporter.prefix, table, self.date, self.key)
+                self.exporter.client.upload_file(
+                    writer.path, self.bucket, key, ExtraArgs={'ContentType': CONTENT_TYPE}
+                )
+                files[table] = key
+                rows[table] = writer.rows
+        except Exception as e:
+            self._fail(f"Falha ao enviar o Parquet de {self.key}: {str(e)}")
+            return {'error': self.error, 'files': files}
+        finally:
+            self.discard()
+        logger.info(f"Parquet de {self.key}: {rows}")
+        return {'files': files, 'rows': rows}
+
+    def discard(self):
+        """Remove os arquivos temporários sem enviar (arquivo com erro)"""
+        for writer in self.writers.values():
+            writer.discard()
+        self.writers = {}
+
+    def _fail(self, message: str):
+        logger.warning(message)
+        self.error = message
+        self.discard()
+
+
+class ParquetExporter:
+    """Grava as linhas transformadas de cada tabela em Parquet, particionado por tabela e data
+
+    Os arquivos são montados em /tmp (SPILL_DIR) enquanto os lotes vão para o banco e só
+    são enviados depois que o arquivo de origem foi gravado com sucesso. Guardam todas as
+    linhas transformadas do arquivo, inclusive as que DB_DEDUP (chave repetida) e o modo
+    delta (linha sem alteração) não enviam ao MySQL.
+    """
+
+    def __init__(self, client, columns: Dict[str, List[str]], prefix: str, bucket: Optional[str] = None,
+                 row_group_rows: int = 250000, compression: str = 'snappy', directory: Optional[str] = None):
+        """
+        Args:
+            client: Cliente boto3 do S3
+            columns: Colunas de cada tabela, na ordem das tuplas dos lotes
+            prefix: Prefixo da saída (ex.: analytics/)
+            bucket: Bucket da saída (None = o bucket do arquivo de origem)
+            row_group_rows: Linhas por row group
+            compression: Codec do Parquet (snappy, zstd, gzip, none)
+            directory: Diretório dos arquivos temporários (None = /tmp)
+        """
+        self.client = client
+        self.columns = columns
+        self.prefix = prefix if not prefix or prefix.endswith('/') else prefix + '/'
+        self.bucket = bucket
+        self.row_group_rows = row_group_rows
+        self.compression = compression
+        self.directory = directory
+
+    def open(self, bucket: str, key: str) -> ParquetOutput:
+        return ParquetOutput(self, bucket, key)
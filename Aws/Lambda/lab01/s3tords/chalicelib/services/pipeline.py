@@ -0,0 +1,199 @@
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Tuple
+
+# Marca o fim dos itens de uma fila
+_END = object()
+# Intervalo para as etapas bloqueadas conferirem se o pipeline foi interrompido
+_POLL = 0.1
+
+
+class PipelineInterrupted(Exception):
+    """Outra etapa falhou; a etapa atual para sem concluir o trabalho"""
+    pass
+
+
+class StageStats:
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.seconds = 0.0
+        self.input_wait = 0.0
+        self.output_wait = 0.0
+
+    def busy(self) -> float:
+        return max(0.0, self.seconds - self.input_wait - self.output_wait)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'items': self.items,
+            'seconds': round(self.seconds, 3),
+            'busy': round(self.busy(), 3),
+            'input_wait': round(self.input_wait, 3),
+            'output_wait': round(self.output_wait, 3)
+        }
+
+
+class BoundedQueue:
+    """Fila com capacidade fixa entre duas etapas; put bloqueia quando cheia (contrapressão)"""
+
+    def __init__(self, capacity: int, interrupted: threading.Event):
+        self.capacity = capacity
+        self.queue = queue.Queue(capacity)
+        self.interrupted = interrupted
+        self.max_depth = 0
+        self.depth_total = 0
+        self.samples = 0
+        self.full = 0
+
+    def put(self, item, stage: StageStats):
+        depth = self.queue.qsize()
+        self.max_depth = max(self.max_depth, depth)
+        self.depth_total += depth
+        self.samples += 1
+        if depth >= self.capacity:
+            self.full += 1
+        start = time.perf_counter()
+        try:
+            while True:
+                if self.interrupted.is_set():
+                    raise PipelineInterrupted()
+                try:
+                    self.queue.put(item, timeout=_POLL)
+                    return
+                except queue.Full:
+                    pass
+        finally:
+            stage.output_wait += time.perf_counter() - start
+
+    def close(self):
+        while not self.interrupted.is_set():
+            try:
+                self.queue.put(_END, timeout=_POLL)
+                return
+            except queue.Full:
+                pass
+
+    def consume(self, stage: StageStats) -> Iterator[Any]:
+        while True:
+            start = time.perf_counter()
+            try:
+                while True:
+                    if self.interrupted.is_set():
+                        raise PipelineInterrupted()
+                    try:
+                        item = self.queue.get(timeout=_POLL)
+                        break
+                    except queue.Empty:
+                        pass
+            finally:
+                stage.input_wait += time.perf_counter() - start
+            if item is _END:
+                return
+            yield item
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'capacity': self.capacity,
+            'max_depth': self.max_depth,
+            'mean_depth': round(self.depth_total / self.samples, 2) if self.samples else 0,
+            'full': self.full
+        }
+
+
+class StagedPipeline:
+    """Download, processamento e gravação rodando ao mesmo tempo, ligados por filas limitadas
+
+    Cada etapa tem sua thread (a gravação usa a thread do chamador). Com as filas cheias a
+    etapa anterior fica bloqueada, então um banco lento segura o download e a memória em
+    uso fica limitada a queue_size blocos e queue_size lotes. A duração total tende à
+    da etapa mais lenta em vez da soma das três.
+    """
+
+    def __init__(self, queue_size: int = 4):
+        self.queue_size = max(1, queue_size)
+
+    def run(self, chunks: Iterable[bytes], parse: Callable[[Iterable[bytes]], Iterable[Any]],
+            write: Callable[[Iterable[Any]], Any]) -> Tuple[Any, Dict[str, Any]]:
+        """Retorna o resultado de write e as estatísticas por etapa e fila
+
+        Args:
+            chunks: Iterador de blocos do arquivo (a leitura acontece na etapa de download)
+            parse: Recebe os blocos e gera os lotes (tabela, registros)
+            write: Recebe os lotes e os persiste
+        """
+        interrupted = threading.Event()
+        chunk_queue = BoundedQueue(self.queue_size, interrupted)
+        batch_queue = BoundedQueue(self.queue_size, interrupted)
+        download = StageStats('download')
+        parsing = StageStats('parse')
+        writing = StageStats('write')
+        errors: List[Exception] = []
+
+        def fail(error: Exception):
+            if not isinstance(error, PipelineInterrupted):
+                errors.append(error)
+            interrupted.set()
+
+        def read_chunks():
+            start = time.perf_counter()
+            try:
+                for chunk in chunks:
+                    download.items += 1
+                    chunk_queue.put(chunk, download)
+                chunk_queue.close()
+            except Exception as e:
+                fail(e)
+            finally:
+                # Fecha o corpo da resposta do S3 também quando a leitura é interrompida
+                close = getattr(chunks, 'close', None)
+                if close is not None:
+                    close()
+                download.seconds = time.perf_counter() - start
+
+        def parse_chunks():
+            start = time.perf_counter()
+            try:
+                for batch in parse(chunk_queue.consume(parsing)):
+                    parsing.items += 1
+                    batch_queue.put(batch, parsing)
+                batch_queue.close()
+            except Exception as e:
+                fail(e)
+            finally:
+                parsing.seconds = time.perf_counter() - start
+
+        def count(batches: Iterator[Any]) -> Iterator[Any]:
+            for batch in batches:
+                writing.items += 1
+                yield batch
+
+        threads = [
+            threading.Thread(target=read_chunks, name='pipeline-download', daemon=True),
+            threading.Thread(target=parse_chunks, name='pipeline-parse', daemon=True)
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+
+        result = None
+        try:
+            result = write(count(batch_queue.consume(writing)))
+        except Exception as e:
+            fail(e)
+        finally:
+            writing.seconds = time.perf_counter() - start
+            for thread in threads:
+                thread.join()
+
+        if errors:
+            raise errors[0]
+
+        stages = (download, parsing, writing)
+        return result, {
+            'seconds': round(time.perf_counter() - start, 3),
+            'bottleneck': max(stages, key=StageStats.busy).name,
+            'stages': {stage.name: stage.summary() for stage in stages},
+            'queues': {'chunks': chunk_queue.summary(), 'batches': batch_queue.summary()}
+        }
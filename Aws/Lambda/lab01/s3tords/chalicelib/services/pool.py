@@ -0,0 +1,112 @@
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Tuple
+from chalicelib.core.logger import logger
+
+# Erros do cliente MySQL que indicam conexão perdida (servidor reiniciado, wait_timeout, rede)
+CONNECTION_LOST_CODES = {2006, 2013, 2014, 2045, 2055}
+
+
+def is_connection_lost(error: Exception) -> bool:
+    """Indica se o erro veio de uma conexão que não pode mais ser usada"""
+    err = sys.modules.get('pymysql.err')
+    if err is None:
+        return False
+    if isinstance(error, err.InterfaceError):
+        return True
+    return (
+        isinstance(error, err.OperationalError)
+        and bool(error.args)
+        and error.args[0] in CONNECTION_LOST_CODES
+    )
+
+
+class ConnectionPool:
+    """Pool de conexões no escopo do módulo, reaproveitado entre invocações quentes da Lambda
+
+    Conexões ociosas há mais de max_idle segundos são fechadas; as ociosas há mais de
+    ping_interval segundos passam por ping() antes de voltar ao uso.
+    """
+
+    def __init__(self, connect: Callable[[], Any], size: int = 2, max_idle: float = 300.0,
+                 ping_interval: float = 5.0, clock: Callable[[], float] = time.monotonic):
+        self.connect = connect
+        self.size = size
+        self.max_idle = max_idle
+        self.ping_interval = ping_interval
+        self.clock = clock
+        self._idle: List[Tuple[Any, float]] = []
+        self._lock = threading.Lock()
+
+    def acquire(self) -> Any:
+        """Retorna uma conexão ociosa ainda válida ou abre uma nova"""
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                conn, last_used = self._idle.pop()
+
+            idle = self.clock() - last_used
+            if idle > self.max_idle:
+                logger.info(f"Conexão ociosa há {idle:.0f}s descartada")
+                self._close(conn)
+                continue
+            if idle > self.ping_interval:
+                try:
+                    conn.ping(reconnect=False)
+                except Exception as e:
+                    logger.warning(f"Conexão inválida no ping, descartando: {str(e)}")
+                    self._close(conn)
+                    continue
+            return conn
+
+        return self.connect()
+
+    def release(self, conn: Any):
+        """Devolve a conexão ao pool (ou fecha, se o pool já estiver cheio)"""
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append((conn, self.clock()))
+                return
+        self._close(conn)
+
+    def discard(self, conn: Any):
+        """Fecha uma conexão que não deve voltar ao pool"""
+        self._close(conn)
+
+    def clear(self):
+        """Fecha todas as conexões ociosas"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._close(conn)
+
+    @staticmethod
+    def _close(conn: Any):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+_POOLS: Dict[tuple, ConnectionPool] = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def get_pool(key: tuple, connect: Callable[[], Any], **options) -> ConnectionPool:
+    """Retorna o pool do destino informado, criando-o na primeira chamada do container"""
+    with _POOLS_LOCK:
+        pool = _POOLS.get(key)
+        if pool is None:
+            pool = _POOLS[key] = ConnectionPool(connect, **options)
+        return pool
+
+
+def reset_pools():
+    """Fecha e descarta todos os pools (testes e troca de credenciais)"""
+    with _POOLS_LOCK:
+        pools = list(_POOLS.values())
+        _POOLS.clear()
+    for pool in pools:
+        pool.clear()
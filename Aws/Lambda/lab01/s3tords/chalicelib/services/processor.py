@@ -1,52 +1,138 @@
 import csv
 import io
 from datetime import datetime
-from typing import Dict, List, Any
+from typing import Dict, Iterable, Iterator, List, Any, Optional, Tuple, Union
 from chalicelib.core.logger import logger
+from chalicelib.services.mapping import compile_mappings, load_order
+from chalicelib.services.schema import RowValidator
+from chalicelib.services import columnar
+
+
+def _transform_date(value: Any) -> str:
+    try:
+        day, month, year = value.split('.')
+        return f"{year}-{month}-{day} 00:00:00"
+    except:
+        return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+def _transform_ippi(value: Any) -> int:
+    return 1 if value and value.upper() == 'C' else 2
+
+def _transform_now(_: Any) -> str:
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+TRANSFORMS = {
+    'date': _transform_date,
+    'ippi': _transform_ippi,
+    'now': _transform_now
+}
+
+# Versões vetorizadas (Arrow) das transformações, usadas pelo caminho colunar
+VECTORIZED = {
+    _transform_date: columnar.date_column,
+    _transform_ippi: columnar.ippi_column
+}
 
 class DataProcessor:
-    def __init__(self, mappings: List[Dict], delimiter: str = ';'):
+    def __init__(self, mappings: List[Dict], delimiter: str = ';', columnar: bool = False):
         self.mappings = mappings
         self.delimiter = delimiter
+        self.columnar = columnar
+        self.plan = compile_mappings(
+            mappings,
+            TRANSFORMS,
+            resolve=lambda col: self._get_column_value([], 0, col)
+        )
+        self.load_order = load_order(mappings)
     
     def transform_value(self, value: Any, transform_type: str) -> Any:
         """Aplica transformações aos valores"""
-        if transform_type == 'date':
-            try:
-                day, month, year = value.split('.')
-                return f"{year}-{month}-{day} 00:00:00"
-            except:
-                return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        elif transform_type == 'ippi':
-            return 1 if value and value.upper() == 'C' else 2
-        elif transform_type == 'now':
-            return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        return value
+        transform = TRANSFORMS.get(transform_type)
+        return transform(value) if transform else value
     
-    def process_csv(self, content: str) -> Dict[str, List[tuple]]:
-        """Processa conteúdo CSV e retorna dados estruturados por tabela"""
-        logger.info("Processando arquivo CSV")
-        reader = csv.reader(io.StringIO(content), delimiter=self.delimiter)
+    def process_csv(self, content: Union[str, Iterable[str]]) -> Dict[str, List[tuple]]:
+        """Processa conteúdo CSV (texto ou iterador de linhas) e retorna dados estruturados por tabela"""
         table_data = {table['name']: [] for table in self.mappings}
+        for table_name, batch in self.iter_batches(content):
+            table_data[table_name].extend(batch)
+        return table_data
+    
+    def iter_batches(self, content: Union[str, Iterable[str]], batch_size: int = 10000,
+                     validator: Optional[RowValidator] = None) -> Iterator[Tuple[str, List[tuple]]]:
+        """Gera (tabela, lote) assim que batch_size linhas estiverem prontas
+
+        Os lotes de cada bloco saem na ordem de carga (tabelas referenciadas primeiro),
+        de modo que as linhas-pai já estejam gravadas quando o lote dependente chegar.
+        Com validator, os valores saem nos tipos do banco e linhas inválidas são rejeitadas.
+        """
+        logger.info("Processando arquivo CSV")
+        lines = io.StringIO(content) if isinstance(content, str) else content
+        if self.columnar:
+            if columnar.arrow_available():
+                yield from self._iter_batches_columnar(lines, batch_size, validator)
+                return
+            logger.warning("pyarrow não instalado - usando processamento linha a linha")
+        
+        reader = csv.reader(lines, delimiter=self.delimiter)
+        tables = self.plan.tables
+        order = [tables.index(name) for name in self.load_order]
+        project = self.plan.bind()
+        
+        buffers = [[] for _ in tables]
+        outputs = [buffer.append for buffer in buffers]
+        pending = 0
         
         for row_idx, row in enumerate(reader, 1):
             if not row:
                 logger.warning(f"Linha {row_idx} vazia - ignorando")
                 continue
             
-            for table in self.mappings:
-                values = []
-                for col in table['columns']:
-                    try:
-                        value = self._get_column_value(row, row_idx, col)
-                        values.append(value)
-                    except Exception as e:
-                        logger.error(f"Erro na coluna {col['name']}, linha {row_idx}: {str(e)}")
-                        values.append(None)
-                
-                table_data[table['name']].append(tuple(values))
+            for append, values in zip(outputs, project(row, row_idx)):
+                append(values)
+            pending += 1
+            
+            if pending >= batch_size:
+                if validator is not None:
+                    buffers = validator.convert(buffers)
+                for i in order:
+                    yield tables[i], buffers[i]
+                buffers = [[] for _ in tables]
+                outputs = [buffer.append for buffer in buffers]
+                pending = 0
         
-        return table_data
+        if pending:
+            if validator is not None:
+                buffers = validator.convert(buffers)
+            for i in order:
+                yield tables[i], buffers[i]
+    
+    def _iter_batches_columnar(self, lines: Iterable[str], batch_size: int,
+                               validator: Optional[RowValidator] = None) -> Iterator[Tuple[str, List[tuple]]]:
+        """Caminho colunar: cada bloco de batch_size linhas é projetado via Arrow"""
+        tables = self.plan.tables
+        order = [tables.index(name) for name in self.load_order]
+        constants = self.plan.bind_constants()
+        project = self.plan.bind(constants)
+        projector = columnar.ColumnarProjector(self.plan, VECTORIZED, self.delimiter)
+        first_row = 1
+        
+        for text in columnar.iter_record_chunks(lines, batch_size):
+            batches = projector.project(text, constants)
+            if batches is None:
+                batches = [[] for _ in tables]
+                reader = csv.reader(io.StringIO(text), delimiter=self.delimiter)
+                for row_idx, row in enumerate(reader, first_row):
+                    if not row:
+                        logger.warning(f"Linha {row_idx} vazia - ignorando")
+                        continue
+                    for batch, values in zip(batches, project(row, row_idx)):
+                        batch.append(values)
+            first_row += text.count('\n')
+            if validator is not None:
+                batches = validator.convert(batches)
+            
+            for i in order:
+                yield tables[i], batches[i]
     
     def _get_column_value(self, row: List[str], row_idx: int, col: Dict[str, Any]) -> Any:
         """Obtém valor de uma coluna aplicando transformações se necessário"""
@@ -0,0 +1,194 @@
+import re
+from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Callable, Dict, FrozenSet, List, Optional
+from chalicelib.core.logger import logger
+
+INTEGER_TYPES = {'tinyint', 'smallint', 'mediumint', 'int', 'integer', 'bigint'}
+DECIMAL_TYPES = {'decimal', 'numeric'}
+FLOAT_TYPES = {'float', 'double', 'real'}
+TEXT_TYPES = {'char', 'varchar', 'tinytext', 'text', 'mediumtext', 'longtext'}
+
+# CHECK (coluna IN ('A', 'B', ...)), como o MySQL 8 devolve em CHECK_CLAUSE
+_CHECK_IN = re.compile(r"^\(*`?(\w+)`?\s+in\s*\((.*)\)\)*$", re.IGNORECASE | re.DOTALL)
+_QUOTED = re.compile(r"'((?:[^'\\]|\\.|'')*)'")
+
+# Amostras de rejeição devolvidas no resultado do handler
+MAX_SAMPLES = 10
+
+
+def _to_int(value: Any) -> int:
+    return value if isinstance(value, int) else int(str(value).strip())
+
+
+def _to_datetime(value: Any) -> datetime:
+    return value if isinstance(value, datetime) else datetime.fromisoformat(str(value).strip())
+
+
+def _to_date(value: Any) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    return value if isinstance(value, date) else date.fromisoformat(str(value).strip()[:10])
+
+
+@dataclass(frozen=True)
+class ColumnSchema:
+    name: str
+    data_type: str
+    max_length: Optional[int]
+    nullable: bool
+    allowed: Optional[FrozenSet[str]] = None
+
+    def converter(self) -> Callable[[Any], Any]:
+        """Converte o valor para o tipo nativo da coluna; ValueError se o servidor o recusaria"""
+        if self.data_type in INTEGER_TYPES:
+            parse = _to_int
+        elif self.data_type in DECIMAL_TYPES:
+            parse = lambda value: value if isinstance(value, Decimal) else Decimal(str(value).strip())
+        elif self.data_type in FLOAT_TYPES:
+            parse = float
+        elif self.data_type in ('datetime', 'timestamp'):
+            parse = _to_datetime
+        elif self.data_type == 'date':
+            parse = _to_date
+        elif self.data_type in TEXT_TYPES:
+            parse = str
+        else:
+            parse = None
+
+        name, nullable, max_length, allowed = self.name, self.nullable, self.max_length, self.allowed
+
+        def convert(value: Any) -> Any:
+            if value is None:
+                if not nullable:
+                    raise ValueError(f"{name}: NULL em coluna NOT NULL")
+                return None
+            if parse is not None:
+                try:
+                    value = parse(value)
+                except (TypeError, ValueError, ArithmeticError):
+                    raise ValueError(f"{name}: {value!r} não é {self.data_type}")
+            if max_length is not None and isinstance(value, str) and len(value) > max_length:
+                raise ValueError(f"{name}: {len(value)} caracteres excede {self.data_type}({max_length})")
+            if allowed is not None and str(value) not in allowed:
+                raise ValueError(f"{name}: {value!r} fora do CHECK ({', '.join(sorted(allowed))})")
+            return value
+
+        return convert
+
+
+class SchemaModel:
+    """Tipos, tamanhos, nulabilidade e CHECKs simples das tabelas mapeadas (INFORMATION_SCHEMA)"""
+
+    def __init__(self, tables: Dict[str, Dict[str, ColumnSchema]]):
+        self.tables = tables
+
+    @classmethod
+    def load(cls, conn, tables: List[str]) -> 'SchemaModel':
+        placeholders = ', '.join(['%s'] * len(tables))
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT TABLE_NAME, COLUMN_NAME, DATA_TYPE, CHARACTER_MAXIMUM_LENGTH, IS_NULLABLE "
+                "FROM INFORMATION_SCHEMA.COLUMNS "
+                f"WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME IN ({placeholders})",
+                tables
+            )
+            columns = [tuple(row.values()) if isinstance(row, dict) else tuple(row) for row in cursor.fetchall()]
+
+        allowed: Dict[tuple, FrozenSet[str]] = {}
+        try:
+            with conn.cursor() as cursor:
+                # CHECK_CONSTRAINTS existe a partir do MySQL 8.0.16
+                cursor.execute(
+                    "SELECT tc.TABLE_NAME, cc.CHECK_CLAUSE "
+                    "FROM INFORMATION_SCHEMA.TABLE_CONSTRAINTS tc "
+                    "JOIN INFORMATION_SCHEMA.CHECK_CONSTRAINTS cc "
+                    "ON cc.CONSTRAINT_SCHEMA = tc.CONSTRAINT_SCHEMA AND cc.CONSTRAINT_NAME = tc.CONSTRAINT_NAME "
+                    f"WHERE tc.TABLE_SCHEMA = DATABASE() AND tc.CONSTRAINT_TYPE = 'CHECK' AND tc.TABLE_NAME IN ({placeholders})",
+                    tables
+                )
+                checks = [tuple(row.values()) if isinstance(row, dict) else tuple(row) for row in cursor.fetchall()]
+            for table, clause in checks:
+                match = _CHECK_IN.match(clause.strip())
+                if match:
+                    values = frozenset(value.replace("''", "'") for value in _QUOTED.findall(match.group(2)))
+                    allowed[(table, match.group(1))] = values
+        except Exception as e:
+            logger.warning(f"CHECKs indisponíveis no INFORMATION_SCHEMA: {str(e)}")
+
+        model: Dict[str, Dict[str, ColumnSchema]] = {}
+        for table, column, data_type, max_length, nullable in columns:
+            model.setdefault(table, {})[column] = ColumnSchema(
+                name=column,
+                data_type=data_type.lower(),
+                max_length=int(max_length) if max_length is not None and data_type.lower() in TEXT_TYPES else None,
+                nullable=nullable == 'YES',
+                allowed=allowed.get((table, column))
+            )
+        return cls(model)
+
+    def validator(self, tables: List[str], columns: Dict[str, List[str]]) -> 'RowValidator':
+        return RowValidator(self, tables, columns)
+
+
+class RowValidator:
+    """Converte os lotes de um arquivo para os tipos do banco e rejeita linhas inválidas
+
+    Os lotes de todas as tabelas vêm alinhados (a linha n do arquivo está na posição n
+    de cada lote). Uma linha rejeitada em qualquer tabela sai de todas, para que uma
+    tabela dependente nunca receba uma linha cuja linha-pai foi descartada.
+    """
+
+    def __init__(self, model: SchemaModel, tables: List[str], columns: Dict[str, List[str]]):
+        self.tables = tables
+        self.converters = []
+        for table in tables:
+            schema = model.tables.get(table, {})
+            self.converters.append([
+                schema[column].converter() if column in schema else None
+                for column in columns[table]
+            ])
+        self.rejected = 0
+        self.by_table: Dict[str, int] = {}
+        self.samples: List[str] = []
+
+    def convert(self, batches: List[List[tuple]]) -> List[List[tuple]]:
+        """Retorna os lotes convertidos, sem as linhas rejeitadas"""
+        if not batches or not batches[0]:
+            return batches
+        converted = [[] for _ in batches]
+        outputs = [batch.append for batch in converted]
+        plans = list(zip(self.tables, self.converters))
+
+        for values in zip(*batches):
+            rows = []
+            try:
+                for (table, converters), row in zip(plans, values):
+                    rows.append(tuple([
+                        convert(value) if convert is not None else value
+                        for convert, value in zip(converters, row)
+                    ]))
+            except ValueError as e:
+                self._reject(table, str(e))
+                continue
+            for append, row in zip(outputs, rows):
+                append(row)
+        return converted
+
+    def _reject(self, table: str, reason: str):
+        self.rejected += 1
+        self.by_table[table] = self.by_table.get(table, 0) + 1
+        if len(self.samples) < MAX_SAMPLES:
+            self.samples.append(f"{table}.{reason}")
+            logger.warning(f"Linha rejeitada em {table}.{reason}")
+
+    def merge(self, summary: Dict[str, Any]):
+        """Soma as rejeições de um validador que rodou em outro processo"""
+        self.rejected += summary['rows']
+        for table, count in summary['by_table'].items():
+            self.by_table[table] = self.by_table.get(table, 0) + count
+        self.samples.extend(summary['samples'][:MAX_SAMPLES - len(self.samples)])
+
+    def summary(self) -> Dict[str, Any]:
+        return {'rows': self.rejected, 'by_table': self.by_table, 'samples': self.samples}
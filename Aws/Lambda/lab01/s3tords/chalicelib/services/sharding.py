@@ -0,0 +1,44 @@
+import zlib
+from operator import itemgetter
+from typing import List
+
+
+def shard_by_range(rows: List[tuple], positions: List[int], shards: int) -> List[List[tuple]]:
+    """Divide as linhas em faixas contíguas da chave primária, ordenadas pela chave
+
+    Linhas com a mesma chave ficam sempre na mesma faixa (na ordem original, para que a
+    última ocorrência continue prevalecendo) e faixas diferentes não compartilham gaps
+    do índice, exceto nas fronteiras.
+    """
+    key = itemgetter(*positions)
+    ordered = sorted(rows, key=key)
+    size = -(-len(ordered) // shards)
+    result = []
+    start = 0
+    while start < len(ordered):
+        end = min(start + size, len(ordered))
+        while end < len(ordered) and key(ordered[end]) == key(ordered[end - 1]):
+            end += 1
+        result.append(ordered[start:end])
+        start = end
+    return result
+
+
+def shard_by_hash(rows: List[tuple], positions: List[int], shards: int) -> List[List[tuple]]:
+    """Distribui as linhas pelo hash (crc32) da chave primária, mantendo a ordem original"""
+    key = itemgetter(*positions)
+    result = [[] for _ in range(shards)]
+    for row in rows:
+        result[zlib.crc32(repr(key(row)).encode()) % shards].append(row)
+    return [shard for shard in result if shard]
+
+
+def shard_rows(rows: List[tuple], positions: List[int], shards: int, mode: str = 'range') -> List[List[tuple]]:
+    """Particiona as linhas em até `shards` grupos disjuntos pela chave primária (range | hash)"""
+    if mode == 'range':
+        try:
+            return shard_by_range(rows, positions, shards)
+        except TypeError:
+            # Chave com None ou tipos mistos não ordena; o hash continua disjunto
+            pass
+    return shard_by_hash(rows, positions, shards)
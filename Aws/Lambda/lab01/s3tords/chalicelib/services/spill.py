@@ -0,0 +1,194 @@
+import mmap
+import os
+import pickle
+import shutil
+import tempfile
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
+from chalicelib.core.exceptions import ProcessingError
+from chalicelib.core.logger import logger
+
+# Abaixo disso por processo, o custo de criar os processos supera o ganho
+MIN_SLICE_BYTES = 1024 * 1024
+
+# Espaço em /tmp reservado para os lotes em pickle, por byte do arquivo (medido ~1,3x no
+# mapeamento de exemplo; a folga cobre mapeamentos que repetem colunas em várias tabelas)
+PICKLE_BYTES_PER_BYTE = 2
+
+
+def split_offsets(mm, size: int, parts: int) -> List[Tuple[int, int]]:
+    """Divide [0, size) em até `parts` fatias que começam e terminam em fim de linha"""
+    bounds = [0]
+    for i in range(1, parts):
+        newline = mm.find(b'\n', max(bounds[-1], size * i // parts))
+        if newline == -1:
+            break
+        if newline + 1 < size:
+            bounds.append(newline + 1)
+    bounds.append(size)
+    return [(start, end) for start, end in zip(bounds, bounds[1:]) if end > start]
+
+
+def iter_mmap_lines(mm, start: int, end: int) -> Iterator[str]:
+    """Linhas de mm[start:end] lidas direto do mapeamento, sem copiar a fatia"""
+    mm.seek(start)
+    while mm.tell() < end:
+        yield mm.readline().decode('utf-8')
+
+
+def _parse_slice(processor, path: str, start: int, end: int, batch_size: int, validator, output: str, conn):
+    """Processo filho: grava os lotes da fatia em `output` (pickle) e avisa o pai pelo pipe"""
+    try:
+        with open(path, 'rb') as source, mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ) as mm, \
+                open(output, 'wb') as sink:
+            for batch in processor.iter_batches(iter_mmap_lines(mm, start, end), batch_size, validator):
+                pickle.dump(batch, sink, protocol=pickle.HIGHEST_PROTOCOL)
+        conn.send(('ok', validator.summary() if validator is not None else None))
+    except BaseException as e:
+        conn.send(('error', f"{type(e).__name__}: {str(e)}"))
+    finally:
+        conn.close()
+
+
+def _read_batches(path: str) -> Iterator[Tuple[str, List[tuple]]]:
+    with open(path, 'rb') as source:
+        while True:
+            try:
+                yield pickle.load(source)
+            except EOFError:
+                return
+
+
+class SpillParser:
+    """Grava o arquivo em /tmp, mapeia com mmap e divide o parsing entre processos
+
+    O arquivo é cortado em fatias terminadas em '\\n' e cada processo (fork, herdando o
+    DataProcessor já compilado) lê a sua direto do mmap. Os lotes de cada fatia vão para
+    um arquivo próprio em /tmp e são devolvidos na ordem do arquivo assim que a fatia
+    termina, sem esperar as seguintes. Usa Process + Pipe porque o Lambda não tem
+    /dev/shm (Pool e Queue do multiprocessing não funcionam lá).
+
+    Arquivos com aspas podem ter quebra de linha dentro de um campo; nesse caso, para
+    arquivos pequenos e quando não há espaço livre no diretório para os lotes em pickle
+    (o /tmp do Lambda tem 512 MB por padrão e já guarda o próprio arquivo), o parsing é
+    feito em um único processo sobre o mesmo mmap.
+    """
+
+    def __init__(self, processor, processes: int, directory: Optional[str] = None):
+        self.processor = processor
+        self.processes = processes
+        self.directory = directory
+
+    def spill(self, chunks: Iterable[bytes]) -> str:
+        """Grava os blocos em um arquivo temporário e retorna o caminho"""
+        with tempfile.NamedTemporaryFile('wb', suffix='.csv', dir=self.directory, delete=False) as output:
+            try:
+                for chunk in chunks:
+                    output.write(chunk)
+            except BaseException:
+                output.close()
+                os.unlink(output.name)
+                raise
+        return output.name
+
+    def iter_batches(self, chunks: Iterable[bytes], batch_size: int = 10000,
+                     validator=None) -> Iterator[Tuple[str, List[tuple]]]:
+        """Gera (tabela, lote) na mesma ordem de DataProcessor.iter_batches
+
+        O arquivo é gravado e os processos são criados já nesta chamada, e não no primeiro
+        next(): o fork acontece antes de quem consome os lotes iniciar suas threads.
+        """
+        batches = self._iter_batches(chunks, batch_size, validator)
+        next(batches)
+        return batches
+
+    def _iter_batches(self, chunks: Iterable[bytes], batch_size: int,
+                      validator) -> Iterator[Optional[Tuple[str, List[tuple]]]]:
+        """Primeiro item None (arquivo gravado e processos criados), depois os lotes"""
+        path = self.spill(chunks)
+        workers: List[Tuple[Any, Any, str]] = []
+        try:
+            size = os.path.getsize(path)
+            if size:
+                with open(path, 'rb') as source, mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    parts = min(self.processes, size // MIN_SLICE_BYTES)
+                    if parts > 1 and mm.find(b'"') != -1:
+                        logger.info("Arquivo com aspas - parsing em um único processo")
+                        parts = 1
+                    if parts > 1 and not self._has_room(size):
+                        parts = 1
+                    slices = split_offsets(mm, size, parts) if parts > 1 else [(0, size)]
+                if len(slices) > 1:
+                    self._start_workers(workers, path, slices, batch_size, validator)
+            yield None
+            if not size:
+                return
+            if not workers:
+                with open(path, 'rb') as source, mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    yield from self.processor.iter_batches(iter_mmap_lines(mm, 0, size), batch_size, validator)
+                return
+            yield from self._collect(workers, validator)
+        finally:
+            self._stop_workers(workers)
+            os.unlink(path)
+
+    def _has_room(self, size: int) -> bool:
+        """Indica se o diretório comporta os lotes em pickle de um arquivo de `size` bytes"""
+        free = shutil.disk_usage(self.directory or tempfile.gettempdir()).free
+        needed = size * PICKLE_BYTES_PER_BYTE
+        if free < needed:
+            logger.warning(f"{free / 1024 / 1024:.0f} MB livres para {needed / 1024 / 1024:.0f} MB de lotes "
+                           f"- parsing em um único processo")
+            return False
+        return True
+
+    def _start_workers(self, workers: List[Tuple[Any, Any, str]], path: str, slices: List[Tuple[int, int]],
+                       batch_size: int, validator):
+        """Cria um processo por fatia, acrescentando (processo, pipe, arquivo de lotes) a `workers`"""
+        import multiprocessing
+
+        # fork (e não forkserver/spawn) para o filho herdar o DataProcessor compilado sem
+        # pickle. É seguro porque só é chamado depois que o arquivo inteiro foi gravado
+        # (as threads dos GETs por faixa já terminaram) e antes de quem consome os lotes
+        # criar threads (DB_PARALLEL_TABLES, shards). Threads ociosas de invocações
+        # anteriores (pool de shards) esperam na própria fila sem segurar locks usados no
+        # filho, que só usa o processador, o validador, o mmap, o pipe e o logging (cujos
+        # locks o Python reinicia após o fork). Conexões MySQL e clientes boto3 não são usados.
+        context = multiprocessing.get_context('fork')
+        for i, (start, end) in enumerate(slices):
+            output = f"{path}.{i}.pickle"
+            receiver, sender = context.Pipe(duplex=False)
+            process = context.Process(
+                target=_parse_slice,
+                args=(self.processor, path, start, end, batch_size, validator, output, sender),
+                daemon=True
+            )
+            process.start()
+            sender.close()
+            workers.append((process, receiver, output))
+        logger.info(f"Parsing em {len(workers)} processos")
+
+    @staticmethod
+    def _collect(workers: List[Tuple[Any, Any, str]], validator) -> Iterator[Tuple[str, List[tuple]]]:
+        """Devolve os lotes de cada fatia, na ordem do arquivo, assim que a fatia termina"""
+        for process, receiver, output in workers:
+            try:
+                status, detail = receiver.recv()
+            except EOFError:
+                status, detail = 'error', f"processo terminou com código {process.exitcode}"
+            process.join()
+            if status != 'ok':
+                raise ProcessingError(f"Falha no parsing paralelo: {detail}")
+            if validator is not None and detail is not None:
+                validator.merge(detail)
+            yield from _read_batches(output)
+            os.unlink(output)
+
+    @staticmethod
+    def _stop_workers(workers: List[Tuple[Any, Any, str]]):
+        for process, receiver, output in workers:
+            if process.is_alive():
+                process.terminate()
+            process.join()
+            receiver.close()
+            if os.path.exists(output):
+                os.unlink(output)
@@ -1,40 +1,219 @@
-import boto3
+import codecs
+from itertools import chain
+from typing import Dict, Iterable, Iterator, List
 from chalicelib.core.config import S3Config
 from chalicelib.core.exceptions import StorageError, InvalidFileError
 from chalicelib.core.logger import logger
+from chalicelib.services.archive import Archiver
+from chalicelib.services.compression import SUFFIXES, ZSTD, codec_from_key, codec_from_magic, decompress, zstd_available
+
+
+def iter_lines(chunks: Iterable[bytes], encoding: str = 'utf-8') -> Iterator[str]:
+    """Decodifica blocos de bytes de forma incremental e devolve linhas completas (com '\\n')
+
+    Caracteres multibyte e linhas partidas entre blocos são remontados; campos entre
+    aspas com quebra de linha ficam a cargo do csv.reader, que consome as linhas seguintes.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    pending = ''
+    for chunk in chunks:
+        lines = (pending + decoder.decode(chunk)).split('\n')
+        pending = lines.pop()
+        for line in lines:
+            yield line + '\n'
+    pending += decoder.decode(b'', final=True)
+    if pending:
+        yield pending
 
 class StorageService:
-    def __init__(self, config: S3Config):
+    def __init__(self, config: S3Config, client=None):
         self.config = config
-        self.client = boto3.client('s3')
+        if client is None:
+            import boto3
+            client = boto3.client('s3')
+        self.client = client
+        self.archiver = Archiver(
+            client,
+            config.multipart_copy_threshold,
+            config.copy_part_size,
+            config.copy_concurrency,
+            config.archive_compression_level
+        )
+        # Codec detectado na leitura de cada arquivo, consultado ao arquivá-lo
+        self._codecs: Dict[str, str] = {}
+        self.archive_compression = config.archive_compression if config.archive_compression in SUFFIXES else None
+        if self.archive_compression == ZSTD and not zstd_available():
+            logger.warning("zstandard não instalado - arquivando sem compressão")
+            self.archive_compression = None
     
     def get_file(self, bucket: str, key: str) -> str:
         """Obtém conteúdo do arquivo"""
+        try:
+            return b''.join(self._open_chunks(bucket, key)).decode('utf-8')
+        except StorageError:
+            raise
+        except Exception as e:
+            logger.error(f"Erro ao ler arquivo: {str(e)}")
+            raise StorageError(f"Falha ao ler arquivo: {str(e)}")
+    
+    def stream_file(self, bucket: str, key: str) -> Iterator[str]:
+        """Obtém o arquivo como iterador de linhas, sem manter o conteúdo inteiro em memória"""
+        return self._iter_lines(self._open_chunks(bucket, key))
+    
+    def stream_chunks(self, bucket: str, key: str) -> Iterator[bytes]:
+        """Obtém o arquivo como iterador de blocos de bytes, sem decodificar"""
+        return self._open_chunks(bucket, key)
+    
+    def _open_chunks(self, bucket: str, key: str) -> Iterator[bytes]:
+        """Blocos do arquivo em ordem; objetos maiores que range_size são baixados em faixas paralelas
+
+        A primeira requisição já pede a faixa inicial: o Content-Range informa o tamanho do
+        objeto, então arquivos pequenos continuam custando um único GET e não há HEAD extra.
+        """
         try:
             if not key.startswith(self.config.input_prefix):
                 raise InvalidFileError(f"Arquivo deve estar em {self.config.input_prefix}")
-                
-            response = self.client.get_object(Bucket=bucket, Key=key)
-            return response['Body'].read().decode('utf-8')
+            
+            if self.config.range_size <= 0:
+                response = self.client.get_object(Bucket=bucket, Key=key)
+            else:
+                try:
+                    response = self.client.get_object(Bucket=bucket, Key=key, Range=f"bytes=0-{self.config.range_size - 1}")
+                except Exception as e:
+                    # Objeto vazio: não há faixa válida para pedir
+                    if getattr(e, 'response', {}).get('Error', {}).get('Code') != 'InvalidRange':
+                        raise
+                    response = self.client.get_object(Bucket=bucket, Key=key)
+        except Exception as e:
+            logger.error(f"Erro ao ler arquivo: {str(e)}")
+            raise StorageError(f"Falha ao ler arquivo: {str(e)}")
+        
+        content_range = response.get('ContentRange')
+        size = int(content_range.rsplit('/', 1)[1]) if content_range else response['ContentLength']
+        if size <= response['ContentLength']:
+            return self._decompress(key, self._iter_chunks(response['Body']))
+        return self._decompress(key, self._iter_ranges(bucket, key, response['Body'], size, response.get('ETag')))
+    
+    def _decompress(self, key: str, chunks: Iterator[bytes]) -> Iterator[bytes]:
+        """Descomprime gzip/zstd em streaming, pelo início do conteúdo ou pela extensão"""
+        try:
+            first = next(chunks, b'')
+            codec = codec_from_magic(first) or codec_from_key(key)
+            if codec is not None:
+                logger.info(f"{key} comprimido com {codec}")
+                self._codecs[key] = codec
+            yield from decompress(chain([first], chunks), codec, self.config.chunk_size)
+        except StorageError:
+            raise
+        except Exception as e:
+            logger.error(f"Erro ao ler arquivo: {str(e)}")
+            raise StorageError(f"Falha ao ler arquivo: {str(e)}")
+        finally:
+            chunks.close()
+    
+    def _get_range(self, bucket: str, key: str, start: int, end: int, etag: str) -> bytes:
+        kwargs = {'IfMatch': etag} if etag else {}
+        body = self.client.get_object(Bucket=bucket, Key=key, Range=f"bytes={start}-{end}", **kwargs)['Body']
+        try:
+            data = body.read()
+        finally:
+            body.close()
+        if len(data) != end - start + 1:
+            raise StorageError(f"Faixa {start}-{end} incompleta: {len(data)} bytes")
+        return data
+    
+    def _iter_ranges(self, bucket: str, key: str, first, size: int, etag: str) -> Iterator[bytes]:
+        """Baixa as faixas restantes com até range_concurrency GETs simultâneos
+
+        Cada bloco entregue termina em '\n' (o trecho final de uma faixa é juntado à
+        seguinte), então cada um pode ser decodificado e separado em linhas sozinho. Os
+        blocos saem na ordem do arquivo; campos entre aspas com quebra de linha seguem a
+        cargo do csv.reader. IfMatch garante que todas as faixas são da mesma versão do
+        objeto. Memória em uso: cerca de range_concurrency * range_size.
+        """
+        from collections import deque
+        from concurrent.futures import ThreadPoolExecutor
+
+        part = self.config.range_size
+        starts = iter(range(part, size, part))
+        pool = ThreadPoolExecutor(max(1, self.config.range_concurrency), thread_name_prefix='s3-range')
+        pending = deque()
+
+        def submit():
+            start = next(starts, None)
+            if start is not None:
+                pending.append(pool.submit(self._get_range, bucket, key, start, min(start + part, size) - 1, etag))
+
+        try:
+            for _ in range(max(1, self.config.range_concurrency)):
+                submit()
+            data = first.read()
+            tail = b''
+            while True:
+                data = tail + data
+                cut = data.rfind(b'\n') + 1
+                tail = data[cut:]
+                if cut:
+                    yield data[:cut]
+                if not pending:
+                    break
+                data = pending.popleft().result()
+                submit()
+            if tail:
+                yield tail
+        except StorageError:
+            raise
+        except Exception as e:
+            logger.error(f"Erro ao ler arquivo: {str(e)}")
+            raise StorageError(f"Falha ao ler arquivo: {str(e)}")
+        finally:
+            first.close()
+            pool.shutdown(cancel_futures=True)
+    
+    def _iter_lines(self, chunks: Iterator[bytes]) -> Iterator[str]:
+        try:
+            yield from iter_lines(chunks)
+        except StorageError:
+            raise
+        except Exception as e:
+            logger.error(f"Erro ao ler arquivo: {str(e)}")
+            raise StorageError(f"Falha ao ler arquivo: {str(e)}")
+    
+    def _iter_chunks(self, body) -> Iterator[bytes]:
+        try:
+            yield from body.iter_chunks(self.config.chunk_size)
         except Exception as e:
             logger.error(f"Erro ao ler arquivo: {str(e)}")
             raise StorageError(f"Falha ao ler arquivo: {str(e)}")
+        finally:
+            body.close()
     
     def move_file(self, bucket: str, key: str, success: bool) -> str:
-        """Move arquivo para processados/erros"""
+        """Copia o arquivo para processados/erros; o original é excluído em flush_deletes()
+        
+        Com ARCHIVE_COMPRESSION, arquivos lidos sem compressão vão comprimidos para processados/.
+        """
         try:
             if success:
                 new_key = key.replace(self.config.input_prefix, self.config.processed_prefix)
             else:
                 new_key = key.replace(self.config.input_prefix, self.config.error_prefix)
+            codec = self._codecs.pop(key, None)
+            if new_key == key:
+                # Reprocessamento direto de erros/: o arquivo já está no destino
+                return key
             
-            self.client.copy_object(
-                Bucket=bucket,
-                CopySource={'Bucket': bucket, 'Key': key},
-                Key=new_key
-            )
-            self.client.delete_object(Bucket=bucket, Key=key)
+            compress = self.archive_compression
+            if success and compress and codec is None and codec_from_key(key) is None:
+                new_key += SUFFIXES[compress]
+                self.archiver.move(bucket, key, new_key, compress=compress)
+                return new_key
+            self.archiver.move(bucket, key, new_key)
             return new_key
         except Exception as e:
             logger.error(f"Erro ao mover arquivo: {str(e)}")
-            raise StorageError(f"Falha ao mover arquivo: {str(e)}")
\ No newline at end of file
+            raise StorageError(f"Falha ao mover arquivo: {str(e)}")
+    
+    def flush_deletes(self) -> List[str]:
+        """Exclui os originais dos arquivos movidos; retorna as chaves que ficaram para trás"""
+        return self.archiver.flush_deletes()
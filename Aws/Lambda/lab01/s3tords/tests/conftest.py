@@ -0,0 +1,131 @@
+import pytest
+from chalicelib.services.pool import reset_pools
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.max_stmt_length = None
+        self._result = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def execute(self, query, params=None):
+        self.conn.run('execute', query, params)
+        self._result = self.conn.results(query, params)
+
+    def executemany(self, query, rows):
+        self.conn.run('executemany', query, list(rows))
+
+    def fetchone(self):
+        return self._result[0] if self._result else None
+
+    def fetchall(self):
+        return list(self._result)
+
+
+class FakeConnection:
+    """Conexão compatível com pymysql que registra as instruções, commits e rollbacks
+
+    `fail` recebe (operação, query, parâmetros) e pode levantar a exceção que quiser.
+    """
+
+    def __init__(self, log=None, fail=None, primary_keys=None):
+        self.log = [] if log is None else log
+        self.fail = fail
+        self.primary_keys = primary_keys or {}
+        self.closed = False
+        self.pings = 0
+
+    def run(self, operation, query, params):
+        if self.closed:
+            raise RuntimeError('conexão fechada')
+        if self.fail is not None:
+            self.fail(operation, query, params)
+        self.log.append((self, operation, ' '.join(query.split()), params))
+
+    def results(self, query, params):
+        if 'max_allowed_packet' in query:
+            return [{'max_allowed_packet': 4 * 1024 * 1024}]
+        if "CONSTRAINT_NAME = 'PRIMARY'" in query:
+            return [{'name': column} for column in self.primary_keys.get(params[0], [])]
+        return []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.run('commit', 'COMMIT', None)
+
+    def rollback(self):
+        self.run('rollback', 'ROLLBACK', None)
+
+    def ping(self, reconnect=False):
+        self.pings += 1
+        if self.closed:
+            raise RuntimeError('conexão fechada')
+
+    def close(self):
+        self.closed = True
+
+    def operations(self):
+        return [(op, query) for conn, op, query, _ in self.log if conn is self]
+
+
+@pytest.fixture(autouse=True)
+def clean_pools():
+    # Pools são globais ao módulo (sobrevivem entre invocações); cada teste começa do zero
+    reset_pools()
+    yield
+    reset_pools()
+
+
+BUCKET = 'dev-bucket-lab01'
+
+
+def csv_lines(count: int, start: int = 0) -> str:
+    """CSV no layout do mapeamento de exemplo (8 colunas separadas por ';')"""
+    return ''.join(f"C;{i};01.02.2024;x;COD{i};y;z;Nome {i}\n" for i in range(start, start + count))
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    """S3 do moto com o bucket do laboratório criado"""
+    moto = pytest.importorskip('moto')
+    import boto3
+
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    with moto.mock_aws():
+        client = boto3.client('s3')
+        client.create_bucket(Bucket=BUCKET)
+        yield client
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    """pymysql.connect devolvendo FakeConnection; retorna o log compartilhado das conexões"""
+    import pymysql
+
+    log = []
+    monkeypatch.setattr(pymysql, 'connect', lambda **kwargs: FakeConnection(log))
+    return log
+
+
+def put(s3, key: str, body) -> dict:
+    """Grava o objeto e retorna o registro do evento S3 correspondente"""
+    s3.put_object(Bucket=BUCKET, Key=key, Body=body)
+    head = s3.head_object(Bucket=BUCKET, Key=key)
+    return {'s3': {
+        'bucket': {'name': BUCKET},
+        'object': {'key': key, 'size': head['ContentLength'], 'eTag': head['ETag'].strip('"')}
+    }}
+
+
+def keys(s3, prefix: str = '') -> list:
+    return sorted(obj['Key'] for obj in s3.list_objects_v2(Bucket=BUCKET, Prefix=prefix).get('Contents', []))
@@ -0,0 +1,60 @@
+import json
+
+from chalicelib.backfill import Backfill
+from chalicelib.core.config import AppConfig, DBConfig
+from chalicelib.services.archive import Archiver
+from tests.conftest import BUCKET, csv_lines, keys
+
+CONFIG = AppConfig(db=DBConfig(host='db', user='u', database='lab'))
+
+
+def write_checkpoint(path, items):
+    path.write_text(''.join(json.dumps(item) + '\n' for item in items) + '{"key": "cortada', encoding='utf-8')
+
+
+def test_backfill_processes_prefix_and_resumes_from_checkpoint(s3, fake_db, tmp_path):
+    for name in 'abcde':
+        s3.put_object(Bucket=BUCKET, Key=f"erros/{name}.csv", Body=csv_lines(5))
+    checkpoint = tmp_path / 'backfill.jsonl'
+    # Execução anterior interrompida: a e b concluídos, c já concluído no ledger, d em outra invocação
+    write_checkpoint(checkpoint, [
+        {'key': 'erros/a.csv', 'status': 'success'},
+        {'key': 'erros/b.csv', 'status': 'success'},
+        {'key': 'erros/c.csv', 'status': 'skipped', 'reason': 'done'},
+        {'key': 'erros/d.csv', 'status': 'skipped', 'reason': 'busy'},
+    ])
+
+    summary = Backfill(CONFIG, 'erros/', workers=2, checkpoint=str(checkpoint)).run(BUCKET)
+
+    assert (summary['resumed'], summary['success'], summary['errors']) == (3, 2, 0)
+    assert keys(s3, 'erros/') == ['erros/a.csv', 'erros/b.csv', 'erros/c.csv']
+    assert len(keys(s3, 'processados/')) == 2
+    lines = checkpoint.read_text(encoding='utf-8').splitlines()
+    # A linha cortada foi terminada; d (BUSY na execução anterior) e e foram registrados depois dela
+    assert sorted(json.loads(line)['key'] for line in lines[5:]) == ['erros/d.csv', 'erros/e.csv']
+
+    # Nova execução: tudo já está no checkpoint
+    again = Backfill(CONFIG, 'erros/', workers=2, checkpoint=str(checkpoint)).run(BUCKET)
+    assert (again['files'], again['resumed']) == (0, 3)
+
+
+def test_checkpoint_is_written_after_the_originals_are_deleted(s3, fake_db, tmp_path, monkeypatch):
+    for name in 'abc':
+        s3.put_object(Bucket=BUCKET, Key=f"erros/{name}.csv", Body=csv_lines(5))
+    checkpoint = tmp_path / 'backfill.jsonl'
+    flush_deletes = Archiver.flush_deletes
+
+    def flush_failing_b(self):
+        # Nenhum sucesso pode estar no checkpoint antes da exclusão dos originais
+        assert not checkpoint.exists() or checkpoint.read_text(encoding='utf-8') == ''
+        pending = [key for batch in self._pending.values() for key in batch]
+        flush_deletes(self)
+        return ['erros/b.csv'] if 'erros/b.csv' in pending else []
+
+    monkeypatch.setattr(Archiver, 'flush_deletes', flush_failing_b)
+    summary = Backfill(CONFIG, 'erros/', workers=1, checkpoint=str(checkpoint)).run(BUCKET)
+
+    assert summary['success'] == 3 and summary['undeleted_files'] == ['erros/b.csv']
+    recorded = [json.loads(line)['key'] for line in checkpoint.read_text(encoding='utf-8').splitlines()]
+    # O original que ficou para trás volta a ser processado na próxima execução
+    assert sorted(recorded) == ['erros/a.csv', 'erros/c.csv']
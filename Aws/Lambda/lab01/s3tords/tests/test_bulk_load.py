@@ -0,0 +1,22 @@
+from chalicelib.services.bulk_load import load_data_upsert, tsv_value
+from tests.conftest import FakeConnection
+
+
+def test_load_data_upsert_never_commits_implicitly(tmp_path):
+    conn = FakeConnection()
+    load_data_upsert(conn, 'produto', ['id', 'nome'], [(1, 'a\tb'), (2, None)], tmp_dir=str(tmp_path))
+
+    queries = [query for _, query in conn.operations()]
+    # TRUNCATE (mesmo em tabela temporária) faria commit da transação do chamador
+    assert not any(query.startswith(('TRUNCATE', 'COMMIT', 'ROLLBACK')) for query in queries)
+    assert queries[0] == 'CREATE TEMPORARY TABLE IF NOT EXISTS stg_produto LIKE produto'
+    assert queries[1] == 'DELETE FROM stg_produto'
+    assert queries[2].startswith('LOAD DATA LOCAL INFILE')
+    assert queries[3].startswith('INSERT INTO produto (id, nome) SELECT id, nome FROM stg_produto')
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_tsv_value_escapes_and_null():
+    assert tsv_value(None) == '\\N'
+    assert tsv_value('a\tb\nc\\') == 'a\\tb\\nc\\\\'
+    assert tsv_value(3) == '3'
@@ -0,0 +1,17 @@
+from chalicelib.services.columnar import iter_record_chunks
+
+
+def test_record_chunks_keep_quoted_newlines_in_one_chunk():
+    lines = ['1;"a\n', 'b";x\n', '2;c;y\n', '3;d;z\n']
+
+    assert list(iter_record_chunks(lines, 1)) == ['1;"a\nb";x\n', '2;c;y\n', '3;d;z\n']
+
+
+def test_stray_quote_reads_at_most_chunk_lines_more():
+    lines = ['1;"a;x\n'] + [f"{i};b;y\n" for i in range(2, 101)]
+
+    chunks = list(iter_record_chunks(lines, 10))
+
+    assert ''.join(chunks) == ''.join(lines)
+    # O bloco com a aspa solta para em 2 x 10 linhas; o resto do arquivo segue em blocos normais
+    assert [chunk.count('\n') for chunk in chunks] == [20] + [10] * 8
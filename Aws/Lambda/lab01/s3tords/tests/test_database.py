@@ -0,0 +1,89 @@
+import pytest
+from chalicelib.core.config import DBConfig
+from chalicelib.core.exceptions import DatabaseError
+from chalicelib.services.database import DatabaseService
+from tests.conftest import FakeConnection
+
+COLUMNS = {'pai': ['id', 'nome'], 'filho': ['id', 'pai_id']}
+
+
+def service(conn, **options):
+    config = DBConfig(host='db', user='u', database='lab', **options)
+    return DatabaseService(config, connect=lambda: conn)
+
+
+@pytest.mark.parametrize('loader', ['executemany', 'load_data'])
+def test_upsert_group_commits_once_at_the_end(loader):
+    conn = FakeConnection()
+    batches = [('pai', [(1, 'a'), (2, 'b')]), ('filho', [(10, 1)]), ('pai', [(3, 'c')])]
+
+    processed = service(conn, loader=loader).upsert_group(batches, COLUMNS)
+
+    assert processed == {'pai': 3, 'filho': 1}
+    operations = [op for op, _ in conn.operations()]
+    assert operations.count('commit') == 1
+    # Nada antes do commit final pode ter encerrado a transação
+    writes = [query for op, query in conn.operations() if op != 'commit']
+    assert operations[-1] == 'commit'
+    assert not any(query.startswith(('TRUNCATE', 'ROLLBACK')) for query in writes)
+
+
+@pytest.mark.parametrize('loader', ['executemany', 'load_data'])
+def test_upsert_group_failure_rolls_back_without_commit(loader):
+    def fail(operation, query, params):
+        if operation in ('executemany', 'execute') and query.lstrip().startswith('INSERT INTO filho'):
+            raise RuntimeError('FK inválida')
+
+    conn = FakeConnection(fail=fail)
+    with pytest.raises(DatabaseError):
+        service(conn, loader=loader).upsert_group([('pai', [(1, 'a')]), ('filho', [(10, 9)])], COLUMNS)
+
+    operations = [op for op, _ in conn.operations()]
+    assert 'commit' not in operations
+    assert operations[-1] == 'rollback'
+
+
+def _reconnect_then_deadlock(deadlocks):
+    """Fábrica: a 1ª conexão cai no primeiro INSERT; a 2ª dá `deadlocks` deadlocks antes de gravar"""
+    from pymysql.err import OperationalError
+
+    log = []
+    state = {'deadlocks': deadlocks}
+
+    def lost(operation, query, params):
+        if operation == 'executemany':
+            raise OperationalError(2013, 'Lost connection to MySQL server during query')
+
+    def deadlock(operation, query, params):
+        if operation == 'executemany' and state['deadlocks']:
+            state['deadlocks'] -= 1
+            raise OperationalError(1213, 'Deadlock found when trying to get lock')
+
+    conns = [FakeConnection(log, fail=lost), FakeConnection(log, fail=deadlock)]
+    return conns, iter(conns).__next__
+
+
+def test_lock_error_after_reconnect_rolls_back_the_new_connection():
+    (old, new), connect = _reconnect_then_deadlock(deadlocks=1)
+    database = DatabaseService(DBConfig(host='db', user='u', database='lab', batch_min=1), connect=connect)
+
+    assert database.upsert_batches([('pai', [(1, 'a'), (2, 'b')])], COLUMNS) == {'pai': 2, 'filho': 0}
+
+    assert old.closed and ('rollback', 'ROLLBACK') not in old.operations()
+    endings = [op for op, _ in new.operations() if op in ('rollback', 'commit')]
+    assert endings[0] == 'rollback' and set(endings[1:]) == {'commit'}
+    assert [conn for conn, _ in database.pool._idle] == [new]
+
+
+def test_exhausted_lock_retries_after_reconnect_release_the_new_connection():
+    (old, new), connect = _reconnect_then_deadlock(deadlocks=100)
+    database = DatabaseService(DBConfig(host='db', user='u', database='lab', batch_min=1), connect=connect)
+
+    with pytest.raises(DatabaseError):
+        database.upsert_batches([('pai', [(1, 'a')])], COLUMNS)
+
+    assert ('rollback', 'ROLLBACK') not in old.operations()
+    assert 'commit' not in [op for op, _ in new.operations()]
+    assert [op for op, _ in new.operations()][-1] == 'rollback'
+    # A conexão nova volta ao pool em vez de ficar com a transação aberta
+    assert [conn for conn, _ in database.pool._idle] == [new]
@@ -0,0 +1,68 @@
+import pytest
+from chalicelib.core.config import DBConfig
+from chalicelib.core.exceptions import DatabaseError
+from chalicelib.services.database import DatabaseService
+from chalicelib.services.delta import DeltaFilter, _digest
+from tests.conftest import FakeConnection
+
+MAPPINGS = [{'name': 'pai', 'columns': [
+    {'name': 'id', 'source': {'type': 'column', 'index': 0}},
+    {'name': 'nome', 'source': {'type': 'column', 'index': 1}},
+]}]
+COLUMNS = {'pai': ['id', 'nome']}
+
+
+class StoredHashes(FakeConnection):
+    """FakeConnection que responde à consulta de hashes com os valores já gravados por chave"""
+
+    def __init__(self, stored, **kwargs):
+        super().__init__(primary_keys={'pai': ['id']}, **kwargs)
+        self.stored = {_digest((pk,)): _digest(values) for pk, values in stored.items()}
+
+    def results(self, query, params):
+        if query.startswith('SELECT pk_hash'):
+            return [(pk_hash, self.stored[pk_hash]) for pk_hash in params[1:] if pk_hash in self.stored]
+        return super().results(query, params)
+
+
+def test_skipped_counts_only_rows_matching_the_stored_hash():
+    conn = StoredHashes({1: (1, 'a'), 2: (2, 'antigo')})
+    delta = DeltaFilter(MAPPINGS)
+    # 1 igual ao gravado (repetido no lote), 2 alterado, 3 novo (repetido no lote)
+    rows = [(1, 'a'), (1, 'a'), (2, 'b'), (3, 'c'), (3, 'd')]
+
+    changed, hashes = delta.changed(conn, 'pai', COLUMNS['pai'], rows, ['id'])
+
+    assert sorted(changed) == [(2, 'b'), (3, 'd')]
+    assert len(hashes) == 2
+    assert delta.skipped_rows() == {'pai': 1}
+
+
+def test_failed_group_does_not_keep_its_counts():
+    def fail(operation, query, params):
+        if operation == 'executemany' and query.lstrip().startswith('INSERT INTO pai'):
+            raise RuntimeError('falha no grupo')
+
+    conn = StoredHashes({1: (1, 'a')}, fail=fail)
+    database = DatabaseService(DBConfig(host='db', user='u', database='lab', dedup=True),
+                               connect=lambda: conn, delta=DeltaFilter(MAPPINGS))
+
+    with pytest.raises(DatabaseError):
+        database.upsert_group([('pai', [(1, 'a'), (2, 'b'), (2, 'b')])], COLUMNS)
+
+    # O chamador regrava arquivo a arquivo; o grupo desfeito não pode ter contado nada
+    assert database.skipped_rows() == {}
+    assert database.collapsed_rows() == {}
+
+
+def test_dedup_spans_the_batches_of_the_file():
+    conn = FakeConnection(primary_keys={'pai': ['id']})
+    database = DatabaseService(DBConfig(host='db', user='u', database='lab', dedup=True), connect=lambda: conn)
+
+    database.upsert_batches([('pai', [(1, 'a'), (2, 'b'), (2, 'c')]), ('pai', [(2, 'd'), (3, 'e')])], COLUMNS)
+
+    written = [row for _, operation, query, params in conn.log
+               if operation == 'executemany' and query.startswith('INSERT INTO pai') for row in params]
+    # A chave 2 chega ao MySQL uma vez: a última do primeiro lote em que aparece
+    assert written == [(1, 'a'), (2, 'c'), (3, 'e')]
+    assert database.collapsed_rows() == {'pai': 2}
@@ -0,0 +1,61 @@
+from chalicelib.core.config import AppConfig, DBConfig
+from chalicelib.core.runtime import Runtime
+from chalicelib.lambda_function import lambda_handler
+from chalicelib.services.ledger import MemoryLedger
+from tests.conftest import csv_lines, keys, put
+
+
+class FlakyLedger(MemoryLedger):
+    """Ledger em memória que falha no acquire das chaves informadas, depois de tomar o lease"""
+
+    def __init__(self, failing):
+        super().__init__()
+        self.failing = failing
+        self.released = []
+
+    def acquire(self, bucket, key, etag, owner):
+        state = super().acquire(bucket, key, etag, owner)
+        if key in self.failing:
+            raise ConnectionError('ledger indisponível')
+        return state
+
+    def release(self, bucket, key, etag, owner):
+        self.released.append(key)
+        super().release(bucket, key, etag, owner)
+
+
+def runtime_with(ledger, **options):
+    runtime = Runtime(AppConfig(db=DBConfig(host='db', user='u', database='lab'), **options))
+    runtime.__dict__['ledger'] = ledger
+    return runtime
+
+
+def test_ledger_failure_becomes_that_file_error(s3, fake_db):
+    records = [put(s3, f"entrada/{name}.csv", csv_lines(5)) for name in 'abc']
+    ledger = FlakyLedger({'entrada/b.csv'})
+
+    body = lambda_handler({'Records': records}, None, runtime_with(ledger))['body']
+
+    assert (body['processed_files'], body['failed_files']) == (2, 1)
+    failed = [result for result in body['details'] if result['status'] == 'error']
+    assert failed[0]['file'] == 'entrada/b.csv' and 'ledger' in failed[0]['error']
+    assert ledger.released == ['entrada/b.csv']
+    # O arquivo com falha no ledger fica na entrada; os demais foram movidos e excluídos
+    assert keys(s3, 'entrada/') == ['entrada/b.csv']
+    assert len(keys(s3, 'processados/')) == 2
+
+
+def test_coalescer_releases_leases_when_acquire_fails(s3, fake_db):
+    records = [put(s3, f"entrada/{name}.csv", csv_lines(5)) for name in 'abc']
+    ledger = FlakyLedger({'entrada/b.csv'})
+    runtime = runtime_with(ledger, coalesce_max_bytes=10000)
+
+    results = runtime.coalescer.process(records, 'dono')
+    runtime.storage.flush_deletes()
+
+    assert [result['status'] for result in results] == ['success', 'error', 'success']
+    assert ledger.released == ['entrada/b.csv']
+    assert keys(s3, 'entrada/') == ['entrada/b.csv']
+    # Uma nova entrega de b (sem falha no ledger) pode tomar o lease liberado
+    ledger.failing = set()
+    assert ledger.acquire(records[1]['s3']['bucket']['name'], 'entrada/b.csv', records[1]['s3']['object']['eTag'], 'outro') == 'acquired'
@@ -0,0 +1,74 @@
+import io
+from datetime import datetime, timezone
+
+import pytest
+from chalicelib.core.config import AppConfig, DBConfig
+from chalicelib.core.runtime import Runtime
+from chalicelib.lambda_function import lambda_handler
+from chalicelib.services.parquet_output import ParquetExporter
+from tests.conftest import BUCKET, FakeConnection, csv_lines, keys, put
+
+pq = pytest.importorskip('pyarrow.parquet')
+
+
+def runtime_with(tmp_path, **options):
+    config = AppConfig(db=DBConfig(host='db', user='u', database='lab'), parquet_prefix='analytics/',
+                       spill_dir=str(tmp_path), **options)
+    return Runtime(config)
+
+
+def read_parquet(s3, key):
+    response = s3.get_object(Bucket=BUCKET, Key=key)
+    return pq.ParquetFile(io.BytesIO(response['Body'].read())), response['ContentType']
+
+
+def test_handler_writes_one_parquet_per_table_that_reads_back(s3, fake_db, tmp_path):
+    runtime = runtime_with(tmp_path, parquet_row_group_rows=30)
+    record = put(s3, 'entrada/lote_01.csv', csv_lines(100))
+
+    body = lambda_handler({'Records': [record]}, None, runtime)['body']
+
+    date = datetime.now(timezone.utc).strftime('%Y-%m-%d')
+    assert body['processed_files'] == 1
+    assert keys(s3, 'analytics/') == sorted(f"analytics/{table}/dt={date}/lote_01.parquet" for table in runtime.columns)
+    for table, columns in runtime.columns.items():
+        parquet, content_type = read_parquet(s3, f"analytics/{table}/dt={date}/lote_01.parquet")
+        assert content_type == 'application/vnd.apache.parquet'
+        assert parquet.schema_arrow.names == columns
+        metadata = parquet.metadata
+        assert [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)] == [30, 30, 30, 10]
+        # Sem DB_DEDUP nem delta, as mesmas linhas que foram para o banco, na mesma ordem
+        written = [params for _, op, query, params in fake_db if op == 'executemany' and f"INSERT INTO {table} " in query]
+        assert [tuple(row.values()) for row in parquet.read().to_pylist()] == [row for batch in written for row in batch]
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_failed_load_uploads_no_parquet(s3, tmp_path, monkeypatch):
+    import pymysql
+
+    def fail(operation, query, params):
+        if operation == 'executemany':
+            raise RuntimeError('banco indisponível')
+
+    monkeypatch.setattr(pymysql, 'connect', lambda **kwargs: FakeConnection(fail=fail))
+    record = put(s3, 'entrada/lote_02.csv', csv_lines(10))
+
+    body = lambda_handler({'Records': [record]}, None, runtime_with(tmp_path))['body']
+
+    assert body['failed_files'] == 1
+    assert keys(s3, 'analytics/') == []
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_column_only_none_in_the_first_batch_becomes_string(s3, tmp_path):
+    exporter = ParquetExporter(s3, {'t': ['id', 'obs']}, 'analytics', directory=str(tmp_path))
+    output = exporter.open(BUCKET, 'entrada/x.csv')
+    output.add('t', [(1, None), (2, None)])
+    output.add('t', [(3, 'texto')])
+
+    result = output.commit()
+
+    parquet, _ = read_parquet(s3, result['files']['t'])
+    assert str(parquet.schema_arrow.field('obs').type) == 'string'
+    assert parquet.read().to_pylist() == [{'id': 1, 'obs': None}, {'id': 2, 'obs': None}, {'id': 3, 'obs': 'texto'}]
+    assert result['rows'] == {'t': 3}
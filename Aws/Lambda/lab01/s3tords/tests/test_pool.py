@@ -0,0 +1,101 @@
+from chalicelib.core.config import DBConfig
+from chalicelib.services.database import DatabaseService
+from chalicelib.services.pool import ConnectionPool
+from tests.conftest import FakeConnection
+
+COLUMNS = {'pai': ['id', 'nome'], 'filho': ['id', 'pai_id']}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def pool_with(clock, **options):
+    opened = []
+
+    def connect():
+        opened.append(FakeConnection())
+        return opened[-1]
+
+    return ConnectionPool(connect, clock=clock, **options), opened
+
+
+def test_idle_connection_is_reused_without_ping_inside_the_interval():
+    clock = Clock()
+    pool, opened = pool_with(clock, ping_interval=5)
+
+    conn = pool.acquire()
+    pool.release(conn)
+    clock.now += 4
+
+    assert pool.acquire() is conn
+    assert len(opened) == 1 and conn.pings == 0
+
+
+def test_connection_idle_past_the_interval_is_pinged_and_replaced_when_dead():
+    clock = Clock()
+    pool, opened = pool_with(clock, ping_interval=5)
+    alive, dead = pool.acquire(), pool.acquire()
+    pool.release(alive)
+    pool.release(dead)
+    dead.closed = True
+    clock.now += 10
+
+    # A última devolvida sai primeiro: falha no ping, é descartada e a seguinte é usada
+    assert pool.acquire() is alive
+    assert dead.pings == 1 and alive.pings == 1
+    # Sem ociosas, abre uma nova
+    assert pool.acquire() is opened[2]
+
+
+def test_connection_idle_past_max_idle_is_closed_without_ping():
+    clock = Clock()
+    pool, opened = pool_with(clock, max_idle=300)
+    old = pool.acquire()
+    pool.release(old)
+    clock.now += 301
+
+    assert pool.acquire() is opened[1]
+    assert old.closed and old.pings == 0
+
+
+def test_release_beyond_size_closes_the_connection():
+    pool, opened = pool_with(Clock(), size=1)
+    first, second = pool.acquire(), pool.acquire()
+    pool.release(first)
+    pool.release(second)
+
+    assert [conn for conn, _ in pool._idle] == [first]
+    assert second.closed and not first.closed
+
+
+def test_services_of_a_warm_container_share_the_pool(fake_db):
+    config = DBConfig(host='db', user='u', database='lab', pool_ping_interval=0)
+    first = DatabaseService(config)
+    first.upsert_batches([('pai', [(1, 'a')])], COLUMNS)
+
+    # Próxima invocação quente: novo serviço, mesmo pool e mesma conexão, validada por ping
+    second = DatabaseService(config)
+    second.upsert_batches([('pai', [(2, 'b')])], COLUMNS)
+
+    assert second.pool is first.pool
+    connections = {conn for conn, _, _, _ in fake_db}
+    assert len(connections) == 1 and connections.pop().pings == 1
+
+
+def test_warm_invocation_reconnects_when_the_pooled_connection_died(fake_db):
+    config = DBConfig(host='db', user='u', database='lab', pool_ping_interval=0)
+    first = DatabaseService(config)
+    first.upsert_batches([('pai', [(1, 'a')])], COLUMNS)
+    (stale, _), = first.pool._idle
+    stale.closed = True  # wait_timeout do servidor entre as invocações
+
+    DatabaseService(config).upsert_batches([('pai', [(2, 'b')])], COLUMNS)
+
+    fresh = [conn for conn, _ in first.pool._idle]
+    assert len(fresh) == 1 and fresh[0] is not stale
+    assert ('commit', 'COMMIT') in fresh[0].operations()
@@ -0,0 +1,66 @@
+import io
+import re
+
+from chalicelib.core.config import AppConfig, DBConfig
+from chalicelib.core.runtime import Runtime
+from chalicelib.services import spill
+from chalicelib.services.spill import SpillParser
+from tests.conftest import csv_lines
+
+# ~2,5 MB: acima de MIN_SLICE_BYTES por processo com 2 processos
+CONTENT = csv_lines(60000).encode('utf-8')
+
+
+def parser(tmp_path):
+    runtime = Runtime(AppConfig(db=DBConfig(host='db', user='u', database='lab')))
+    return SpillParser(runtime.processor, 2, str(tmp_path))
+
+
+def rows(batches):
+    """Linhas por tabela, sem a data de atualização (função avaliada no momento do parsing)"""
+    now = re.compile(r'\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}$')
+    tables = {}
+    for table, batch in batches:
+        tables.setdefault(table, []).extend(
+            tuple(None if isinstance(value, str) and now.match(value) else value for value in row) for row in batch
+        )
+    return tables
+
+
+def expected(spill_parser):
+    return rows(spill_parser.processor.iter_batches(io.StringIO(CONTENT.decode('utf-8')), 5000, None))
+
+
+def test_parallel_parsing_matches_single_process(tmp_path):
+    spill_parser = parser(tmp_path)
+
+    assert rows(spill_parser.iter_batches([CONTENT], 5000)) == expected(spill_parser)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_low_free_space_falls_back_to_single_process(tmp_path, monkeypatch):
+    spill_parser = parser(tmp_path)
+    monkeypatch.setattr(spill.shutil, 'disk_usage', lambda path: type('Usage', (), {'free': len(CONTENT)})())
+
+    def no_fork(*args):
+        raise AssertionError('não deveria criar processos sem espaço para os lotes')
+
+    monkeypatch.setattr(spill_parser, '_start_workers', no_fork)
+
+    assert rows(spill_parser.iter_batches([CONTENT], 5000)) == expected(spill_parser)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_processes_start_before_the_batches_are_consumed(tmp_path, monkeypatch):
+    spill_parser = parser(tmp_path)
+    started = []
+    start_workers = spill_parser._start_workers
+    monkeypatch.setattr(spill_parser, '_start_workers', lambda workers, *args: started.append(
+        start_workers(workers, *args)))
+
+    batches = spill_parser.iter_batches([CONTENT], 5000)
+
+    # O fork acontece antes de quem consome os lotes criar threads
+    assert len(started) == 1
+    batches.close()
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,90 @@
+import gzip
+
+import pytest
+from chalicelib.core.config import S3Config
+from chalicelib.core.exceptions import StorageError
+from chalicelib.services.storage import StorageService
+from tests.conftest import BUCKET, csv_lines
+
+# Linhas de tamanhos diferentes, para que as faixas cortem linhas em pontos variados
+CONTENT = ''.join(f"{line.rstrip()};{'x' * (i % 37)}\n" for i, line in enumerate(csv_lines(2000).splitlines())).encode()
+
+
+class CountingClient:
+    """Cliente S3 que registra os Range de cada get_object; `after_first` roda depois do primeiro GET"""
+
+    def __init__(self, client, after_first=None):
+        self.client = client
+        self.after_first = after_first
+        self.ranges = []
+
+    def get_object(self, **kwargs):
+        response = self.client.get_object(**kwargs)
+        self.ranges.append(kwargs.get('Range'))
+        if self.after_first is not None and len(self.ranges) == 1:
+            self.after_first()
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+
+def storage(client, **options):
+    return StorageService(S3Config(range_size=4096, range_concurrency=3, **options), client=client)
+
+
+@pytest.mark.parametrize('body', [CONTENT, CONTENT.rstrip(b'\n')], ids=['terminado', 'sem-quebra-final'])
+def test_ranged_chunks_reassemble_the_object_in_order(s3, body):
+    s3.put_object(Bucket=BUCKET, Key='entrada/grande.csv', Body=body)
+    client = CountingClient(s3)
+
+    chunks = list(storage(client).stream_chunks(BUCKET, 'entrada/grande.csv'))
+
+    assert b''.join(chunks) == body
+    # Todo bloco, menos o último, termina em fim de linha
+    assert all(chunk.endswith(b'\n') for chunk in chunks[:-1])
+    # Faixas disjuntas de 4096 bytes cobrindo o objeto (as threads terminam em qualquer ordem)
+    expected = {f"bytes={start}-{min(start + 4096, len(body)) - 1}" for start in range(0, len(body), 4096)}
+    assert len(client.ranges) == len(expected) and set(client.ranges) == expected
+
+
+def test_ranged_lines_match_the_file(s3):
+    s3.put_object(Bucket=BUCKET, Key='entrada/grande.csv', Body=CONTENT)
+
+    lines = list(storage(s3).stream_file(BUCKET, 'entrada/grande.csv'))
+
+    assert ''.join(lines) == CONTENT.decode()
+
+
+def test_compressed_object_is_reassembled_before_decompressing(s3):
+    s3.put_object(Bucket=BUCKET, Key='entrada/grande.csv.gz', Body=gzip.compress(CONTENT))
+    client = CountingClient(s3)
+
+    assert storage(client).get_file(BUCKET, 'entrada/grande.csv.gz') == CONTENT.decode()
+    assert len(client.ranges) > 1
+
+
+def test_small_object_costs_a_single_get(s3):
+    s3.put_object(Bucket=BUCKET, Key='entrada/pequeno.csv', Body=b'C;1;01.02.2024\n')
+    client = CountingClient(s3)
+
+    assert storage(client).get_file(BUCKET, 'entrada/pequeno.csv') == 'C;1;01.02.2024\n'
+    assert client.ranges == ['bytes=0-4095']
+
+
+def test_empty_object_is_read_without_range(s3):
+    s3.put_object(Bucket=BUCKET, Key='entrada/vazio.csv', Body=b'')
+    client = CountingClient(s3)
+
+    assert storage(client).get_file(BUCKET, 'entrada/vazio.csv') == ''
+    # InvalidRange na primeira faixa: uma leitura simples do objeto
+    assert client.ranges[-1] is None
+
+
+def test_object_replaced_during_ranged_read_fails(s3):
+    s3.put_object(Bucket=BUCKET, Key='entrada/grande.csv', Body=CONTENT)
+    replace = lambda: s3.put_object(Bucket=BUCKET, Key='entrada/grande.csv', Body=CONTENT + b'nova versao\n')
+    client = CountingClient(s3, after_first=replace)
+
+    with pytest.raises(StorageError):
+        list(storage(client).stream_chunks(BUCKET, 'entrada/grande.csv'))